@@ -1,40 +1,133 @@
 from datetime import datetime, timedelta
 import argparse  # for --no download option command line argument
-import pandas as pd
 import os
 import glob
 import xml.etree.ElementTree as ET
 import json
 import sqlite3
-import requests
+import csv
 import io
-from sec_edgar_downloader import Downloader
+import threading
+import time
+
+import form4_parser
+import inventory
+import issuers
+import metrics
+import partitions
+import schema
+
+# pandas, requests and sec_edgar_downloader are imported inside the functions that
+# need them, so query-only, --no-download and export-only runs start quickly
 
 # Use relative path for data directory
 DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
 DB_PATH = os.path.join(DATA_DIR, 'insider_trading.db')
 SP500_URL = "https://raw.githubusercontent.com/datasets/s-and-p-500-companies/main/data/constituents.csv"
 
+# Identity sent to the SEC with every request (required by EDGAR's fair access policy)
+SEC_COMPANY_NAME = "S&P500 Insider Trading Research Project"
+SEC_USER_EMAIL = "kennylamitunes@yahoo.com"  # Using a real email for SEC requirements
+
+# SEC EDGAR allows at most 10 requests per second per client
+SEC_MAX_REQUESTS_PER_SECOND = 10
+
+# How filings are downloaded: 'primary' fetches only the ownership XML
+# (fetcher.py), 'full' uses sec-edgar-downloader with full submissions
+FETCH_MODES = ('primary', 'full')
+DEFAULT_FETCH_MODE = 'primary'
+
+# Companies downloaded in parallel by the daily run; the shared RateLimiter
+# keeps the total within SEC_MAX_REQUESTS_PER_SECOND, so workers only hide latency
+DOWNLOAD_WORKERS = 4
+
+# Secondary indexes (dropped and rebuilt around bulk loads), on the normalized
+# tables; databases not converted yet use schema.FLAT_SECONDARY_INDEXES
+SECONDARY_INDEXES = schema.SECONDARY_INDEXES
+
+# Columns added to insider_trading after the original schema (migrated in place)
+ADDED_COLUMNS = {
+    'issuer_cik': 'TEXT',
+    'reported_ticker': 'TEXT',
+}
+
+# Columns filled from each parsed Form 4 filing, in insert order
+TRANSACTION_COLUMNS = (
+    'issuer_name', 'issuer_ticker', 'reporting_owner', 'reporting_owner_cik',
+    'reporting_owner_position', 'transaction_date', 'transaction_shares',
+    'transaction_price', 'transaction_type', 'shares_after_transaction',
+    'issuer_cik', 'reported_ticker',
+)
+
+INSERT_TRANSACTION_SQL = f'''
+INSERT INTO insider_trading 
+({', '.join(TRANSACTION_COLUMNS)}, source_file)
+VALUES ({', '.join('?' * (len(TRANSACTION_COLUMNS) + 1))})
+'''
+
+# Bulk-load tuning: rows per commit and page cache size
+BULK_LOAD_BATCH_SIZE = 5000
+BULK_LOAD_CACHE_MB = 256
+
+class RateLimiter:
+    """Thread-safe limiter that spaces calls evenly to at most `rate` per second."""
+
+    def __init__(self, rate=SEC_MAX_REQUESTS_PER_SECOND):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        """Block until the caller may issue its next request."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+# The functions sec-edgar-downloader sends its HTTP requests through, as its orchestrator calls them
+DOWNLOADER_REQUEST_FUNCTIONS = ('download_filing', 'get_list_of_available_filings', 'get_ticker_metadata')
+
+def throttle_downloader_requests(limiter):
+    """Make every request sec-edgar-downloader sends wait on `limiter`.
+    
+    The library's own limit isn't shared with our limiter (or with other
+    shard processes), so its request functions are wrapped instead.
+    """
+    from sec_edgar_downloader import _orchestrator
+    for name in DOWNLOADER_REQUEST_FUNCTIONS:
+        request = getattr(_orchestrator, name)
+        request = getattr(request, '__wrapped__', request)
+        
+        def throttled(*args, _request=request, **kwargs):
+            limiter.acquire()
+            return _request(*args, **kwargs)
+        throttled.__wrapped__ = request
+        setattr(_orchestrator, name, throttled)
+
 def get_sp500_companies():
     """Fetch the list of S&P 500 companies from GitHub."""
     try:
+        import requests
+        
         print("Fetching S&P 500 companies list...")
         
         # Fetch the CSV data from the URL
         response = requests.get(SP500_URL)
         response.raise_for_status()  # Raise an exception for HTTP errors
         
-        # Read the CSV into a DataFrame
-        df = pd.read_csv(io.StringIO(response.text))
+        # Read the CSV rows
+        reader = csv.DictReader(io.StringIO(response.text))
         
         # Extract the ticker symbols (assuming the column is named 'Symbol')
-        if 'Symbol' in df.columns:
+        if reader.fieldnames and 'Symbol' in reader.fieldnames:
             # Clean the ticker symbols (remove any special characters like dots)
-            tickers = [ticker.replace('.', '-') for ticker in df['Symbol'].tolist()]
+            tickers = [row['Symbol'].replace('.', '-') for row in reader if row['Symbol']]
             print(f"Successfully fetched {len(tickers)} S&P 500 companies")
             return tickers
         else:
-            print(f"Column 'Symbol' not found in CSV. Available columns: {df.columns.tolist()}")
+            print(f"Column 'Symbol' not found in CSV. Available columns: {reader.fieldnames}")
             # Return a default list as fallback
             return ["AAPL", "MSFT", "AMZN", "GOOGL", "META"]
             
@@ -50,16 +143,66 @@ def main():
     parser.add_argument('--no-download', action='store_true', 
                         help='Skip downloading new filings and only process existing files')
     parser.add_argument('--limit', type=int, default=0,
-                        help='Limit the number of S&P 500 companies to download (0 = all)')
+                        help='Limit the number of universe companies to download (0 = all)')
+    parser.add_argument('--universe', type=str,
+                        help='Universe config listing the issuers to download (default: universe.json, '
+                             'or the S&P 500 when it is missing)')
+    parser.add_argument('--workers', type=int, default=DOWNLOAD_WORKERS,
+                        help=f'Number of companies downloaded in parallel (default: {DOWNLOAD_WORKERS})')
     parser.add_argument('--date-range', type=str, 
                         help='Date range for downloading filings in format YYYY-MM-DD:YYYY-MM-DD')
+    parser.add_argument('--fetch-mode', choices=FETCH_MODES, default=DEFAULT_FETCH_MODE,
+                        help='primary: download only the ownership XML of each filing; '
+                             f'full: full submissions via sec-edgar-downloader (default: {DEFAULT_FETCH_MODE})')
+    parser.add_argument('--bulk-load', action='store_true',
+                        help='Use SQLite bulk-load mode (WAL, deferred indexes, batched commits) for large ingests')
+    parser.add_argument('--batch-size', type=int, default=BULK_LOAD_BATCH_SIZE,
+                        help=f'Rows per commit in bulk-load mode (default: {BULK_LOAD_BATCH_SIZE})')
+    parser.add_argument('--vacuum', action='store_true',
+                        help='Run VACUUM after a bulk load')
+    parser.add_argument('--parser', choices=('auto',) + tuple(form4_parser.BACKENDS), default='auto',
+                        help='XML parser backend (default: auto, the fastest installed one)')
+    parser.add_argument('--watch', action='store_true',
+                        help='Poll the latest-filings feed and ingest new Form 4 filings continuously')
+    parser.add_argument('--interval', type=int, default=60,
+                        help='Seconds between feed polls in watch mode (default: 60)')
+    parser.add_argument('--feed-url', type=str,
+                        help='Latest-filings Atom feed to poll in watch mode (default: EDGAR\'s Form 4 feed)')
+    parser.add_argument('--max-polls', type=int, default=0,
+                        help='Stop watch mode after this many polls (0 = run until interrupted)')
     parser.add_argument('--debug', action='store_true',
                         help='Enable debug output')
+    metrics.add_profile_arguments(parser)
     args = parser.parse_args()
     
     # Enable debug output for GitHub Actions
     debug = args.debug or ('GITHUB_ACTIONS' in os.environ)
     
+    if args.watch:
+        # Each poll records its own run in run_metrics.json
+        import universe
+        import watch
+        try:
+            companies = universe.load_universe(args.universe, args.limit)
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            return 1
+        watch.run_watch(interval=args.interval, feed_url=args.feed_url or watch.FEED_URL, universe=companies,
+                        parser_backend=args.parser, max_polls=args.max_polls)
+        return 0
+    
+    # Record per-stage timings and counters in run_metrics.json
+    metrics.start_run('InsiderTrading', metrics.metrics_path(args, DATA_DIR),
+                      profile_stage=args.profile, profile_mode=args.profile_mode)
+    status = 1
+    try:
+        status = run(args, debug)
+    finally:
+        metrics.finish_run('ok' if status == 0 else 'error')
+    return status
+
+def run(args, debug=False):
+    """Download and process Form 4 filings for parsed command line arguments."""
     if debug:
         print("DEBUG: Starting InsiderTrading.py script")
         print(f"DEBUG: Current working directory: {os.getcwd()}")
@@ -73,17 +216,14 @@ def main():
     
     if debug:
         print("DEBUG: Data directory created or verified")
-        print("DEBUG: Listing files in data directory:")
-        for root, dirs, files in os.walk(DATA_DIR):
-            print(f"DEBUG:   Dir: {root}")
-            for file in files:
-                print(f"DEBUG:     File: {file}")
     
     # Initialize SQLite database
-    initialize_database()
+    with metrics.stage('initialize'):
+        initialize_database()
     
     if debug:
         print("DEBUG: Database initialized")
+        print_inventory(prefix='DEBUG: ')
     
     if not args.no_download:
         # Only run download code if --no-download is NOT specified
@@ -110,20 +250,23 @@ def main():
             if debug:
                 print(f"DEBUG: Using default date range (last 30 days): {start_date} to {end_date}")
                 
-        print(f"Using sec-edgar-downloader to fetch Form 4 filings from {start_date} to {end_date}...")
+        source = 'EDGAR primary documents' if args.fetch_mode == 'primary' else 'sec-edgar-downloader'
+        print(f"Using {source} ({args.fetch_mode} mode) to fetch Form 4 filings from {start_date} to {end_date}...")
         
         # Initialize the downloader with company name and user email (required by SEC)
-        company_name = "S&P500 Insider Trading Research Project"
-        user_email = "kennylamitunes@yahoo.com"  # Using a real email for SEC requirements
+        company_name = SEC_COMPANY_NAME
+        user_email = SEC_USER_EMAIL
         if debug:
             print(f"DEBUG: Using company name: {company_name}")
             print(f"DEBUG: Using email: {user_email}")
         
         try:
             # The library will automatically create headers using company_name and user_email
-            dl = Downloader(company_name, user_email, DATA_DIR)
+            # One limiter shared by every download worker keeps the whole run within the SEC's limit
+            limiter = RateLimiter()
+            dl = create_downloader(company_name, user_email, fetch_mode=args.fetch_mode, limiter=limiter)
             if debug:
-                print("DEBUG: Downloader initialized successfully")
+                print(f"DEBUG: Downloader initialized successfully ({args.fetch_mode} mode)")
         except Exception as e:
             print(f"ERROR: Failed to initialize downloader: {e}")
             if debug:
@@ -131,61 +274,39 @@ def main():
                 traceback.print_exc()
             return 1
         
-        # Get S&P 500 companies dynamically
+        # Get the universe of companies (universe.json, the S&P 500 by default)
         try:
-            companies = get_sp500_companies()
+            import universe
+            companies = universe.load_universe(args.universe, args.limit)
             if debug:
                 print(f"DEBUG: Successfully fetched companies: {len(companies)}")
                 print(f"DEBUG: First 5 companies: {companies[:5]}")
         except Exception as e:
-            print(f"ERROR: Failed to get S&P 500 companies: {e}")
+            print(f"ERROR: Failed to get the universe of companies: {e}")
             if debug:
                 import traceback
                 traceback.print_exc()
             return 1
-        
-        # Apply limit if specified
-        if args.limit > 0 and args.limit < len(companies):
-            print(f"Limiting to the first {args.limit} companies (out of {len(companies)} total S&P 500 companies)")
-            companies = companies[:args.limit]
-            if debug:
-                print(f"DEBUG: Limited to companies: {companies}")
-        else:
-            print(f"Processing all {len(companies)} S&P 500 companies")
+        print(f"Processing {len(companies)} companies")
         
         # Download Form 4 filings for each company
-        for i, ticker in enumerate(companies):
-            try:
-                print(f"[{i+1}/{len(companies)}] Downloading Form 4 filings for {ticker}...")
-                if debug:
-                    print(f"DEBUG: Starting download for {ticker}")
-                
-                # Download Form 4 filings within the specified date range
-                # Set download_details=True to get the XML files
-                dl.get("4", ticker, after=start_date, before=end_date, download_details=True)
-                print(f"Successfully downloaded Form 4 filings for {ticker}")
-            except Exception as e:
-                print(f"Error downloading Form 4 filings for {ticker}: {e}")
-                if debug:
-                    import traceback
-                    traceback.print_exc()
+        with metrics.stage('download'):
+            refresh_issuers()
+            download_companies(dl, companies, start_date, end_date, workers=args.workers, debug=debug)
+            record_downloads(dl)
     else:
         print("Skipping download, processing existing files only...")
-        if debug:
-            print("DEBUG: No-download mode, checking for existing files:")
-            # List files
-            for root, dirs, files in os.walk(os.path.join(DATA_DIR, "sec-edgar-filings")):
-                print(f"DEBUG:   Dir: {root}")
-                for file in files:
-                    print(f"DEBUG:     File: {file}")
     
     # Process the downloaded Form 4 filings
     try:
         if debug:
             print("DEBUG: Starting to process Form 4 filings")
-        process_form4_filings()
+        with metrics.stage('ingest'):
+            process_form4_filings(bulk_load=args.bulk_load, batch_size=args.batch_size, vacuum=args.vacuum,
+                                  parser_backend=args.parser)
         if debug:
             print("DEBUG: Successfully processed Form 4 filings")
+            print_inventory(prefix='DEBUG: ')
     except Exception as e:
         print(f"ERROR: Failed to process Form 4 filings: {e}")
         if debug:
@@ -193,73 +314,241 @@ def main():
             traceback.print_exc()
         return 1
     
+    # Refresh latest.json of the tickers that just got rows, without waiting for the full export
+    with metrics.stage('export_latest'):
+        update_latest_files()
+    
     if debug:
         print("DEBUG: Script completed successfully")
     
     return 0
 
+def create_downloader(company_name=SEC_COMPANY_NAME, user_email=SEC_USER_EMAIL, fetch_mode=DEFAULT_FETCH_MODE,
+                      limiter=None):
+    """Create the downloader saving filings under DATA_DIR for a fetch mode.
+    
+    'primary' returns a fetcher.PrimaryDocumentFetcher sharing `limiter`;
+    'full' returns a sec-edgar-downloader Downloader whose requests wait on
+    `limiter` too.
+    """
+    if fetch_mode == 'primary':
+        import fetcher
+        return fetcher.PrimaryDocumentFetcher(f"{company_name} {user_email}", DATA_DIR, DB_PATH, limiter=limiter)
+    # Imported here so runs that don't download never load the library
+    from sec_edgar_downloader import Downloader
+    if limiter is not None:
+        throttle_downloader_requests(limiter)
+    return Downloader(company_name, user_email, DATA_DIR)
+
+def downloaded_accessions(ticker):
+    """Return the accession numbers already present on disk for a ticker."""
+    ticker_dir = os.path.join(DATA_DIR, "sec-edgar-filings", ticker, "4")
+    if not os.path.isdir(ticker_dir):
+        return set()
+    return {entry.name for entry in os.scandir(ticker_dir) if entry.is_dir()}
+
+def download_form4_filings(dl, ticker, start_date, end_date):
+    """Download Form 4 filings for one ticker, skipping accessions already on disk.
+    
+    Returns the number of filings downloaded.
+    """
+    # Set download_details=True to get the XML files
+    downloaded = dl.get("4", ticker, after=start_date, before=end_date, download_details=True,
+                        accession_numbers_to_skip=downloaded_accessions(ticker))
+    metrics.incr('files', downloaded)
+    return downloaded
+
+def download_companies(dl, companies, start_date, end_date, workers=DOWNLOAD_WORKERS, debug=False):
+    """Download the Form 4 filings of many companies with `workers` parallel downloads.
+    
+    Every request waits on the limiter the downloader was created with (see
+    create_downloader). Returns the number of filings downloaded.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    
+    total = 0
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = {executor.submit(download_form4_filings, dl, ticker, start_date, end_date): ticker
+                   for ticker in companies}
+        for done_count, future in enumerate(as_completed(futures), start=1):
+            ticker = futures[future]
+            try:
+                filings = future.result()
+                total += filings
+                print(f"[{done_count}/{len(companies)}] Downloaded {filings} Form 4 filings for {ticker}")
+            except Exception as e:
+                metrics.incr('errors')
+                print(f"Error downloading Form 4 filings for {ticker}: {e}")
+                if debug:
+                    import traceback
+                    traceback.print_exc()
+    return total
+
 def initialize_database():
-    """Initialize SQLite database with the required tables."""
+    """Initialize SQLite database with the required tables.
+    
+    A database with the single insider_trading table of earlier versions is
+    converted to the normalized schema (see schema.py) and vacuumed.
+    """
     print("Initializing SQLite database...")
     
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
-    # Create main insider trading table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS insider_trading (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        issuer_name TEXT,
-        issuer_ticker TEXT,
-        reporting_owner TEXT,
-        reporting_owner_cik TEXT,
-        reporting_owner_position TEXT,
-        transaction_date TEXT,
-        transaction_shares TEXT,
-        transaction_price TEXT,
-        transaction_type TEXT,
-        shares_after_transaction TEXT,
-        source_file TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
+    # Lets prune.py hand freed pages back with incremental VACUUM (only takes effect on new databases)
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    
+    # Bring a single-table database up to date before converting it
+    if cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'insider_trading'").fetchone():
+        migrate_schema(conn)
+    converted = schema.normalize(conn)
+    issuers.initialize_issuers(conn)
     
     # Create index for faster queries
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_issuer_ticker ON insider_trading (issuer_ticker)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transaction_date ON insider_trading (transaction_date)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reporting_owner ON insider_trading (reporting_owner)')
+    for create_sql in SECONDARY_INDEXES.values():
+        cursor.execute(create_sql)
     
     conn.commit()
+    if converted:
+        # Hands back the space of the repeated text columns
+        conn.execute("VACUUM")
+        print(f"Converted {converted} rows to the normalized schema")
     conn.close()
     
     print("Database initialized successfully")
 
+def migrate_schema(conn):
+    """Add columns introduced after the original schema to an existing insider_trading table.
+    
+    Rows ingested before issuer CIK routing are rerouted once, when the
+    columns are added. The normalized schema has every column already.
+    """
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(insider_trading)")}
+    added = [column for column in ADDED_COLUMNS if column not in existing]
+    for column in added:
+        conn.execute(f"ALTER TABLE insider_trading ADD COLUMN {column} {ADDED_COLUMNS[column]}")
+    issuers.initialize_issuers(conn)
+    if 'reported_ticker' in added:
+        print(f"Routed {issuers.assign_legacy_rows(conn, DATA_DIR)} existing rows by issuer CIK")
+    conn.execute(schema.secondary_indexes(conn)['idx_issuer_cik'])
+    conn.commit()
+
+def sec_user_agent():
+    """Return the User-Agent the SEC requires for direct requests."""
+    return f"{SEC_COMPANY_NAME} {SEC_USER_EMAIL}"
+
+def refresh_issuers():
+    """Refresh the issuer CIK map; a failure leaves the cached map in use."""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        changed = issuers.refresh_issuer_map(conn, sec_user_agent(), data_dir=DATA_DIR)
+        if changed:
+            print(f"Issuer map updated: {changed} CIKs added or changed")
+    except Exception as e:
+        print(f"Warning: could not refresh the issuer map, using the cached one: {e}")
+    finally:
+        conn.close()
+
+def record_downloads(dl):
+    """Record the filings a downloader saved (with their filing dates) in the inventory."""
+    downloads = getattr(dl, 'downloaded', None)
+    if not downloads:
+        return
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        inventory.record_downloads(conn, DATA_DIR, downloads)
+        downloads.clear()
+    finally:
+        conn.close()
+
+def print_inventory(prefix=''):
+    """Print the inventory summary of the downloaded filings (without walking the data directory)."""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        inventory.print_report(conn, prefix=prefix)
+    except sqlite3.Error as e:
+        print(f"{prefix}Could not read the inventory: {e}")
+    finally:
+        conn.close()
+
+def update_latest_files():
+    """Rewrite data/json/{ticker}/latest.json of the tickers with rows ingested since the last update."""
+    import export_json
+    
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        written = export_json.update_latest_files(conn, os.path.join(DATA_DIR, 'json'))
+        print(f"Updated latest.json for {written} companies")
+    except Exception as e:
+        print(f"Warning: could not update latest.json files: {e}")
+    finally:
+        conn.close()
+
+def enable_bulk_load(conn, cache_size_mb=BULK_LOAD_CACHE_MB):
+    """Switch a connection into bulk-load mode for large ingests.
+    
+    Uses WAL with synchronous=NORMAL (commits may be lost on an OS crash, but
+    the database stays consistent), a large page cache and drops the secondary
+    indexes so inserts only touch the table. Returns the settings needed by
+    disable_bulk_load() to restore normal mode.
+    """
+    conn.commit()
+    state = {
+        'journal_mode': conn.execute("PRAGMA journal_mode").fetchone()[0],
+        'synchronous': conn.execute("PRAGMA synchronous").fetchone()[0],
+        'cache_size': conn.execute("PRAGMA cache_size").fetchone()[0],
+    }
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(cache_size_mb) * 1024}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        for index_name in schema.secondary_indexes(conn):
+            conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+        conn.commit()
+    except sqlite3.Error:
+        disable_bulk_load(conn, state, success=False)
+        raise
+    return state
+
+def disable_bulk_load(conn, state, success=True, vacuum=False):
+    """Leave bulk-load mode: rebuild indexes and restore the previous settings.
+    
+    Indexes and pragmas are always restored. ANALYZE (and VACUUM if requested)
+    only run after a successful load.
+    """
+    for create_sql in schema.secondary_indexes(conn).values():
+        conn.execute(create_sql)
+    conn.commit()
+    
+    if success:
+        conn.execute("ANALYZE")
+        conn.commit()
+        if vacuum:
+            conn.execute("VACUUM")
+    
+    conn.execute(f"PRAGMA synchronous={state['synchronous']}")
+    conn.execute(f"PRAGMA cache_size={state['cache_size']}")
+    conn.execute(f"PRAGMA journal_mode={state['journal_mode']}")
+
 def check_downloaded_data():
-    """Examines the downloaded data structure and prints information about it."""
+    """Prints the inventory of the downloaded data and examines a sample XML file."""
     print("\nChecking downloaded data structure:")
     
-    # List directories and files
-    if not os.path.exists(DATA_DIR):
-        print(f"Error: Directory {DATA_DIR} does not exist")
+    if not os.path.exists(DB_PATH):
+        print(f"Error: SQLite database not found at {DB_PATH}")
         return
     
-    # Count files 
-    print(f"\nDirectory structure:")
-    for root, dirs, files in os.walk(DATA_DIR):
-        depth = root.replace(DATA_DIR, '').count(os.sep)
-        indent = ' ' * 4 * depth
-        print(f"{indent}{os.path.basename(root)}/")
-        if depth < 2:  # Only show files for the first two levels
-            for file in files:
-                print(f"{indent}    {file}")
-    
-    # Find XML files
-    xml_files = glob.glob(f"{DATA_DIR}/**/*.xml", recursive=True)
-    print(f"\nFound {len(xml_files)} XML files")
-    
-    # Examine a sample XML file if available
-    if xml_files:
-        sample_file = xml_files[0]
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        inventory.print_report(conn)
+        sample = conn.execute("SELECT path FROM filing_inventory ORDER BY updated_at DESC LIMIT 1").fetchone()
+    finally:
+        conn.close()
+    
+    # Examine the most recently recorded XML file if available
+    if sample and os.path.exists(sample[0]):
+        sample_file = sample[0]
         print(f"\nExamining sample XML file: {os.path.basename(sample_file)}")
         try:
             tree = ET.parse(sample_file)
@@ -272,12 +561,54 @@ def check_downloaded_data():
         except Exception as e:
             print(f"Error parsing XML: {e}")
 
-def process_form4_filings():
-    """Process the downloaded Form 4 filings to extract insider trading information."""
+def parse_form4_file(xml_file, backend='auto'):
+    """Parse one Form 4 XML file into a dictionary of insider_trading column values.
+    
+    Only the first non-derivative transaction is extracted. issuer_ticker is
+    the symbol as reported; process_form4_filings() routes it by issuer_cik.
+    `backend` selects the form4_parser backend ('auto' = fastest installed).
+    """
+    record = form4_parser.get_parser(backend)(xml_file)
+    record['reported_ticker'] = record['issuer_ticker']
+    record['issuer_cik'] = issuers.normalize_cik(record['issuer_cik'])
+    return record
+
+def transaction_values(record, source_file):
+    """Return the INSERT_TRANSACTION_SQL parameters for a parsed Form 4 record."""
+    return tuple(record[column] for column in TRANSACTION_COLUMNS) + (source_file,)
+
+def ingest_form4_file(conn, issuer_map, xml_file, parser_backend='auto'):
+    """Parse one Form 4 file, route it by issuer CIK and insert its row (uncommitted).
+    
+    Returns the parsed record.
+    """
+    with metrics.timer('parse'):
+        record = parse_form4_file(xml_file, parser_backend)
+    
+    # Route by issuer CIK rather than the free-text symbol
+    record['issuer_ticker'] = issuers.route_issuer(
+        conn, issuer_map, record['issuer_cik'], record['reported_ticker'])
+    
+    with metrics.timer('insert'):
+        conn.execute(INSERT_TRANSACTION_SQL, transaction_values(record, xml_file))
+    metrics.incr('rows')
+    return record
+
+def process_form4_filings(bulk_load=False, batch_size=BULK_LOAD_BATCH_SIZE, vacuum=False, parser_backend='auto'):
+    """Process the downloaded Form 4 filings to extract insider trading information.
+    
+    Args:
+        bulk_load: Use bulk-load mode (WAL, no secondary indexes, batched commits)
+            for large ingests. Falls back to normal mode if it can't be enabled.
+        batch_size: Number of inserted rows per commit in bulk-load mode
+        vacuum: Run VACUUM after a successful bulk load
+        parser_backend: form4_parser backend used to parse the filings
+    """
     print("\nProcessing Form 4 filings...")
     
     # Find all XML files (Form 4 filings are in XML format)
-    xml_files = glob.glob(f"{DATA_DIR}/**/*.xml", recursive=True)
+    with metrics.timer('discovery'):
+        xml_files = glob.glob(f"{DATA_DIR}/**/*.xml", recursive=True)
     
     if not xml_files:
         print("No XML files found to process")
@@ -286,109 +617,71 @@ def process_form4_filings():
     # Connect to SQLite database
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
+    migrate_schema(conn)
+    issuer_map = issuers.load_issuer_map(conn)
+    
+    # Skip files that were ingested by a previous run so re-runs don't duplicate rows,
+    # including the ones whose rows were rolled into cold partitions since
+    cursor.execute("SELECT DISTINCT source_file FROM insider_trading")
+    ingested = {row[0] for row in cursor.fetchall()}
+    if partitions.partitions_for_range(conn):
+        _, rows = partitions.query_partitions(conn, DATA_DIR, "source_file IS NOT NULL", [],
+                                              'source_file', -1, columns=['source_file'])
+        ingested.update(row[0] for row in rows)
+    # Files seen for the first time join the inventory (only they are stat'ed)
+    inventory.add_discovered(conn, DATA_DIR, xml_files, ingested)
+    skipped_count = len([f for f in xml_files if f in ingested])
+    xml_files = [f for f in xml_files if f not in ingested]
+    metrics.incr('cache_hits', skipped_count)
+    
+    bulk_state = None
+    if bulk_load and xml_files:
+        try:
+            bulk_state = enable_bulk_load(conn)
+            print(f"Bulk-load mode enabled for {len(xml_files)} files")
+        except sqlite3.Error as e:
+            print(f"Warning: could not enable bulk-load mode, using normal mode: {e}")
     
     # Track processed filings for summary
     processed_count = 0
     error_count = 0
     
-    for xml_file in xml_files:
-        try:
-            # Parse the XML file
-            tree = ET.parse(xml_file)
-            root = tree.getroot()
-            
-            # Extract relevant information
-            issuer_name = None
-            issuer_ticker = None
-            reporting_owner = None
-            reporting_owner_cik = None
-            reporting_owner_position = None  # New field for position
-            transaction_date = None
-            transaction_shares = None
-            transaction_price = None
-            transaction_type = None
-            shares_after_transaction = None
-            
-            # Extract issuer information
-            for elem in root.findall(".//issuerName"):
-                issuer_name = elem.text
-                break
-            
-            for elem in root.findall(".//issuerTradingSymbol"):
-                issuer_ticker = elem.text
-                break
-            
-            # Extract reporting owner information
-            for elem in root.findall(".//rptOwnerName"):
-                reporting_owner = elem.text
-                break
-            
-            # Extract reporting owner CIK
-            for elem in root.findall(".//rptOwnerCik"):
-                reporting_owner_cik = elem.text
-                break
-            
-            # Extract reporting owner position/title
-            for elem in root.findall(".//reportingOwnerRelationship/officerTitle"):
-                reporting_owner_position = elem.text
-                break
-            
-            # Extract transaction information
-            # Get the first non-derivative transaction (for simplicity)
-            non_derivative_transactions = root.findall(".//nonDerivativeTransaction")
-            if non_derivative_transactions:
-                transaction = non_derivative_transactions[0]  # Get the first transaction
-                
-                # Extract transaction date
-                date_elem = transaction.find(".//transactionDate/value")
-                if date_elem is not None:
-                    transaction_date = date_elem.text
-                
-                # Extract transaction shares
-                shares_elem = transaction.find(".//transactionShares/value")
-                if shares_elem is not None:
-                    transaction_shares = shares_elem.text
-                
-                # Extract transaction price
-                price_elem = transaction.find(".//transactionPricePerShare/value")
-                if price_elem is not None:
-                    transaction_price = price_elem.text
-                
-                # Extract transaction code
-                code_elem = transaction.find(".//transactionCode")
-                if code_elem is not None:
-                    transaction_type = code_elem.text
-                
-                # Extract shares owned after transaction
-                post_shares_elem = transaction.find(".//sharesOwnedFollowingTransaction/value")
-                if post_shares_elem is not None:
-                    shares_after_transaction = post_shares_elem.text
-            
-            # Insert into SQLite database
-            cursor.execute('''
-            INSERT INTO insider_trading 
-            (issuer_name, issuer_ticker, reporting_owner, reporting_owner_cik, 
-             reporting_owner_position, transaction_date, transaction_shares, 
-             transaction_price, transaction_type, shares_after_transaction, source_file)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                issuer_name, issuer_ticker, reporting_owner, reporting_owner_cik,
-                reporting_owner_position, transaction_date, transaction_shares,
-                transaction_price, transaction_type, shares_after_transaction, xml_file
-            ))
+    try:
+        for xml_file in xml_files:
+            try:
+                metrics.incr('files')
+                ingest_form4_file(conn, issuer_map, xml_file, parser_backend)
+                inventory.record(conn, DATA_DIR, xml_file, inventory.STATUS_INGESTED)
+                processed_count += 1
             
-            processed_count += 1
+                # Commit in bounded batches during bulk loads
+                if bulk_state and batch_size > 0 and processed_count % batch_size == 0:
+                    conn.commit()
         
-        except Exception as e:
-            print(f"Error processing {xml_file}: {e}")
-            error_count += 1
+            except Exception as e:
+                print(f"Error processing {xml_file}: {e}")
+                inventory.record(conn, DATA_DIR, xml_file, inventory.STATUS_ERROR, error=str(e))
+                metrics.incr('errors')
+                error_count += 1
+        
+        # Commit changes
+        with metrics.timer('commit'):
+            conn.commit()
+    except BaseException:
+        # Keep the committed batches, drop the partial one and restore normal mode
+        conn.rollback()
+        if bulk_state:
+            disable_bulk_load(conn, bulk_state, success=False)
+        conn.close()
+        raise
     
-    # Commit changes and close connection
-    conn.commit()
+    if bulk_state:
+        disable_bulk_load(conn, bulk_state, vacuum=vacuum)
     conn.close()
     
     print(f"\nInsider Trading Data Summary:")
     print(f"Total transactions processed: {processed_count}")
+    print(f"Previously ingested files skipped: {skipped_count}")
     print(f"Errors encountered: {error_count}")
     
     # Display sample data from the database
@@ -398,45 +691,71 @@ def display_sample_data():
     """Display sample data from the SQLite database."""
     try:
         conn = sqlite3.connect(DB_PATH)
-        
-        # Convert SQLite data to DataFrame for easy display
-        df = pd.read_sql_query("SELECT * FROM insider_trading LIMIT 5", conn)
+        cursor = conn.execute("SELECT * FROM insider_trading LIMIT 5")
+        columns = [description[0] for description in cursor.description]
+        rows = cursor.fetchall()
         conn.close()
         
-        if not df.empty:
+        if rows:
+            # Print an aligned text table
+            cells = [columns] + [['' if value is None else str(value) for value in row] for row in rows]
+            widths = [max(len(row[i]) for row in cells) for i in range(len(columns))]
             print("\nSample transactions:")
-            print(df.to_string())
+            for row in cells:
+                print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
         else:
             print("\nNo insider trading data found in the database")
     except Exception as e:
         print(f"Error displaying sample data: {e}")
 
-def query_insider_trading(ticker=None, date_from=None, date_to=None, limit=10):
-    """Query insider trading data from the SQLite database."""
+def query_insider_trading(ticker=None, date_from=None, date_to=None, limit=10, as_dataframe=True):
+    """Query insider trading data from the SQLite database.
+    
+    Cold partitions (see partitions.py) are only attached when the date
+    range reaches them. Returns a pandas DataFrame, or a list of row
+    dictionaries when as_dataframe is False (which avoids importing pandas).
+    """
     conn = sqlite3.connect(DB_PATH)
     
-    query = "SELECT * FROM insider_trading WHERE 1=1"
+    where = "1=1"
     params = []
     
     if ticker:
-        query += " AND issuer_ticker = ?"
+        where += " AND issuer_ticker = ?"
         params.append(ticker)
     
     if date_from:
-        query += " AND transaction_date >= ?"
+        where += " AND transaction_date >= ?"
         params.append(date_from)
     
     if date_to:
-        query += " AND transaction_date <= ?"
+        where += " AND transaction_date <= ?"
         params.append(date_to)
     
-    query += " ORDER BY transaction_date DESC LIMIT ?"
+    if partitions.partitions_for_range(conn, date_from, date_to):
+        columns, rows = partitions.query_partitions(conn, DATA_DIR, where, params,
+                                                    'transaction_date DESC', limit,
+                                                    date_from=date_from, date_to=date_to)
+        conn.close()
+        if as_dataframe:
+            import pandas as pd
+            return pd.DataFrame(rows, columns=columns)
+        return [dict(zip(columns, row)) for row in rows]
+    
+    query = f"SELECT * FROM insider_trading WHERE {where} ORDER BY transaction_date DESC LIMIT ?"
     params.append(limit)
     
-    df = pd.read_sql_query(query, conn, params=params)
+    if as_dataframe:
+        import pandas as pd
+        df = pd.read_sql_query(query, conn, params=params)
+        conn.close()
+        return df
+    
+    conn.row_factory = sqlite3.Row
+    rows = [dict(row) for row in conn.execute(query, params)]
     conn.close()
     
-    return df
+    return rows
 
 if __name__ == "__main__":
     import sys
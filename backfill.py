@@ -0,0 +1,292 @@
+"""
+Checkpointed, resumable historical backfill of Form 4 filings.
+
+Progress is tracked per (date chunk, ticker) in a `backfill_state` table inside the
+main SQLite database, so an interrupted run picks up exactly where it stopped.
+Chunks are downloaded in parallel under one global SEC rate limit, and the
+filings are parsed and exported to JSON once at the very end.
+"""
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import contextlib
+import os
+import sqlite3
+import time
+
+import InsiderTrading
+import export_json
+import metrics
+import shards
+import universe
+
+STATUS_PENDING = 'pending'
+STATUS_DONE = 'done'
+STATUS_ERROR = 'error'
+
+def generate_date_chunks(start_date, end_date, chunk_months=3):
+    """Split a YYYY-MM-DD date range into consecutive chunks of `chunk_months` months.
+
+    Returns a list of (start, end) date string tuples covering the whole range.
+    """
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d')
+
+    chunks = []
+    current_start = start
+    while current_start < end:
+        # Calculate end of this chunk
+        month = current_start.month - 1 + chunk_months
+        year = current_start.year + month // 12
+        month = month % 12 + 1
+        day = min(current_start.day, 28)  # Avoid month boundary issues
+
+        current_end = min(datetime(year, month, day), end)
+        chunks.append((current_start.strftime('%Y-%m-%d'), current_end.strftime('%Y-%m-%d')))
+
+        # Move to next chunk
+        current_start = current_end + timedelta(days=1)
+
+    return chunks
+
+def initialize_state(conn):
+    """Create the backfill state table if it doesn't exist."""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS backfill_state (
+        chunk_start TEXT NOT NULL,
+        chunk_end TEXT NOT NULL,
+        ticker TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        filings INTEGER,
+        error TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (chunk_start, chunk_end, ticker)
+    )
+    ''')
+    conn.commit()
+
+def seed_state(conn, chunks, tickers):
+    """Register every chunk x ticker task, leaving existing tasks untouched."""
+    conn.executemany('''
+    INSERT OR IGNORE INTO backfill_state (chunk_start, chunk_end, ticker)
+    VALUES (?, ?, ?)
+    ''', [(start, end, ticker) for start, end in chunks for ticker in tickers])
+    conn.commit()
+
+def pending_tasks(conn, chunks, tickers, retry_errors=True, max_attempts=3):
+    """Return the (chunk_start, chunk_end, ticker) tasks that still need to run.
+
+    Failed tasks are retried until they have been attempted `max_attempts` times.
+    """
+    wanted = {(start, end, ticker) for start, end in chunks for ticker in tickers}
+    cursor = conn.execute('''
+    SELECT chunk_start, chunk_end, ticker
+    FROM backfill_state
+    WHERE status = ? OR (status = ? AND ? AND attempts < ?)
+    ORDER BY chunk_start, ticker
+    ''', (STATUS_PENDING, STATUS_ERROR, int(retry_errors), max_attempts))
+    return [task for task in cursor.fetchall() if task in wanted]
+
+def update_task(conn, task, status, filings=None, error=None):
+    """Record the outcome of a single chunk x ticker task."""
+    chunk_start, chunk_end, ticker = task
+    conn.execute('''
+    UPDATE backfill_state
+    SET status = ?,
+        attempts = attempts + 1,
+        filings = COALESCE(?, filings),
+        error = ?,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE chunk_start = ? AND chunk_end = ? AND ticker = ?
+    ''', (status, filings, error, chunk_start, chunk_end, ticker))
+    conn.commit()
+
+def summarize_state(conn):
+    """Return a {status: task count} dictionary for the backfill state table."""
+    cursor = conn.execute("SELECT status, COUNT(*) FROM backfill_state GROUP BY status")
+    return dict(cursor.fetchall())
+
+def run_backfill(start_date, end_date, chunk_months=3, tickers=None, workers=4,
+                 requests_per_second=InsiderTrading.SEC_MAX_REQUESTS_PER_SECOND,
+                 max_runtime_minutes=0, export=True, debug=False, fetch_mode=InsiderTrading.DEFAULT_FETCH_MODE):
+    """Download, parse and export historical Form 4 filings for a date range.
+
+    Args:
+        start_date: First date of the backfill (YYYY-MM-DD)
+        end_date: Last date of the backfill (YYYY-MM-DD)
+        chunk_months: Number of months per download chunk
+        tickers: Tickers to backfill (defaults to the universe, see universe.py)
+        workers: Number of chunk x ticker tasks downloaded in parallel
+        requests_per_second: Global cap on SEC requests across all workers
+        max_runtime_minutes: Stop scheduling new downloads after this many minutes (0 = no limit)
+        export: Whether to run the JSON export once all downloads are finished
+        fetch_mode: 'primary' (ownership XML only) or 'full' (sec-edgar-downloader)
+
+    Returns:
+        A {status: task count} summary of the backfill state.
+    """
+    started = time.monotonic()
+    os.makedirs(InsiderTrading.DATA_DIR, exist_ok=True)
+    InsiderTrading.initialize_database()
+
+    if tickers is None:
+        tickers = universe.load_universe()
+    chunks = generate_date_chunks(start_date, end_date, chunk_months)
+    print(f"Backfilling {len(chunks)} date chunks x {len(tickers)} tickers from {start_date} to {end_date}")
+
+    conn = sqlite3.connect(InsiderTrading.DB_PATH)
+    initialize_state(conn)
+    seed_state(conn, chunks, tickers)
+    tasks = pending_tasks(conn, chunks, tickers)
+    print(f"{len(tasks)} tasks remaining")
+
+    if tasks:
+        InsiderTrading.refresh_issuers()
+        limiter = InsiderTrading.RateLimiter(requests_per_second)
+        # Every request of either fetch mode waits on the limiter shared by the workers
+        dl = InsiderTrading.create_downloader(fetch_mode=fetch_mode, limiter=limiter)
+        deadline = started + max_runtime_minutes * 60 if max_runtime_minutes > 0 else None
+
+        def download(task):
+            if deadline is not None and time.monotonic() > deadline:
+                return None
+            chunk_start, chunk_end, ticker = task
+            return InsiderTrading.download_form4_filings(dl, ticker, chunk_start, chunk_end)
+
+        # Only the main thread writes to the state table; workers just download.
+        # A task is checkpointed as soon as it finishes, so an interrupted run
+        # leaves only the unfinished tasks pending.
+        with metrics.stage('download'), ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(download, task): task for task in tasks}
+
+            for done_count, future in enumerate(as_completed(futures), start=1):
+                task = futures[future]
+                try:
+                    filings = future.result()
+                    if filings is None:
+                        # Out of time: leave the task pending for the next run
+                        continue
+                    update_task(conn, task, STATUS_DONE, filings=filings)
+                    if debug:
+                        print(f"DEBUG: [{done_count}/{len(tasks)}] {task[2]} {task[0]}:{task[1]} -> {filings} filings")
+                except Exception as e:
+                    metrics.incr('errors')
+                    update_task(conn, task, STATUS_ERROR, error=str(e))
+                    print(f"Error downloading {task[2]} for {task[0]}:{task[1]}: {e}")
+
+    summary = summarize_state(conn)
+    conn.close()
+    print(f"Backfill state: {summary}")
+
+    # Parse and export once, after every chunk has been downloaded
+    with metrics.stage('ingest'):
+        InsiderTrading.process_form4_filings(bulk_load=True)
+    if export:
+        export_json.main(['--debug'] if debug else [])
+
+    return summary
+
+def main(argv=None):
+    """Main function to run a historical backfill."""
+    parser = argparse.ArgumentParser(description='Resumable historical backfill of SEC Form 4 filings.')
+    parser.add_argument('--start-date', type=str, required=True,
+                        help='Start date for historical data (YYYY-MM-DD)')
+    parser.add_argument('--end-date', type=str, required=True,
+                        help='End date for historical data (YYYY-MM-DD)')
+    parser.add_argument('--chunk-months', type=int, default=3,
+                        help='Months per download chunk (default: 3)')
+    parser.add_argument('--limit', type=int, default=0,
+                        help='Limit the number of universe companies to backfill (0 = all)')
+    parser.add_argument('--tickers', type=str,
+                        help='Comma-separated list of tickers to backfill instead of the universe')
+    parser.add_argument('--universe', type=str,
+                        help='Universe config listing the issuers to backfill (default: universe.json)')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='Number of parallel download workers (default: 4)')
+    parser.add_argument('--requests-per-second', type=float,
+                        default=InsiderTrading.SEC_MAX_REQUESTS_PER_SECOND,
+                        help='Global rate limit for SEC requests across all workers (default: 10)')
+    parser.add_argument('--max-runtime', type=int, default=0,
+                        help='Stop scheduling downloads after this many minutes (0 = no limit)')
+    parser.add_argument('--fetch-mode', choices=InsiderTrading.FETCH_MODES, default=InsiderTrading.DEFAULT_FETCH_MODE,
+                        help='primary: download only the ownership XML of each filing; '
+                             'full: full submissions via sec-edgar-downloader')
+    parser.add_argument('--no-export', action='store_true',
+                        help='Skip the JSON export at the end of the backfill')
+    parser.add_argument('--shard', type=str,
+                        help='Only backfill shard I of N (I/N) of the tickers, into data/shards/I-of-N '
+                             '(merge with `python shards.py merge`)')
+    parser.add_argument('--debug', action='store_true',
+                        help='Enable debug output')
+    metrics.add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    # Enable debug output for GitHub Actions
+    debug = args.debug or ('GITHUB_ACTIONS' in os.environ)
+
+    try:
+        datetime.strptime(args.start_date, '%Y-%m-%d')
+        datetime.strptime(args.end_date, '%Y-%m-%d')
+    except ValueError as e:
+        print(f"ERROR: Invalid date format. Use YYYY-MM-DD. Error: {e}")
+        return 1
+
+    if args.tickers:
+        tickers = [t.strip() for t in args.tickers.split(',') if t.strip()]
+    else:
+        try:
+            tickers = universe.load_universe(args.universe)
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            return 1
+    if args.limit > 0:
+        tickers = tickers[:args.limit]
+
+    data_dir = InsiderTrading.DATA_DIR
+    export = not args.no_export
+    shard_context = contextlib.nullcontext()
+    if args.shard:
+        try:
+            shard, num_shards = shards.parse_shard(args.shard)
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            return 1
+        tickers = shards.select_shard(tickers, shard, num_shards)
+        data_dir = shards.shard_dir(InsiderTrading.DATA_DIR, shard, num_shards)
+        # A shard holds only part of the data: JSON is exported after the merge
+        export = False
+        shard_context = shards.shard_environment(data_dir)
+        print(f"Shard {shard}/{num_shards}: {len(tickers)} tickers into {data_dir}")
+
+    # Record per-stage timings and counters in run_metrics.json (the export is nested in this run)
+    metrics.start_run('backfill', metrics.metrics_path(args, data_dir),
+                      profile_stage=args.profile, profile_mode=args.profile_mode)
+    try:
+        with shard_context:
+            summary = run_backfill(args.start_date, args.end_date,
+                                   chunk_months=args.chunk_months,
+                                   tickers=tickers,
+                                   workers=args.workers,
+                                   requests_per_second=args.requests_per_second,
+                                   max_runtime_minutes=args.max_runtime,
+                                   export=export,
+                                   debug=debug,
+                                   fetch_mode=args.fetch_mode)
+    except Exception as e:
+        metrics.finish_run('error')
+        print(f"ERROR: Backfill failed: {e}")
+        if debug:
+            import traceback
+            traceback.print_exc()
+        return 1
+    metrics.finish_run('ok')
+
+    remaining = summary.get(STATUS_PENDING, 0)
+    if remaining:
+        print(f"{remaining} tasks still pending, re-run the same command to resume")
+    return 0
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -0,0 +1 @@
+# Offline benchmarks for the Form 4 pipeline
@@ -0,0 +1,169 @@
+"""
+Synthetic Form 4 corpus generator for offline benchmarks.
+
+Writes realistic ownership XML filings into the same
+`sec-edgar-filings/{ticker}/4/{accession}/` layout that sec-edgar-downloader
+produces, so the real ingest and export code can run against it unchanged.
+The output is fully determined by the seed and the end date (CORPUS_END_DATE
+unless one is given).
+"""
+from datetime import date, timedelta
+import os
+import random
+from xml.sax.saxutils import escape
+
+# Tickers as they actually appear in issuerTradingSymbol, including the messy ones
+TRICKY_TICKERS = ['BRK.B', 'BF-B', 'LEN, LEN.B', 'NCLH]', 'brk.a', 'GOOG']
+
+OFFICER_TITLES = ['Chief Executive Officer', 'CFO', 'EVP, General Counsel', 'Director', None]
+TRANSACTION_CODES = ['S', 'S', 'S', 'P', 'A', 'M', 'G', 'F', 'D']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+              'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Müller', "O'Brien"]
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda',
+               'José', 'Zoë']
+
+# Fixed default end of the filing period, so runs on different days generate the same corpus
+CORPUS_END_DATE = date(2025, 6, 30)
+
+def issuer_tickers(n_issuers):
+    """Return `n_issuers` deterministic ticker symbols, starting with the tricky ones."""
+    tickers = list(TRICKY_TICKERS[:n_issuers])
+    i = 0
+    while len(tickers) < n_issuers:
+        # AAA, AAB, ... style symbols
+        symbol = ''.join(chr(ord('A') + (i // 26 ** k) % 26) for k in (2, 1, 0))
+        if symbol not in tickers:
+            tickers.append(symbol)
+        i += 1
+    return tickers
+
+def _value(tag, value, indent):
+    if value is None:
+        return f"{indent}<{tag}/>\n"
+    return f"{indent}<{tag}>\n{indent}    <value>{escape(str(value))}</value>\n{indent}</{tag}>\n"
+
+def _transaction_xml(rng, kind, transaction_date, holdings):
+    code = rng.choice(TRANSACTION_CODES)
+    shares = rng.randint(1, 500) * 100
+    price = round(rng.uniform(5, 900), 2) if code in ('S', 'P') else 0
+    holdings = max(holdings + (shares if code in ('P', 'A', 'M') else -shares), 0)
+    indent = ' ' * 12
+    xml = f"        <{kind}Transaction>\n"
+    xml += f"{indent}<securityTitle>\n{indent}    <value>{'Common Stock' if kind == 'nonDerivative' else 'Stock Option (Right to Buy)'}</value>\n{indent}</securityTitle>\n"
+    if kind == 'derivative':
+        xml += _value('conversionOrExercisePrice', round(rng.uniform(5, 300), 2), indent)
+    xml += _value('transactionDate', transaction_date.isoformat(), indent)
+    xml += f"{indent}<transactionCoding>\n{indent}    <transactionFormType>4</transactionFormType>\n"
+    xml += f"{indent}    <transactionCode>{code}</transactionCode>\n{indent}    <equitySwapInvolved>0</equitySwapInvolved>\n{indent}</transactionCoding>\n"
+    xml += f"{indent}<transactionAmounts>\n"
+    xml += _value('transactionShares', shares, indent + '    ')
+    xml += _value('transactionPricePerShare', price, indent + '    ')
+    xml += f"{indent}    <transactionAcquiredDisposedCode>\n{indent}        <value>{'A' if code in ('P', 'A', 'M') else 'D'}</value>\n{indent}    </transactionAcquiredDisposedCode>\n"
+    xml += f"{indent}</transactionAmounts>\n"
+    xml += f"{indent}<postTransactionAmounts>\n"
+    xml += _value('sharesOwnedFollowingTransaction', holdings, indent + '    ')
+    xml += f"{indent}</postTransactionAmounts>\n"
+    xml += f"{indent}<ownershipNature>\n{indent}    <directOrIndirectOwnership>\n{indent}        <value>D</value>\n{indent}    </directOrIndirectOwnership>\n{indent}</ownershipNature>\n"
+    xml += f"        </{kind}Transaction>\n"
+    return xml, holdings
+
+def form4_xml(rng, issuer_cik, ticker, owner_cik, owner_name, title, period, n_lines, n_derivative):
+    """Render one Form 4 ownership document as an XML string."""
+    holdings = rng.randint(1, 1000) * 1000
+    non_derivative = ''
+    for line in range(n_lines):
+        xml, holdings = _transaction_xml(rng, 'nonDerivative', period - timedelta(days=line), holdings)
+        non_derivative += xml
+    derivative = ''
+    for line in range(n_derivative):
+        xml, _ = _transaction_xml(rng, 'derivative', period, rng.randint(1, 100) * 1000)
+        derivative += xml
+
+    relationship = "            <isDirector>1</isDirector>\n" if title == 'Director' else ''
+    if title and title != 'Director':
+        relationship += f"            <isOfficer>1</isOfficer>\n            <officerTitle>{escape(title)}</officerTitle>\n"
+
+    return f"""<?xml version="1.0"?>
+<ownershipDocument>
+    <schemaVersion>X0508</schemaVersion>
+    <documentType>4</documentType>
+    <periodOfReport>{period.isoformat()}</periodOfReport>
+    <notSubjectToSection16>0</notSubjectToSection16>
+    <issuer>
+        <issuerCik>{issuer_cik}</issuerCik>
+        <issuerName>{escape(ticker.split(',')[0].strip(' ]').upper())} Holdings Inc.</issuerName>
+        <issuerTradingSymbol>{escape(ticker)}</issuerTradingSymbol>
+    </issuer>
+    <reportingOwner>
+        <reportingOwnerId>
+            <rptOwnerCik>{owner_cik}</rptOwnerCik>
+            <rptOwnerName>{escape(owner_name)}</rptOwnerName>
+        </reportingOwnerId>
+        <reportingOwnerAddress>
+            <rptOwnerStreet1>1 MAIN STREET</rptOwnerStreet1>
+            <rptOwnerCity>SPRINGFIELD</rptOwnerCity>
+            <rptOwnerState>CA</rptOwnerState>
+            <rptOwnerZipCode>90000</rptOwnerZipCode>
+        </reportingOwnerAddress>
+        <reportingOwnerRelationship>
+{relationship}        </reportingOwnerRelationship>
+    </reportingOwner>
+    <nonDerivativeTable>
+{non_derivative}    </nonDerivativeTable>
+    <derivativeTable>
+{derivative}    </derivativeTable>
+    <footnotes>
+        <footnote id="F1">The price reported is a weighted average price.</footnote>
+    </footnotes>
+    <ownerSignature>
+        <signatureName>/s/ {escape(owner_name)}</signatureName>
+        <signatureDate>{(period + timedelta(days=2)).isoformat()}</signatureDate>
+    </ownerSignature>
+</ownershipDocument>
+"""
+
+def generate_corpus(data_dir, n_filings, n_issuers, seed=0, years=3, end_date=CORPUS_END_DATE):
+    """Write `n_filings` synthetic Form 4 filings for `n_issuers` issuers under `data_dir`.
+
+    Filings are spread uniformly over the `years` years before `end_date`
+    and written as `{data_dir}/sec-edgar-filings/{ticker}/4/{accession}/` directories
+    holding both primary-document.xml and full-submission.txt.
+
+    Returns the list of primary-document.xml paths.
+    """
+    rng = random.Random(seed)
+    tickers = issuer_tickers(n_issuers)
+    issuers = [(1000000 + i, ticker) for i, ticker in enumerate(tickers)]
+
+    # A handful of insiders per issuer, reused across filings like in real data
+    owners = {}
+    for issuer_cik, ticker in issuers:
+        owners[ticker] = [
+            (f"{2000000 + issuer_cik * 10 + k:010d}",
+             f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}",
+             rng.choice(OFFICER_TITLES))
+            for k in range(rng.randint(2, 8))
+        ]
+
+    paths = []
+    for n in range(n_filings):
+        issuer_cik, ticker = issuers[n % n_issuers]
+        owner_cik, owner_name, title = rng.choice(owners[ticker])
+        period = end_date - timedelta(days=rng.randint(0, 365 * years))
+        n_lines = rng.choice([1, 1, 1, 2, 3, 5, 12])
+        n_derivative = rng.choice([0, 0, 0, 1, 2])
+
+        xml = form4_xml(rng, f"{issuer_cik:010d}", ticker, owner_cik, owner_name, title,
+                        period, n_lines, n_derivative)
+
+        accession = f"{owner_cik}-{period.year % 100:02d}-{n:06d}"
+        filing_dir = os.path.join(data_dir, 'sec-edgar-filings', ticker, '4', accession)
+        os.makedirs(filing_dir, exist_ok=True)
+        path = os.path.join(filing_dir, 'primary-document.xml')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(xml)
+        with open(os.path.join(filing_dir, 'full-submission.txt'), 'w', encoding='utf-8') as f:
+            f.write(f"<SEC-DOCUMENT>{accession}.txt\n<TYPE>4\n<TEXT>\n<XML>\n{xml}</XML>\n</TEXT>\n</SEC-DOCUMENT>\n")
+        paths.append(path)
+
+    return paths
@@ -0,0 +1,296 @@
+"""
+Reproducible offline benchmark of the ingest and export pipeline.
+
+For each scale a synthetic corpus is generated (see corpus.py) and every stage
+is timed against it: filing discovery, XML parsing (with every installed parser
+backend), SQLite inserts, the full process_form4_filings() ingest, each
+export_* function (including the binary and SQLite snapshots), filtered
+queries through server.py (p50/p99 latency) and the hot/cold rollover. Every
+date window is counted back from the corpus's end date instead of today, and
+results are written as JSON so runs from different commits and days can be
+compared with --compare.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--scales 1000,10000] [--issuers 50] [--compare old.json]
+"""
+from datetime import date, datetime
+from functools import partial
+from unittest.mock import patch
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add the parent directory to the path so we can import the pipeline scripts
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_DIR)
+import InsiderTrading
+import export_json
+import form4_parser
+import partitions
+import server
+import snapshots
+import sqlite_snapshot
+
+from benchmarks.corpus import CORPUS_END_DATE, generate_corpus
+
+RESULTS_DIR = os.path.join(REPO_DIR, 'benchmarks', 'results')
+DEFAULT_SCALES = [1000, 10000]
+
+def directory_bytes(path):
+    """Return the total size in bytes and the number of files under a directory."""
+    total = 0
+    count = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+            count += 1
+    return total, count
+
+def git_commit():
+    """Return the current git commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def server_latencies(db_path, data_dir, n_requests=200, seed=0):
+    """Time filtered transaction queries through server.py's handler with the cache disabled.
+
+    Returns the per-request latencies in seconds.
+    """
+    rng = random.Random(seed)
+    api = server.ApiServer(db_path=db_path, data_dir=data_dir, cache=server.ResponseCache(max_entries=0))
+    try:
+        tickers = [row['ticker'] for row in export_json.companies_records(api.connection())]
+        latencies = []
+        for _ in range(n_requests):
+            year = rng.choice([2023, 2024, 2025])
+            month = rng.randint(1, 9)
+            target = (f"/data/json/{rng.choice(tickers)}/transactions.json"
+                      f"?from={year}-{month:02d}-01&to={year}-{month + 3:02d}-01&type=S,P&limit=100")
+            start = time.perf_counter()
+            api.handle('GET', target, {'Accept-Encoding': 'gzip'})
+            latencies.append(time.perf_counter() - start)
+        return latencies
+    finally:
+        api.close()
+
+def percentile(values, fraction):
+    """Return the value at a fraction (0-1) of the sorted values."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class StageTimer:
+    """Collects wall time, item counts and output bytes per benchmark stage."""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name, items=0):
+        entry = {'items': items}
+        start = time.perf_counter()
+        yield entry
+        seconds = time.perf_counter() - start
+        entry['seconds'] = round(seconds, 6)
+        if entry['items']:
+            entry['items_per_sec'] = round(entry['items'] / seconds, 1) if seconds else None
+        self.stages[name] = entry
+
+def run_scale(n_filings, n_issuers, seed=0, quiet=True, end_date=CORPUS_END_DATE):
+    """Benchmark every pipeline stage against a corpus of `n_filings` filings.
+
+    Returns a dictionary with the corpus description and per-stage results.
+    """
+    work_dir = tempfile.mkdtemp(prefix='form4-bench-')
+    data_dir = os.path.join(work_dir, 'data')
+    json_dir = os.path.join(data_dir, 'json')
+    db_path = os.path.join(data_dir, 'insider_trading.db')
+    timer = StageTimer()
+    # Keep the pipeline's progress prints out of the benchmark output
+    output = io.StringIO() if quiet else sys.stdout
+
+    try:
+        with timer.stage('generate', items=n_filings):
+            generate_corpus(data_dir, n_filings, n_issuers, seed=seed, end_date=end_date)
+        corpus_bytes, corpus_files = directory_bytes(data_dir)
+
+        with patch.object(InsiderTrading, 'DATA_DIR', data_dir), \
+             patch.object(InsiderTrading, 'DB_PATH', db_path), \
+             patch.object(export_json, 'DATA_DIR', data_dir), \
+             patch.object(export_json, 'DB_PATH', db_path), \
+             patch.object(export_json, 'JSON_DIR', json_dir), \
+             contextlib.redirect_stdout(output):
+
+            with timer.stage('discovery') as entry:
+                xml_files = glob.glob(f"{data_dir}/**/*.xml", recursive=True)
+                entry['items'] = len(xml_files)
+
+            with timer.stage('parse', items=len(xml_files)):
+                records = [InsiderTrading.parse_form4_file(xml_file) for xml_file in xml_files]
+
+            # Files/sec of each installed parser backend ('parse' above uses the auto choice)
+            for backend in form4_parser.available_backends():
+                parse = form4_parser.get_parser(backend)
+                with timer.stage(f'parse_{backend}', items=len(xml_files)):
+                    for xml_file in xml_files:
+                        parse(xml_file)
+
+            InsiderTrading.initialize_database()
+            with timer.stage('insert', items=len(records)):
+                conn = sqlite3.connect(db_path)
+                conn.executemany(InsiderTrading.INSERT_TRANSACTION_SQL,
+                                 [InsiderTrading.transaction_values(record, xml_file)
+                                  for record, xml_file in zip(records, xml_files)])
+                conn.commit()
+                conn.close()
+
+            # End-to-end ingest into a fresh database, normal and bulk-load mode
+            for name, bulk_load in (('ingest', False), ('ingest_bulk_load', True)):
+                os.remove(db_path)
+                InsiderTrading.initialize_database()
+                with timer.stage(name, items=len(xml_files)):
+                    InsiderTrading.process_form4_filings(bulk_load=bulk_load)
+            db_bytes = os.path.getsize(db_path)
+
+            # Retention windows are counted back from the corpus's end date, not the wall clock,
+            # so runs on different days export the same rows
+            export_stages = [
+                ('export_initialize_json_directory', export_json.initialize_json_directory),
+                ('export_companies_index', export_json.export_companies_index),
+                ('export_company_transactions', partial(export_json.export_company_transactions, today=end_date)),
+                ('export_summary_data', export_json.export_summary_data),
+                ('export_latest', export_json.export_latest),
+                ('export_views', export_json.export_views),
+                ('export_by_month', partial(export_json.export_by_month, today=end_date)),
+                ('export_holdings', partial(export_json.export_holdings, today=end_date)),
+            ]
+            for name, export_function in export_stages:
+                bytes_before, files_before = directory_bytes(json_dir)
+                with timer.stage(name) as entry:
+                    export_function()
+                bytes_after, files_after = directory_bytes(json_dir)
+                entry['bytes_written'] = bytes_after - bytes_before
+                entry['files_written'] = files_after - files_before
+
+            with timer.stage('export_snapshots') as entry:
+                snapshots.export_snapshots(db_path, data_dir, json_dir)
+            entry['bytes_written'] = sum(os.path.getsize(path) for path in
+                                         glob.glob(os.path.join(json_dir, '*', snapshots.SNAPSHOT_FILE)))
+
+            with timer.stage('export_sqlite_snapshot') as entry:
+                sqlite_path = os.path.join(json_dir, sqlite_snapshot.SNAPSHOT_FILE)
+                sqlite_snapshot.build_snapshot(db_path, data_dir, sqlite_path)
+            entry['bytes_written'] = os.path.getsize(sqlite_path)
+
+            with timer.stage('load_snapshots') as entry:
+                universe = snapshots.load_universe(json_dir)
+                entry['items'] = sum(len(snapshot['date']) for snapshot in universe.values())
+
+            with timer.stage('server_filtered_queries') as entry:
+                latencies = server_latencies(db_path, data_dir, seed=seed)
+                entry['items'] = len(latencies)
+            entry['p50_ms'] = round(percentile(latencies, 0.5) * 1000, 3)
+            entry['p99_ms'] = round(percentile(latencies, 0.99) * 1000, 3)
+
+            # Last, as it moves the rows outside the hot window into cold partitions
+            with timer.stage('rollover') as entry:
+                moved = partitions.rollover(db_path, data_dir, today=end_date)
+                entry['items'] = sum(moved.values())
+
+        json_bytes, json_files = directory_bytes(json_dir)
+        return {
+            'filings': n_filings,
+            'issuers': n_issuers,
+            'corpus_bytes': corpus_bytes,
+            'corpus_files': corpus_files,
+            'db_bytes': db_bytes,
+            'json_bytes': json_bytes,
+            'json_files': json_files,
+            'stages': timer.stages,
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def compare_results(previous, current):
+    """Print the per-stage time change between two result documents."""
+    previous_scales = {scale['filings']: scale for scale in previous['scales']}
+    for scale in current['scales']:
+        old = previous_scales.get(scale['filings'])
+        if not old:
+            continue
+        print(f"\n{scale['filings']} filings: {previous.get('git_commit')} -> {current.get('git_commit')}")
+        for name, stage in scale['stages'].items():
+            old_stage = old['stages'].get(name)
+            if not old_stage or not old_stage['seconds']:
+                continue
+            change = (stage['seconds'] - old_stage['seconds']) / old_stage['seconds'] * 100
+            print(f"  {name:<36} {old_stage['seconds']:>9.3f}s -> {stage['seconds']:>9.3f}s ({change:+.1f}%)")
+
+def main(argv=None):
+    """Main function to run the benchmark suite and write the JSON results."""
+    parser = argparse.ArgumentParser(description='Benchmark the Form 4 ingest and export pipeline offline.')
+    parser.add_argument('--scales', type=str, default=','.join(str(s) for s in DEFAULT_SCALES),
+                        help='Comma-separated numbers of filings to benchmark (default: 1000,10000)')
+    parser.add_argument('--issuers', type=int, default=50,
+                        help='Number of issuers in the synthetic corpus (default: 50)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed for the synthetic corpus (default: 0)')
+    parser.add_argument('--end-date', type=date.fromisoformat, default=CORPUS_END_DATE,
+                        help=f'Last filing date of the synthetic corpus (default: {CORPUS_END_DATE})')
+    parser.add_argument('--output', type=str,
+                        help='Path of the JSON results file (default: benchmarks/results/<commit>-<timestamp>.json)')
+    parser.add_argument('--compare', type=str,
+                        help='Previous results file to compare against')
+    args = parser.parse_args(argv)
+
+    commit = git_commit()
+    results = {
+        'generated_at': datetime.now().isoformat(),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sqlite': sqlite3.sqlite_version,
+        'seed': args.seed,
+        'end_date': args.end_date.isoformat(),
+        'scales': [],
+    }
+
+    for n_filings in [int(s) for s in args.scales.split(',') if s.strip()]:
+        print(f"Benchmarking {n_filings} filings for {args.issuers} issuers...")
+        scale = run_scale(n_filings, args.issuers, seed=args.seed, end_date=args.end_date)
+        results['scales'].append(scale)
+        for name, stage in scale['stages'].items():
+            rate = f" ({stage['items_per_sec']}/s)" if stage.get('items_per_sec') else ''
+            latency = f" p50 {stage['p50_ms']}ms p99 {stage['p99_ms']}ms" if 'p99_ms' in stage else ''
+            print(f"  {name:<36} {stage['seconds']:>9.3f}s{rate}{latency}")
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{commit or 'nogit'}-{timestamp}.json")
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(json.load(f), results)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""
+Universe scaling benchmark: one daily run over thousands of issuers, offline.
+
+Scaling target: a daily run over SCALING_TARGET['issuers'] issuers (a
+Russell 3000-sized universe) fits in the daily workflow's job limit
+(SCALING_TARGET['job_minutes'], see .github/workflows/update_data.yml).
+
+The run is replayed against an in-process stand-in for EDGAR that serves
+every issuer's submissions list and `--filings-per-issuer` new ownership
+documents, with no rate limit, and every stage is timed: the universe sync
+(then a re-sync after `--churn` of the members were replaced), the parallel
+download, the ingest and the full JSON export. The SEC's fair access limit
+is what actually bounds the download, so the projected job time is the
+measured local time plus the requests made at SEC_MAX_REQUESTS_PER_SECOND.
+
+A second download after the membership change shows what a change costs:
+one submissions request per member, and documents for the new members only.
+
+Usage:
+    python benchmarks/scale_universe.py [--issuers 3000] [--filings-per-issuer 3] [--churn 0.05]
+"""
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+# Add the parent directory to the path so we can import the pipeline scripts
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_DIR)
+import InsiderTrading
+import export_json
+import fetcher
+import issuers
+import universe
+
+from benchmarks import corpus
+from benchmarks.run_benchmarks import RESULTS_DIR, StageTimer, git_commit
+
+SCALING_TARGET = {'issuers': 3000, 'job_minutes': 120}
+
+class FakeResponse:
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+class FakeEdgar:
+    """Serves canned EDGAR documents by URL and counts the requests (thread-safe)."""
+
+    def __init__(self):
+        self.documents = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, timeout=None):
+        with self._lock:
+            self.requests += 1
+        body = self.documents.get(url)
+        return FakeResponse(body) if body is not None else FakeResponse(b'', 404)
+
+    def add_issuer(self, rng, cik, ticker, filings, filing_date):
+        """Publish an issuer's submissions list and `filings` Form 4 documents filed on filing_date."""
+        accessions = [f"{cik:010d}-{filing_date.year % 100:02d}-{n:06d}" for n in range(filings)]
+        self.documents[fetcher.SUBMISSIONS_URL.format(name=f"CIK{cik:010d}.json")] = json.dumps({
+            'filings': {'recent': {
+                'accessionNumber': accessions,
+                'filingDate': [filing_date.isoformat()] * filings,
+                'form': ['4'] * filings,
+                'primaryDocument': ['xslF345X05/form4.xml'] * filings,
+            }, 'files': []}}).encode()
+        for accession in accessions:
+            owner_cik = f"{2000000 + cik * 10 + rng.randint(0, 5):010d}"
+            self.documents[fetcher.ARCHIVES_URL.format(cik=cik, accession=accession.replace('-', '')) + '/form4.xml'] = \
+                corpus.form4_xml(rng, f"{cik:010d}", ticker, owner_cik, 'Smith James', 'CFO',
+                                 filing_date - timedelta(days=2), rng.choice([1, 1, 2, 3]), rng.choice([0, 1])).encode()
+
+def universe_tickers(n_issuers):
+    """Return `n_issuers` plain ticker symbols (AAA, AAB, ...)."""
+    tickers = []
+    size = n_issuers
+    while len(tickers) < n_issuers:
+        size += 10
+        tickers = [ticker for ticker in corpus.issuer_tickers(size) if ticker.isalpha()]
+    return tickers[:n_issuers]
+
+def write_universe(work_dir, tickers):
+    """Write a universe config with a CSV source holding the tickers; returns the config path."""
+    with open(os.path.join(work_dir, 'members.csv'), 'w') as f:
+        f.write('Symbol,Name\n' + ''.join(f"{ticker},{ticker} Holdings Inc.\n" for ticker in tickers))
+    config_path = os.path.join(work_dir, 'universe.json')
+    with open(config_path, 'w') as f:
+        json.dump({'sources': [{'type': 'csv', 'path': 'members.csv'}]}, f)
+    return config_path
+
+def run_universe(n_issuers, filings_per_issuer=3, churn=0.05, workers=InsiderTrading.DOWNLOAD_WORKERS,
+                 seed=0, quiet=True):
+    """Replay a daily run over `n_issuers` issuers; returns the per-stage results and the projection."""
+    rng = random.Random(seed)
+    work_dir = tempfile.mkdtemp(prefix='form4-universe-')
+    data_dir = os.path.join(work_dir, 'data')
+    json_dir = os.path.join(data_dir, 'json')
+    db_path = os.path.join(data_dir, 'insider_trading.db')
+    os.makedirs(data_dir)
+    timer = StageTimer()
+    output = io.StringIO() if quiet else sys.stdout
+
+    n_replaced = int(n_issuers * churn)
+    tickers = universe_tickers(n_issuers + n_replaced)
+    ciks = {ticker: 1000000 + i for i, ticker in enumerate(tickers)}
+    members, newcomers = tickers[:n_issuers], tickers[n_issuers:]
+    filing_date = date.today() - timedelta(days=1)
+    start_date, end_date = (filing_date - timedelta(days=1)).isoformat(), date.today().isoformat()
+
+    edgar = FakeEdgar()
+    for ticker in tickers:
+        edgar.add_issuer(rng, ciks[ticker], ticker, filings_per_issuer, filing_date)
+
+    try:
+        with patch.object(InsiderTrading, 'DATA_DIR', data_dir), \
+             patch.object(InsiderTrading, 'DB_PATH', db_path), \
+             patch.object(export_json, 'DATA_DIR', data_dir), \
+             patch.object(export_json, 'DB_PATH', db_path), \
+             patch.object(export_json, 'JSON_DIR', json_dir), \
+             contextlib.redirect_stdout(output):
+
+            InsiderTrading.initialize_database()
+            conn = sqlite3.connect(db_path)
+            issuers.initialize_issuers(conn)
+            conn.executemany("INSERT INTO issuers (cik, ticker, tickers, source) VALUES (?, ?, ?, 'sec')",
+                             [(f"{cik:010d}", ticker, ticker) for ticker, cik in ciks.items()])
+            conn.commit()
+            conn.close()
+
+            dl = fetcher.PrimaryDocumentFetcher('benchmark agent', data_dir, db_path,
+                                                limiter=InsiderTrading.RateLimiter(0))
+            dl._session = lambda: edgar
+
+            with timer.stage('universe_sync', items=n_issuers):
+                symbols = universe.load_universe(write_universe(work_dir, members))
+
+            with timer.stage('download', items=len(symbols)) as entry:
+                entry['filings'] = InsiderTrading.download_companies(dl, symbols, start_date, end_date,
+                                                                     workers=workers)
+            entry['requests'] = edgar.requests
+
+            with timer.stage('ingest', items=len(symbols) * filings_per_issuer):
+                InsiderTrading.process_form4_filings(bulk_load=True)
+
+            with timer.stage('export', items=n_issuers):
+                export_json.main([])
+
+            # Replace `churn` of the members, then run the download again
+            with timer.stage('universe_resync', items=n_issuers) as entry:
+                symbols = universe.load_universe(write_universe(work_dir, members[n_replaced:] + newcomers))
+            conn = sqlite3.connect(db_path)
+            entry['removed'] = len(universe.members(conn, removed=True))
+            conn.close()
+
+            requests_before = edgar.requests
+            with timer.stage('download_after_churn', items=len(symbols)) as entry:
+                entry['filings'] = InsiderTrading.download_companies(dl, symbols, start_date, end_date,
+                                                                     workers=workers)
+            entry['requests'] = edgar.requests - requests_before
+
+        stages = timer.stages
+        daily = ('universe_sync', 'download', 'ingest', 'export')
+        local_seconds = sum(stages[name]['seconds'] for name in daily)
+        network_seconds = stages['download']['requests'] / InsiderTrading.SEC_MAX_REQUESTS_PER_SECOND
+        projected_minutes = (local_seconds + network_seconds) / 60
+        return {
+            'issuers': n_issuers,
+            'filings_per_issuer': filings_per_issuer,
+            'churn': churn,
+            'workers': workers,
+            'stages': stages,
+            'projection': {
+                'local_seconds': round(local_seconds, 3),
+                'network_seconds': round(network_seconds, 1),
+                'projected_minutes': round(projected_minutes, 2),
+                'job_minutes': SCALING_TARGET['job_minutes'],
+                'within_job_limit': projected_minutes <= SCALING_TARGET['job_minutes'],
+            },
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def main(argv=None):
+    """Main function to run the universe scaling benchmark and write the JSON results."""
+    parser = argparse.ArgumentParser(description='Benchmark a daily run over a large issuer universe offline.')
+    parser.add_argument('--issuers', type=int, default=SCALING_TARGET['issuers'],
+                        help=f"Number of issuers in the universe (default: {SCALING_TARGET['issuers']})")
+    parser.add_argument('--filings-per-issuer', type=int, default=3,
+                        help='New Form 4 filings per issuer in the daily window (default: 3)')
+    parser.add_argument('--churn', type=float, default=0.05,
+                        help='Fraction of the members replaced before the second download (default: 0.05)')
+    parser.add_argument('--workers', type=int, default=InsiderTrading.DOWNLOAD_WORKERS,
+                        help=f'Parallel download workers (default: {InsiderTrading.DOWNLOAD_WORKERS})')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed for the synthetic filings (default: 0)')
+    parser.add_argument('--output', type=str,
+                        help='Path of the JSON results file (default: benchmarks/results/universe-<commit>-<timestamp>.json)')
+    args = parser.parse_args(argv)
+
+    print(f"Benchmarking a daily run over {args.issuers} issuers "
+          f"({args.filings_per_issuer} filings each, {args.churn:.0%} churn)...")
+    started = time.perf_counter()
+    result = run_universe(args.issuers, args.filings_per_issuer, args.churn, args.workers, seed=args.seed)
+    for name, stage in result['stages'].items():
+        rate = f" ({stage['items_per_sec']}/s)" if stage.get('items_per_sec') else ''
+        requests = f" {stage['requests']} requests" if 'requests' in stage else ''
+        print(f"  {name:<24} {stage['seconds']:>9.3f}s{rate}{requests}")
+    projection = result['projection']
+    print(f"Projected daily run: {projection['projected_minutes']} min "
+          f"({projection['local_seconds']}s local + {projection['network_seconds']}s of requests at "
+          f"{InsiderTrading.SEC_MAX_REQUESTS_PER_SECOND}/s), job limit {projection['job_minutes']} min: "
+          f"{'OK' if projection['within_job_limit'] else 'OVER'} (benchmark took {time.perf_counter() - started:.1f}s)")
+
+    commit = git_commit()
+    results = {
+        'generated_at': datetime.now().isoformat(),
+        'git_commit': commit,
+        'sqlite': sqlite3.sqlite_version,
+        'seed': args.seed,
+        'target': SCALING_TARGET,
+        'universe': result,
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"universe-{commit or 'nogit'}-{timestamp}.json")
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+    return 0 if projection['within_job_limit'] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
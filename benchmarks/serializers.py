@@ -0,0 +1,136 @@
+"""
+JSON serialization microbenchmark over the largest exported files.
+
+For each ticker the largest of its transactions.json and quarterly files is
+loaded back into row tuples, then serialized again:
+
+    pandas_stdlib  the previous export path: DataFrame -> to_dict(orient='records') -> json.dumps(indent=2)
+    <backend>      serializer.py from Rows(columns, rows), for each installed backend
+
+Every backend's output is compared byte for byte with the first one's, and
+with the previous path's once its NaN values (pandas' missing values, which
+json.dumps writes as invalid JSON) are read as null.
+
+Usage:
+    python benchmarks/serializers.py [--tickers GOOG,META,CRM] [--repeat 20]
+"""
+from datetime import datetime
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+# Add the parent directory to the path so we can import the pipeline scripts
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_DIR)
+import export_json
+import serializer
+
+from benchmarks.run_benchmarks import RESULTS_DIR, git_commit
+
+# The tickers with the largest files in data/json
+DEFAULT_TICKERS = ('GOOG', 'META', 'CRM')
+
+def largest_file(json_dir, ticker):
+    """Return the path of a ticker's largest transaction file, or None."""
+    paths = glob.glob(os.path.join(json_dir, ticker, 'transactions.json')) + \
+        glob.glob(os.path.join(json_dir, ticker, 'quarterly', '*.json'))
+    return max(paths, key=os.path.getsize, default=None)
+
+def load_rows(path):
+    """Return (document, columns, rows) of an exported file, its transactions as row tuples."""
+    with open(path) as f:
+        document = json.load(f)
+    transactions = document.pop('transactions')
+    columns = list(transactions[0]) if transactions else list(export_json.TRANSACTION_EXPORT_COLUMNS)
+    return document, columns, [tuple(record.get(column) for column in columns) for record in transactions]
+
+def best_time(function, repeat):
+    """Return the fastest of `repeat` calls of function() in seconds, and its result."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def bench_file(path, repeat=20):
+    """Time the previous pandas path and every installed backend on one file."""
+    import pandas as pd
+
+    document, columns, rows = load_rows(path)
+
+    def pandas_stdlib():
+        records = pd.DataFrame(rows, columns=columns).to_dict(orient='records')
+        return json.dumps({**document, 'transactions': records}, indent=2).encode('utf-8')
+
+    seconds, previous = best_time(pandas_stdlib, repeat)
+    result = {'file': path, 'rows': len(rows), 'seconds': {'pandas_stdlib': round(seconds, 6)}, 'identical': {}}
+    expected = None
+    for name in serializer.available_backends():
+        dumps = serializer.get_backend(name)
+        seconds, data = best_time(lambda: dumps({**document, 'transactions': serializer.Rows(columns, rows)}), repeat)
+        expected = expected or data
+        result['seconds'][name] = round(seconds, 6)
+        result['identical'][name] = data == expected
+    result['bytes'] = len(expected)
+    # pandas turns some missing values into NaN, which json.dumps writes as (invalid) NaN; the exports write null
+    result['pandas_nan'] = previous.count(b'NaN')
+    result['identical']['pandas_stdlib'] = previous.replace(b': NaN', b': null') == expected
+    fastest = min(result['seconds'][name] for name in serializer.available_backends())
+    result['speedup'] = round(result['seconds']['pandas_stdlib'] / fastest, 1) if fastest else None
+    return result
+
+def main(argv=None):
+    """Main function to run the serializer benchmark and write the JSON results."""
+    parser = argparse.ArgumentParser(description='Benchmark the JSON serializer backends on the largest exported files.')
+    parser.add_argument('--json-dir', type=str, default=export_json.JSON_DIR,
+                        help='Directory of the exported JSON files (default: data/json)')
+    parser.add_argument('--tickers', type=str, default=','.join(DEFAULT_TICKERS),
+                        help=f"Comma-separated tickers whose largest file is serialized (default: {','.join(DEFAULT_TICKERS)})")
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='Runs per measurement; the fastest is reported (default: 20)')
+    parser.add_argument('--output', type=str,
+                        help='Path of the JSON results file (default: benchmarks/results/serializers-<commit>-<timestamp>.json)')
+    args = parser.parse_args(argv)
+
+    files = []
+    for ticker in args.tickers.split(','):
+        path = largest_file(args.json_dir, ticker)
+        if path is None:
+            print(f"  {ticker}: no exported files, skipped")
+            continue
+        result = bench_file(path, args.repeat)
+        files.append({'ticker': ticker, **result})
+        timings = ', '.join(f"{name} {seconds * 1000:.2f}ms" for name, seconds in result['seconds'].items())
+        mismatches = [name for name, identical in result['identical'].items() if not identical]
+        print(f"  {ticker} {os.path.relpath(path, args.json_dir)} ({result['bytes'] / 1024:.0f} KB, "
+              f"{result['rows']} rows): {timings} -> {result['speedup']}x"
+              f"{f', DIFFERENT OUTPUT: {mismatches}' if mismatches else ''}")
+    if not files:
+        print(f"Error: no exported files found in {args.json_dir}")
+        return 1
+
+    commit = git_commit()
+    results = {
+        'generated_at': datetime.now().isoformat(),
+        'git_commit': commit,
+        'backends': serializer.available_backends(),
+        'repeat': args.repeat,
+        'files': files,
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"serializers-{commit or 'nogit'}-{timestamp}.json")
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+    return 0 if all(all(result['identical'].values()) for result in files) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
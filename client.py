@@ -0,0 +1,210 @@
+"""
+Python client for the SEC Form 4 JSON API.
+
+Fetches are made concurrently over pooled HTTP connections and cached on
+disk. Cached files are revalidated with If-None-Match/If-Modified-Since, so
+refreshing unchanged files costs a 304 response instead of a download.
+
+Example:
+    from client import Form4Client
+
+    client = Form4Client()
+    df = client.load_transactions(['AAPL', 'MSFT'])
+    quarters = client.load_transactions(['AAPL'], quarters=['2024-Q3', '2024-Q4'])
+
+Works against the hosted static API and against server.py
+(Form4Client(base_url='http://127.0.0.1:8000/data/json')).
+"""
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import threading
+
+# requests and pandas are imported when first needed
+
+BASE_URL = "https://kenny-hk.github.io/sec-form4-api/data/json"
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'sec-form4-api')
+
+# Concurrent requests (and pooled connections) per client
+MAX_WORKERS = 16
+REQUEST_TIMEOUT = 30
+
+# Column types of the transaction DataFrames
+NUMERIC_COLUMNS = ('transaction_shares', 'transaction_price', 'shares_after_transaction')
+CATEGORY_COLUMNS = ('ticker', 'transaction_type', 'reporting_owner_position')
+
+class Form4Client:
+    """Concurrent, caching client for the JSON API."""
+
+    def __init__(self, base_url=BASE_URL, cache_dir=CACHE_DIR, max_workers=MAX_WORKERS, timeout=REQUEST_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._local = threading.local()
+        self._executor = None
+        self.stats = {'downloaded': 0, 'not_modified': 0, 'missing': 0}
+        self._stats_lock = threading.Lock()
+
+    def _session(self):
+        # One pooled session per worker thread (requests sessions aren't thread-safe)
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=2)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._local.session = session
+        return session
+
+    def _cache_paths(self, path):
+        # Paths come from the server (manifest.json); none may resolve outside the cache
+        root = os.path.realpath(self.cache_dir)
+        body_path = os.path.realpath(os.path.join(root, *path.split('/')))
+        if body_path == root or os.path.commonpath([root, body_path]) != root:
+            raise ValueError(f"Refusing to cache {path!r} outside {self.cache_dir}")
+        return body_path, body_path + '.meta'
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def fetch(self, path):
+        """Return the decoded JSON document at `path` (e.g. 'AAPL/transactions.json').
+
+        Returns None when the document doesn't exist.
+        """
+        body_path, meta_path = self._cache_paths(path)
+        headers = {}
+        if os.path.exists(body_path) and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        response = self._session().get(f"{self.base_url}/{path}", headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            self._count('not_modified')
+            with open(body_path, 'rb') as f:
+                return json.loads(f.read())
+        if response.status_code == 404:
+            self._count('missing')
+            return None
+        response.raise_for_status()
+        self._count('downloaded')
+
+        # Write the body before its metadata so an interrupted write is never trusted
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        temp_path = f"{body_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(response.content)
+        os.replace(temp_path, body_path)
+        with open(temp_path, 'w') as f:
+            json.dump({'etag': response.headers.get('ETag'),
+                       'last_modified': response.headers.get('Last-Modified')}, f)
+        os.replace(temp_path, meta_path)
+        return json.loads(response.content)
+
+    def fetch_many(self, paths):
+        """Fetch many documents concurrently and return a {path: document} dictionary."""
+        paths = list(dict.fromkeys(paths))
+        # The worker threads (and their keep-alive connections) are reused across calls
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return dict(zip(paths, self._executor.map(self.fetch, paths)))
+
+    def close(self):
+        """Stop the worker threads."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def sync(self):
+        """Bring the cached JSON files up to date using manifest.json.
+
+        Only files whose manifest content_hash differs from the last completed sync
+        (or that are missing from the cache) are fetched. Returns their paths.
+        Raises ValueError, before fetching anything, when a manifest path
+        would be written outside cache_dir.
+        """
+        synced_path = os.path.join(self.cache_dir, 'manifest.synced.json')
+        old_files = {}
+        if os.path.exists(synced_path):
+            with open(synced_path) as f:
+                old_files = json.load(f)['files']
+
+        manifest = self.fetch('manifest.json')
+        if manifest is None:
+            return []
+        body_paths = {path: self._cache_paths(path)[0] for path in manifest['files'] if path.endswith('.json')}
+        changed = [path for path, body_path in body_paths.items()
+                   if old_files.get(path, {}).get('content_hash') != manifest['files'][path]['content_hash']
+                   or not os.path.exists(body_path)]
+        self.fetch_many(changed)
+
+        # Recorded only once every changed file is cached, so an interrupted sync is resumed
+        temp_path = f"{synced_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, synced_path)
+        return sorted(changed)
+
+    def companies(self):
+        """Return the companies index."""
+        return self.fetch('companies.json')
+
+    def summary(self):
+        """Return the summary of large and recent transactions."""
+        return self.fetch('summary.json')
+
+    def transactions(self, ticker):
+        """Return a company's transactions.json document."""
+        return self.fetch(f'{ticker}/transactions.json')
+
+    def quarterly(self, ticker, quarter):
+        """Return a company's quarterly document for a 'YYYY-Q#' quarter."""
+        return self.fetch(f'{ticker}/quarterly/{quarter}.json')
+
+    def load_transactions(self, tickers=None, quarters=None):
+        """Load the transactions of many tickers into one typed DataFrame.
+
+        Args:
+            tickers: Tickers to load (default: every company in companies.json)
+            quarters: 'YYYY-Q#' quarters to load from the quarterly files instead
+                of each company's transactions.json
+        """
+        if tickers is None:
+            tickers = [company['ticker'] for company in self.companies()['companies']]
+        if quarters:
+            paths = {f'{ticker}/quarterly/{quarter}.json': ticker for ticker in tickers for quarter in quarters}
+        else:
+            paths = {f'{ticker}/transactions.json': ticker for ticker in tickers}
+
+        documents = self.fetch_many(paths)
+        records = [
+            {'ticker': paths[path], **transaction}
+            for path, document in documents.items() if document
+            for transaction in document['transactions']
+        ]
+        return transactions_frame(records)
+
+def transactions_frame(records):
+    """Build a DataFrame with typed columns from transaction records."""
+    import pandas as pd
+
+    df = pd.DataFrame.from_records(records)
+    if df.empty:
+        return df
+    if 'transaction_date' in df:
+        df['transaction_date'] = pd.to_datetime(df['transaction_date'], errors='coerce')
+    for column in NUMERIC_COLUMNS:
+        if column in df:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+    for column in CATEGORY_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype('category')
+    return df.sort_values(['transaction_date', 'ticker'], ascending=[False, True], ignore_index=True)
@@ -1,16 +1,55 @@
 import os
 import sqlite3
-import json
-import pandas as pd
 from datetime import datetime, timedelta
 import argparse
 import shutil
 
+import holdings
+import manifest
+import metrics
+import months
+import partitions
+import schema
+import serializer
+import views
+
 # Use relative path for data directory
 DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
 DB_PATH = os.path.join(DATA_DIR, 'insider_trading.db')
 JSON_DIR = os.path.join(DATA_DIR, 'json')
 
+# Columns exported for each transaction
+TRANSACTION_EXPORT_COLUMNS = (
+    'id',
+    'issuer_name',
+    'reporting_owner',
+    'reporting_owner_cik',
+    'reporting_owner_position',
+    'transaction_date',
+    'transaction_shares',
+    'transaction_price',
+    'transaction_type',
+    'shares_after_transaction',
+)
+
+# latest.json: the newest rows of each ticker, for widgets and alerts that only need recent activity
+LATEST_FILE = 'latest.json'
+LATEST_COUNT = 50
+LATEST_WATERMARK = 'latest'
+
+def transaction_quarter(date):
+    """Return the (year, quarter) of a 'YYYY-MM-DD' transaction date, or None."""
+    try:
+        return int(date[:4]), (int(date[5:7]) - 1) // 3 + 1
+    except (TypeError, ValueError):
+        return None
+
+def query_records(conn, query, params=()):
+    """Run a query and return the rows as a list of dictionaries."""
+    cursor = conn.execute(query, params)
+    columns = [description[0] for description in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
 def initialize_json_directory():
     """Create JSON directory structure if it doesn't exist."""
     os.makedirs(JSON_DIR, exist_ok=True)
@@ -20,149 +59,246 @@ def initialize_json_directory():
     cursor = conn.cursor()
     cursor.execute("SELECT DISTINCT issuer_ticker FROM insider_trading")
     tickers = [row[0] for row in cursor.fetchall() if row[0]]
+    # Tickers whose rows all rolled over into cold partitions keep their directory
+    tickers += sorted(partitions.cold_tickers(conn, DATA_DIR) - set(tickers))
+    removed = remove_alias_directories(conn, tickers)
     conn.close()
     
     for ticker in tickers:
         os.makedirs(os.path.join(JSON_DIR, ticker), exist_ok=True)
     
+    if removed:
+        print(f"Removed {len(removed)} directories of symbols now routed by issuer CIK: {', '.join(removed)}")
     print(f"Initialized JSON directory structure for {len(tickers)} companies")
 
+def remove_alias_directories(conn, tickers):
+    """Remove directories exported under reported symbols that now route to another ticker.
+    
+    Rows are exported under their CIK-routed issuer_ticker, so directories such
+    as 'LEN, LEN.B' or 'NCLH]' left by earlier exports would otherwise go stale.
+    Returns the names of the removed directories.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(insider_trading)")}
+    if 'reported_ticker' not in columns:
+        return []
+    cursor = conn.execute("""
+        SELECT DISTINCT reported_ticker FROM insider_trading
+        WHERE reported_ticker IS NOT NULL AND reported_ticker IS NOT issuer_ticker
+    """)
+    aliases = {row[0] for row in cursor.fetchall()} - set(tickers)
+    
+    removed = []
+    for alias in sorted(aliases):
+        path = os.path.join(JSON_DIR, alias)
+        # Only plain directories directly under JSON_DIR
+        if os.path.dirname(os.path.normpath(path)) == os.path.normpath(JSON_DIR) and os.path.isdir(path):
+            shutil.rmtree(path)
+            removed.append(alias)
+    return removed
+
+# Per-ticker aggregates of the flat insider_trading table (the cold partitions' layout)
+COMPANIES_SQL = """
+    SELECT
+        issuer_ticker as ticker,
+        issuer_name as name,
+        COUNT(*) as transaction_count,
+        MAX(transaction_date) as latest_transaction,
+        MIN(transaction_date) as earliest_transaction
+    FROM
+        {table}
+    WHERE
+        issuer_ticker IS NOT NULL
+    GROUP BY
+        issuer_ticker, issuer_name
+    ORDER BY
+        transaction_count DESC
+"""
+
+def companies_records(conn, data_dir=None):
+    """Return the companies index rows (one per ticker, busiest first).
+
+    Rows rolled over into cold partitions (under data_dir, default DATA_DIR)
+    are counted too.
+    """
+    companies = _hot_companies_records(conn)
+    cold_columns, cold_rows = partitions.query_cold_partitions(
+        conn, DATA_DIR if data_dir is None else data_dir, COMPANIES_SQL)
+    if not cold_rows:
+        return companies
+
+    merged = {(company['ticker'], company['name']): company for company in companies}
+    for row in cold_rows:
+        cold = dict(zip(cold_columns, row))
+        company = merged.setdefault((cold['ticker'], cold['name']), dict(cold, transaction_count=0))
+        company['transaction_count'] += cold['transaction_count']
+        dates = [date for date in (company['latest_transaction'], cold['latest_transaction']) if date]
+        company['latest_transaction'] = max(dates, default=None)
+        dates = [date for date in (company['earliest_transaction'], cold['earliest_transaction']) if date]
+        company['earliest_transaction'] = min(dates, default=None)
+    return sorted(merged.values(), key=lambda company: company['transaction_count'], reverse=True)
+
+def _hot_companies_records(conn):
+    if schema.is_normalized(conn):
+        # Counted per company key before the names are joined in
+        return query_records(conn, """
+            SELECT
+                c.issuer_ticker as ticker,
+                c.issuer_name as name,
+                SUM(t.transaction_count) as transaction_count,
+                MAX(t.latest_transaction) as latest_transaction,
+                MIN(t.earliest_transaction) as earliest_transaction
+            FROM (
+                SELECT company_id, COUNT(*) as transaction_count,
+                       MAX(transaction_date) as latest_transaction,
+                       MIN(transaction_date) as earliest_transaction
+                FROM transactions
+                GROUP BY company_id
+            ) t
+            JOIN companies c ON c.id = t.company_id
+            WHERE c.issuer_ticker IS NOT NULL
+            GROUP BY c.issuer_ticker, c.issuer_name
+            ORDER BY transaction_count DESC
+        """)
+    return query_records(conn, COMPANIES_SQL.format(table='insider_trading'))
+
 def export_companies_index():
     """Export list of all companies with metadata to companies.json."""
     conn = sqlite3.connect(DB_PATH)
     
     # Get company data
-    company_data = pd.read_sql_query("""
-        SELECT 
-            issuer_ticker as ticker,
-            issuer_name as name,
-            COUNT(*) as transaction_count,
-            MAX(transaction_date) as latest_transaction,
-            MIN(transaction_date) as earliest_transaction
-        FROM 
-            insider_trading
-        WHERE 
-            issuer_ticker IS NOT NULL
-        GROUP BY 
-            issuer_ticker, issuer_name
-        ORDER BY 
-            transaction_count DESC
-    """, conn)
-    
-    # Convert to list of dictionaries for JSON
-    companies = company_data.to_dict(orient='records')
+    companies = companies_records(conn, DATA_DIR)
     
     # Write to JSON file
-    with open(os.path.join(JSON_DIR, 'companies.json'), 'w') as f:
-        json.dump({
-            'last_updated': datetime.now().isoformat(),
-            'count': len(companies),
-            'companies': companies
-        }, f, indent=2)
+    companies_path = os.path.join(JSON_DIR, 'companies.json')
+    serializer.dump({
+        'last_updated': datetime.now().isoformat(),
+        'count': len(companies),
+        'companies': companies
+    }, companies_path)
+    metrics.record_file(companies_path, rows=len(companies))
     
     conn.close()
     print(f"Exported data for {len(companies)} companies to companies.json")
 
-def export_company_transactions(detailed_retention_years=3, quarterly_retention_years=10):
+def export_company_transactions(detailed_retention_years=3, quarterly_retention_years=10, include_cold=False,
+                                tickers=None, today=None):
     """Export comprehensive transaction data for each company with data retention strategy.
     
+    Only the hot database is read by default. Quarterly files for quarters
+    that reach into the cold partitions were written before their rows were
+    rolled over and are left as they are.
+    
     Args:
         detailed_retention_years: Number of years to keep detailed transaction data
         quarterly_retention_years: Number of years to keep quarterly summary data
+        include_cold: Also read the cold partitions and rewrite every quarterly file
+        tickers: Only export these tickers (default: every ticker in the database)
+        today: Date the retention periods are counted back from (default: now)
     """
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
     # Calculate cutoff dates
-    today = datetime.now()
+    now = datetime.now()
+    today = today or now
     detailed_cutoff = (today - timedelta(days=365 * detailed_retention_years)).strftime('%Y-%m-%d')
     quarterly_cutoff = (today - timedelta(days=365 * quarterly_retention_years)).strftime('%Y-%m-%d')
     
+    # Quarters starting on or before the newest cold row are frozen unless the cold partitions are read too
+    cold = partitions.partitions_for_range(conn, date_from=quarterly_cutoff)
+    frozen_through = None if include_cold or not cold else max(partition['max_date'] for partition in cold)
+    
     # Get all tickers
     cursor.execute("SELECT DISTINCT issuer_ticker FROM insider_trading WHERE issuer_ticker IS NOT NULL")
-    tickers = [row[0] for row in cursor.fetchall()]
+    all_tickers = [row[0] for row in cursor.fetchall()]
+    if tickers is None:
+        tickers = all_tickers
+    else:
+        wanted = set(tickers)
+        tickers = [ticker for ticker in all_tickers if ticker in wanted]
     
+    date_index = TRANSACTION_EXPORT_COLUMNS.index('transaction_date')
     for ticker in tickers:
         # Create company directory if it doesn't exist
         company_dir = os.path.join(JSON_DIR, ticker)
         os.makedirs(company_dir, exist_ok=True)
         
-        # Get all trades for this company
-        trades = pd.read_sql_query("""
-            SELECT 
-                id,
-                issuer_name,
-                reporting_owner,
-                reporting_owner_cik,
-                reporting_owner_position,
-                transaction_date,
-                transaction_shares,
-                transaction_price,
-                transaction_type,
-                shares_after_transaction
-            FROM 
-                insider_trading
-            WHERE 
-                issuer_ticker = ?
-            ORDER BY 
-                transaction_date DESC
-        """, conn, params=[ticker])
+        # Get all trades for this company, as row tuples (serialized without building dictionaries here)
+        if include_cold and cold:
+            _, trades = partitions.query_partitions(
+                conn, DATA_DIR, "issuer_ticker = ? AND transaction_date >= ?", [ticker, quarterly_cutoff],
+                'transaction_date DESC', -1, date_from=quarterly_cutoff, columns=TRANSACTION_EXPORT_COLUMNS)
+        else:
+            trades = conn.execute(f"""
+                SELECT 
+                    {', '.join(TRANSACTION_EXPORT_COLUMNS)}
+                FROM 
+                    insider_trading
+                WHERE 
+                    issuer_ticker = ?
+                ORDER BY 
+                    transaction_date DESC
+            """, [ticker]).fetchall()
         
         if len(trades) > 0:
-            # Convert transaction_date to datetime for filtering
-            trades['transaction_date_dt'] = pd.to_datetime(trades['transaction_date'])
-            
             # Export recent detailed transactions (last N years)
-            recent_trades = trades[trades['transaction_date'] >= detailed_cutoff]
-            recent_trades_list = recent_trades.drop('transaction_date_dt', axis=1).to_dict(orient='records')
+            recent_trades = [row for row in trades if (row[date_index] or '') >= detailed_cutoff]
             
-            with open(os.path.join(company_dir, 'transactions.json'), 'w') as f:
-                json.dump({
-                    'ticker': ticker,
-                    'last_updated': today.isoformat(),
-                    'retention_years': detailed_retention_years,
-                    'count': len(recent_trades_list),
-                    'transactions': recent_trades_list
-                }, f, indent=2)
+            transactions_path = os.path.join(company_dir, 'transactions.json')
+            serializer.dump({
+                'ticker': ticker,
+                'last_updated': now.isoformat(),
+                'retention_years': detailed_retention_years,
+                'count': len(recent_trades),
+                'transactions': serializer.Rows(TRANSACTION_EXPORT_COLUMNS, recent_trades)
+            }, transactions_path)
+            metrics.record_file(transactions_path, rows=len(recent_trades))
             
             # Create quarterly directory
             quarterly_dir = os.path.join(company_dir, 'quarterly')
             os.makedirs(quarterly_dir, exist_ok=True)
             
-            # Add quarter information for grouping
-            trades['year'] = trades['transaction_date_dt'].dt.year
-            trades['quarter'] = trades['transaction_date_dt'].dt.quarter
+            # Group by year and quarter (rows keep their newest-first order) and create quarterly files
+            quarters = {}
+            for row in trades:
+                quarter = transaction_quarter(row[date_index])
+                if quarter:
+                    quarters.setdefault(quarter, []).append(row)
             
-            # Group by year and quarter and create quarterly files
-            for (year, quarter), group in trades.groupby(['year', 'quarter']):
+            for (year, quarter), group in sorted(quarters.items()):
                 # Skip quarters older than the quarterly retention period
-                quarter_date = datetime(year=int(year), month=int(quarter)*3-2, day=1)
+                quarter_date = datetime(year=year, month=quarter*3-2, day=1)
                 if quarter_date < datetime.strptime(quarterly_cutoff, '%Y-%m-%d'):
                     continue
                 
                 quarter_file = f"{year}-Q{quarter}.json"
-                group_list = group.drop(['transaction_date_dt', 'year', 'quarter'], axis=1).to_dict(orient='records')
                 
-                with open(os.path.join(quarterly_dir, quarter_file), 'w') as f:
-                    json.dump({
-                        'ticker': ticker,
-                        'year': int(year),
-                        'quarter': int(quarter),
-                        'last_updated': today.isoformat(),
-                        'count': len(group_list),
-                        'transactions': group_list
-                    }, f, indent=2)
+                # Part of this quarter lives in cold storage; keep the complete file written before rollover
+                if frozen_through and quarter_date.strftime('%Y-%m-%d') <= frozen_through \
+                        and os.path.exists(os.path.join(quarterly_dir, quarter_file)):
+                    metrics.incr('cache_hits')
+                    continue
+                
+                quarter_path = os.path.join(quarterly_dir, quarter_file)
+                serializer.dump({
+                    'ticker': ticker,
+                    'year': year,
+                    'quarter': quarter,
+                    'last_updated': now.isoformat(),
+                    'count': len(group),
+                    'transactions': serializer.Rows(TRANSACTION_EXPORT_COLUMNS, group)
+                }, quarter_path)
+                metrics.record_file(quarter_path, rows=len(group))
+                
+                # Earlier exports named the quarter '2024.0-Q1.0.json' when a row had no date
+                legacy_path = os.path.join(quarterly_dir, f"{year}.0-Q{quarter}.0.json")
+                if os.path.exists(legacy_path):
+                    os.remove(legacy_path)
     
     conn.close()
     print(f"Exported transaction data for {len(tickers)} companies with {detailed_retention_years} years detailed data and {quarterly_retention_years} years quarterly data")
 
-def export_summary_data():
-    """Export summary with notable transactions across companies."""
-    conn = sqlite3.connect(DB_PATH)
-    
-    # Get large transactions
-    large_transactions = pd.read_sql_query("""
-        SELECT 
+SUMMARY_COLUMNS = """
             issuer_ticker as ticker,
             issuer_name as company,
             reporting_owner as insider,
@@ -171,62 +307,224 @@ def export_summary_data():
             transaction_shares as shares,
             transaction_price as price,
             transaction_type as type,
-            (CAST(transaction_shares AS REAL) * CAST(transaction_price AS REAL)) as value
-        FROM 
-            insider_trading
-        WHERE 
-            transaction_shares IS NOT NULL 
+            (CAST(transaction_shares AS REAL) * CAST(transaction_price AS REAL)) as value"""
+
+LARGE_TRANSACTIONS_SQL = f"""
+        SELECT {SUMMARY_COLUMNS}
+        FROM
+            {{table}}
+        WHERE
+            transaction_shares IS NOT NULL
             AND transaction_price IS NOT NULL
             AND CAST(transaction_shares AS REAL) > 0
-        ORDER BY 
+        ORDER BY
             value DESC
         LIMIT 100
-    """, conn)
-    
-    # Get recent transactions
-    recent_transactions = pd.read_sql_query("""
-        SELECT 
-            issuer_ticker as ticker,
-            issuer_name as company,
-            reporting_owner as insider,
-            reporting_owner_position as position,
-            transaction_date as date,
-            transaction_shares as shares,
-            transaction_price as price,
-            transaction_type as type,
-            (CAST(transaction_shares AS REAL) * CAST(transaction_price AS REAL)) as value
-        FROM 
-            insider_trading
-        ORDER BY 
+"""
+
+RECENT_TRANSACTIONS_SQL = f"""
+        SELECT {SUMMARY_COLUMNS}
+        FROM
+            {{table}}
+        ORDER BY
             transaction_date DESC
         LIMIT 50
-    """, conn)
+"""
+
+def summary_records(conn, data_dir=None):
+    """Return the summary's large and recent transactions as a dictionary of row lists.
+
+    The cold partitions (under data_dir, default DATA_DIR) are searched too;
+    each partition's top rows are merged with the hot table's.
+    """
+    data_dir = DATA_DIR if data_dir is None else data_dir
+    summary = {}
+    for name, query, key, limit in (
+            ('large_transactions', LARGE_TRANSACTIONS_SQL, lambda row: row['value'], 100),
+            ('recent_transactions', RECENT_TRANSACTIONS_SQL, lambda row: row['date'] or '', 50)):
+        records = query_records(conn, query.format(table='insider_trading'))
+        columns, rows = partitions.query_cold_partitions(conn, data_dir, query)
+        if rows:
+            records = sorted(records + [dict(zip(columns, row)) for row in rows], key=key, reverse=True)[:limit]
+        summary[name] = records
+    return summary
+
+def export_summary_data():
+    """Export summary with notable transactions across companies."""
+    conn = sqlite3.connect(DB_PATH)
+    summary = summary_records(conn, DATA_DIR)
     
     # Write to JSON file
-    with open(os.path.join(JSON_DIR, 'summary.json'), 'w') as f:
-        json.dump({
-            'last_updated': datetime.now().isoformat(),
-            'large_transactions': large_transactions.to_dict(orient='records'),
-            'recent_transactions': recent_transactions.to_dict(orient='records')
-        }, f, indent=2)
+    summary_path = os.path.join(JSON_DIR, 'summary.json')
+    serializer.dump({
+        'last_updated': datetime.now().isoformat(),
+        **summary
+    }, summary_path)
+    metrics.record_file(summary_path, rows=len(summary['large_transactions']) + len(summary['recent_transactions']))
     
     conn.close()
     print("Exported summary data")
 
-def main():
+def latest_records(conn, ticker, count=LATEST_COUNT):
+    """Return a ticker's newest `count` transactions (newest first), from the hot table."""
+    return query_records(conn, f"""
+        SELECT {', '.join(TRANSACTION_EXPORT_COLUMNS)}
+        FROM insider_trading
+        WHERE issuer_ticker = ?
+        ORDER BY transaction_date DESC, id DESC
+        LIMIT ?
+    """, (ticker, count))
+
+def update_latest_files(conn, json_dir, count=LATEST_COUNT, rebuild=False):
+    """Rewrite latest.json of the tickers with rows added since the last update.
+    
+    Tickers without a latest.json are written too; every ticker is rewritten
+    on the first update, with rebuild=True and after issuers were moved to
+    new tickers. The files of tickers without hot rows (all rolled into cold
+    partitions, or moved to another ticker) are removed. Returns the number
+    of files written.
+    """
+    holdings.initialize_holdings(conn)
+    since_id = holdings.get_watermark(conn, LATEST_WATERMARK)
+    max_id = conn.execute("SELECT MAX(id) FROM insider_trading").fetchone()[0] or 0
+    tickers = [row[0] for row in conn.execute(
+        "SELECT DISTINCT issuer_ticker FROM insider_trading WHERE issuer_ticker IS NOT NULL")]
+    if rebuild or since_id is None:
+        touched = set(tickers)
+    else:
+        touched = {row[0] for row in conn.execute(
+            "SELECT DISTINCT issuer_ticker FROM insider_trading WHERE id > ? AND issuer_ticker IS NOT NULL",
+            (since_id,))}
+    
+    written = 0
+    now = datetime.now().isoformat()
+    for ticker in tickers:
+        path = os.path.join(json_dir, ticker, LATEST_FILE)
+        if ticker not in touched and os.path.exists(path):
+            metrics.incr('cache_hits')
+            continue
+        transactions = latest_records(conn, ticker, count)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        serializer.dump({
+            'ticker': ticker,
+            'last_updated': now,
+            'count': len(transactions),
+            'transactions': transactions
+        }, path, compact=True)
+        metrics.record_file(path, rows=len(transactions))
+        written += 1
+    
+    known = set(tickers)
+    removed = 0
+    for name in sorted(os.listdir(json_dir)) if os.path.isdir(json_dir) else []:
+        path = os.path.join(json_dir, name, LATEST_FILE)
+        if name not in known and os.path.isfile(path):
+            os.remove(path)
+            removed += 1
+    if removed:
+        print(f"Removed latest.json of {removed} companies without current transactions")
+    
+    holdings.set_watermark(conn, LATEST_WATERMARK, max_id)
+    conn.commit()
+    return written
+
+def export_latest(count=LATEST_COUNT, rebuild=False):
+    """Export latest.json (the newest transactions) of the companies with new transactions."""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        written = update_latest_files(conn, JSON_DIR, count=count, rebuild=rebuild)
+    finally:
+        conn.close()
+    print(f"Exported latest transactions for {written} companies")
+    return written
+
+def export_views(config_path=None, rebuild=False):
+    """Export the filtered views declared in views.json (data/json/views/) from the new transactions."""
+    declared = views.load_views(config_path or views.VIEWS_CONFIG)
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        written = views.update_views(conn, JSON_DIR, declared, rebuild=rebuild)
+    finally:
+        conn.close()
+    print(f"Exported {written} of {len(declared)} filtered views")
+    return written
+
+def export_by_month(compress=False, rebuild=False, today=None):
+    """Export every issuer's transactions of each month to by-month/YYYY-MM.json, freezing settled months."""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        written = months.update_month_files(conn, DATA_DIR, JSON_DIR, compress=compress, rebuild=rebuild,
+                                            today=today)
+    finally:
+        conn.close()
+    print(f"Exported {written} month files")
+    return written
+
+def export_holdings(quarterly_retention_years=10, rebuild=False, today=None):
+    """Export per-insider holdings timelines (holdings.json) of the companies with new transactions."""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        return holdings.export_holdings(conn, DATA_DIR, JSON_DIR, retention_years=quarterly_retention_years,
+                                        rebuild=rebuild, today=today)
+    finally:
+        conn.close()
+
+def main(argv=None):
     """Main function to export SQLite data to JSON files."""
     parser = argparse.ArgumentParser(description='Export insider trading data from SQLite to JSON.')
     parser.add_argument('--detailed-years', type=int, default=3,
                         help='Number of years to keep detailed transaction data (default: 3)')
     parser.add_argument('--quarterly-years', type=int, default=10,
                         help='Number of years to keep quarterly summary data (default: 10)')
+    parser.add_argument('--snapshots', action='store_true',
+                        help='Also write binary per-ticker snapshots (snapshot.bin) for NumPy loading')
+    parser.add_argument('--sqlite', action='store_true',
+                        help='Also write a read-only SQLite snapshot of the whole dataset (insider_trading.sqlite3) '
+                             'for SQL over HTTP range requests')
+    parser.add_argument('--include-cold', action='store_true',
+                        help='Also read the cold partitions and rewrite every quarterly file')
+    parser.add_argument('--tickers', type=str,
+                        help='Comma-separated tickers whose transaction files are re-exported (default: all); '
+                             'the indexes, summary and manifest are always refreshed')
+    parser.add_argument('--latest-count', type=int, default=LATEST_COUNT,
+                        help=f'Number of newest transactions in each latest.json (default: {LATEST_COUNT})')
+    parser.add_argument('--rebuild-latest', action='store_true',
+                        help='Rewrite every latest.json instead of only those with new transactions')
+    parser.add_argument('--views', type=str, default=views.VIEWS_CONFIG,
+                        help='Config file declaring the filtered views (default: views.json)')
+    parser.add_argument('--rebuild-views', action='store_true',
+                        help='Recompute every filtered view instead of merging the new transactions')
+    parser.add_argument('--gzip-months', action='store_true',
+                        help='Write the by-month files gzip-compressed (YYYY-MM.json.gz)')
+    parser.add_argument('--rebuild-months', action='store_true',
+                        help='Rewrite every open by-month file (frozen months are never rewritten)')
+    parser.add_argument('--rebuild-holdings', action='store_true',
+                        help='Recompute every holdings timeline instead of only those with new transactions')
+    parser.add_argument('--json-backend', choices=('auto',) + tuple(serializer.BACKENDS), default='auto',
+                        help='JSON serializer backend (default: auto, the fastest installed one); '
+                             'every backend writes the same bytes')
     parser.add_argument('--debug', action='store_true',
                         help='Enable debug output')
-    args = parser.parse_args()
+    metrics.add_profile_arguments(parser)
+    args = parser.parse_args(argv)
     
     # Enable debug output for GitHub Actions
     debug = args.debug or ('GITHUB_ACTIONS' in os.environ)
     
+    # Record per-stage timings and counters in run_metrics.json
+    metrics.start_run('export_json', metrics.metrics_path(args, DATA_DIR),
+                      profile_stage=args.profile, profile_mode=args.profile_mode)
+    previous_backend = serializer.set_backend(args.json_backend)
+    status = 1
+    try:
+        status = run(args, debug)
+    finally:
+        metrics.finish_run('ok' if status == 0 else 'error')
+        serializer.set_backend(previous_backend)
+    return status
+
+def run(args, debug=False):
+    """Export SQLite data to JSON files for parsed command line arguments."""
     if debug:
         print("DEBUG: Starting export_json.py script")
         print(f"DEBUG: Current working directory: {os.getcwd()}")
@@ -267,23 +565,69 @@ def main():
         # Initialize JSON directory structure
         if debug:
             print("DEBUG: Initializing JSON directory structure")
-        initialize_json_directory()
+        with metrics.stage('export_initialize_json_directory'):
+            initialize_json_directory()
         
         # Export data with retention strategy
         if debug:
             print("DEBUG: Exporting companies index")
-        export_companies_index()
+        with metrics.stage('export_companies_index'):
+            export_companies_index()
         
         if debug:
             print(f"DEBUG: Exporting transactions with {args.detailed_years} years detailed data and {args.quarterly_years} years quarterly data")
-        export_company_transactions(
-            detailed_retention_years=args.detailed_years,
-            quarterly_retention_years=args.quarterly_years
-        )
+        with metrics.stage('export_company_transactions'):
+            export_company_transactions(
+                detailed_retention_years=args.detailed_years,
+                quarterly_retention_years=args.quarterly_years,
+                include_cold=args.include_cold,
+                tickers=args.tickers.split(',') if args.tickers else None
+            )
         
         if debug:
             print("DEBUG: Exporting summary data")
-        export_summary_data()
+        with metrics.stage('export_summary_data'):
+            export_summary_data()
+        
+        if debug:
+            print("DEBUG: Exporting latest transactions")
+        with metrics.stage('export_latest'):
+            export_latest(count=args.latest_count, rebuild=args.rebuild_latest)
+        
+        if debug:
+            print("DEBUG: Exporting filtered views")
+        with metrics.stage('export_views'):
+            export_views(config_path=args.views, rebuild=args.rebuild_views)
+        
+        if debug:
+            print("DEBUG: Exporting month files")
+        with metrics.stage('export_by_month'):
+            export_by_month(compress=args.gzip_months, rebuild=args.rebuild_months)
+        
+        if debug:
+            print("DEBUG: Exporting holdings timelines")
+        with metrics.stage('export_holdings'):
+            export_holdings(quarterly_retention_years=args.quarterly_years, rebuild=args.rebuild_holdings)
+        
+        if args.snapshots:
+            if debug:
+                print("DEBUG: Exporting binary snapshots")
+            import snapshots
+            with metrics.stage('export_snapshots'):
+                snapshots.export_snapshots(DB_PATH, DATA_DIR, JSON_DIR, retention_years=args.quarterly_years)
+        
+        if args.sqlite:
+            if debug:
+                print("DEBUG: Building SQLite snapshot")
+            import sqlite_snapshot
+            with metrics.stage('export_sqlite_snapshot'):
+                sqlite_snapshot.build_snapshot(DB_PATH, DATA_DIR, os.path.join(JSON_DIR, sqlite_snapshot.SNAPSHOT_FILE))
+        
+        # Written last: the manifest only lists files whose export has finished
+        if debug:
+            print("DEBUG: Writing manifest")
+        with metrics.stage('export_manifest'):
+            manifest.write_manifest(JSON_DIR)
         
         print(f"JSON export completed successfully with {args.detailed_years} years of detailed data and {args.quarterly_years} years of quarterly data")
         
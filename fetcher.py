@@ -0,0 +1,191 @@
+"""
+Lean Form 4 fetcher that downloads only the primary ownership XML.
+
+sec-edgar-downloader's `get("4", ..., download_details=True)` saves the full
+submission text and the primary document of every accession, although the
+parser only reads the ownership XML. PrimaryDocumentFetcher lists an
+issuer's Form 4 accessions from the EDGAR submissions API (one request per
+ticker and date range), then downloads each filing's ownership XML into the
+same `sec-edgar-filings/{ticker}/4/{accession}/primary-document.xml` layout.
+When the submissions entry doesn't name the XML, the filing index is read
+to find it. Anything else (the full submission) is fetched on demand with
+fetch_full_submission().
+
+Every request goes through one RateLimiter, so all the workers sharing a
+fetcher stay within the SEC's fair access limit.
+"""
+import os
+import posixpath
+import sqlite3
+import threading
+
+import issuers
+import metrics
+
+# requests is imported when the first request is made
+
+SUBMISSIONS_URL = "https://data.sec.gov/submissions/{name}"
+ARCHIVES_URL = "https://www.sec.gov/Archives/edgar/data/{cik}/{accession}"
+PRIMARY_DOCUMENT = 'primary-document.xml'
+FULL_SUBMISSION = 'full-submission.txt'
+
+REQUEST_TIMEOUT = 30
+
+class PrimaryDocumentFetcher:
+    """Downloads the primary ownership XML of each Form 4 accession.
+
+    get() takes the same arguments as sec_edgar_downloader.Downloader.get(),
+    so it can be used wherever a Downloader is.
+    """
+
+    def __init__(self, user_agent, data_dir, db_path, limiter=None, timeout=REQUEST_TIMEOUT):
+        import InsiderTrading
+
+        self.user_agent = user_agent
+        self.data_dir = data_dir
+        self.db_path = db_path
+        self.limiter = limiter or InsiderTrading.RateLimiter()
+        self.timeout = timeout
+        self._local = threading.local()
+        # (path, filing date) of every document saved by get(), for the inventory
+        self.downloaded = []
+
+    def _session(self):
+        # One session per thread: requests sessions aren't thread-safe
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+            session = requests.Session()
+            session.headers['User-Agent'] = self.user_agent
+            self._local.session = session
+        return session
+
+    def _request(self, url):
+        """GET a URL under the rate limit; returns the response (raises on HTTP errors other than 404)."""
+        self.limiter.acquire()
+        response = self._session().get(url, timeout=self.timeout)
+        metrics.incr('requests')
+        metrics.incr('bytes_downloaded', len(response.content))
+        if response.status_code != 404:
+            response.raise_for_status()
+        return response
+
+    def fetch(self, url):
+        """GET any EDGAR URL under the shared rate limit; returns the body, or None when it doesn't exist."""
+        response = self._request(url)
+        return None if response.status_code == 404 else response.content
+
+    def resolve_cik(self, ticker):
+        """Return the issuer CIK of a ticker from the cached issuer map."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            entry = issuers.lookup(conn, ticker)
+        finally:
+            conn.close()
+        if entry is None:
+            raise ValueError(f"No issuer CIK known for {ticker} (run `python issuers.py refresh`)")
+        return entry['cik']
+
+    def list_filings(self, cik, form='4', after=None, before=None):
+        """Return (accession number, filing date, primary document) of an issuer's filings of a form type.
+
+        Filing dates are compared inclusively with `after` and `before`
+        (YYYY-MM-DD). Older submission pages are only read when they overlap
+        the date range.
+        """
+        document = self._request(SUBMISSIONS_URL.format(name=f"CIK{cik}.json")).json()
+        pages = [document.get('filings', {}).get('recent', {})]
+        for page in document.get('filings', {}).get('files', []):
+            if (after and page.get('filingTo', '') < after) or (before and page.get('filingFrom', '') > before):
+                continue
+            pages.append(self._request(SUBMISSIONS_URL.format(name=page['name'])).json())
+
+        filings = []
+        for page in pages:
+            for accession, filing_date, filing_form, primary in zip(
+                    page.get('accessionNumber', []), page.get('filingDate', []),
+                    page.get('form', []), page.get('primaryDocument', [])):
+                if filing_form != form:
+                    continue
+                if (after and filing_date < after) or (before and filing_date > before):
+                    continue
+                filings.append((accession, filing_date, primary))
+        return filings
+
+    def primary_xml_name(self, cik, accession, primary=None):
+        """Return the file name of a filing's ownership XML.
+
+        The submissions API names the XSL-rendered view ('xslF345X05/doc.xml');
+        the raw XML has the same name at the top of the accession folder.
+        Without a usable name the filing index is read.
+        """
+        if primary and primary.lower().endswith('.xml'):
+            return posixpath.basename(primary)
+        index_url = ARCHIVES_URL.format(cik=int(cik), accession=accession.replace('-', '')) + '/index.json'
+        response = self._request(index_url)
+        if response.status_code == 404:
+            return None
+        for item in response.json().get('directory', {}).get('item', []):
+            name = item.get('name', '')
+            if name.lower().endswith('.xml') and name != 'FilingSummary.xml':
+                return name
+        return None
+
+    def fetch_primary_document(self, ticker, cik, accession, primary=None):
+        """Download one filing's ownership XML; returns its path or None when it has none."""
+        name = self.primary_xml_name(cik, accession, primary)
+        if name is None:
+            return None
+        response = self._request(
+            ARCHIVES_URL.format(cik=int(cik), accession=accession.replace('-', '')) + f'/{name}')
+        if response.status_code == 404:
+            return None
+
+        filing_dir = os.path.join(self.data_dir, 'sec-edgar-filings', ticker, '4', accession)
+        os.makedirs(filing_dir, exist_ok=True)
+        path = os.path.join(filing_dir, PRIMARY_DOCUMENT)
+        # Written under a temporary name so an interrupted download is never parsed
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(response.content)
+        os.replace(temp_path, path)
+        metrics.incr('bytes_written', len(response.content))
+        return path
+
+    def get(self, form, ticker, after=None, before=None, download_details=True, accession_numbers_to_skip=None):
+        """Download the ownership XML of a ticker's filings in a date range.
+
+        Returns the number of filings downloaded.
+        """
+        cik = self.resolve_cik(ticker)
+        skip = set(accession_numbers_to_skip or ())
+        downloaded = 0
+        for accession, filing_date, primary in self.list_filings(cik, form, after, before):
+            if accession in skip:
+                continue
+            path = self.fetch_primary_document(ticker, cik, accession, primary)
+            if path:
+                self.downloaded.append((path, filing_date))
+                downloaded += 1
+        return downloaded
+
+    def fetch_full_submission(self, filing_dir):
+        """Download a filing's full submission text next to its primary document, on demand.
+
+        The issuer CIK is read from the primary document. Returns the path.
+        """
+        path = os.path.join(filing_dir, FULL_SUBMISSION)
+        if os.path.exists(path):
+            return path
+        cik = issuers.read_issuer_cik(os.path.join(filing_dir, PRIMARY_DOCUMENT))
+        if cik is None:
+            raise ValueError(f"No issuer CIK found in {filing_dir}")
+        accession = os.path.basename(os.path.normpath(filing_dir))
+        response = self._request(ARCHIVES_URL.format(cik=int(cik), accession=accession) + '.txt')
+        if response.status_code == 404:
+            raise FileNotFoundError(f"EDGAR has no submission {accession}")
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(response.content)
+        os.replace(temp_path, path)
+        return path
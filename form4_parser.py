@@ -0,0 +1,205 @@
+"""
+Form 4 ownership document parsers.
+
+Every backend returns the same dictionary of raw field values (see FIELDS)
+for one filing:
+
+    etree   xml.etree.ElementTree, all fields resolved in one pass over the
+            document with a fixed tag -> field table
+    lxml    lxml with compiled XPath (optional dependency)
+    legacy  the original `.//` searches, kept as the reference for the
+            differential tests
+
+Only the first non-derivative transaction is extracted. get_parser('auto')
+picks the fastest backend that is installed.
+"""
+import xml.etree.ElementTree as ET
+
+# lxml is imported only when its backend is used
+
+# Field values returned by every backend, in order
+FIELDS = (
+    'issuer_name', 'issuer_ticker', 'issuer_cik',
+    'reporting_owner', 'reporting_owner_cik', 'reporting_owner_position',
+    'transaction_date', 'transaction_shares', 'transaction_price',
+    'transaction_type', 'shares_after_transaction',
+)
+
+# Elements whose text is a field; the first one in the document wins
+DOCUMENT_TAGS = {
+    'issuerName': 'issuer_name',
+    'issuerTradingSymbol': 'issuer_ticker',
+    'issuerCik': 'issuer_cik',
+    'rptOwnerName': 'reporting_owner',
+    'rptOwnerCik': 'reporting_owner_cik',
+}
+# Transaction elements whose <value> child is a field
+VALUE_PARENTS = {
+    'transactionDate': 'transaction_date',
+    'transactionShares': 'transaction_shares',
+    'transactionPricePerShare': 'transaction_price',
+    'sharesOwnedFollowingTransaction': 'shares_after_transaction',
+}
+
+def _empty_record():
+    return dict.fromkeys(FIELDS)
+
+def parse_etree(xml_file):
+    """Parse a Form 4 document with ElementTree in a single pass over its elements.
+    
+    Fields are dispatched by tag as they are met, so the document is walked
+    once (plus once over its first non-derivative transaction) instead of
+    once per field. Filings that leave out wrapper elements such as
+    <transactionAmounts> are handled like the legacy parser handles them.
+    """
+    root = ET.parse(xml_file).getroot()
+    values = _empty_record()
+    found = set()
+    transaction = None
+    for elem in root.iter():
+        tag = elem.tag
+        field = DOCUMENT_TAGS.get(tag)
+        if field is not None:
+            if field not in found:
+                found.add(field)
+                values[field] = elem.text
+        elif tag == 'reportingOwnerRelationship':
+            if 'reporting_owner_position' not in found:
+                title = elem.find('officerTitle')
+                if title is not None:
+                    found.add('reporting_owner_position')
+                    values['reporting_owner_position'] = title.text
+        elif tag == 'nonDerivativeTransaction' and transaction is None:
+            transaction = elem
+
+    # Only the first non-derivative transaction is extracted
+    if transaction is not None:
+        for elem in transaction.iter():
+            tag = elem.tag
+            field = VALUE_PARENTS.get(tag)
+            if field is not None:
+                if field not in found:
+                    value = elem.find('value')
+                    if value is not None:
+                        found.add(field)
+                        values[field] = value.text
+            elif tag == 'transactionCode' and 'transaction_type' not in found:
+                found.add('transaction_type')
+                values['transaction_type'] = elem.text
+    return values
+
+# XPath of each field, relative to the document root or to the first transaction
+LXML_DOCUMENT_PATHS = {
+    'issuer_name': './/issuerName',
+    'issuer_ticker': './/issuerTradingSymbol',
+    'issuer_cik': './/issuerCik',
+    'reporting_owner': './/rptOwnerName',
+    'reporting_owner_cik': './/rptOwnerCik',
+    'reporting_owner_position': './/reportingOwnerRelationship/officerTitle',
+}
+LXML_TRANSACTION_PATHS = {
+    'transaction_date': './/transactionDate/value',
+    'transaction_shares': './/transactionShares/value',
+    'transaction_price': './/transactionPricePerShare/value',
+    'transaction_type': './/transactionCode',
+    'shares_after_transaction': './/sharesOwnedFollowingTransaction/value',
+}
+
+_lxml_paths = None
+
+def _compile_lxml_paths():
+    """Compile the XPath expressions once per process."""
+    global _lxml_paths
+    if _lxml_paths is None:
+        from lxml import etree
+        document = {field: etree.XPath(f'({path})[1]') for field, path in LXML_DOCUMENT_PATHS.items()}
+        transaction = {field: etree.XPath(f'({path})[1]') for field, path in LXML_TRANSACTION_PATHS.items()}
+        _lxml_paths = (document, etree.XPath('(.//nonDerivativeTransaction)[1]'), transaction,
+                       etree.XMLParser(resolve_entities=False, no_network=True))
+    return _lxml_paths
+
+def parse_lxml(xml_file):
+    """Parse a Form 4 document with lxml and compiled XPath."""
+    from lxml import etree
+
+    document_paths, transaction_path, transaction_paths, parser = _compile_lxml_paths()
+    try:
+        root = etree.parse(xml_file, parser).getroot()
+    except etree.XMLSyntaxError as e:
+        raise ET.ParseError(str(e)) from e
+    values = _empty_record()
+    for field, xpath in document_paths.items():
+        elements = xpath(root)
+        if elements:
+            values[field] = elements[0].text
+    transactions = transaction_path(root)
+    if transactions:
+        for field, xpath in transaction_paths.items():
+            elements = xpath(transactions[0])
+            if elements:
+                values[field] = elements[0].text
+    return values
+
+def parse_legacy(xml_file):
+    """Parse a Form 4 document with the original descendant searches."""
+    root = ET.parse(xml_file).getroot()
+    values = _empty_record()
+
+    for field, path in (('issuer_name', './/issuerName'), ('issuer_ticker', './/issuerTradingSymbol'),
+                        ('issuer_cik', './/issuerCik'), ('reporting_owner', './/rptOwnerName'),
+                        ('reporting_owner_cik', './/rptOwnerCik'),
+                        ('reporting_owner_position', './/reportingOwnerRelationship/officerTitle')):
+        for elem in root.findall(path):
+            values[field] = elem.text
+            break
+
+    non_derivative_transactions = root.findall(".//nonDerivativeTransaction")
+    if non_derivative_transactions:
+        transaction = non_derivative_transactions[0]
+        for field, path in (('transaction_date', './/transactionDate/value'),
+                            ('transaction_shares', './/transactionShares/value'),
+                            ('transaction_price', './/transactionPricePerShare/value'),
+                            ('transaction_type', './/transactionCode'),
+                            ('shares_after_transaction', './/sharesOwnedFollowingTransaction/value')):
+            elem = transaction.find(path)
+            if elem is not None:
+                values[field] = elem.text
+    return values
+
+BACKENDS = {
+    'etree': parse_etree,
+    'lxml': parse_lxml,
+    'legacy': parse_legacy,
+}
+
+# Tried in order by get_parser('auto')
+AUTO_ORDER = ('lxml', 'etree')
+
+# {backend: installed}, filled on first use so a missing lxml is only looked up once
+_available = {}
+
+def backend_available(name):
+    """Return whether a backend's dependencies are installed."""
+    if name != 'lxml':
+        return name in BACKENDS
+    if name not in _available:
+        try:
+            import lxml.etree  # noqa: F401
+            _available[name] = True
+        except ImportError:
+            _available[name] = False
+    return _available[name]
+
+def available_backends():
+    """Return the names of the backends that can be used here."""
+    return [name for name in BACKENDS if backend_available(name)]
+
+def get_parser(backend='auto'):
+    """Return the parse function of a backend ('auto' = fastest installed one)."""
+    if backend == 'auto':
+        backend = next(name for name in AUTO_ORDER if backend_available(name))
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown parser backend {backend!r} (choose from {', '.join(BACKENDS)})")
+    if not backend_available(backend):
+        raise ValueError(f"Parser backend {backend!r} is not installed")
+    return BACKENDS[backend]
@@ -0,0 +1,193 @@
+"""
+Per-insider holdings timelines, maintained incrementally.
+
+Each (issuer ticker, reporting owner) pair has a series of points built from
+shares_after_transaction, kept in the `holdings_series` table. An export
+only reads the insider_trading rows added since the last one (tracked by
+row id in `export_watermarks`), merges them into the series they touch and
+rewrites `data/json/{ticker}/holdings.json` for the affected tickers:
+
+    {"ticker": "AAPL", "last_updated": ..., "count": 2,
+     "fields": ["date", "shares_after", "type", "shares"],
+     "insiders": [{"owner": "Cook, Tim", "owner_cik": "0001214156",
+                   "position": "CEO", "first_date": ..., "last_date": ...,
+                   "latest_shares": 3280557,
+                   "points": [["2024-04-01", 3280557, "S", 196410], ...]}]}
+
+Points are oldest first and use the field order given in `fields`. Every
+series is recomputed from the hot and cold tables on the first export, with
+rebuild=True, and after issuers.py moved rows to new tickers (it clears the
+export watermarks).
+"""
+from datetime import datetime, timedelta
+import json
+import os
+
+import metrics
+import partitions
+import serializer
+
+HOLDINGS_FILE = 'holdings.json'
+WATERMARK = 'holdings'
+POINT_FIELDS = ('date', 'shares_after', 'type', 'shares')
+
+SOURCE_COLUMNS = ['id', 'issuer_ticker', 'reporting_owner', 'reporting_owner_cik', 'reporting_owner_position',
+                  'transaction_date', 'transaction_type', 'transaction_shares', 'shares_after_transaction']
+
+def initialize_holdings(conn):
+    """Create the holdings_series and export_watermarks tables if they don't exist."""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS holdings_series (
+        issuer_ticker TEXT NOT NULL,
+        owner_key TEXT NOT NULL,
+        reporting_owner TEXT,
+        reporting_owner_cik TEXT,
+        reporting_owner_position TEXT,
+        points TEXT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (issuer_ticker, owner_key)
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS export_watermarks (
+        name TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+def get_watermark(conn, name):
+    """Return the last insider_trading id an export has processed, or None."""
+    row = conn.execute("SELECT last_id FROM export_watermarks WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+def set_watermark(conn, name, last_id):
+    """Record the last insider_trading id an export has processed."""
+    conn.execute("INSERT OR REPLACE INTO export_watermarks (name, last_id, updated_at) "
+                 "VALUES (?, ?, CURRENT_TIMESTAMP)", (name, last_id))
+
+def _number(value):
+    """Return a share count as an int when whole, a float otherwise, or None."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if number.is_integer() else number
+
+def _point(row):
+    # [id, date, shares_after, type, shares]; the id de-duplicates and orders same-day points
+    return [row['id'], row['transaction_date'], _number(row['shares_after_transaction']),
+            row['transaction_type'], _number(row['transaction_shares'])]
+
+def _new_rows(conn, data_dir, since_id, rebuild):
+    """Return the source rows to merge: all rows (hot and cold) or the hot rows after since_id."""
+    if rebuild:
+        columns, rows = partitions.query_partitions(conn, data_dir, "issuer_ticker IS NOT NULL", [],
+                                                    'transaction_date', -1, columns=SOURCE_COLUMNS)
+    else:
+        cursor = conn.execute(f'''
+        SELECT {', '.join(SOURCE_COLUMNS)} FROM insider_trading
+        WHERE id > ? AND issuer_ticker IS NOT NULL
+        ''', (since_id,))
+        columns = [description[0] for description in cursor.description]
+        rows = cursor.fetchall()
+    return [dict(zip(columns, row)) for row in rows]
+
+def update_series(conn, data_dir, rebuild=False):
+    """Merge insider_trading rows added since the last export into the holdings series.
+
+    Returns the set of tickers whose series changed.
+    """
+    initialize_holdings(conn)
+    since_id = get_watermark(conn, WATERMARK)
+    rebuild = rebuild or since_id is None
+    previous = set()
+    if rebuild:
+        # Tickers that lose every series still get their holdings.json rewritten
+        previous = {row[0] for row in conn.execute("SELECT DISTINCT issuer_ticker FROM holdings_series")}
+        conn.execute("DELETE FROM holdings_series")
+    max_id = conn.execute("SELECT MAX(id) FROM insider_trading").fetchone()[0] or 0
+
+    touched = {}
+    for row in _new_rows(conn, data_dir, since_id, rebuild):
+        if _number(row['shares_after_transaction']) is None or not row['transaction_date']:
+            continue
+        owner_key = row['reporting_owner_cik'] or row['reporting_owner'] or ''
+        touched.setdefault((row['issuer_ticker'], owner_key), []).append(row)
+
+    for (ticker, owner_key), rows in touched.items():
+        stored = conn.execute('''
+        SELECT points FROM holdings_series WHERE issuer_ticker = ? AND owner_key = ?
+        ''', (ticker, owner_key)).fetchone()
+        points = {point[0]: point for point in json.loads(stored[0])} if stored else {}
+        points.update((row['id'], _point(row)) for row in rows)
+        # The newest row names the insider (names and titles change over time)
+        latest = max(rows, key=lambda row: (row['transaction_date'], row['id']))
+        conn.execute('''
+        INSERT OR REPLACE INTO holdings_series
+        (issuer_ticker, owner_key, reporting_owner, reporting_owner_cik, reporting_owner_position, points, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (ticker, owner_key, latest['reporting_owner'], latest['reporting_owner_cik'],
+              latest['reporting_owner_position'],
+              json.dumps(sorted(points.values(), key=lambda point: (point[1], point[0])), separators=(',', ':'))))
+
+    set_watermark(conn, WATERMARK, max_id)
+    conn.commit()
+    metrics.incr('rows', sum(len(rows) for rows in touched.values()))
+    return previous | {ticker for ticker, _ in touched}
+
+def holdings_document(conn, ticker, cutoff=None):
+    """Return the holdings.json document of a ticker, dropping points dated before cutoff."""
+    insiders = []
+    cursor = conn.execute('''
+    SELECT reporting_owner, reporting_owner_cik, reporting_owner_position, points
+    FROM holdings_series WHERE issuer_ticker = ?
+    ''', (ticker,))
+    for owner, owner_cik, position, points in cursor:
+        points = [point[1:] for point in json.loads(points) if not cutoff or point[1] >= cutoff]
+        if not points:
+            continue
+        insiders.append({
+            'owner': owner,
+            'owner_cik': owner_cik,
+            'position': position,
+            'first_date': points[0][0],
+            'last_date': points[-1][0],
+            'latest_shares': points[-1][1],
+            'points': points,
+        })
+    # Largest current holders first
+    insiders.sort(key=lambda insider: (-(insider['latest_shares'] or 0), insider['owner'] or ''))
+    return {
+        'ticker': ticker,
+        'last_updated': datetime.now().isoformat(),
+        'count': len(insiders),
+        'fields': list(POINT_FIELDS),
+        'insiders': insiders,
+    }
+
+def export_holdings(conn, data_dir, json_dir, retention_years=10, rebuild=False, today=None):
+    """Update the holdings series and write holdings.json for the tickers they touch.
+
+    Tickers without a holdings.json yet (e.g. a fresh JSON directory) are
+    written too; points older than retention_years before today (default:
+    now) are left out. Returns the number of files written.
+    """
+    touched = update_series(conn, data_dir, rebuild=rebuild)
+    cutoff = ((today or datetime.now()) - timedelta(days=365 * retention_years)).strftime('%Y-%m-%d')
+    tickers = {row[0] for row in conn.execute("SELECT DISTINCT issuer_ticker FROM holdings_series")}
+
+    written = 0
+    for ticker in sorted(tickers | touched):
+        path = os.path.join(json_dir, ticker, HOLDINGS_FILE)
+        if ticker not in touched and os.path.exists(path):
+            metrics.incr('cache_hits')
+            continue
+        document = holdings_document(conn, ticker, cutoff)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        serializer.dump(document, path, compact=True)
+        metrics.record_file(path, rows=document['count'])
+        written += 1
+
+    print(f"Exported holdings timelines for {written} companies ({len(touched)} with new transactions)")
+    return written
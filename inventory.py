@@ -0,0 +1,210 @@
+"""
+Incrementally maintained inventory of the downloaded Form 4 corpus.
+
+Every filing document under data/sec-edgar-filings has a row in the
+`filing_inventory` table (path, accession, ticker, size, filing date and
+parse status), kept up to date by the code that touches the file: downloads
+record their filing date, ingestion records whether the file was parsed
+('ingested') or failed ('error', with the message), and the file discovery
+of each ingest adds files it hasn't seen yet as 'pending'. Debug output and
+the report below read the table instead of walking the data directory, so
+they cost O(changes) rather than O(corpus).
+
+Usage:
+    python inventory.py report [--ticker AAPL] [--errors 10]
+    python inventory.py scan       # reconcile with the files on disk (drops rows of deleted files)
+"""
+from datetime import datetime
+import argparse
+import glob
+import os
+import re
+import sqlite3
+
+STATUS_PENDING = 'pending'
+STATUS_INGESTED = 'ingested'
+STATUS_ERROR = 'error'
+
+FILINGS_DIR = 'sec-edgar-filings'
+FULL_SUBMISSION = 'full-submission.txt'
+FILED_AS_OF = re.compile(rb'FILED AS OF DATE:\s*(\d{4})(\d{2})(\d{2})')
+
+def initialize_inventory(conn):
+    """Create the filing_inventory table if it doesn't exist."""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS filing_inventory (
+        path TEXT PRIMARY KEY,
+        accession TEXT,
+        ticker TEXT,
+        size INTEGER,
+        filing_date TEXT,
+        status TEXT NOT NULL,
+        error TEXT,
+        updated_at TEXT NOT NULL
+    )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_inventory_status ON filing_inventory (status)")
+    conn.commit()
+
+def describe_path(data_dir, path):
+    """Return (ticker, accession) of a file in the sec-edgar-filings/{ticker}/4/{accession}/ layout, or Nones."""
+    parts = os.path.relpath(path, os.path.join(data_dir, FILINGS_DIR)).split(os.sep)
+    if len(parts) >= 4 and parts[0] != '..':
+        return parts[0], parts[2]
+    return None, None
+
+def submission_filing_date(path):
+    """Return the filing date from the header of the full submission next to a file, or None."""
+    try:
+        with open(os.path.join(os.path.dirname(path), FULL_SUBMISSION), 'rb') as f:
+            match = FILED_AS_OF.search(f.read(4096))
+    except OSError:
+        return None
+    return '-'.join(group.decode() for group in match.groups()) if match else None
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+def record(conn, data_dir, path, status, error=None, filing_date=None):
+    """Insert or update a file's inventory row (uncommitted); a known filing date is kept."""
+    ticker, accession = describe_path(data_dir, path)
+    conn.execute('''
+    INSERT INTO filing_inventory (path, accession, ticker, size, filing_date, status, error, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (path) DO UPDATE SET
+        size = excluded.size, filing_date = COALESCE(excluded.filing_date, filing_inventory.filing_date),
+        status = excluded.status, error = excluded.error, updated_at = excluded.updated_at
+    ''', (path, accession, ticker, _size(path), filing_date, status, error, _now()))
+
+def record_downloads(conn, data_dir, downloads):
+    """Record downloaded (path, filing_date) pairs as pending (already ingested files keep their status)."""
+    initialize_inventory(conn)
+    now = _now()
+    rows = []
+    for path, filing_date in downloads:
+        ticker, accession = describe_path(data_dir, path)
+        rows.append((path, accession, ticker, _size(path), filing_date, STATUS_PENDING, now))
+    conn.executemany('''
+    INSERT INTO filing_inventory (path, accession, ticker, size, filing_date, status, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (path) DO UPDATE SET
+        size = excluded.size, filing_date = excluded.filing_date, updated_at = excluded.updated_at
+    ''', rows)
+    conn.commit()
+    return len(rows)
+
+def add_discovered(conn, data_dir, paths, ingested):
+    """Add files the inventory doesn't know yet; those in `ingested` are recorded as ingested.
+
+    Only new files are stat'ed and have their submission header read.
+    Returns the number of rows added.
+    """
+    initialize_inventory(conn)
+    known = {row[0] for row in conn.execute("SELECT path FROM filing_inventory")}
+    now = _now()
+    rows = []
+    for path in paths:
+        if path in known:
+            continue
+        ticker, accession = describe_path(data_dir, path)
+        rows.append((path, accession, ticker, _size(path), submission_filing_date(path),
+                     STATUS_INGESTED if path in ingested else STATUS_PENDING, now))
+    conn.executemany('''
+    INSERT INTO filing_inventory (path, accession, ticker, size, filing_date, status, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    return len(rows)
+
+def scan(conn, data_dir):
+    """Reconcile the inventory with the XML files on disk; returns (added, removed)."""
+    initialize_inventory(conn)
+    paths = set(glob.glob(f"{data_dir}/**/*.xml", recursive=True))
+    ingested = {row[0] for row in conn.execute("SELECT DISTINCT source_file FROM insider_trading")}
+    added = add_discovered(conn, data_dir, paths, ingested)
+    missing = [row[0] for row in conn.execute("SELECT path FROM filing_inventory") if row[0] not in paths]
+    conn.executemany("DELETE FROM filing_inventory WHERE path = ?", [(path,) for path in missing])
+    conn.commit()
+    return added, len(missing)
+
+def summary(conn, ticker=None, errors=5):
+    """Return a summary of the inventory (optionally of one ticker) as a dictionary."""
+    initialize_inventory(conn)
+    where, params = ("WHERE ticker = ?", [ticker]) if ticker else ("", [])
+    files, size, tickers, first_date, last_date, last_update = conn.execute(f'''
+    SELECT COUNT(*), COALESCE(SUM(size), 0), COUNT(DISTINCT ticker), MIN(filing_date), MAX(filing_date),
+           MAX(updated_at)
+    FROM filing_inventory {where}
+    ''', params).fetchone()
+    statuses = dict(conn.execute(f"SELECT status, COUNT(*) FROM filing_inventory {where} GROUP BY status", params))
+    largest = conn.execute(f'''
+    SELECT ticker, COUNT(*) FROM filing_inventory {where} GROUP BY ticker ORDER BY COUNT(*) DESC, ticker LIMIT 5
+    ''', params).fetchall()
+    recent_errors = conn.execute(f'''
+    SELECT path, error FROM filing_inventory
+    WHERE status = ? {'AND ticker = ?' if ticker else ''} ORDER BY updated_at DESC LIMIT ?
+    ''', [STATUS_ERROR] + params + [errors]).fetchall()
+    return {
+        'files': files,
+        'bytes': size,
+        'tickers': tickers,
+        'statuses': statuses,
+        'first_filing_date': first_date,
+        'last_filing_date': last_date,
+        'last_update': last_update,
+        'largest_tickers': largest,
+        'recent_errors': recent_errors,
+    }
+
+def print_report(conn, ticker=None, errors=5, prefix=''):
+    """Print the inventory summary."""
+    report = summary(conn, ticker, errors)
+    print(f"{prefix}Inventory{f' of {ticker}' if ticker else ''}: {report['files']} files, "
+          f"{report['bytes'] / 1024 / 1024:.1f} MB, {report['tickers']} tickers")
+    print(f"{prefix}  Status: " + (', '.join(f"{status} {count}" for status, count in
+                                             sorted(report['statuses'].items())) or 'empty'))
+    if report['first_filing_date']:
+        print(f"{prefix}  Filing dates: {report['first_filing_date']} to {report['last_filing_date']}")
+    if report['last_update']:
+        print(f"{prefix}  Last change: {report['last_update']}")
+    if report['largest_tickers'] and not ticker:
+        print(f"{prefix}  Most filings: " + ', '.join(f"{name} {count}" for name, count in report['largest_tickers']))
+    for path, error in report['recent_errors']:
+        print(f"{prefix}  Error: {path}: {error}")
+    return report
+
+def main(argv=None):
+    """Main function for the inventory commands."""
+    import InsiderTrading
+
+    parser = argparse.ArgumentParser(description='Report on the inventory of downloaded Form 4 filings.')
+    parser.add_argument('command', nargs='?', choices=['report', 'scan'], default='report',
+                        help='report: summarize the inventory (default); scan: reconcile it with the files on disk')
+    parser.add_argument('--ticker', type=str,
+                        help='Only report on this ticker')
+    parser.add_argument('--errors', type=int, default=5,
+                        help='Number of latest parse errors to list (default: 5)')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(InsiderTrading.DB_PATH):
+        print(f"Error: SQLite database not found at {InsiderTrading.DB_PATH}")
+        return 1
+    conn = sqlite3.connect(InsiderTrading.DB_PATH)
+    try:
+        if args.command == 'scan':
+            added, removed = scan(conn, InsiderTrading.DATA_DIR)
+            print(f"Inventory scan: {added} files added, {removed} removed")
+        print_report(conn, args.ticker, args.errors)
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""
+Issuer CIK -> canonical ticker map used to route Form 4 rows.
+
+issuerTradingSymbol is free text typed by the filer ('LEN, LEN.B', 'NCLH]',
+'brk.a', '-'), so rows are routed by issuerCik instead. The map is built
+from the SEC's company_tickers.json, cached in the `issuers` table of the
+database and refreshed with conditional requests; only CIKs whose tickers
+changed are rewritten. CIKs the SEC file doesn't know get a ticker derived
+from the filing's own symbol the first time they are seen.
+
+Share-class suffixes use '.' (BRK.B), as in the SEC's EDGAR listings; the
+S&P 500 list used for downloads writes them with '-' (BRK-B).
+
+Rows are rerouted in the hot table and in every cold partition.
+
+Usage:
+    python issuers.py refresh [--force]
+    python issuers.py lookup AAPL|0000320193
+"""
+from datetime import datetime, timedelta
+import argparse
+import json
+import os
+import re
+import sqlite3
+
+import partitions
+
+COMPANY_TICKERS_URL = "https://www.sec.gov/files/company_tickers.json"
+
+# company_tickers.json changes rarely; don't ask for it more often than this
+REFRESH_INTERVAL_HOURS = 24
+
+# A plausible exchange ticker: 1-6 letters/digits with an optional share-class suffix
+VALID_SYMBOL = re.compile(r'^[A-Z][A-Z0-9]{0,5}(\.[A-Z0-9]{1,3})?$')
+ISSUER_CIK_PATTERN = re.compile(rb'<issuerCik>\s*(\d+)\s*</issuerCik>')
+
+def normalize_cik(value):
+    """Return a CIK as the 10-digit zero-padded string EDGAR uses, or None."""
+    if value is None:
+        return None
+    digits = str(value).strip()
+    if not digits.isdigit():
+        return None
+    return f"{int(digits):010d}"
+
+def sanitize_symbol(symbol):
+    """Clean up a filer-typed trading symbol; returns None when nothing usable is left.
+
+    'LEN, LEN.B' -> 'LEN', 'NCLH]' -> 'NCLH', 'brk-a' -> 'BRK.A', '-' -> None
+    """
+    if not symbol:
+        return None
+    first = re.split(r'[,;/\s]+', symbol.strip())[0]
+    cleaned = re.sub(r'[^A-Z0-9.\-]', '', first.upper()).replace('-', '.').strip('.')
+    return cleaned if VALID_SYMBOL.match(cleaned) else None
+
+def initialize_issuers(conn):
+    """Create the issuers and issuer_map_state tables if they don't exist."""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS issuers (
+        cik TEXT PRIMARY KEY,
+        ticker TEXT,
+        tickers TEXT,
+        name TEXT,
+        source TEXT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS issuer_map_state (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+    ''')
+
+def load_issuer_map(conn):
+    """Return the cached {cik: canonical ticker} map."""
+    initialize_issuers(conn)
+    return {cik: ticker for cik, ticker in conn.execute("SELECT cik, ticker FROM issuers")}
+
+def route_issuer(conn, issuer_map, cik, symbol):
+    """Return the canonical ticker for a filing's issuer CIK and reported symbol.
+
+    CIKs missing from the map are registered with a ticker derived from the
+    symbol (or 'CIK<number>' when the symbol is unusable or already taken),
+    so every later filing of that issuer lands under the same key.
+    """
+    cik = normalize_cik(cik)
+    if cik is None:
+        return sanitize_symbol(symbol)
+    if cik in issuer_map:
+        return issuer_map[cik]
+
+    ticker = sanitize_symbol(symbol)
+    if ticker is None or ticker in issuer_map.values():
+        ticker = f"CIK{int(cik)}"
+    conn.execute("INSERT OR IGNORE INTO issuers (cik, ticker, tickers, source) VALUES (?, ?, ?, 'filing')",
+                 (cik, ticker, ticker))
+    issuer_map[cik] = ticker
+    return ticker
+
+def read_issuer_cik(xml_file):
+    """Return the normalized issuerCik of a filing on disk, or None."""
+    try:
+        with open(xml_file, 'rb') as f:
+            match = ISSUER_CIK_PATTERN.search(f.read())
+    except (OSError, TypeError):
+        return None
+    return normalize_cik(match.group(1).decode()) if match else None
+
+def assign_legacy_rows(conn, data_dir=None):
+    """Fill issuer_cik/reported_ticker for rows ingested before CIK routing and reroute them.
+
+    The CIK is read back from each row's source file when it is still on disk.
+    Rows in cold partitions are updated too (data_dir defaults to the
+    database's directory). Returns the number of rows updated.
+    """
+    issuer_map = load_issuer_map(conn)
+    ciks = {}
+    updated = 0
+
+    def route_rows(conn, schema_name):
+        nonlocal updated
+        rows = conn.execute(f"SELECT id, issuer_ticker, source_file FROM {schema_name}.insider_trading "
+                            "WHERE reported_ticker IS NULL").fetchall()
+        updates = []
+        for row_id, symbol, source_file in rows:
+            if source_file not in ciks:
+                ciks[source_file] = read_issuer_cik(source_file)
+            cik = ciks[source_file]
+            updates.append((cik, symbol, route_issuer(conn, issuer_map, cik, symbol), row_id))
+        conn.executemany(f"UPDATE {schema_name}.insider_trading "
+                         "SET issuer_cik = ?, reported_ticker = ?, issuer_ticker = ? WHERE id = ?", updates)
+        updated += len(updates)
+
+    partitions.update_cold_partitions(conn, data_dir or database_dir(conn), route_rows)
+    route_rows(conn, 'main')
+    if updated:
+        clear_export_watermarks(conn)
+    return updated
+
+def database_dir(conn):
+    """Return the directory of the main database file (where its cold partitions are catalogued from)."""
+    return os.path.dirname(conn.execute("PRAGMA database_list").fetchone()[2])
+
+def clear_export_watermarks(conn):
+    """Make incremental exports (see holdings.py) rebuild after rows moved to other tickers."""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'export_watermarks'").fetchone():
+        conn.execute("DELETE FROM export_watermarks")
+
+def parse_company_tickers(document):
+    """Turn company_tickers.json into {cik: (canonical ticker, [tickers], name)}.
+
+    The SEC lists a company's tickers in order of prominence, so the first
+    ticker seen for a CIK is its canonical one.
+    """
+    companies = {}
+    for entry in document.values():
+        cik = normalize_cik(entry.get('cik_str'))
+        ticker = sanitize_symbol(entry.get('ticker'))
+        if cik is None or ticker is None:
+            continue
+        if cik not in companies:
+            companies[cik] = (ticker, [ticker], entry.get('title'))
+        elif ticker not in companies[cik][1]:
+            companies[cik][1].append(ticker)
+    return companies
+
+def _state(conn, key):
+    row = conn.execute("SELECT value FROM issuer_map_state WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def _set_state(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO issuer_map_state (key, value) VALUES (?, ?)", (key, value))
+
+def refresh_issuer_map(conn, user_agent, force=False, now=None, data_dir=None):
+    """Refresh the cached map from the SEC's company_tickers.json.
+
+    Skipped when the map was checked within REFRESH_INTERVAL_HOURS (unless
+    forced); otherwise a conditional request is made and only CIKs whose
+    tickers changed are rewritten, together with their insider_trading rows
+    in the hot table and the cold partitions (data_dir defaults to the
+    database's directory). Returns the number of CIKs added or changed.
+    """
+    import requests
+
+    initialize_issuers(conn)
+    now = now or datetime.now()
+    checked_at = _state(conn, 'checked_at')
+    if not force and checked_at and now - datetime.fromisoformat(checked_at) < timedelta(hours=REFRESH_INTERVAL_HOURS):
+        return 0
+
+    headers = {'User-Agent': user_agent}
+    if not force and _state(conn, 'etag'):
+        headers['If-None-Match'] = _state(conn, 'etag')
+    if not force and _state(conn, 'last_modified'):
+        headers['If-Modified-Since'] = _state(conn, 'last_modified')
+
+    response = requests.get(COMPANY_TICKERS_URL, headers=headers, timeout=30)
+    if response.status_code == 304:
+        _set_state(conn, 'checked_at', now.isoformat())
+        conn.commit()
+        return 0
+    response.raise_for_status()
+
+    companies = parse_company_tickers(response.json())
+    cached = {cik: (ticker, tickers, name, source) for cik, ticker, tickers, name, source
+              in conn.execute("SELECT cik, ticker, tickers, name, source FROM issuers")}
+    changed = []
+    for cik, (ticker, tickers, name) in companies.items():
+        row = (ticker, ','.join(tickers), name, 'sec')
+        if cached.get(cik) != row:
+            changed.append((cik,) + row)
+
+    # Move existing rows of issuers whose canonical ticker changed (counted with total_changes,
+    # as updates through the normalized schema's view report no rowcount). Cold partitions go
+    # first: until the map below is committed, an interrupted refresh redoes every move.
+    moves = [(ticker, cik, ticker) for cik, ticker, _, _, _ in changed if cik not in cached or cached[cik][0] != ticker]
+
+    def reroute(conn, schema_name):
+        conn.executemany(f"UPDATE {schema_name}.insider_trading SET issuer_ticker = ? "
+                         "WHERE issuer_cik = ? AND issuer_ticker IS NOT ?", moves)
+
+    moved = partitions.update_cold_partitions(conn, data_dir or database_dir(conn), reroute) if moves else 0
+    conn.executemany('''
+    INSERT OR REPLACE INTO issuers (cik, ticker, tickers, name, source, updated_at)
+    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ''', changed)
+    changes = conn.total_changes
+    reroute(conn, 'main')
+    if moved or conn.total_changes > changes:
+        clear_export_watermarks(conn)
+
+    _set_state(conn, 'etag', response.headers.get('ETag'))
+    _set_state(conn, 'last_modified', response.headers.get('Last-Modified'))
+    _set_state(conn, 'checked_at', now.isoformat())
+    conn.commit()
+    return len(changed)
+
+def lookup(conn, key):
+    """Return the issuers row for a CIK or ticker as a dictionary, or None.
+
+    A ticker matches the canonical one first, then any of an issuer's other
+    share classes (GOOG when the SEC lists GOOGL first).
+    """
+    initialize_issuers(conn)
+    cik = normalize_cik(key)
+    if cik:
+        cursor = conn.execute("SELECT cik, ticker, tickers, name, source FROM issuers WHERE cik = ?", (cik,))
+    else:
+        cursor = conn.execute('''
+        SELECT cik, ticker, tickers, name, source FROM issuers
+        WHERE ticker = ?1 OR instr(',' || tickers || ',', ',' || ?1 || ',') > 0
+        ORDER BY ticker IS NOT ?1, cik
+        LIMIT 1
+        ''', (sanitize_symbol(key),))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(zip([description[0] for description in cursor.description], row))
+
+def main(argv=None):
+    """Main function for the issuer map commands."""
+    import InsiderTrading
+
+    parser = argparse.ArgumentParser(description='Maintain the issuer CIK to ticker map.')
+    parser.add_argument('command', choices=['refresh', 'lookup'],
+                        help='refresh: update the map from the SEC; lookup: show the entry for a ticker or CIK')
+    parser.add_argument('key', nargs='?', help='Ticker or CIK for lookup')
+    parser.add_argument('--force', action='store_true',
+                        help='Download the SEC file even if the cached map is recent')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(InsiderTrading.DB_PATH):
+        print(f"Error: SQLite database not found at {InsiderTrading.DB_PATH}")
+        return 1
+
+    conn = sqlite3.connect(InsiderTrading.DB_PATH)
+    try:
+        if args.command == 'refresh':
+            changed = refresh_issuer_map(conn, InsiderTrading.sec_user_agent(), force=args.force,
+                                         data_dir=InsiderTrading.DATA_DIR)
+            print(f"Issuer map refreshed: {changed} CIKs added or changed")
+        else:
+            entry = lookup(conn, args.key or '')
+            print(json.dumps(entry, indent=2) if entry else f"No issuer found for {args.key}")
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""
+Global manifest of the exported API files for incremental client sync.
+
+data/json/manifest.json lists every file under data/json with its hashes,
+size, row count and date span:
+
+    {"generated_at": ..., "file_count": N, "files": {
+        "AAPL/transactions.json": {"content_hash": ..., "sha256": ..., "bytes": ...,
+                                   "rows": ..., "first_date": ..., "last_date": ...}, ...}}
+
+`sha256` is the hash of the file's bytes, to verify a download against.
+`content_hash` is what changes are detected with: for a JSON file it hashes
+the document without its top-level `last_updated` (re-serialized with sorted
+keys), so a file re-exported with the same data keeps it; for other files it
+equals `sha256`. The manifest is written last and replaced atomically: it
+only ever lists files that are complete, and a client that fetches it, then
+the entries whose content_hash changed, is in sync.
+
+Modification times only go into a local cache next to the JSON directory
+(data/manifest_cache.json, not committed): a fresh checkout gives every file
+a new mtime, which would otherwise change every published entry.
+
+Usage:
+    python manifest.py
+"""
+from datetime import datetime, timedelta
+import argparse
+import gzip
+import hashlib
+import json
+import os
+
+import metrics
+
+MANIFEST_FILE = 'manifest.json'
+
+# Local {path: {"mtime_ns": ..., "entry": ...}} cache, in the parent of the JSON directory
+CACHE_FILE = 'manifest_cache.json'
+
+# Record fields that carry a transaction (or first/last transaction) date
+DATE_FIELDS = ('transaction_date', 'date', 'earliest_transaction', 'latest_transaction')
+
+def content_hash(path, data):
+    """Return the SHA-256 of a file's content, ignoring the last_updated of JSON documents."""
+    if path.endswith('.json'):
+        document = json.loads(data)
+        if isinstance(document, dict) and 'last_updated' in document:
+            document = {key: value for key, value in document.items() if key != 'last_updated'}
+            data = json.dumps(document, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+def _date_span(dates):
+    dates = [value[:10] for value in dates if isinstance(value, str) and value]
+    return (min(dates), max(dates)) if dates else (None, None)
+
+def describe_json(data):
+    """Return (rows, first_date, last_date) of an exported JSON document.
+
+    Rows are the records of the document's top-level lists.
+    """
+    document = json.loads(data)
+    if not isinstance(document, dict):
+        return 0, None, None
+    records = [record for value in document.values() if isinstance(value, list)
+               for record in value if isinstance(record, dict)]
+    first_date, last_date = _date_span([record.get(field) for record in records for field in DATE_FIELDS])
+    return len(records), first_date, last_date
+
+def describe_snapshot(path):
+    """Return (rows, first_date, last_date) of a binary snapshot."""
+    import snapshots
+
+    snapshot = snapshots.load_snapshot(path, use_mmap=False)
+    days = [int(day) for day in snapshot['date'] if day != snapshots.MISSING_DATE]
+    if not days:
+        return len(snapshot['date']), None, None
+    return (len(snapshot['date']),
+            (snapshots.EPOCH + timedelta(days=min(days))).isoformat(),
+            (snapshots.EPOCH + timedelta(days=max(days))).isoformat())
+
+def describe_database(path):
+    """Return (rows, first_date, last_date) of a SQLite snapshot from its metadata table."""
+    import sqlite_snapshot
+
+    metadata = sqlite_snapshot.read_metadata(path) or {}
+    rows = metadata.get('row_count')
+    return (int(rows) if rows is not None else None), metadata.get('first_date'), metadata.get('last_date')
+
+def describe_file(json_dir, relative_path):
+    """Return the manifest entry of one file."""
+    path = os.path.join(json_dir, relative_path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    if relative_path.endswith('.json'):
+        rows, first_date, last_date = describe_json(data)
+    elif relative_path.endswith('.json.gz'):
+        rows, first_date, last_date = describe_json(gzip.decompress(data))
+    elif relative_path.endswith('.bin'):
+        rows, first_date, last_date = describe_snapshot(path)
+    elif relative_path.endswith('.sqlite3'):
+        rows, first_date, last_date = describe_database(path)
+    else:
+        rows, first_date, last_date = None, None, None
+    return {
+        'content_hash': content_hash(relative_path, data),
+        'sha256': hashlib.sha256(data).hexdigest(),
+        'bytes': len(data),
+        'rows': rows,
+        'first_date': first_date,
+        'last_date': last_date,
+    }
+
+def list_files(json_dir):
+    """Return the paths (relative, '/'-separated, sorted) of the files the manifest covers."""
+    paths = []
+    for root, dirs, files in os.walk(json_dir):
+        dirs.sort()
+        for name in files:
+            if name == MANIFEST_FILE or name.endswith('.tmp'):
+                continue
+            paths.append(os.path.relpath(os.path.join(root, name), json_dir).replace(os.sep, '/'))
+    return sorted(paths)
+
+def load_manifest(json_dir):
+    """Return the current manifest, or None when there is no readable one."""
+    try:
+        with open(os.path.join(json_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def cache_path(json_dir):
+    """Return the path of the local entry cache of a JSON directory."""
+    return os.path.join(os.path.dirname(os.path.abspath(json_dir)), CACHE_FILE)
+
+def load_cache(json_dir):
+    """Return the local entry cache, or an empty one when there is no readable one."""
+    try:
+        with open(cache_path(json_dir)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def build_manifest(json_dir, cache=None):
+    """Describe every file under json_dir.
+
+    Entries in `cache` are reused for files whose size and modification time
+    haven't changed, so only rewritten files are read and hashed. The cache
+    is updated in place.
+    """
+    cache = {} if cache is None else cache
+    files = {}
+    for relative_path in list_files(json_dir):
+        stat = os.stat(os.path.join(json_dir, relative_path))
+        cached = cache.get(relative_path)
+        # Entries cached before content_hash existed are described again
+        if cached and cached['entry'].get('bytes') == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns \
+                and 'content_hash' in cached['entry']:
+            entry = cached['entry']
+            metrics.incr('cache_hits')
+        else:
+            entry = describe_file(json_dir, relative_path)
+            cache[relative_path] = {'mtime_ns': stat.st_mtime_ns, 'entry': entry}
+            metrics.incr('files')
+        files[relative_path] = entry
+    for relative_path in set(cache) - set(files):
+        del cache[relative_path]
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'file_count': len(files),
+        'files': files,
+    }
+
+def _write_json(path, document, **options):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(document, f, **options)
+    os.replace(temp_path, path)
+
+def write_manifest(json_dir):
+    """Build and atomically replace data/json/manifest.json; returns the manifest."""
+    cache = load_cache(json_dir)
+    manifest = build_manifest(json_dir, cache)
+    path = os.path.join(json_dir, MANIFEST_FILE)
+    _write_json(path, manifest, indent=2, sort_keys=True)
+    _write_json(cache_path(json_dir), cache)
+    metrics.record_file(path, rows=manifest['file_count'])
+    print(f"Wrote manifest of {manifest['file_count']} files")
+    return manifest
+
+def changed_files(old, new):
+    """Return the paths of `new` that are missing from `old` or have a different content_hash."""
+    old_files = (old or {}).get('files', {})
+    return sorted(path for path, entry in new['files'].items()
+                  if old_files.get(path, {}).get('content_hash') != entry['content_hash'])
+
+def main(argv=None):
+    """Main function to rebuild the manifest of the exported files."""
+    import export_json
+
+    parser = argparse.ArgumentParser(description='Write data/json/manifest.json for the exported files.')
+    parser.parse_args(argv)
+    if not os.path.isdir(export_json.JSON_DIR):
+        print(f"Error: JSON directory not found at {export_json.JSON_DIR}")
+        return 1
+    write_manifest(export_json.JSON_DIR)
+    return 0
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+Stage-level run metrics for the ingest and export scripts.
+
+A script starts a run with start_run(), wraps each pipeline stage in
+`with metrics.stage('name'):` and pipeline code reports counters with
+metrics.incr(). When no run is active every call is a no-op, so library
+functions can be instrumented without changing their signatures.
+
+Each stage records wall and CPU time plus counters (files, rows,
+bytes_written, cache_hits, errors) and derived files/sec and rows/sec.
+The result is written as machine-readable JSON (run_metrics.json), with
+one section per script. A single stage can optionally be profiled with
+cProfile or tracemalloc.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import os
+import threading
+import time
+
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+METRICS_FILE = 'run_metrics.json'
+
+# The run currently being recorded by this process (None = metrics disabled)
+_current_run = None
+# Number of nested start_run() calls sharing the current run
+_depth = 0
+
+class RunMetrics:
+    """Collects per-stage timings and counters for one script run."""
+
+    def __init__(self, script, path=None, profile_stage=None, profile_mode='cprofile'):
+        self.script = script
+        self.path = path
+        self.started_at = datetime.now().isoformat()
+        self.stages = {}
+        self.status = None
+        self.profile_stage = profile_stage
+        self.profile_mode = profile_mode
+        self._active = []
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """Time a pipeline stage; counters reported inside it are attributed to it."""
+        entry = self.stages.setdefault(name, {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'counters': {}})
+        profiler = self._start_profiler(name)
+        self._active.append(entry)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield entry
+        except BaseException:
+            entry['counters']['errors'] = entry['counters'].get('errors', 0) + 1
+            raise
+        finally:
+            entry['wall_seconds'] += time.perf_counter() - wall_start
+            entry['cpu_seconds'] += time.process_time() - cpu_start
+            self._active.pop()
+            if profiler is not None:
+                self._stop_profiler(name, entry, profiler)
+
+    @contextmanager
+    def timer(self, name):
+        """Accumulate wall time for a sub-step (e.g. parse vs insert) into the active stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.incr(f'{name}_seconds', time.perf_counter() - start)
+
+    def incr(self, counter, amount=1):
+        """Add `amount` to a counter of the innermost active stage."""
+        if not self._active:
+            return
+        counters = self._active[-1]['counters']
+        with self._lock:
+            counters[counter] = counters.get(counter, 0) + amount
+
+    def to_dict(self):
+        """Return the run as a JSON-serializable dictionary."""
+        stages = {}
+        for name, entry in self.stages.items():
+            stage = {
+                'wall_seconds': round(entry['wall_seconds'], 6),
+                'cpu_seconds': round(entry['cpu_seconds'], 6),
+                'counters': {key: round(value, 6) if isinstance(value, float) else value
+                             for key, value in entry['counters'].items()},
+            }
+            for counter in ('files', 'rows'):
+                if counter in entry['counters'] and entry['wall_seconds'] > 0:
+                    stage[f'{counter}_per_sec'] = round(entry['counters'][counter] / entry['wall_seconds'], 1)
+            for key in ('profile', 'tracemalloc'):
+                if key in entry:
+                    stage[key] = entry[key]
+            stages[name] = stage
+
+        return {
+            'started_at': self.started_at,
+            'wall_seconds': round(time.perf_counter() - self._start, 6),
+            'status': self.status,
+            'stages': stages,
+        }
+
+    def write(self, path=None):
+        """Write this run into `path`, keeping the sections of other scripts."""
+        path = path or self.path
+        document = {}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    document = json.load(f)
+            except (OSError, ValueError):
+                document = {}
+        document.setdefault('runs', {})[self.script] = self.to_dict()
+        document['last_updated'] = datetime.now().isoformat()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(document, f, indent=2)
+
+    def _start_profiler(self, name):
+        if name != self.profile_stage:
+            return None
+        if self.profile_mode == 'tracemalloc':
+            import tracemalloc
+            tracemalloc.start()
+            return tracemalloc
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _stop_profiler(self, name, entry, profiler):
+        if self.profile_mode == 'tracemalloc':
+            snapshot = profiler.take_snapshot()
+            current, peak = profiler.get_traced_memory()
+            profiler.stop()
+            entry['tracemalloc'] = {
+                'current_bytes': current,
+                'peak_bytes': peak,
+                'top_allocations': [
+                    {'location': str(stat.traceback), 'bytes': stat.size, 'count': stat.count}
+                    for stat in snapshot.statistics('lineno')[:10]
+                ],
+            }
+            return
+
+        profiler.disable()
+        # Profiles are written next to the metrics file
+        profile_dir = os.path.dirname(os.path.abspath(self.path)) if self.path else os.getcwd()
+        os.makedirs(profile_dir, exist_ok=True)
+        profile_path = os.path.join(profile_dir, f'{self.script}.{name}.prof')
+        profiler.dump_stats(profile_path)
+        entry['profile'] = profile_path
+
+def start_run(script, path, profile_stage=None, profile_mode='cprofile'):
+    """Start recording metrics for this process and return the active RunMetrics.
+
+    The run is written to `path` by finish_run(). If a run is already active
+    (e.g. the backfill calling the exporter) it is reused, so the nested
+    script's stages are recorded in the outer run.
+    """
+    global _current_run, _depth
+    if _current_run is None:
+        _current_run = RunMetrics(script, path=path, profile_stage=profile_stage, profile_mode=profile_mode)
+    _depth += 1
+    return _current_run
+
+def finish_run(status='ok'):
+    """Finish the innermost start_run(); the outermost one writes the metrics file.
+
+    A metrics file that can't be written never fails the run itself.
+    """
+    global _current_run, _depth
+    run = _current_run
+    if run is None:
+        return None
+    _depth -= 1
+    if _depth > 0:
+        return run
+    _current_run = None
+    run.status = status
+    try:
+        run.write()
+    except Exception as e:
+        print(f"Warning: could not write run metrics: {e}")
+    return run
+
+def current_run():
+    """Return the active RunMetrics, or None when metrics are disabled."""
+    return _current_run
+
+@contextmanager
+def stage(name):
+    """Time a stage of the active run (no-op when metrics are disabled)."""
+    if _current_run is None:
+        yield None
+    else:
+        with _current_run.stage(name) as entry:
+            yield entry
+
+@contextmanager
+def timer(name):
+    """Accumulate sub-step wall time into the active stage (no-op when disabled)."""
+    if _current_run is None:
+        yield
+    else:
+        with _current_run.timer(name):
+            yield
+
+def incr(counter, amount=1):
+    """Add to a counter of the active stage (no-op when disabled)."""
+    if _current_run is not None:
+        _current_run.incr(counter, amount)
+
+def record_file(path, rows=None):
+    """Count a written output file, its size in bytes and optionally its rows."""
+    if _current_run is None:
+        return
+    _current_run.incr('files')
+    _current_run.incr('bytes_written', os.path.getsize(path))
+    if rows is not None:
+        _current_run.incr('rows', rows)
+
+def add_profile_arguments(parser):
+    """Add the shared --metrics/--profile options to a script's argument parser."""
+    parser.add_argument('--metrics', type=str,
+                        help='Path of the run metrics JSON file (default: data/run_metrics.json)')
+    parser.add_argument('--profile', type=str, metavar='STAGE',
+                        help='Profile a single stage (e.g. download, ingest, export_company_transactions)')
+    parser.add_argument('--profile-mode', choices=PROFILE_MODES, default='cprofile',
+                        help='Profiler used with --profile (default: cprofile)')
+
+def metrics_path(args, data_dir):
+    """Return the --metrics path of parsed arguments, or run_metrics.json in data_dir when it isn't given."""
+    if args.metrics is None:
+        return os.path.join(data_dir, METRICS_FILE)
+    return os.fspath(args.metrics)
@@ -0,0 +1,231 @@
+"""
+Market-wide month-partitioned transaction files.
+
+Every issuer's transactions of a month are exported to one file,
+`data/json/by-month/YYYY-MM.json` (or `YYYY-MM.json.gz` with gzip), oldest
+first, so a cross-sectional question about a month costs one fetch:
+
+    {"month": "2025-03", "last_updated": ..., "frozen": true, "count": 2,
+     "transactions": [{"ticker": "AAPL", "id": 12, "transaction_date": "2025-03-10", ...}, ...]}
+
+`by-month/index.json` lists the months with their counts.
+
+A month is settled SETTLE_DAYS after it ends: its file is then written one
+last time, marked frozen in the `month_files` table and never touched again,
+so its URL can be cached forever. Rows that still arrive for a frozen month
+(late filings, a backfill of an older range) are only counted in
+`month_files.late_rows` and reported; deleting a frozen month's file has it
+written again on the next export. The files are authoritative: a database
+that doesn't know a month yet (the daily workflow builds a fresh one) takes
+its frozen state from the `"frozen": true` of the file on disk.
+
+Open months are rewritten when rows were added to them since the last export
+(tracked by row id in `export_watermarks`), and all of them with
+rebuild=True and after issuers.py moved rows to new tickers (it clears the
+export watermarks). Rows are read from the hot table and the cold partitions.
+"""
+from datetime import datetime, timedelta
+import gzip
+import os
+import re
+
+import holdings
+import metrics
+import partitions
+import serializer
+
+MONTHS_DIR = 'by-month'
+INDEX_FILE = 'index.json'
+WATERMARK = 'by_month'
+
+# Form 4 is due two business days after a transaction; a month is settled this many days after it ends
+SETTLE_DAYS = 30
+
+MONTH_FILE_PATTERN = re.compile(r'^(\d{4}-\d{2})\.json(\.gz)?$')
+# The header fields come before the transactions, within the first bytes of a file
+HEADER_BYTES = 512
+
+MONTH_COLUMNS = ['id', 'issuer_ticker', 'issuer_name', 'reporting_owner', 'reporting_owner_cik',
+                 'reporting_owner_position', 'transaction_date', 'transaction_shares', 'transaction_price',
+                 'transaction_type', 'shares_after_transaction']
+
+def initialize_months(conn):
+    """Create the month_files and export_watermarks tables if they don't exist."""
+    holdings.initialize_holdings(conn)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS month_files (
+        month TEXT PRIMARY KEY,
+        row_count INTEGER NOT NULL,
+        frozen_at TEXT,
+        late_rows INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    conn.commit()
+
+def settled_before(today=None):
+    """Return the first month ('YYYY-MM') that isn't settled yet; earlier months are."""
+    return ((today or datetime.now()) - timedelta(days=SETTLE_DAYS)).strftime('%Y-%m')
+
+def month_path(json_dir, month, compress=False):
+    """Return the path of a month's file."""
+    return os.path.join(json_dir, MONTHS_DIR, f"{month}.json.gz" if compress else f"{month}.json")
+
+def _month_exists(json_dir, month):
+    return os.path.exists(month_path(json_dir, month)) or os.path.exists(month_path(json_dir, month, True))
+
+def _frozen_header(path):
+    """Return (count, last_updated) from the header of a frozen month file, or None."""
+    opener = gzip.open if path.endswith('.gz') else open
+    try:
+        with opener(path, 'rb') as f:
+            header = f.read(HEADER_BYTES)
+    except (OSError, EOFError):
+        return None
+    if not re.search(rb'"frozen":\s*true', header):
+        return None
+    count = re.search(rb'"count":\s*(\d+)', header)
+    last_updated = re.search(rb'"last_updated":\s*"([^"]*)"', header)
+    return (int(count.group(1)) if count else 0,
+            last_updated.group(1).decode() if last_updated else datetime.now().isoformat())
+
+def _record_frozen_files(conn, json_dir, recorded):
+    """Add the frozen month files on disk that month_files doesn't know; returns their months."""
+    seeded = []
+    for name in sorted(os.listdir(os.path.join(json_dir, MONTHS_DIR))):
+        match = MONTH_FILE_PATTERN.match(name)
+        if not match or match.group(1) in recorded:
+            continue
+        header = _frozen_header(os.path.join(json_dir, MONTHS_DIR, name))
+        if header is None:
+            continue
+        month = match.group(1)
+        conn.execute('''
+        INSERT OR REPLACE INTO month_files (month, row_count, frozen_at, late_rows, updated_at)
+        VALUES (?, ?, ?, 0, CURRENT_TIMESTAMP)
+        ''', (month,) + header)
+        recorded[month] = header[1]
+        seeded.append(month)
+    return seeded
+
+def month_records(conn, data_dir, month):
+    """Return every issuer's transactions of a month ('YYYY-MM') as Rows, oldest first, from the hot and cold tables."""
+    year, number = int(month[:4]), int(month[5:7])
+    start = f"{year}-{number:02d}-01"
+    end = f"{year + 1}-01-01" if number == 12 else f"{year}-{number + 1:02d}-01"
+    columns, rows = partitions.query_partitions(
+        conn, data_dir, "transaction_date >= ? AND transaction_date < ? AND issuer_ticker IS NOT NULL",
+        [start, end], 'transaction_date, issuer_ticker, id', -1, date_from=start, date_to=end,
+        columns=MONTH_COLUMNS)
+    date_index, ticker_index, id_index = (columns.index(name) for name in ('transaction_date', 'issuer_ticker', 'id'))
+    rows.sort(key=lambda row: (row[date_index], row[ticker_index], row[id_index]))
+    # issuer_ticker is written last, as 'ticker'
+    others = [index for index in range(len(columns)) if index != ticker_index]
+    return serializer.Rows([columns[index] for index in others] + ['ticker'],
+                           [tuple(row[index] for index in others) + (row[ticker_index],) for row in rows])
+
+def _write_month(path, document, compress):
+    data = serializer.dumps(document, compact=True)
+    temp_path = f"{path}.tmp"
+    if compress:
+        # mtime=0 keeps the compressed bytes identical for identical content
+        with open(temp_path, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+            f.write(data)
+    else:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+    os.replace(temp_path, path)
+
+def _all_months(conn):
+    months = {row[0] for row in conn.execute(
+        "SELECT DISTINCT substr(transaction_date, 1, 7) FROM insider_trading WHERE transaction_date IS NOT NULL")}
+    for partition in partitions.list_partitions(conn):
+        if partition['row_count']:
+            # Cold partitions are whole years; months without rows are skipped when written
+            months.update(f"{partition['year']}-{number:02d}" for number in range(1, 13))
+    return months
+
+def _month_counts(conn, since_id):
+    return dict(conn.execute('''
+    SELECT substr(transaction_date, 1, 7), COUNT(*) FROM insider_trading
+    WHERE id > ? AND transaction_date IS NOT NULL AND issuer_ticker IS NOT NULL
+    GROUP BY 1
+    ''', (since_id,)))
+
+def update_month_files(conn, data_dir, json_dir, compress=False, rebuild=False, today=None):
+    """Rewrite the open months with new rows, freeze the settled ones and rewrite by-month/index.json.
+
+    Returns the number of month files written.
+    """
+    initialize_months(conn)
+    since_id = holdings.get_watermark(conn, WATERMARK)
+    max_id = conn.execute("SELECT MAX(id) FROM insider_trading").fetchone()[0] or 0
+    first_open = settled_before(today)
+    now = datetime.now().isoformat()
+    os.makedirs(os.path.join(json_dir, MONTHS_DIR), exist_ok=True)
+
+    recorded = {month: frozen_at for month, frozen_at in conn.execute("SELECT month, frozen_at FROM month_files")}
+    seeded = _record_frozen_files(conn, json_dir, recorded)
+    if rebuild or since_id is None:
+        new_rows = {}
+        candidates = _all_months(conn)
+    else:
+        new_rows = _month_counts(conn, since_id)
+        candidates = set(new_rows)
+    if seeded and since_id is None:
+        # Every row of a fresh database is new: the ones of months already frozen on disk arrived late
+        counts = _month_counts(conn, 0)
+        new_rows.update({month: counts[month] for month in seeded if month in counts})
+    # Open months that settled since the last export are written a last time and frozen
+    candidates |= {month for month, frozen_at in recorded.items() if frozen_at is None and month < first_open}
+    # Missing files (including deleted frozen ones) are written again
+    candidates |= {month for month in recorded if not _month_exists(json_dir, month)}
+
+    written = 0
+    late = {}
+    for month in sorted(candidates):
+        if recorded.get(month) and _month_exists(json_dir, month):
+            metrics.incr('cache_hits')
+            if new_rows.get(month):
+                late[month] = new_rows[month]
+            continue
+        transactions = month_records(conn, data_dir, month)
+        if not transactions:
+            continue
+        frozen = month < first_open
+        path = month_path(json_dir, month, compress)
+        _write_month(path, {
+            'month': month,
+            'last_updated': now,
+            'frozen': frozen,
+            'count': len(transactions),
+            'transactions': transactions
+        }, compress)
+        # Only one spelling of a month is kept
+        other = month_path(json_dir, month, not compress)
+        if os.path.exists(other):
+            os.remove(other)
+        metrics.record_file(path, rows=len(transactions))
+        conn.execute('''
+        INSERT OR REPLACE INTO month_files (month, row_count, frozen_at, late_rows, updated_at)
+        VALUES (?, ?, ?, 0, CURRENT_TIMESTAMP)
+        ''', (month, len(transactions), now if frozen else None))
+        written += 1
+
+    if late:
+        conn.executemany("UPDATE month_files SET late_rows = late_rows + ? WHERE month = ?",
+                         [(count, month) for month, count in late.items()])
+        print(f"Warning: {sum(late.values())} new rows belong to frozen months and were not exported: "
+              f"{', '.join(f'{month} ({count})' for month, count in sorted(late.items()))}")
+
+    months = [{'month': month, 'count': count, 'frozen': frozen_at is not None,
+               'file': f"{month}.json.gz" if os.path.exists(month_path(json_dir, month, True)) else f"{month}.json"}
+              for month, count, frozen_at in conn.execute(
+                  "SELECT month, row_count, frozen_at FROM month_files ORDER BY month")]
+    index_path = os.path.join(json_dir, MONTHS_DIR, INDEX_FILE)
+    serializer.dump({'last_updated': now, 'count': len(months), 'months': months}, index_path)
+    metrics.record_file(index_path, rows=len(months))
+
+    holdings.set_watermark(conn, WATERMARK, max_id)
+    conn.commit()
+    return written
@@ -0,0 +1,338 @@
+"""
+Hot/cold time partitioning of the insider_trading table.
+
+The main database (insider_trading.db) is the hot partition and holds the
+detailed-retention window. Older rows are rolled over into yearly cold
+databases (data/cold/insider_trading_YYYY.db) that are only ATTACHed when a
+query's date range reaches them. A `cold_partitions` catalog in the hot
+database records each cold file's date span and row count, so routing a query
+never has to open the files it doesn't need.
+
+Usage:
+    python partitions.py rollover [--hot-years 3]
+    python partitions.py list
+"""
+from datetime import datetime, timedelta
+import argparse
+import os
+import sqlite3
+
+import schema
+
+# Rows newer than this many years stay in the hot database (matches export_json's detailed retention)
+HOT_RETENTION_YEARS = 3
+
+# SQLite's default limit on attached databases per connection
+MAX_ATTACHED = 10
+
+def cold_dir(data_dir):
+    """Return the directory holding the yearly cold databases."""
+    return os.path.join(data_dir, 'cold')
+
+def cold_db_path(data_dir, year):
+    """Return the path of the cold database for a year."""
+    return os.path.join(cold_dir(data_dir), f'insider_trading_{year}.db')
+
+def hot_cutoff(hot_years=HOT_RETENTION_YEARS, today=None):
+    """Return the YYYY-MM-DD date before which rows belong in cold storage."""
+    today = today or datetime.now()
+    return (today - timedelta(days=365 * hot_years)).strftime('%Y-%m-%d')
+
+def initialize_catalog(conn):
+    """Create the cold partition catalog in the hot database if it doesn't exist."""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS cold_partitions (
+        year INTEGER PRIMARY KEY,
+        path TEXT NOT NULL,
+        min_date TEXT,
+        max_date TEXT,
+        row_count INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    # Which tickers each cold year holds, so a ticker lookup doesn't open the files
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS cold_partition_tickers (
+        year INTEGER NOT NULL,
+        ticker TEXT NOT NULL,
+        PRIMARY KEY (ticker, year)
+    )
+    ''')
+    conn.commit()
+
+def list_partitions(conn):
+    """Return the cold partition catalog as a list of dictionaries ordered by year."""
+    initialize_catalog(conn)
+    cursor = conn.execute("SELECT year, path, min_date, max_date, row_count FROM cold_partitions ORDER BY year")
+    columns = [description[0] for description in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def partitions_for_range(conn, date_from=None, date_to=None):
+    """Return the catalog entries of the cold partitions overlapping a date range."""
+    has_catalog = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='cold_partitions'").fetchone()
+    if not has_catalog:
+        return []
+    return [
+        partition for partition in list_partitions(conn)
+        if partition['row_count'] > 0
+        and (date_from is None or partition['max_date'] >= date_from)
+        and (date_to is None or partition['min_date'] <= date_to)
+    ]
+
+def catalog_tickers(conn, schema_name, year):
+    """Record the tickers of an attached cold database in the catalog (uncommitted)."""
+    conn.execute("DELETE FROM main.cold_partition_tickers WHERE year = ?", (year,))
+    conn.execute(f'''
+    INSERT INTO main.cold_partition_tickers (year, ticker)
+    SELECT DISTINCT ?, issuer_ticker FROM {schema_name}.insider_trading WHERE issuer_ticker IS NOT NULL
+    ''', (year,))
+
+def update_cold_partitions(conn, data_dir, update):
+    """Run update(conn, schema_name) on every cold partition, each in its own transaction.
+
+    Pending changes on conn are committed first (ATTACH needs no open
+    transaction), older cold files get the hot table's columns and the
+    catalog's ticker list is refreshed. Returns the number of rows changed.
+    """
+    conn.commit()
+    changed = 0
+    for partition in partitions_for_range(conn):
+        conn.execute("ATTACH DATABASE ? AS cold", (os.path.join(data_dir, partition['path']),))
+        try:
+            _create_cold_table(conn, 'cold')
+            before = conn.total_changes
+            update(conn, 'cold')
+            changed += conn.total_changes - before
+            catalog_tickers(conn, 'cold', partition['year'])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute("DETACH DATABASE cold")
+    return changed
+
+def has_cold_ticker(conn, data_dir, ticker):
+    """Return whether any cold partition holds rows of a ticker.
+
+    Answered from the catalog; partitions catalogued before it listed tickers
+    are searched.
+    """
+    catalogued = partitions_for_range(conn)
+    if not catalogued:
+        return False
+    if conn.execute("SELECT 1 FROM cold_partition_tickers WHERE ticker = ? LIMIT 1", (ticker,)).fetchone():
+        return True
+    listed = {row[0] for row in conn.execute("SELECT DISTINCT year FROM cold_partition_tickers")}
+    for partition in catalogued:
+        if partition['year'] in listed:
+            continue
+        conn.execute("ATTACH DATABASE ? AS cold", (os.path.join(data_dir, partition['path']),))
+        try:
+            if conn.execute("SELECT 1 FROM cold.insider_trading WHERE issuer_ticker = ? LIMIT 1", (ticker,)).fetchone():
+                return True
+        finally:
+            conn.execute("DETACH DATABASE cold")
+    return False
+
+def cold_tickers(conn, data_dir):
+    """Return the set of tickers with rows in the cold partitions.
+
+    Answered from the catalog; partitions catalogued before it listed tickers
+    are searched.
+    """
+    catalogued = partitions_for_range(conn)
+    if not catalogued:
+        return set()
+    tickers = {row[0] for row in conn.execute("SELECT DISTINCT ticker FROM cold_partition_tickers")}
+    listed = {row[0] for row in conn.execute("SELECT DISTINCT year FROM cold_partition_tickers")}
+    for partition in catalogued:
+        if partition['year'] in listed:
+            continue
+        conn.execute("ATTACH DATABASE ? AS cold", (os.path.join(data_dir, partition['path']),))
+        try:
+            tickers.update(row[0] for row in conn.execute(
+                "SELECT DISTINCT issuer_ticker FROM cold.insider_trading WHERE issuer_ticker IS NOT NULL"))
+        finally:
+            conn.execute("DETACH DATABASE cold")
+    return tickers
+
+def query_cold_partitions(conn, data_dir, query, params=()):
+    """Run a query on each cold partition in turn and return (columns, rows) of all of them.
+
+    `query` names the partition's table `{table}`; per-partition results
+    (aggregates, top-N lists) are combined by the caller.
+    """
+    columns, rows = [], []
+    for partition in partitions_for_range(conn):
+        conn.execute("ATTACH DATABASE ? AS cold", (os.path.join(data_dir, partition['path']),))
+        try:
+            cursor = conn.execute(query.format(table='cold.insider_trading'), params)
+            columns = [description[0] for description in cursor.description]
+            rows.extend(cursor.fetchall())
+        finally:
+            conn.execute("DETACH DATABASE cold")
+    return columns, rows
+
+def table_columns(conn, schema_name='main'):
+    """Return the column names of insider_trading in an attached schema."""
+    return [row[1] for row in conn.execute(f"PRAGMA {schema_name}.table_info(insider_trading)")]
+
+def _create_cold_table(conn, schema_name):
+    """Create insider_trading in an attached cold database using the hot table's schema.
+
+    Cold databases keep the single-table layout when the hot database is
+    normalized. Columns added to the hot table since the cold file was
+    created are added too.
+    """
+    row = conn.execute(
+        "SELECT sql FROM main.sqlite_master WHERE type='table' AND name='insider_trading'").fetchone()
+    table_sql = row[0] if row else schema.FLAT_TABLE_SQL.strip().replace(' IF NOT EXISTS', '', 1)
+    conn.execute(table_sql.replace('CREATE TABLE insider_trading',
+                                   f'CREATE TABLE IF NOT EXISTS {schema_name}.insider_trading', 1))
+    cold_columns = set(table_columns(conn, schema_name))
+    for row in conn.execute("PRAGMA main.table_info(insider_trading)").fetchall():
+        name, column_type = row[1], row[2]
+        if name not in cold_columns:
+            conn.execute(f"ALTER TABLE {schema_name}.insider_trading ADD COLUMN {name} {column_type}")
+    conn.execute(f'CREATE INDEX IF NOT EXISTS {schema_name}.idx_issuer_ticker ON insider_trading (issuer_ticker)')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS {schema_name}.idx_transaction_date ON insider_trading (transaction_date)')
+
+def rollover(db_path, data_dir, hot_years=HOT_RETENTION_YEARS, today=None):
+    """Move rows older than the hot window from the hot database into yearly cold databases.
+
+    Each year is moved in its own transaction, so an interrupted rollover can
+    simply be run again. Returns a {year: rows moved} dictionary.
+    """
+    cutoff = hot_cutoff(hot_years, today)
+    os.makedirs(cold_dir(data_dir), exist_ok=True)
+
+    conn = sqlite3.connect(db_path)
+    initialize_catalog(conn)
+    cursor = conn.execute('''
+    SELECT DISTINCT substr(transaction_date, 1, 4)
+    FROM insider_trading
+    WHERE transaction_date < ?
+    ''', (cutoff,))
+    years = sorted(int(row[0]) for row in cursor.fetchall() if row[0] and row[0].isdigit())
+
+    moved = {}
+    for year in years:
+        path = cold_db_path(data_dir, year)
+        conn.execute("ATTACH DATABASE ? AS cold", (path,))
+        try:
+            _create_cold_table(conn, 'cold')
+            params = (f'{year}-01-01', f'{year + 1}-01-01', cutoff)
+            column_list = ', '.join(table_columns(conn))
+            conn.execute(f'''
+            INSERT OR IGNORE INTO cold.insider_trading ({column_list})
+            SELECT {column_list} FROM main.insider_trading
+            WHERE transaction_date >= ? AND transaction_date < ? AND transaction_date < ?
+            ''', params)
+            deleted = conn.execute(f'''
+            DELETE FROM main.{schema.fact_table(conn)}
+            WHERE transaction_date >= ? AND transaction_date < ? AND transaction_date < ?
+            ''', params).rowcount
+
+            min_date, max_date, row_count = conn.execute(
+                "SELECT MIN(transaction_date), MAX(transaction_date), COUNT(*) FROM cold.insider_trading").fetchone()
+            catalog_tickers(conn, 'cold', year)
+            conn.execute('''
+            INSERT OR REPLACE INTO cold_partitions (year, path, min_date, max_date, row_count, updated_at)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (year, os.path.relpath(path, data_dir), min_date, max_date, row_count))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute("DETACH DATABASE cold")
+        moved[year] = deleted
+        print(f"Moved {deleted} rows from {year} into {os.path.relpath(path, data_dir)}")
+
+    conn.close()
+    return moved
+
+def query_partitions(conn, data_dir, where, params, order_by, limit, date_from=None, date_to=None, columns=None):
+    """Run a query over the hot table and the cold partitions it needs.
+
+    `where` is a WHERE clause (without the keyword) applied to each partition.
+    `columns` selects a subset of the insider_trading columns (default: all).
+    Cold partitions are ATTACHed in groups that fit SQLite's attach limit and
+    the groups' results are merged by running `order_by` and `limit` again
+    over them (a negative limit means no limit, as in SQLite).
+
+    Returns (columns, rows).
+    """
+    partitions = partitions_for_range(conn, date_from, date_to)
+    sources = ['main'] + [f"cold_{partition['year']}" for partition in partitions]
+    paths = {f"cold_{partition['year']}": os.path.join(data_dir, partition['path']) for partition in partitions}
+
+    columns = list(columns or table_columns(conn))
+    rows = []
+    group_size = MAX_ATTACHED
+    for start in range(0, len(sources), group_size):
+        group = sources[start:start + group_size]
+        attached = [schema_name for schema_name in group if schema_name != 'main']
+        for schema_name in attached:
+            conn.execute(f"ATTACH DATABASE ? AS {schema_name}", (paths[schema_name],))
+        try:
+            selects = []
+            for schema_name in group:
+                # Older cold files may lack columns added to the hot table later
+                available = set(table_columns(conn, schema_name))
+                select_list = ', '.join(column if column in available else f'NULL AS {column}'
+                                        for column in columns)
+                selects.append(f"SELECT {select_list} FROM {schema_name}.insider_trading WHERE {where}")
+            cursor = conn.execute(f"SELECT * FROM ({' UNION ALL '.join(selects)}) ORDER BY {order_by} LIMIT ?",
+                                  list(params) * len(group) + [limit])
+            rows.extend(cursor.fetchall())
+        finally:
+            for schema_name in attached:
+                conn.execute(f"DETACH DATABASE {schema_name}")
+
+    if len(sources) > group_size:
+        rows = _merge_groups(columns, rows, order_by, limit)
+    return columns, rows
+
+def _merge_groups(columns, rows, order_by, limit):
+    """Order and limit the concatenated results of several attach groups as SQLite would."""
+    # An untyped scratch table keeps each value's type, so ORDER BY compares as in the partitions
+    merge = sqlite3.connect(':memory:')
+    try:
+        merge.execute(f"CREATE TABLE merged ({', '.join(columns)})")
+        merge.executemany(f"INSERT INTO merged VALUES ({', '.join('?' * len(columns))})", rows)
+        return merge.execute(f"SELECT * FROM merged ORDER BY {order_by} LIMIT ?", (limit,)).fetchall()
+    finally:
+        merge.close()
+
+def main(argv=None):
+    """Main function for the partition maintenance commands."""
+    import InsiderTrading
+
+    parser = argparse.ArgumentParser(description='Maintain hot/cold partitions of the insider trading database.')
+    parser.add_argument('command', choices=['rollover', 'list'],
+                        help='rollover: move aged rows into yearly cold databases; list: show the cold partitions')
+    parser.add_argument('--hot-years', type=int, default=HOT_RETENTION_YEARS,
+                        help=f'Number of years kept in the hot database (default: {HOT_RETENTION_YEARS})')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(InsiderTrading.DB_PATH):
+        print(f"Error: SQLite database not found at {InsiderTrading.DB_PATH}")
+        return 1
+
+    if args.command == 'rollover':
+        moved = rollover(InsiderTrading.DB_PATH, InsiderTrading.DATA_DIR, hot_years=args.hot_years)
+        print(f"Rolled over {sum(moved.values())} rows into {len(moved)} cold partitions")
+    else:
+        conn = sqlite3.connect(InsiderTrading.DB_PATH)
+        for partition in list_partitions(conn):
+            print(f"{partition['year']}: {partition['row_count']} rows "
+                  f"({partition['min_date']} to {partition['max_date']}) in {partition['path']}")
+        conn.close()
+    return 0
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+Retention enforcement for the insider trading database.
+
+Rows older than the quarterly retention horizon are appended to yearly
+gzipped NDJSON archives (data/archive/insider_trading_YYYY.ndjson.gz) and
+deleted from the hot table and the cold partitions. The raw filings they
+came from are removed, and freed database pages are released with
+incremental VACUUM. Each archived line is one row with all its columns; a
+row can appear twice only if a prune was interrupted between archiving and
+deleting, so readers should de-duplicate on `id`.
+
+Usage:
+    python prune.py [--retention-years 10] [--dry-run] [--vacuum-pages N]
+"""
+from datetime import datetime, timedelta
+import argparse
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+
+import inventory
+import metrics
+import partitions
+import schema
+
+# Matches export_json's quarterly retention: nothing older is ever exported
+QUARTERLY_RETENTION_YEARS = 10
+
+def archive_dir(data_dir):
+    """Return the directory holding the yearly row archives."""
+    return os.path.join(data_dir, 'archive')
+
+def archive_path(data_dir, year):
+    """Return the archive file for a year of transaction dates."""
+    return os.path.join(archive_dir(data_dir), f'insider_trading_{year}.ndjson.gz')
+
+def retention_cutoff(retention_years=QUARTERLY_RETENTION_YEARS, today=None):
+    """Return the first quarter start (YYYY-MM-DD) inside the retention horizon.
+
+    Rounded down to a quarter so a quarter exported by export_json is never
+    half pruned.
+    """
+    horizon = (today or datetime.now()) - timedelta(days=365 * retention_years)
+    return datetime(horizon.year, (horizon.month - 1) // 3 * 3 + 1, 1).strftime('%Y-%m-%d')
+
+def _filing_dir(source_file, data_dir):
+    """Return the accession directory of a raw filing if it lies in the download tree."""
+    if not source_file:
+        return None
+    filings_root = os.path.normpath(os.path.join(data_dir, 'sec-edgar-filings'))
+    accession_dir = os.path.dirname(os.path.normpath(source_file))
+    # sec-edgar-filings/{ticker}/4/{accession}/primary-document.xml
+    if os.path.dirname(os.path.dirname(os.path.dirname(accession_dir))) != filings_root:
+        return None
+    return accession_dir
+
+def directory_bytes(path):
+    """Return the total size in bytes of the files under a directory."""
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, files in os.walk(path) for name in files)
+
+def prune_table(conn, schema_name, data_dir, cutoff, report, dry_run=False):
+    """Archive and delete the rows of one attached insider_trading table older than the cutoff.
+
+    Returns the source files of the pruned rows.
+    """
+    cursor = conn.execute(f'''
+    SELECT * FROM {schema_name}.insider_trading
+    WHERE transaction_date < ?
+    ORDER BY transaction_date
+    ''', (cutoff,))
+    columns = [description[0] for description in cursor.description]
+    source_index = columns.index('source_file') if 'source_file' in columns else None
+
+    source_files = set()
+    archives = {}
+    try:
+        for row in cursor:
+            record = dict(zip(columns, row))
+            year = (record['transaction_date'] or '')[:4]
+            year = year if year.isdigit() else 'unknown'
+            report['rows_archived'] += 1
+            report['archived_by_year'][year] = report['archived_by_year'].get(year, 0) + 1
+            if source_index is not None:
+                source_files.add(row[source_index])
+            if dry_run:
+                continue
+            if year not in archives:
+                os.makedirs(archive_dir(data_dir), exist_ok=True)
+                # Appending adds a gzip member; readers see one continuous stream
+                archives[year] = gzip.open(archive_path(data_dir, year), 'at', encoding='utf-8')
+            archives[year].write(json.dumps(record, default=str) + '\n')
+    finally:
+        for archive in archives.values():
+            archive.close()
+
+    if not dry_run:
+        # The transactions table of a normalized database (the view reports no rowcount)
+        table = schema.fact_table(conn, schema_name)
+        deleted = conn.execute(f"DELETE FROM {schema_name}.{table} WHERE transaction_date < ?",
+                               (cutoff,)).rowcount
+        report['rows_deleted'] += deleted
+    return source_files
+
+def prune(db_path, data_dir, retention_years=QUARTERLY_RETENTION_YEARS, today=None, dry_run=False, vacuum_pages=0):
+    """Enforce the retention horizon on the database and the raw filings.
+
+    Returns a report dictionary with the row, file and byte counts.
+    """
+    cutoff = retention_cutoff(retention_years, today)
+    report = {
+        'cutoff': cutoff,
+        'dry_run': dry_run,
+        'rows_archived': 0,
+        'rows_deleted': 0,
+        'archived_by_year': {},
+        'cold_partitions_removed': 0,
+        'filings_removed': 0,
+        'filing_bytes_freed': 0,
+        'db_bytes_before': os.path.getsize(db_path),
+    }
+    archive_bytes_before = directory_bytes(archive_dir(data_dir))
+
+    conn = sqlite3.connect(db_path)
+    source_files = prune_table(conn, 'main', data_dir, cutoff, report, dry_run)
+    if not dry_run:
+        conn.commit()
+
+    # Cold partitions that reach back past the cutoff
+    for partition in partitions.partitions_for_range(conn, date_to=cutoff):
+        path = os.path.join(data_dir, partition['path'])
+        conn.execute("ATTACH DATABASE ? AS cold", (path,))
+        try:
+            source_files |= prune_table(conn, 'cold', data_dir, cutoff, report, dry_run)
+            if dry_run:
+                continue
+            min_date, max_date, row_count = conn.execute(
+                "SELECT MIN(transaction_date), MAX(transaction_date), COUNT(*) FROM cold.insider_trading").fetchone()
+            if row_count:
+                conn.execute("UPDATE cold_partitions SET min_date = ?, max_date = ?, row_count = ? WHERE year = ?",
+                             (min_date, max_date, row_count, partition['year']))
+            else:
+                conn.execute("DELETE FROM cold_partitions WHERE year = ?", (partition['year'],))
+            conn.commit()
+        finally:
+            conn.execute("DETACH DATABASE cold")
+        if not dry_run and not row_count:
+            os.remove(path)
+            report['cold_partitions_removed'] += 1
+
+    # Raw filings of the pruned rows (otherwise the next ingest would load them again)
+    filing_dirs = {_filing_dir(source_file, data_dir) for source_file in source_files} - {None}
+    for filing_dir in sorted(filing_dirs):
+        if not os.path.isdir(filing_dir):
+            continue
+        report['filings_removed'] += 1
+        report['filing_bytes_freed'] += directory_bytes(filing_dir)
+        if not dry_run:
+            shutil.rmtree(filing_dir)
+    if not dry_run and filing_dirs:
+        inventory.initialize_inventory(conn)
+        conn.executemany("DELETE FROM filing_inventory WHERE path LIKE ? || '%'",
+                         [(os.path.join(filing_dir, ''),) for filing_dir in filing_dirs])
+        conn.commit()
+
+    if not dry_run:
+        report['vacuum'] = incremental_vacuum(conn, vacuum_pages)
+    conn.close()
+
+    report['db_bytes_after'] = os.path.getsize(db_path)
+    report['archive_bytes_written'] = directory_bytes(archive_dir(data_dir)) - archive_bytes_before
+    metrics.incr('rows', report['rows_deleted'])
+    metrics.incr('files', report['filings_removed'])
+    metrics.incr('bytes_written', report['archive_bytes_written'])
+    return report
+
+def incremental_vacuum(conn, pages=0):
+    """Release free pages to the filesystem with incremental VACUUM.
+
+    A database not yet in incremental auto-vacuum mode is converted with a
+    one-off full VACUUM. `pages` limits how many pages are released (0 = all).
+    Returns the mode used and the free pages before and after.
+    """
+    free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        mode = 'full'
+    else:
+        conn.execute(f"PRAGMA incremental_vacuum({int(pages)})" if pages else "PRAGMA incremental_vacuum")
+        mode = 'incremental'
+    free_after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return {'mode': mode, 'free_pages_before': free_before, 'free_pages_after': free_after}
+
+def print_report(report):
+    """Print a prune report."""
+    action = 'Would prune' if report['dry_run'] else 'Pruned'
+    print(f"{action} rows dated before {report['cutoff']}:")
+    for year, count in sorted(report['archived_by_year'].items()):
+        print(f"  {year}: {count} rows")
+    print(f"Rows archived: {report['rows_archived']}")
+    print(f"Rows deleted: {report['rows_deleted']}")
+    print(f"Cold partitions removed: {report['cold_partitions_removed']}")
+    print(f"Raw filings removed: {report['filings_removed']} ({report['filing_bytes_freed']} bytes)")
+    print(f"Archive bytes written: {report['archive_bytes_written']}")
+    print(f"Database size: {report['db_bytes_before']} -> {report['db_bytes_after']} bytes")
+
+def main(argv=None):
+    """Main function for the prune command."""
+    import InsiderTrading
+
+    parser = argparse.ArgumentParser(description='Archive and delete insider trading rows past the retention horizon.')
+    parser.add_argument('--retention-years', type=int, default=QUARTERLY_RETENTION_YEARS,
+                        help=f'Years of data kept in the database (default: {QUARTERLY_RETENTION_YEARS})')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Report what would be pruned without changing anything')
+    parser.add_argument('--vacuum-pages', type=int, default=0,
+                        help='Maximum number of free pages released by incremental VACUUM (default: all)')
+    metrics.add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(InsiderTrading.DB_PATH):
+        print(f"Error: SQLite database not found at {InsiderTrading.DB_PATH}")
+        return 1
+
+    metrics.start_run('prune', metrics.metrics_path(args, InsiderTrading.DATA_DIR),
+                      profile_stage=args.profile, profile_mode=args.profile_mode)
+    status = 1
+    try:
+        with metrics.stage('prune'):
+            report = prune(InsiderTrading.DB_PATH, InsiderTrading.DATA_DIR, retention_years=args.retention_years,
+                           dry_run=args.dry_run, vacuum_pages=args.vacuum_pages)
+        print_report(report)
+        status = 0
+    finally:
+        metrics.finish_run('ok' if status == 0 else 'error')
+    return status
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -0,0 +1,328 @@
+"""
+Normalized storage of the insider trading rows.
+
+The rows used to live in one wide insider_trading table that repeated the
+issuer name and CIKs, owner name and position title as text on every
+row. They now live in `transactions`, with integer keys into three
+dimension tables:
+
+    companies  issuer_cik, issuer_ticker, reported_ticker, issuer_name
+    owners     reporting_owner_cik, reporting_owner
+    positions  title (reporting_owner_position)
+
+source_file stays on the transaction: nearly every filing has a path of its
+own, so a dimension would store each path twice (table and unique index).
+
+`insider_trading` is a view with the original columns in the original
+order. INSTEAD OF triggers turn INSERT, UPDATE and DELETE on the view into
+writes of the underlying tables and create dimension rows as needed, so
+existing queries and writers keep working unchanged. Statements on the
+view report no rowcount (SQLite doesn't count trigger changes), and work
+that only touches transaction columns, such as deleting rows by date or
+counting a company's rows, is cheaper on `transactions` directly:
+fact_table() names the table to use.
+
+Dimension rows are never deleted; the ones rows moved away from are few
+and are reused when the values come back.
+
+Databases with the single table are converted by normalize(), which
+InsiderTrading.initialize_database() runs on the next ingest. Cold
+partitions and shard databases keep the single-table layout
+(FLAT_TABLE_SQL).
+
+Usage:
+    python schema.py status       # layout, row and dimension counts, database size
+    python schema.py normalize    # convert a single-table database now
+"""
+import argparse
+import os
+import sqlite3
+
+# The single-table layout, kept by cold partitions and shards
+FLAT_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS insider_trading (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    issuer_name TEXT,
+    issuer_ticker TEXT,
+    reporting_owner TEXT,
+    reporting_owner_cik TEXT,
+    reporting_owner_position TEXT,
+    transaction_date TEXT,
+    transaction_shares TEXT,
+    transaction_price TEXT,
+    transaction_type TEXT,
+    shares_after_transaction TEXT,
+    source_file TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    issuer_cik TEXT,
+    reported_ticker TEXT
+)
+'''
+
+# Secondary indexes of the single-table layout
+FLAT_SECONDARY_INDEXES = {
+    'idx_issuer_ticker': 'CREATE INDEX IF NOT EXISTS idx_issuer_ticker ON insider_trading (issuer_ticker)',
+    'idx_transaction_date': 'CREATE INDEX IF NOT EXISTS idx_transaction_date ON insider_trading (transaction_date)',
+    'idx_reporting_owner': 'CREATE INDEX IF NOT EXISTS idx_reporting_owner ON insider_trading (reporting_owner)',
+    'idx_ticker_date': 'CREATE INDEX IF NOT EXISTS idx_ticker_date ON insider_trading (issuer_ticker, transaction_date)',
+    'idx_issuer_cik': 'CREATE INDEX IF NOT EXISTS idx_issuer_cik ON insider_trading (issuer_cik)',
+}
+
+# The same indexes on the table holding each column (dropped and rebuilt around bulk loads)
+SECONDARY_INDEXES = {
+    'idx_issuer_ticker': 'CREATE INDEX IF NOT EXISTS idx_issuer_ticker ON companies (issuer_ticker)',
+    'idx_transaction_date': 'CREATE INDEX IF NOT EXISTS idx_transaction_date ON transactions (transaction_date)',
+    'idx_reporting_owner': 'CREATE INDEX IF NOT EXISTS idx_reporting_owner ON owners (reporting_owner)',
+    # Serves per-ticker date range queries: companies by ticker, then their rows by date
+    'idx_ticker_date': 'CREATE INDEX IF NOT EXISTS idx_ticker_date ON transactions (company_id, transaction_date)',
+    'idx_issuer_cik': 'CREATE INDEX IF NOT EXISTS idx_issuer_cik ON companies (issuer_cik)',
+}
+
+TABLES_SQL = [
+    '''
+    CREATE TABLE IF NOT EXISTS companies (
+        id INTEGER PRIMARY KEY,
+        issuer_cik TEXT,
+        issuer_ticker TEXT,
+        reported_ticker TEXT,
+        issuer_name TEXT,
+        UNIQUE (issuer_cik, issuer_ticker, reported_ticker, issuer_name)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS owners (
+        id INTEGER PRIMARY KEY,
+        reporting_owner_cik TEXT,
+        reporting_owner TEXT,
+        UNIQUE (reporting_owner_cik, reporting_owner)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS positions (
+        id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL UNIQUE
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        company_id INTEGER NOT NULL REFERENCES companies (id),
+        owner_id INTEGER NOT NULL REFERENCES owners (id),
+        position_id INTEGER REFERENCES positions (id),
+        transaction_date TEXT,
+        transaction_shares TEXT,
+        transaction_price TEXT,
+        transaction_type TEXT,
+        shares_after_transaction TEXT,
+        source_file TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+]
+
+# Transaction columns stored as they are, in both layouts
+FACT_COLUMNS = ('transaction_date', 'transaction_shares', 'transaction_price', 'transaction_type',
+                'shares_after_transaction', 'source_file')
+
+VIEW_SQL = '''
+CREATE VIEW IF NOT EXISTS insider_trading AS
+SELECT
+    t.id AS id,
+    c.issuer_name AS issuer_name,
+    c.issuer_ticker AS issuer_ticker,
+    o.reporting_owner AS reporting_owner,
+    o.reporting_owner_cik AS reporting_owner_cik,
+    p.title AS reporting_owner_position,
+    t.transaction_date AS transaction_date,
+    t.transaction_shares AS transaction_shares,
+    t.transaction_price AS transaction_price,
+    t.transaction_type AS transaction_type,
+    t.shares_after_transaction AS shares_after_transaction,
+    t.source_file AS source_file,
+    t.created_at AS created_at,
+    c.issuer_cik AS issuer_cik,
+    c.reported_ticker AS reported_ticker
+FROM transactions t
+JOIN companies c ON c.id = t.company_id
+JOIN owners o ON o.id = t.owner_id
+LEFT JOIN positions p ON p.id = t.position_id
+'''
+
+# Dimension rows for the NEW values of a trigger (NULLs can't be left to UNIQUE, which lets them repeat)
+_ENSURE_DIMENSIONS = '''
+    INSERT INTO companies (issuer_cik, issuer_ticker, reported_ticker, issuer_name)
+    SELECT NEW.issuer_cik, NEW.issuer_ticker, NEW.reported_ticker, NEW.issuer_name
+    WHERE NOT EXISTS (SELECT 1 FROM companies WHERE issuer_cik IS NEW.issuer_cik
+                      AND issuer_ticker IS NEW.issuer_ticker AND reported_ticker IS NEW.reported_ticker
+                      AND issuer_name IS NEW.issuer_name);
+    INSERT INTO owners (reporting_owner_cik, reporting_owner)
+    SELECT NEW.reporting_owner_cik, NEW.reporting_owner
+    WHERE NOT EXISTS (SELECT 1 FROM owners WHERE reporting_owner_cik IS NEW.reporting_owner_cik
+                      AND reporting_owner IS NEW.reporting_owner);
+    INSERT OR IGNORE INTO positions (title) VALUES (NEW.reporting_owner_position);
+'''
+
+_NEW_KEYS = {
+    'company_id': '''(SELECT id FROM companies WHERE issuer_cik IS NEW.issuer_cik
+                      AND issuer_ticker IS NEW.issuer_ticker AND reported_ticker IS NEW.reported_ticker
+                      AND issuer_name IS NEW.issuer_name)''',
+    'owner_id': '''(SELECT id FROM owners WHERE reporting_owner_cik IS NEW.reporting_owner_cik
+                    AND reporting_owner IS NEW.reporting_owner)''',
+    'position_id': '(SELECT id FROM positions WHERE title = NEW.reporting_owner_position)',
+}
+
+TRIGGERS_SQL = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS insider_trading_insert INSTEAD OF INSERT ON insider_trading
+    BEGIN
+    {_ENSURE_DIMENSIONS}
+        INSERT INTO transactions (id, {', '.join(_NEW_KEYS)}, {', '.join(FACT_COLUMNS)}, created_at)
+        VALUES (NEW.id, {', '.join(_NEW_KEYS.values())}, {', '.join(f'NEW.{column}' for column in FACT_COLUMNS)},
+                COALESCE(NEW.created_at, CURRENT_TIMESTAMP));
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS insider_trading_update INSTEAD OF UPDATE ON insider_trading
+    BEGIN
+    {_ENSURE_DIMENSIONS}
+        UPDATE transactions SET
+            id = NEW.id,
+            {', '.join(f'{key} = {lookup}' for key, lookup in _NEW_KEYS.items())},
+            {', '.join(f'{column} = NEW.{column}' for column in FACT_COLUMNS)},
+            created_at = NEW.created_at
+        WHERE id = OLD.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS insider_trading_delete INSTEAD OF DELETE ON insider_trading
+    BEGIN
+        DELETE FROM transactions WHERE id = OLD.id;
+    END
+    ''',
+]
+
+def _object_type(conn, name, schema_name='main'):
+    row = conn.execute(f"SELECT type FROM {schema_name}.sqlite_master WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+def is_normalized(conn, schema_name='main'):
+    """Return whether insider_trading in a schema is the view over the normalized tables."""
+    return _object_type(conn, 'insider_trading', schema_name) == 'view'
+
+def fact_table(conn, schema_name='main'):
+    """Return the table holding the transaction columns: transactions, or insider_trading in the flat layout."""
+    return 'transactions' if is_normalized(conn, schema_name) else 'insider_trading'
+
+def secondary_indexes(conn):
+    """Return the secondary index statements of the database's layout."""
+    return SECONDARY_INDEXES if is_normalized(conn) else FLAT_SECONDARY_INDEXES
+
+def create_normalized(conn):
+    """Create the normalized tables, the insider_trading view and its triggers if they don't exist."""
+    for create_sql in TABLES_SQL + [VIEW_SQL] + TRIGGERS_SQL:
+        conn.execute(create_sql)
+
+def normalize(conn):
+    """Create the normalized schema, converting a single insider_trading table if there is one.
+
+    The conversion runs in one transaction and keeps row ids (and the
+    AUTOINCREMENT sequence, so ids are never reused). Returns the number of
+    rows converted.
+    """
+    if is_normalized(conn):
+        return 0
+    if _object_type(conn, 'insider_trading') != 'table':
+        create_normalized(conn)
+        conn.commit()
+        return 0
+
+    conn.commit()
+    conn.execute("BEGIN")
+    try:
+        conn.execute("ALTER TABLE insider_trading RENAME TO insider_trading_flat")
+        for create_sql in TABLES_SQL:
+            conn.execute(create_sql)
+        conn.execute('''
+        INSERT INTO companies (issuer_cik, issuer_ticker, reported_ticker, issuer_name)
+        SELECT DISTINCT issuer_cik, issuer_ticker, reported_ticker, issuer_name FROM insider_trading_flat
+        ''')
+        conn.execute('''
+        INSERT INTO owners (reporting_owner_cik, reporting_owner)
+        SELECT DISTINCT reporting_owner_cik, reporting_owner FROM insider_trading_flat
+        ''')
+        conn.execute('''
+        INSERT INTO positions (title)
+        SELECT DISTINCT reporting_owner_position FROM insider_trading_flat WHERE reporting_owner_position IS NOT NULL
+        ''')
+        converted = conn.execute(f'''
+        INSERT INTO transactions (id, {', '.join(_NEW_KEYS)}, {', '.join(FACT_COLUMNS)}, created_at)
+        SELECT f.id, c.id, o.id, p.id, {', '.join(f'f.{column}' for column in FACT_COLUMNS)}, f.created_at
+        FROM insider_trading_flat f
+        JOIN companies c ON c.issuer_cik IS f.issuer_cik AND c.issuer_ticker IS f.issuer_ticker
+            AND c.reported_ticker IS f.reported_ticker AND c.issuer_name IS f.issuer_name
+        JOIN owners o ON o.reporting_owner_cik IS f.reporting_owner_cik AND o.reporting_owner IS f.reporting_owner
+        LEFT JOIN positions p ON p.title = f.reporting_owner_position
+        ORDER BY f.id
+        ''').rowcount
+        # Ids of deleted rows are not handed out again (export watermarks rely on increasing ids)
+        conn.execute('''
+        UPDATE sqlite_sequence
+        SET seq = MAX(seq, COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'insider_trading_flat'), 0))
+        WHERE name = 'transactions'
+        ''')
+        conn.execute('''
+        INSERT INTO sqlite_sequence (name, seq)
+        SELECT 'transactions', seq FROM sqlite_sequence WHERE name = 'insider_trading_flat'
+        AND NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'transactions')
+        ''')
+        conn.execute("DROP TABLE insider_trading_flat")
+        create_normalized(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return converted
+
+def status(conn):
+    """Return the layout, row and dimension counts and size of a database as a dictionary."""
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    report = {
+        'layout': 'normalized' if is_normalized(conn) else 'flat',
+        'rows': conn.execute(f"SELECT COUNT(*) FROM {fact_table(conn)}").fetchone()[0],
+        'bytes': conn.execute("PRAGMA page_count").fetchone()[0] * page_size,
+        'free_bytes': conn.execute("PRAGMA freelist_count").fetchone()[0] * page_size,
+    }
+    if report['layout'] == 'normalized':
+        for table in ('companies', 'owners', 'positions'):
+            report[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    return report
+
+def main(argv=None):
+    """Main function for the schema commands."""
+    import InsiderTrading
+
+    parser = argparse.ArgumentParser(description='Inspect or normalize the insider trading database schema.')
+    parser.add_argument('command', nargs='?', choices=['status', 'normalize'], default='status',
+                        help='status: show the layout and sizes (default); normalize: convert a single-table database')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(InsiderTrading.DB_PATH):
+        print(f"Error: SQLite database not found at {InsiderTrading.DB_PATH}")
+        return 1
+    if args.command == 'normalize':
+        InsiderTrading.initialize_database()
+    conn = sqlite3.connect(InsiderTrading.DB_PATH)
+    try:
+        report = status(conn)
+    finally:
+        conn.close()
+    print(f"Layout: {report['layout']}, {report['rows']} rows, {report['bytes'] / 1024 / 1024:.1f} MB "
+          f"({report['free_bytes'] / 1024 / 1024:.1f} MB free)")
+    if report['layout'] == 'normalized':
+        print(f"  Dimensions: {report['companies']} companies, {report['owners']} owners, "
+              f"{report['positions']} positions")
+    return 0
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
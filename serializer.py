@@ -0,0 +1,152 @@
+"""
+JSON serialization of the exported documents, with interchangeable backends.
+
+Exports hand their record lists over as `Rows(columns, rows)`: the row tuples
+straight from sqlite3, without a pandas DataFrame or per-row dictionaries
+built by the caller. dumps() writes them as lists of objects.
+
+    orjson  orjson, when installed (several times faster)
+    stdlib  the json module
+
+The output is byte-identical across backends: it is always what
+json.dumps(document, indent=2) (or separators=(',', ':') with compact=True)
+writes, ASCII-only. The orjson backend escapes non-ASCII characters the same
+way and hands the document to the stdlib backend when orjson can't reproduce
+it (floats that orjson prints differently, integers beyond 64 bits,
+non-string keys). Non-finite floats are written as null by both.
+"""
+import json
+import math
+import re
+
+class Rows:
+    """Row tuples of a query, serialized as a list of {column: value} objects."""
+
+    __slots__ = ('columns', 'rows')
+
+    def __init__(self, columns, rows):
+        self.columns = tuple(columns)
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def records(self):
+        """Return the rows as a list of dictionaries."""
+        columns = self.columns
+        return [dict(zip(columns, row)) for row in self.rows]
+
+def _default(obj):
+    if isinstance(obj, Rows):
+        return obj.records()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _finite(obj):
+    """Return obj with non-finite floats replaced by None (only called when there are some)."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+    if isinstance(obj, Rows):
+        return [_finite(record) for record in obj.records()]
+    return obj
+
+def dumps_stdlib(obj, compact=False):
+    """Serialize with the json module."""
+    options = {'separators': (',', ':')} if compact else {'indent': 2}
+    try:
+        text = json.dumps(obj, default=_default, allow_nan=False, **options)
+    except ValueError:
+        text = json.dumps(_finite(obj), default=_default, allow_nan=False, **options)
+    return text.encode('ascii')
+
+# json escapes DEL as well when ensure_ascii is on
+NON_ASCII = re.compile('[^\x00-\x7e]')
+# Floats orjson prints differently from repr(): with an exponent ('1e16' for '1e+16') and in
+# [1e-5, 1e-4) ('0.00001' for '1e-05'); a string that looks like one only costs a fallback
+FLOAT_MISMATCH = re.compile(rb'(?:[:\[,]|^)\s*-?(?:0\.0000|\d+(?:\.\d+)?[eE])', re.MULTILINE)
+# Quick test run first: FLOAT_MISMATCH alone takes longer than orjson on large documents
+FLOAT_CANDIDATE = re.compile(rb'e[-1-9]')
+
+def _escape(match):
+    code = ord(match.group())
+    if code > 0xFFFF:
+        code -= 0x10000
+        return '\\u%04x\\u%04x' % (0xD800 | (code >> 10), 0xDC00 | (code & 0x3FF))
+    return '\\u%04x' % code
+
+def dumps_orjson(obj, compact=False):
+    """Serialize with orjson, matching dumps_stdlib() byte for byte."""
+    import orjson
+
+    try:
+        data = orjson.dumps(obj, default=_default, option=0 if compact else orjson.OPT_INDENT_2)
+    except TypeError:
+        return dumps_stdlib(obj, compact)
+    if (FLOAT_CANDIDATE.search(data) or b'0.0000' in data) and FLOAT_MISMATCH.search(data):
+        return dumps_stdlib(obj, compact)
+    if not data.isascii() or b'\x7f' in data:
+        data = NON_ASCII.sub(_escape, data.decode('utf-8')).encode('ascii')
+    return data
+
+BACKENDS = {
+    'orjson': dumps_orjson,
+    'stdlib': dumps_stdlib,
+}
+
+# Tried in order by get_backend('auto')
+AUTO_ORDER = ('orjson', 'stdlib')
+
+# {backend: installed}, filled on first use so a missing orjson is only looked up once
+_available = {}
+
+# Backend used by dumps() and dump(); set_backend() changes it
+_backend = 'auto'
+
+def backend_available(name):
+    """Return whether a backend's dependencies are installed."""
+    if name != 'orjson':
+        return name in BACKENDS
+    if name not in _available:
+        try:
+            import orjson  # noqa: F401
+            _available[name] = True
+        except ImportError:
+            _available[name] = False
+    return _available[name]
+
+def available_backends():
+    """Return the names of the backends that can be used here."""
+    return [name for name in BACKENDS if backend_available(name)]
+
+def get_backend(backend='auto'):
+    """Return the dumps function of a backend ('auto' = fastest installed one)."""
+    if backend == 'auto':
+        backend = next(name for name in AUTO_ORDER if backend_available(name))
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend {backend!r} (choose from {', '.join(BACKENDS)})")
+    if not backend_available(backend):
+        raise ValueError(f"JSON backend {backend!r} is not installed")
+    return BACKENDS[backend]
+
+def set_backend(backend='auto'):
+    """Select the backend used by dumps() and dump() and return the previous one.
+
+    A backend that can't be used raises ValueError on the first dumps().
+    """
+    global _backend
+    previous, _backend = _backend, backend
+    return previous
+
+def dumps(obj, compact=False):
+    """Serialize a document to bytes: indented by 2 spaces, or without whitespace with compact=True."""
+    return get_backend(_backend)(obj, compact)
+
+def dump(obj, path, compact=False):
+    """Serialize a document into a file; returns the number of bytes written."""
+    data = dumps(obj, compact)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
@@ -0,0 +1,451 @@
+"""
+Self-hostable read API served straight from the SQLite database.
+
+Keeps the URL layout of the static JSON API:
+
+    /data/json/companies.json
+    /data/json/summary.json
+    /data/json/{ticker}/transactions.json
+    /data/json/{ticker}/latest.json
+    /data/json/{ticker}/quarterly/{YYYY-Q#}.json
+    /data/json/by-month/{YYYY-MM}.json
+    /data/json/views/index.json
+    /data/json/views/{name}.json
+
+Transaction endpoints also accept query parameters:
+
+    from=YYYY-MM-DD  to=YYYY-MM-DD  type=S,P  owner=name-or-CIK  limit=N
+
+Responses carry strong ETags and Last-Modified headers (304 Not Modified is
+returned for matching conditional requests), are gzipped when the client
+accepts it, and are kept in a bounded LRU cache that is cleared whenever the
+database changes.
+
+Usage:
+    python server.py [--host 127.0.0.1] [--port 8000]
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import urlsplit, parse_qs, unquote
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import re
+import sqlite3
+
+import export_json
+import months
+import partitions
+import serializer
+import views
+
+# Use relative path for data directory
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DB_PATH = os.path.join(DATA_DIR, 'insider_trading.db')
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+
+# Bounds of the in-memory response cache
+CACHE_MAX_ENTRIES = 512
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Responses smaller than this are not worth compressing
+GZIP_MIN_BYTES = 1024
+
+# Years of detail in transactions.json when no date range is given (matches export_json)
+DETAILED_RETENTION_YEARS = 3
+
+# Largest request head accepted from a client
+MAX_REQUEST_HEAD_BYTES = 16 * 1024
+
+STATUS_TEXT = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+TRANSACTIONS_PATH = re.compile(r'^/data/json/([^/]+)/transactions\.json$')
+LATEST_PATH = re.compile(r'^/data/json/([^/]+)/latest\.json$')
+QUARTERLY_PATH = re.compile(r'^/data/json/([^/]+)/quarterly/(\d{4})-Q([1-4])\.json$')
+MONTH_PATH = re.compile(r'^/data/json/by-month/(\d{4}-(?:0[1-9]|1[0-2]))\.json$')
+VIEW_PATH = re.compile(r'^/data/json/views/([^/]+)\.json$')
+DATE_PARAM = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+class BadRequest(ValueError):
+    """Raised for invalid query parameters."""
+
+class ResponseCache:
+    """LRU cache of rendered responses bounded by entry count and total bytes."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        entry_size = self._size(entry)
+        if entry_size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.size -= self._size(self.entries.pop(key))
+        self.entries[key] = entry
+        self.size += entry_size
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= self._size(evicted)
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    @staticmethod
+    def _size(entry):
+        return len(entry['body']) + len(entry.get('gzip') or b'')
+
+class ApiServer:
+    """Builds API responses from the database.
+
+    handle() is synchronous and transport-independent; serve() wraps it in an
+    asyncio HTTP/1.1 server that runs queries on a single worker thread.
+    """
+
+    def __init__(self, db_path=None, data_dir=None, cache=None):
+        self.db_path = db_path or DB_PATH
+        self.data_dir = data_dir or DATA_DIR
+        self.cache = cache if cache is not None else ResponseCache()
+        self._conn = None
+        self._data_version = None
+
+    def connection(self):
+        """Return the server's database connection, opening it on first use."""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def last_modified(self):
+        """Return the database modification time (including its WAL) in whole seconds."""
+        mtime = max(os.path.getmtime(path) for path in (self.db_path, self.db_path + '-wal')
+                    if os.path.exists(path))
+        return int(mtime)
+
+    def _check_data_version(self):
+        # PRAGMA data_version changes when another connection commits
+        version = self.connection().execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self.cache.clear()
+            self._data_version = version
+
+    def handle(self, method, target, headers=None):
+        """Handle one request and return (status, headers, body)."""
+        headers = {key.lower(): value for key, value in (headers or {}).items()}
+        if method not in ('GET', 'HEAD'):
+            return self._error(405, f"Method {method} not allowed")
+
+        url = urlsplit(target)
+        path = unquote(url.path)
+        query = parse_qs(url.query)
+        try:
+            self._check_data_version()
+            # Parameters are normalised so equivalent URLs share a cache entry
+            key = (path, tuple(sorted((name, tuple(values)) for name, values in query.items())))
+            entry = self.cache.get(key)
+            if entry is None:
+                payload = self.route(path, query)
+                if payload is None:
+                    return self._error(404, f"Not found: {path}")
+                entry = self._render(payload)
+                self.cache.put(key, entry)
+        except BadRequest as e:
+            return self._error(400, str(e))
+        except sqlite3.Error as e:
+            return self._error(500, f"Database error: {e}")
+        except Exception as e:
+            # e.g. a malformed views.json: still answer, and keep the connection usable
+            print(f"Error handling {method} {target}: {type(e).__name__}: {e}")
+            return self._error(500, "Internal server error")
+
+        use_gzip = 'gzip' in headers.get('accept-encoding', '') and entry['gzip'] is not None
+        # Strong ETags differ per content encoding
+        etag = f'"{entry["hash"]}-gzip"' if use_gzip else f'"{entry["hash"]}"'
+
+        response_headers = {
+            'Content-Type': 'application/json',
+            'ETag': etag,
+            'Last-Modified': formatdate(entry['last_modified'], usegmt=True),
+            'Cache-Control': 'no-cache',
+            'Vary': 'Accept-Encoding',
+            'Access-Control-Allow-Origin': '*',
+        }
+        if self._not_modified(headers, etag, entry['last_modified']):
+            return 304, response_headers, b''
+
+        body = entry['gzip'] if use_gzip else entry['body']
+        if use_gzip:
+            response_headers['Content-Encoding'] = 'gzip'
+        response_headers['Content-Length'] = str(len(body))
+        return 200, response_headers, b'' if method == 'HEAD' else body
+
+    def route(self, path, query):
+        """Return the JSON payload for a path, or None when it doesn't exist."""
+        conn = self.connection()
+        if path == '/data/json/companies.json':
+            companies = export_json.companies_records(conn, self.data_dir)
+            return {'last_updated': self._last_updated(), 'count': len(companies), 'companies': companies}
+
+        if path == '/data/json/summary.json':
+            return {'last_updated': self._last_updated(), **export_json.summary_records(conn, self.data_dir)}
+
+        match = MONTH_PATH.match(path)
+        if match:
+            transactions = months.month_records(conn, self.data_dir, match.group(1))
+            if not transactions:
+                return None
+            return {'month': match.group(1), 'last_updated': self._last_updated(),
+                    'frozen': match.group(1) < months.settled_before(),
+                    'count': len(transactions), 'transactions': transactions}
+
+        match = VIEW_PATH.match(path)
+        if match:
+            declared = views.load_views()
+            if match.group(1) == 'index':
+                return {'last_updated': self._last_updated(), 'count': len(declared),
+                        'views': [{'name': view['name'], 'description': view.get('description', ''),
+                                   'count': len(views.view_records(conn, view))} for view in declared]}
+            view = next((view for view in declared if view['name'] == match.group(1)), None)
+            if view is None:
+                return None
+            transactions = views.view_records(conn, view)
+            return {'name': view['name'], 'description': view.get('description', ''),
+                    'last_updated': self._last_updated(), 'filter': views.view_filter(view),
+                    'count': len(transactions), 'transactions': transactions}
+
+        match = TRANSACTIONS_PATH.match(path)
+        if match:
+            ticker = match.group(1)
+            if 'from' in query or 'to' in query:
+                transactions = self.transactions(ticker, query)
+                payload = {'ticker': ticker, 'last_updated': self._last_updated()}
+            else:
+                cutoff = (datetime.now() - timedelta(days=365 * DETAILED_RETENTION_YEARS)).strftime('%Y-%m-%d')
+                transactions = self.transactions(ticker, query, date_from=cutoff)
+                payload = {'ticker': ticker, 'last_updated': self._last_updated(),
+                           'retention_years': DETAILED_RETENTION_YEARS}
+            if transactions is None:
+                return None
+            return {**payload, 'count': len(transactions), 'transactions': transactions}
+
+        match = LATEST_PATH.match(path)
+        if match:
+            transactions = export_json.latest_records(conn, match.group(1))
+            if not transactions:
+                return None
+            return {'ticker': match.group(1), 'last_updated': self._last_updated(),
+                    'count': len(transactions), 'transactions': transactions}
+
+        match = QUARTERLY_PATH.match(path)
+        if match:
+            ticker, year, quarter = match.group(1), int(match.group(2)), int(match.group(3))
+            first_month = quarter * 3 - 2
+            quarter_start = f"{year}-{first_month:02d}-01"
+            quarter_end = f"{year + 1}-01-01" if quarter == 4 else f"{year}-{first_month + 3:02d}-01"
+            transactions = self.transactions(ticker, query, date_from=quarter_start, date_before=quarter_end)
+            if not transactions:
+                return None
+            return {'ticker': ticker, 'year': year, 'quarter': quarter, 'last_updated': self._last_updated(),
+                    'count': len(transactions), 'transactions': transactions}
+
+        return None
+
+    def transactions(self, ticker, query, date_from=None, date_before=None):
+        """Return a ticker's transactions filtered by the query parameters.
+
+        Returns None when the ticker has no transactions at all.
+        """
+        conn = self.connection()
+        if not conn.execute("SELECT 1 FROM insider_trading WHERE issuer_ticker = ? LIMIT 1", (ticker,)).fetchone() \
+                and not partitions.has_cold_ticker(conn, self.data_dir, ticker):
+            return None
+
+        where = "issuer_ticker = ?"
+        params = [ticker]
+
+        date_from = max(filter(None, [date_from, self._date_param(query, 'from')]), default=None)
+        if date_from:
+            where += " AND transaction_date >= ?"
+            params.append(date_from)
+        date_to = self._date_param(query, 'to')
+        if date_to:
+            where += " AND transaction_date <= ?"
+            params.append(date_to)
+        if date_before:
+            where += " AND transaction_date < ?"
+            params.append(date_before)
+
+        types = [code.strip() for value in query.get('type', []) for code in value.split(',') if code.strip()]
+        if types:
+            where += f" AND transaction_type IN ({', '.join('?' for _ in types)})"
+            params.extend(types)
+
+        owner = query.get('owner', [None])[-1]
+        if owner:
+            # The name is matched literally: '%' and '_' are escaped
+            pattern = owner.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            where += " AND (reporting_owner_cik = ? OR reporting_owner LIKE ? ESCAPE '\\')"
+            params.extend([owner, f"%{pattern}%"])
+
+        limit = self._limit_param(query)
+        columns, rows = partitions.query_partitions(
+            conn, self.data_dir, where, params, 'transaction_date DESC', limit,
+            date_from=date_from, date_to=date_to or date_before,
+            columns=export_json.TRANSACTION_EXPORT_COLUMNS)
+        return serializer.Rows(columns, rows)
+
+    def _date_param(self, query, name):
+        value = query.get(name, [None])[-1]
+        if value and not DATE_PARAM.match(value):
+            raise BadRequest(f"'{name}' must be a YYYY-MM-DD date")
+        return value
+
+    def _limit_param(self, query):
+        value = query.get('limit', [None])[-1]
+        if value is None:
+            return -1
+        if not value.isdigit():
+            raise BadRequest("'limit' must be a non-negative integer")
+        return int(value)
+
+    def _last_updated(self):
+        return datetime.fromtimestamp(self.last_modified()).isoformat()
+
+    def _render(self, payload):
+        body = serializer.dumps(payload)
+        return {
+            'body': body,
+            'gzip': gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None,
+            'hash': hashlib.sha256(body).hexdigest()[:32],
+            'last_modified': self.last_modified(),
+        }
+
+    @staticmethod
+    def _not_modified(headers, etag, last_modified):
+        if_none_match = headers.get('if-none-match')
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or etag in tags
+        if_modified_since = headers.get('if-modified-since')
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            return last_modified <= since.timestamp()
+        return False
+
+    @staticmethod
+    def _error(status, message):
+        body = json.dumps({'error': message}).encode('utf-8')
+        return status, {'Content-Type': 'application/json', 'Content-Length': str(len(body)),
+                        'Access-Control-Allow-Origin': '*'}, body
+
+    async def handle_connection(self, reader, writer, executor):
+        """Serve HTTP/1.1 requests on one client connection (with keep-alive)."""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ')
+                except ValueError:
+                    status, headers, body = self._error(400, 'Malformed request line')
+                    version = 'HTTP/1.0'
+                    connection = 'close'
+                else:
+                    request_headers = {}
+                    for line in lines[1:]:
+                        if ':' in line:
+                            name, value = line.split(':', 1)
+                            # Header names are case-insensitive
+                            request_headers[name.strip().lower()] = value.strip()
+                    status, headers, body = await loop.run_in_executor(
+                        executor, self.handle, method, target, request_headers)
+                    connection = request_headers.get('connection', '').lower()
+
+                keep_alive = version == 'HTTP/1.1' and status != 400 and connection != 'close'
+                headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+                writer.write(f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n".encode('latin-1'))
+                writer.write(''.join(f"{name}: {value}\r\n" for name, value in headers.items()).encode('latin-1'))
+                writer.write(b'\r\n')
+                writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Serve the API until cancelled."""
+        # One worker thread owns the SQLite connection; the event loop only does I/O
+        executor = ThreadPoolExecutor(max_workers=1)
+        server = await asyncio.start_server(
+            lambda reader, writer: self.handle_connection(reader, writer, executor),
+            host, port, limit=MAX_REQUEST_HEAD_BYTES)
+        print(f"Serving {self.db_path} on http://{host}:{port}/data/json/")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            executor.shutdown(wait=True)
+            self.close()
+
+def main(argv=None):
+    """Main function to run the API server."""
+    import schema
+
+    parser = argparse.ArgumentParser(description='Serve the insider trading API from the SQLite database.')
+    parser.add_argument('--host', type=str, default=DEFAULT_HOST,
+                        help=f'Interface to listen on (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help=f'Port to listen on (default: {DEFAULT_PORT})')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(DB_PATH):
+        print(f"Error: SQLite database not found at {DB_PATH}")
+        return 1
+
+    # Make sure the indexes the filtered queries rely on exist
+    conn = sqlite3.connect(DB_PATH)
+    for create_sql in schema.secondary_indexes(conn).values():
+        conn.execute(create_sql)
+    conn.commit()
+    conn.close()
+
+    try:
+        asyncio.run(ApiServer().serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("Server stopped")
+    return 0
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
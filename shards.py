@@ -0,0 +1,317 @@
+"""
+Sharded ingestion: split the ticker universe across runners and merge the results.
+
+A single runner has to download and parse every ticker within one job's time
+limit. With sharding, the universe is split into N shards by a stable hash of
+each ticker, so every runner (a CI job, another machine or a local process)
+works out the same assignment on its own:
+
+    python backfill.py --shard 0/4 --start-date 2015-01-01 --end-date 2024-12-31
+    ...
+    python backfill.py --shard 3/4 --start-date 2015-01-01 --end-date 2024-12-31
+    python shards.py merge --num-shards 4
+    python export_json.py
+
+A shard downloads and parses into its own directory, data/shards/{i}-of-{n}/,
+holding its own insider_trading.db and sec-edgar-filings tree. `merge`
+ATTACHes the shard databases to insider_trading.db and copies their rows in
+one transaction. Rows are keyed by accession number (one row per filing):
+
+    - duplicates across shards keep the most recently parsed row, ties going
+      to the lower shard number; those whose values differ are counted as
+      conflicts
+    - filings already in insider_trading.db (hot or cold) keep their row
+    - new rows are inserted in (transaction_date, accession) order, so the
+      same shards always produce the same ids
+
+`run` starts all the shards as local processes and merges them when they
+have finished.
+"""
+from contextlib import contextmanager
+import argparse
+import glob
+import hashlib
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+
+import InsiderTrading
+import form4_parser
+import issuers
+import metrics
+import partitions
+import universe
+
+SHARDS_DIR = 'shards'
+SHARD_DIR_PATTERN = re.compile(r'^(\d+)-of-(\d+)$')
+
+# Columns copied from the shard databases
+MERGE_COLUMNS = InsiderTrading.TRANSACTION_COLUMNS + ('source_file', 'created_at')
+
+def parse_shard(value):
+    """Parse an 'I/N' shard specification into (shard, number of shards)."""
+    match = re.match(r'^\s*(\d+)\s*/\s*(\d+)\s*$', value or '')
+    if not match:
+        raise ValueError(f"Invalid shard {value!r} (expected I/N, e.g. 0/4)")
+    shard, num_shards = int(match.group(1)), int(match.group(2))
+    if num_shards < 1 or shard >= num_shards:
+        raise ValueError(f"Shard {shard} is out of range for {num_shards} shards")
+    return shard, num_shards
+
+def shard_of(ticker, num_shards):
+    """Return the shard of a ticker.
+
+    The ticker is sanitized first ('BRK-B' and 'BRK.B' share a shard) and
+    hashed with SHA-256, so the result doesn't depend on PYTHONHASHSEED, the
+    machine or the order of the ticker list.
+    """
+    key = issuers.sanitize_symbol(ticker) or ticker.strip().upper()
+    digest = hashlib.sha256(key.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % num_shards
+
+def select_shard(tickers, shard, num_shards):
+    """Return the tickers of one shard, in their original order."""
+    return [ticker for ticker in tickers if shard_of(ticker, num_shards) == shard]
+
+def shard_dir(data_dir, shard, num_shards):
+    """Return the data directory of a shard."""
+    return os.path.join(data_dir, SHARDS_DIR, f"{shard}-of-{num_shards}")
+
+@contextmanager
+def shard_environment(directory):
+    """Point InsiderTrading's DATA_DIR and DB_PATH at a shard directory for the duration of the block."""
+    saved = InsiderTrading.DATA_DIR, InsiderTrading.DB_PATH
+    os.makedirs(directory, exist_ok=True)
+    InsiderTrading.DATA_DIR = directory
+    InsiderTrading.DB_PATH = os.path.join(directory, os.path.basename(saved[1]))
+    try:
+        yield directory
+    finally:
+        InsiderTrading.DATA_DIR, InsiderTrading.DB_PATH = saved
+
+def ingest_shard(data_dir, shard, num_shards, parser_backend='auto'):
+    """Parse the filings already downloaded into a shard directory into its database."""
+    with shard_environment(shard_dir(data_dir, shard, num_shards)):
+        InsiderTrading.initialize_database()
+        InsiderTrading.process_form4_filings(bulk_load=True, parser_backend=parser_backend)
+
+def find_shard_databases(data_dir, num_shards=None):
+    """Return {shard directory name: database path} of the shards under data_dir, sorted by shard.
+
+    With num_shards, only that shard set is returned and a missing shard raises ValueError.
+    """
+    found = {}
+    for path in glob.glob(os.path.join(data_dir, SHARDS_DIR, '*', 'insider_trading.db')):
+        name = os.path.basename(os.path.dirname(path))
+        match = SHARD_DIR_PATTERN.match(name)
+        if match and (num_shards is None or int(match.group(2)) == num_shards):
+            found[(int(match.group(2)), int(match.group(1)))] = (name, path)
+    if num_shards is not None:
+        missing = [shard for shard in range(num_shards) if (num_shards, shard) not in found]
+        if missing:
+            raise ValueError(f"Missing shard databases for shards {missing} of {num_shards}")
+    return dict(found[key] for key in sorted(found))
+
+def accession_number(source_file):
+    """Return the accession number of a filing from its path (the name of its directory)."""
+    if not source_file:
+        return None
+    return os.path.basename(os.path.dirname(source_file)) or None
+
+def merge_shards(db_path, data_dir, shard_paths):
+    """Merge shard databases into the database at db_path.
+
+    `shard_paths` are the shard database paths; their order breaks ties
+    between rows of the same filing parsed at the same time.
+    Returns a dictionary of row counts: rows read, inserted, duplicates
+    across shards, already present in the target and conflicting.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.create_function('accession_number', 1, accession_number, deterministic=True)
+    column_list = ', '.join(MERGE_COLUMNS)
+    try:
+        conn.execute(f"CREATE TEMP TABLE merge_candidates ({column_list}, accession TEXT, shard INTEGER)")
+        conn.execute("CREATE TEMP TABLE merge_existing (accession TEXT PRIMARY KEY)")
+
+        # Filings already in the target, including the rows rolled into cold partitions
+        conn.execute('''
+        INSERT OR IGNORE INTO temp.merge_existing
+        SELECT accession_number(source_file) FROM main.insider_trading WHERE source_file IS NOT NULL
+        ''')
+        if partitions.partitions_for_range(conn):
+            _, rows = partitions.query_partitions(conn, data_dir, "source_file IS NOT NULL", [],
+                                                  'source_file', -1, columns=['source_file'])
+            conn.executemany("INSERT OR IGNORE INTO temp.merge_existing VALUES (?)",
+                             [(accession_number(row[0]),) for row in rows])
+
+        # Copy the shards' rows, attaching as many at a time as SQLite allows
+        shard_paths = list(shard_paths)
+        for start in range(0, len(shard_paths), partitions.MAX_ATTACHED):
+            group = list(enumerate(shard_paths[start:start + partitions.MAX_ATTACHED], start=start))
+            for shard, path in group:
+                conn.execute(f"ATTACH DATABASE ? AS shard_{shard}", (path,))
+            try:
+                for shard, _ in group:
+                    schema = f"shard_{shard}"
+                    available = set(partitions.table_columns(conn, schema))
+                    select_list = ', '.join(column if column in available else f'NULL AS {column}'
+                                            for column in MERGE_COLUMNS)
+                    # Rows without a source file can't be matched, so each one is its own key
+                    conn.execute(f'''
+                    INSERT INTO temp.merge_candidates
+                    SELECT {select_list},
+                           COALESCE(accession_number(source_file), 'shard-{shard}-row-' || rowid), {shard}
+                    FROM {schema}.insider_trading
+                    ''')
+                    # Issuers first seen in a shard's filings; the target's own entries win
+                    if conn.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE name = 'issuers'").fetchone():
+                        conn.execute(f'''
+                        INSERT OR IGNORE INTO main.issuers (cik, ticker, tickers, name, source, updated_at)
+                        SELECT cik, ticker, tickers, name, source, updated_at FROM {schema}.issuers
+                        ''')
+                conn.commit()
+            finally:
+                for shard, _ in group:
+                    conn.execute(f"DETACH DATABASE shard_{shard}")
+
+        conn.execute('''
+        CREATE TEMP TABLE merge_winners AS
+        SELECT * FROM (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY accession ORDER BY created_at DESC, shard, rowid) AS rank
+            FROM temp.merge_candidates
+        ) WHERE rank = 1
+        ''')
+        conn.execute("CREATE UNIQUE INDEX temp.merge_winners_accession ON merge_winners (accession)")
+
+        same_values = ' AND '.join(f"c.{column} IS w.{column}" for column in InsiderTrading.TRANSACTION_COLUMNS)
+        stats = {
+            'shards': len(shard_paths),
+            'rows': conn.execute("SELECT COUNT(*) FROM temp.merge_candidates").fetchone()[0],
+            'conflicts': conn.execute(f'''
+            SELECT COUNT(DISTINCT c.accession) FROM temp.merge_candidates c
+            JOIN temp.merge_winners w ON w.accession = c.accession
+            WHERE NOT ({same_values})
+            ''').fetchone()[0],
+            'existing': conn.execute('''
+            SELECT COUNT(*) FROM temp.merge_winners WHERE accession IN (SELECT accession FROM temp.merge_existing)
+            ''').fetchone()[0],
+        }
+        winners = conn.execute("SELECT COUNT(*) FROM temp.merge_winners").fetchone()[0]
+        stats['duplicates'] = stats['rows'] - winners
+        # Counted up front: inserts through the normalized schema's view report no rowcount
+        stats['inserted'] = winners - stats['existing']
+
+        with metrics.timer('insert'):
+            conn.execute(f'''
+            INSERT INTO main.insider_trading ({column_list})
+            SELECT {column_list} FROM temp.merge_winners
+            WHERE accession NOT IN (SELECT accession FROM temp.merge_existing)
+            ORDER BY transaction_date, accession
+            ''')
+        conn.commit()
+        metrics.incr('rows', stats['inserted'])
+        return stats
+    finally:
+        for table in ('merge_candidates', 'merge_existing', 'merge_winners'):
+            conn.execute(f"DROP TABLE IF EXISTS temp.{table}")
+        conn.close()
+
+def run_local(data_dir, num_shards, backfill_args, requests_per_second=InsiderTrading.SEC_MAX_REQUESTS_PER_SECOND):
+    """Run every shard of a backfill as a local process, then merge them into the main database.
+
+    The SEC rate limit applies per client, so it is split evenly between the
+    processes. Returns the merge statistics, or None when a shard failed.
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backfill.py')
+    per_shard = requests_per_second / num_shards
+    processes = [
+        subprocess.Popen([sys.executable, script, '--shard', f'{shard}/{num_shards}',
+                          '--requests-per-second', str(per_shard), '--no-export'] + list(backfill_args))
+        for shard in range(num_shards)
+    ]
+    failed = [shard for shard, process in enumerate(processes) if process.wait() != 0]
+    if failed:
+        print(f"ERROR: shards {failed} failed, not merging")
+        return None
+    InsiderTrading.initialize_database()
+    return merge_shards(InsiderTrading.DB_PATH, data_dir,
+                        find_shard_databases(data_dir, num_shards).values())
+
+def main(argv=None):
+    """Main function for the sharding commands."""
+    parser = argparse.ArgumentParser(description='Split ingestion into shards and merge the shard databases.')
+    parser.add_argument('command', choices=['assign', 'ingest', 'merge', 'run'],
+                        help='assign: print the tickers of a shard; ingest: parse the filings of a shard '
+                             'into its database; merge: merge shard databases into insider_trading.db; '
+                             'run: backfill every shard as a local process, then merge')
+    parser.add_argument('--shard', type=str,
+                        help='Shard as I/N (assign, ingest)')
+    parser.add_argument('--num-shards', type=int,
+                        help='Number of shards (merge: all of them must be present; default: every shard found)')
+    parser.add_argument('--tickers', type=str,
+                        help='Comma-separated tickers to assign instead of the universe')
+    parser.add_argument('--data-dir', type=str, default=InsiderTrading.DATA_DIR,
+                        help='Data directory holding insider_trading.db and shards/ (default: data)')
+    parser.add_argument('--parser', choices=('auto',) + tuple(form4_parser.BACKENDS),
+                        default='auto', help='XML parser backend for ingest (default: auto)')
+    parser.add_argument('--requests-per-second', type=float, default=InsiderTrading.SEC_MAX_REQUESTS_PER_SECOND,
+                        help='Total SEC request rate shared by the local shard processes (run)')
+    # run passes any other arguments on to backfill.py, e.g. --start-date 2015-01-01 --end-date 2024-12-31
+    args, backfill_args = parser.parse_known_args(argv)
+    if backfill_args and args.command != 'run':
+        parser.error(f"unrecognized arguments: {' '.join(backfill_args)}")
+
+    try:
+        if args.command in ('assign', 'ingest'):
+            shard, num_shards = parse_shard(args.shard)
+        elif args.command == 'run' and not args.num_shards:
+            raise ValueError("run needs --num-shards")
+        elif args.command == 'run' and os.path.abspath(args.data_dir) != os.path.abspath(InsiderTrading.DATA_DIR):
+            # backfill.py always writes under the default data directory
+            raise ValueError("run only supports the default --data-dir")
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 1
+
+    if args.command == 'assign':
+        if args.tickers:
+            tickers = [t.strip() for t in args.tickers.split(',') if t.strip()]
+        else:
+            tickers = universe.load_universe()
+        print(','.join(select_shard(tickers, shard, num_shards)))
+        return 0
+
+    if args.command == 'ingest':
+        ingest_shard(args.data_dir, shard, num_shards, parser_backend=args.parser)
+        return 0
+
+    # Record timings and counters of the merge in run_metrics.json
+    metrics.start_run('shards', os.path.join(args.data_dir, 'run_metrics.json'))
+    status = 1
+    try:
+        with shard_environment(args.data_dir), metrics.stage('merge'):
+            if args.command == 'run':
+                stats = run_local(args.data_dir, args.num_shards, backfill_args,
+                                  requests_per_second=args.requests_per_second)
+            else:
+                databases = find_shard_databases(args.data_dir, args.num_shards)
+                if not databases:
+                    raise ValueError(f"No shard databases found under {os.path.join(args.data_dir, SHARDS_DIR)}")
+                print(f"Merging shards {', '.join(databases)}")
+                InsiderTrading.initialize_database()
+                stats = merge_shards(InsiderTrading.DB_PATH, args.data_dir, databases.values())
+        if stats is not None:
+            print(f"Merged {stats['rows']} rows from {stats['shards']} shards: {stats['inserted']} inserted, "
+                  f"{stats['duplicates']} duplicates ({stats['conflicts']} conflicting), "
+                  f"{stats['existing']} already in the database")
+            status = 0
+    except (ValueError, sqlite3.Error) as e:
+        print(f"ERROR: {e}")
+    finally:
+        metrics.finish_run('ok' if status == 0 else 'error')
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+Compact binary per-ticker snapshots for numerical workloads.
+
+Each data/json/{ticker}/snapshot.bin holds a ticker's transactions, oldest
+first, as fixed-width little-endian columns that can be mapped straight into
+NumPy arrays with no parsing:
+
+    header      64 bytes (see header_dtype())
+    date        int32    days since 1970-01-01 (MISSING_DATE when unknown)
+    shares      float64  (NaN when unknown, as for every float column)
+    price       float64
+    value       float64  shares * price
+    shares_after float64
+    owner       uint32   index into the dictionary's owners/owner_ciks
+    type        uint8    index into the dictionary's types
+    dictionary  UTF-8 JSON {"ticker", "owners", "owner_ciks", "types"}
+
+Every column starts on an 8-byte boundary. load_snapshot() uses numpy.memmap,
+so the pages of a snapshot are shared by every process that loads it.
+"""
+from datetime import date, datetime, timedelta
+import json
+import os
+import sqlite3
+
+import metrics
+import partitions
+
+# numpy is imported by the functions that need it
+
+SNAPSHOT_FILE = 'snapshot.bin'
+MAGIC = b'F4SNAP\x00\x00'
+VERSION = 1
+HEADER_SIZE = 64
+MISSING_DATE = -2 ** 31
+EPOCH = date(1970, 1, 1)
+
+# (name, dtype) of each column, in file order
+COLUMNS = (
+    ('date', '<i4'),
+    ('shares', '<f8'),
+    ('price', '<f8'),
+    ('value', '<f8'),
+    ('shares_after', '<f8'),
+    ('owner', '<u4'),
+    ('type', 'u1'),
+)
+
+def header_dtype():
+    """Return the NumPy dtype of the 64-byte header."""
+    import numpy as np
+    return np.dtype([
+        ('magic', 'S8'),
+        ('version', '<u4'),
+        ('rows', '<u4'),
+        ('dictionary_offset', '<u8'),
+        ('dictionary_length', '<u4'),
+        ('reserved', 'V36'),
+    ])
+
+def _aligned(offset):
+    return (offset + 7) // 8 * 8
+
+def column_offsets(rows):
+    """Return {column: byte offset} and the offset of the dictionary for a row count."""
+    import numpy as np
+    offsets = {}
+    offset = HEADER_SIZE
+    for name, dtype in COLUMNS:
+        offsets[name] = offset
+        offset = _aligned(offset + rows * np.dtype(dtype).itemsize)
+    return offsets, offset
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+def _days(value):
+    try:
+        return (datetime.strptime(value[:10], '%Y-%m-%d').date() - EPOCH).days
+    except (TypeError, ValueError):
+        return MISSING_DATE
+
+def encode_snapshot(ticker, records):
+    """Return the snapshot bytes for a ticker's transaction records (dicts of insider_trading columns)."""
+    import numpy as np
+
+    records = sorted(records, key=lambda record: record['transaction_date'] or '')
+    rows = len(records)
+    owners = {}
+    types = {}
+    for record in records:
+        owners.setdefault((record['reporting_owner'], record['reporting_owner_cik']), len(owners))
+        types.setdefault(record['transaction_type'], len(types))
+
+    shares = np.array([_number(record['transaction_shares']) for record in records], dtype='<f8')
+    price = np.array([_number(record['transaction_price']) for record in records], dtype='<f8')
+    columns = {
+        'date': np.array([_days(record['transaction_date']) for record in records], dtype='<i4'),
+        'shares': shares,
+        'price': price,
+        'value': shares * price,
+        'shares_after': np.array([_number(record['shares_after_transaction']) for record in records], dtype='<f8'),
+        'owner': np.array([owners[(record['reporting_owner'], record['reporting_owner_cik'])] for record in records],
+                          dtype='<u4'),
+        'type': np.array([types[record['transaction_type']] for record in records], dtype='u1'),
+    }
+    dictionary = json.dumps({
+        'ticker': ticker,
+        'owners': [owner for owner, _ in owners],
+        'owner_ciks': [cik for _, cik in owners],
+        'types': list(types),
+    }, separators=(',', ':')).encode('utf-8')
+
+    offsets, dictionary_offset = column_offsets(rows)
+    buffer = bytearray(dictionary_offset + len(dictionary))
+    header = np.zeros(1, dtype=header_dtype())
+    header['magic'] = MAGIC
+    header['version'] = VERSION
+    header['rows'] = rows
+    header['dictionary_offset'] = dictionary_offset
+    header['dictionary_length'] = len(dictionary)
+    buffer[:HEADER_SIZE] = header.tobytes()
+    for name, dtype in COLUMNS:
+        data = columns[name].astype(dtype, copy=False).tobytes()
+        buffer[offsets[name]:offsets[name] + len(data)] = data
+    buffer[dictionary_offset:] = dictionary
+    return bytes(buffer)
+
+def write_snapshot(path, data):
+    """Write snapshot bytes atomically; returns False when the file already has this content.
+
+    Replacing (rather than rewriting) the file keeps existing memory maps valid.
+    """
+    if os.path.exists(path) and os.path.getsize(path) == len(data):
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+    return True
+
+def load_snapshot(path, use_mmap=True):
+    """Load a snapshot as a dictionary of NumPy arrays plus its 'dictionary' and 'ticker'.
+
+    With use_mmap the arrays are read-only views of a shared memory map;
+    otherwise the file is read into memory once and viewed with np.frombuffer.
+    """
+    import numpy as np
+
+    if use_mmap:
+        buffer = np.memmap(path, dtype='u1', mode='r')
+    else:
+        with open(path, 'rb') as f:
+            buffer = np.frombuffer(f.read(), dtype='u1')
+
+    header = buffer[:HEADER_SIZE].view(header_dtype())[0]
+    # 'S8' fields drop trailing NUL bytes
+    if header['magic'] != MAGIC.rstrip(b'\x00'):
+        raise ValueError(f"{path} is not a Form 4 snapshot")
+    if header['version'] != VERSION:
+        raise ValueError(f"{path} has unsupported snapshot version {header['version']}")
+
+    rows = int(header['rows'])
+    offsets, _ = column_offsets(rows)
+    snapshot = {}
+    for name, dtype in COLUMNS:
+        size = rows * np.dtype(dtype).itemsize
+        snapshot[name] = buffer[offsets[name]:offsets[name] + size].view(dtype)
+    start = int(header['dictionary_offset'])
+    dictionary = json.loads(bytes(buffer[start:start + int(header['dictionary_length'])]))
+    snapshot['dictionary'] = dictionary
+    snapshot['ticker'] = dictionary['ticker']
+    return snapshot
+
+def load_universe(json_dir, tickers=None, use_mmap=True):
+    """Load the snapshots of many tickers (default: every ticker that has one) as {ticker: snapshot}."""
+    if tickers is None:
+        tickers = sorted(entry.name for entry in os.scandir(json_dir)
+                         if entry.is_dir() and os.path.exists(os.path.join(entry.path, SNAPSHOT_FILE)))
+    return {ticker: load_snapshot(os.path.join(json_dir, ticker, SNAPSHOT_FILE), use_mmap=use_mmap)
+            for ticker in tickers}
+
+def export_snapshots(db_path, data_dir, json_dir, retention_years=10):
+    """Write a snapshot for every ticker with its transactions inside the retention horizon.
+
+    Returns the number of snapshots written (unchanged snapshots are left untouched).
+    """
+    conn = sqlite3.connect(db_path)
+    cutoff = (datetime.now() - timedelta(days=365 * retention_years)).strftime('%Y-%m-%d')
+    tickers = [row[0] for row in conn.execute(
+        "SELECT DISTINCT issuer_ticker FROM insider_trading WHERE issuer_ticker IS NOT NULL")]
+
+    written = 0
+    for ticker in tickers:
+        columns, rows = partitions.query_partitions(
+            conn, data_dir, "issuer_ticker = ? AND transaction_date >= ?", [ticker, cutoff],
+            'transaction_date DESC', -1, date_from=cutoff,
+            columns=['transaction_date', 'transaction_shares', 'transaction_price', 'shares_after_transaction',
+                     'reporting_owner', 'reporting_owner_cik', 'transaction_type'])
+        data = encode_snapshot(ticker, [dict(zip(columns, row)) for row in rows])
+
+        company_dir = os.path.join(json_dir, ticker)
+        os.makedirs(company_dir, exist_ok=True)
+        path = os.path.join(company_dir, SNAPSHOT_FILE)
+        if write_snapshot(path, data):
+            written += 1
+            metrics.record_file(path, rows=len(rows))
+        else:
+            metrics.incr('cache_hits')
+
+    conn.close()
+    print(f"Exported binary snapshots for {len(tickers)} companies ({written} changed)")
+    return written
@@ -0,0 +1,230 @@
+"""
+Read-only SQLite snapshot of the whole dataset, for SQL over HTTP range requests.
+
+data/json/insider_trading.sqlite3 holds every transaction (hot and cold) in
+one compact database. Clients that read SQLite pages over HTTP range requests
+(e.g. sql.js-httpvfs in a browser) download only the pages a query touches,
+instead of crawling the JSON directories. The layout keeps that number small:
+
+    - PAGE_SIZE-byte pages, written by VACUUM INTO with no free pages and in
+      rollback-journal mode (WAL files can't be read remotely)
+    - rows stored in (issuer_ticker, transaction_date) order, so one
+      company's transactions sit on neighbouring pages
+    - numbers stored as REAL, with transaction_value = shares * price
+    - covering indexes for the common lookups: a company by date, an insider
+      (owner CIK) by date, and the largest transactions by value
+    - ANALYZE statistics, and a `metadata` table (schema version, row count,
+      date span, ...) that a client can read first
+
+The snapshot is rebuilt from scratch and replaced atomically; when its data
+hasn't changed the existing file is kept, so its hash in manifest.json stays
+the same.
+
+Usage:
+    python sqlite_snapshot.py [--output data/json/insider_trading.sqlite3]
+"""
+from datetime import datetime
+from urllib.parse import quote
+import argparse
+import hashlib
+import os
+import sqlite3
+
+import metrics
+import partitions
+
+SNAPSHOT_FILE = 'insider_trading.sqlite3'
+SCHEMA_VERSION = 1
+
+# Every remote read fetches whole pages: 4 KiB keeps the bytes wasted per
+# lookup low while an index probe still only needs a few requests
+PAGE_SIZE = 4096
+
+# (column, type) of the snapshot's insider_trading table
+COLUMNS = (
+    ('id', 'INTEGER'),
+    ('issuer_ticker', 'TEXT'),
+    ('issuer_cik', 'TEXT'),
+    ('issuer_name', 'TEXT'),
+    ('reporting_owner', 'TEXT'),
+    ('reporting_owner_cik', 'TEXT'),
+    ('reporting_owner_position', 'TEXT'),
+    ('transaction_date', 'TEXT'),
+    ('transaction_type', 'TEXT'),
+    ('transaction_shares', 'REAL'),
+    ('transaction_price', 'REAL'),
+    ('transaction_value', 'REAL'),
+    ('shares_after_transaction', 'REAL'),
+)
+
+INDEXES = {
+    # WHERE issuer_ticker = ? AND transaction_date BETWEEN ? AND ? (counts and values from the index alone)
+    'idx_ticker_date': 'issuer_ticker, transaction_date, transaction_type, transaction_value',
+    # WHERE reporting_owner_cik = ? ORDER BY transaction_date
+    'idx_owner_date': 'reporting_owner_cik, transaction_date, issuer_ticker, transaction_type, transaction_value',
+    # ORDER BY transaction_value DESC LIMIT ?
+    'idx_value': 'transaction_value, transaction_date, issuer_ticker',
+}
+
+# Source columns read from the hot and cold databases
+SOURCE_COLUMNS = ('id', 'issuer_ticker', 'issuer_cik', 'issuer_name', 'reporting_owner', 'reporting_owner_cik',
+                  'reporting_owner_position', 'transaction_date', 'transaction_type', 'transaction_shares',
+                  'transaction_price', 'shares_after_transaction')
+
+def to_number(value):
+    """Return a stored share count or price as a float, or None when it isn't numeric."""
+    if value is None:
+        return None
+    try:
+        return float(str(value).replace(',', ''))
+    except ValueError:
+        return None
+
+def connect(path):
+    """Open a snapshot read-only (and as immutable, so no locks or journal are looked for)."""
+    return sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro&immutable=1", uri=True)
+
+def read_metadata(path):
+    """Return the metadata table of a snapshot as a dictionary, or None when it can't be read."""
+    try:
+        conn = connect(path)
+        try:
+            return dict(conn.execute("SELECT key, value FROM metadata"))
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+def _load_rows(conn, db_path, data_dir):
+    """Copy the hot and cold rows into the staging table (numbers converted, in no particular order)."""
+    source = sqlite3.connect(db_path)
+    try:
+        sources = [db_path] + [os.path.join(data_dir, partition['path'])
+                               for partition in partitions.partitions_for_range(source)]
+    finally:
+        source.close()
+
+    conn.execute(f"CREATE TABLE staging ({', '.join(f'{name} {kind}' for name, kind in COLUMNS)})")
+    for path in sources:
+        conn.execute("ATTACH DATABASE ? AS source", (path,))
+        try:
+            available = set(partitions.table_columns(conn, 'source'))
+            select = {column: column if column in available else 'NULL' for column in SOURCE_COLUMNS}
+            conn.execute(f'''
+            INSERT INTO staging ({', '.join(name for name, _ in COLUMNS)})
+            SELECT {select['id']}, {select['issuer_ticker']}, {select['issuer_cik']}, {select['issuer_name']},
+                   {select['reporting_owner']}, {select['reporting_owner_cik']},
+                   {select['reporting_owner_position']}, {select['transaction_date']}, {select['transaction_type']},
+                   to_number({select['transaction_shares']}), to_number({select['transaction_price']}),
+                   to_number({select['transaction_shares']}) * to_number({select['transaction_price']}),
+                   to_number({select['shares_after_transaction']})
+            FROM source.insider_trading
+            WHERE {select['issuer_ticker']} IS NOT NULL
+            ''')
+            conn.commit()
+        finally:
+            conn.execute("DETACH DATABASE source")
+    return len(sources) - 1
+
+def _data_hash(conn):
+    """Return a SHA-256 over the snapshot rows, used to skip replacing an unchanged snapshot."""
+    digest = hashlib.sha256()
+    for row in conn.execute("SELECT * FROM insider_trading ORDER BY rowid"):
+        digest.update(repr(row).encode('utf-8'))
+    return digest.hexdigest()
+
+def build_snapshot(db_path, data_dir, output_path):
+    """Build the snapshot of a database (and its cold partitions) at output_path.
+
+    Returns True when the file was written, False when the existing snapshot
+    already holds the same data.
+    """
+    build_path = f"{output_path}.build.tmp"
+    temp_path = f"{output_path}.tmp"
+    for path in (build_path, temp_path):
+        if os.path.exists(path):
+            os.remove(path)
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    conn = sqlite3.connect(build_path)
+    try:
+        # The page size has to be set before the first table; VACUUM INTO keeps it
+        conn.execute(f"PRAGMA page_size = {PAGE_SIZE}")
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.create_function('to_number', 1, to_number, deterministic=True)
+
+        with metrics.timer('load'):
+            cold_partitions = _load_rows(conn, db_path, data_dir)
+
+        with metrics.timer('layout'):
+            conn.execute(f"CREATE TABLE insider_trading ({', '.join(f'{name} {kind}' for name, kind in COLUMNS)})")
+            # Clustered by company and date: a company's rows sit on neighbouring pages
+            conn.execute('''
+            INSERT INTO insider_trading SELECT * FROM staging
+            ORDER BY issuer_ticker, transaction_date, id
+            ''')
+            conn.execute("DROP TABLE staging")
+            for name, columns in INDEXES.items():
+                conn.execute(f"CREATE INDEX {name} ON insider_trading ({columns})")
+
+        data_hash = _data_hash(conn)
+        previous = read_metadata(output_path) if os.path.exists(output_path) else None
+        if previous and previous.get('data_sha256') == data_hash \
+                and previous.get('schema_version') == str(SCHEMA_VERSION):
+            metrics.incr('cache_hits')
+            return False
+
+        row_count, ticker_count, first_date, last_date = conn.execute('''
+        SELECT COUNT(*), COUNT(DISTINCT issuer_ticker), MIN(transaction_date), MAX(transaction_date)
+        FROM insider_trading
+        ''').fetchone()
+        metadata = {
+            'schema_version': SCHEMA_VERSION,
+            'generated_at': datetime.now().isoformat(),
+            'row_count': row_count,
+            'ticker_count': ticker_count,
+            'first_date': first_date,
+            'last_date': last_date,
+            'cold_partitions': cold_partitions,
+            'page_size': PAGE_SIZE,
+            'data_sha256': data_hash,
+        }
+        conn.execute("CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID")
+        conn.executemany("INSERT INTO metadata VALUES (?, ?)",
+                         [(key, None if value is None else str(value)) for key, value in metadata.items()])
+        conn.execute("ANALYZE")
+        conn.commit()
+
+        with metrics.timer('vacuum'):
+            conn.execute("VACUUM INTO ?", (temp_path,))
+    finally:
+        conn.close()
+        if os.path.exists(build_path):
+            os.remove(build_path)
+
+    os.replace(temp_path, output_path)
+    metrics.record_file(output_path, rows=row_count)
+    return True
+
+def main(argv=None):
+    """Main function to build the SQLite snapshot."""
+    import export_json
+
+    parser = argparse.ArgumentParser(description='Build a read-only SQLite snapshot of the whole dataset.')
+    parser.add_argument('--output', type=str, default=os.path.join(export_json.JSON_DIR, SNAPSHOT_FILE),
+                        help=f'Snapshot path (default: data/json/{SNAPSHOT_FILE})')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(export_json.DB_PATH):
+        print(f"Error: SQLite database not found at {export_json.DB_PATH}")
+        return 1
+    written = build_snapshot(export_json.DB_PATH, export_json.DATA_DIR, args.output)
+    metadata = read_metadata(args.output)
+    print(f"{'Wrote' if written else 'Unchanged'} {args.output}: {metadata['row_count']} rows, "
+          f"{os.path.getsize(args.output)} bytes")
+    return 0
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
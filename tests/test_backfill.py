@@ -0,0 +1,112 @@
+"""
+Tests for the backfill.py script.
+"""
+import os
+import sqlite3
+import pytest
+from unittest.mock import patch, MagicMock
+import sys
+
+# Add the parent directory to the path so we can import from the main script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import backfill
+
+class TestBackfill:
+
+    def test_generate_date_chunks(self):
+        """Test that date chunks cover the whole range without overlapping."""
+        chunks = backfill.generate_date_chunks('2024-01-15', '2024-12-31', chunk_months=3)
+
+        assert chunks[0] == ('2024-01-15', '2024-04-15')
+        assert chunks[1][0] == '2024-04-16'
+        assert chunks[-1][1] == '2024-12-31'
+        assert len(chunks) == 4
+
+    def test_state_seeding_is_idempotent(self, tmp_path):
+        """Test that re-seeding keeps the progress of finished tasks."""
+        conn = sqlite3.connect(os.path.join(tmp_path, 'state.db'))
+        backfill.initialize_state(conn)
+        chunks = [('2024-01-01', '2024-03-31'), ('2024-04-01', '2024-06-30')]
+
+        backfill.seed_state(conn, chunks, ['AAPL', 'MSFT'])
+        backfill.update_task(conn, ('2024-01-01', '2024-03-31', 'AAPL'), backfill.STATUS_DONE, filings=3)
+        backfill.seed_state(conn, chunks, ['AAPL', 'MSFT'])
+
+        tasks = backfill.pending_tasks(conn, chunks, ['AAPL', 'MSFT'])
+        assert len(tasks) == 3
+        assert ('2024-01-01', '2024-03-31', 'AAPL') not in tasks
+        assert backfill.summarize_state(conn) == {'done': 1, 'pending': 3}
+        conn.close()
+
+    def test_failed_tasks_are_retried_up_to_max_attempts(self, tmp_path):
+        """Test that failed tasks stay eligible until they run out of attempts."""
+        conn = sqlite3.connect(os.path.join(tmp_path, 'state.db'))
+        backfill.initialize_state(conn)
+        chunks = [('2024-01-01', '2024-03-31')]
+        task = ('2024-01-01', '2024-03-31', 'AAPL')
+        backfill.seed_state(conn, chunks, ['AAPL'])
+
+        for _ in range(2):
+            backfill.update_task(conn, task, backfill.STATUS_ERROR, error='HTTP 503')
+        assert backfill.pending_tasks(conn, chunks, ['AAPL'], max_attempts=3) == [task]
+
+        backfill.update_task(conn, task, backfill.STATUS_ERROR, error='HTTP 503')
+        assert backfill.pending_tasks(conn, chunks, ['AAPL'], max_attempts=3) == []
+        conn.close()
+
+    def test_run_backfill_resumes_and_exports_once(self, tmp_path):
+        """Test that a second run only downloads unfinished tasks and exports once per run."""
+        test_db_path = os.path.join(tmp_path, 'test_insider_trading.db')
+        calls = []
+
+        def fake_download(dl, ticker, start_date, end_date):
+            calls.append((ticker, start_date))
+            if ticker == 'MSFT' and len([c for c in calls if c[0] == 'MSFT']) == 1:
+                raise Exception("Connection reset")
+            return 2
+
+        with patch('InsiderTrading.DB_PATH', test_db_path), \
+             patch('InsiderTrading.DATA_DIR', str(tmp_path)), \
+             patch('InsiderTrading.create_downloader', MagicMock()), \
+             patch('InsiderTrading.refresh_issuers'), \
+             patch('InsiderTrading.download_form4_filings', side_effect=fake_download), \
+             patch('InsiderTrading.process_form4_filings') as mock_process, \
+             patch('export_json.main') as mock_export:
+
+            summary = backfill.run_backfill('2024-01-01', '2024-06-30', chunk_months=3,
+                                            tickers=['AAPL', 'MSFT'], workers=1,
+                                            requests_per_second=0)
+            assert summary == {'done': 3, 'error': 1}
+            assert len(calls) == 4
+
+            # The second run only retries the failed task
+            summary = backfill.run_backfill('2024-01-01', '2024-06-30', chunk_months=3,
+                                            tickers=['AAPL', 'MSFT'], workers=1,
+                                            requests_per_second=0)
+            assert summary == {'done': 4}
+            assert len(calls) == 5
+
+        assert mock_process.call_count == 2
+        assert mock_export.call_count == 2
+
+    def test_full_mode_requests_wait_on_the_shared_limiter(self, tmp_path):
+        """Test that every sec-edgar-downloader request, not each task, acquires the shared limiter."""
+        import InsiderTrading
+        from sec_edgar_downloader import _orchestrator, _sec_gateway
+
+        first_limiter, limiter = MagicMock(), MagicMock()
+        with patch.dict(_orchestrator.__dict__), \
+             patch.object(_sec_gateway, '_call_sec') as mock_call, \
+             patch('InsiderTrading.DATA_DIR', str(tmp_path)):
+            # Each Downloader fetches the ticker map when it's created; a second one doesn't wrap twice
+            InsiderTrading.create_downloader(fetch_mode='full', limiter=first_limiter)
+            InsiderTrading.create_downloader(fetch_mode='full', limiter=limiter)
+
+            _orchestrator.get_list_of_available_filings('https://data.sec.gov/submissions', 'agent')
+            _orchestrator.download_filing('https://www.sec.gov/filing-1', 'agent')
+            _orchestrator.download_filing('https://www.sec.gov/filing-2', 'agent')
+
+        assert first_limiter.acquire.call_count == 1
+        assert limiter.acquire.call_count == 4
+        assert mock_call.call_count == 5
+        assert _orchestrator.download_filing is _sec_gateway.download_filing
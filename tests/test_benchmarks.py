@@ -0,0 +1,98 @@
+"""
+Tests for the benchmark corpus generator and harness.
+"""
+import os
+import json
+import pytest
+import sys
+
+# Add the parent directory to the path so we can import from the main script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import InsiderTrading
+from benchmarks import corpus, run_benchmarks, scale_universe, serializers
+
+class TestBenchmarks:
+
+    def test_generate_corpus_layout(self, tmp_path):
+        """Test that the generator writes parseable filings in the sec-edgar-filings layout."""
+        paths = corpus.generate_corpus(str(tmp_path), n_filings=12, n_issuers=6, seed=1)
+
+        assert len(paths) == 12
+        for path in paths:
+            parts = os.path.relpath(path, tmp_path).split(os.sep)
+            assert parts[0] == 'sec-edgar-filings'
+            assert parts[2] == '4'
+            assert parts[4] == 'primary-document.xml'
+            assert os.path.exists(os.path.join(os.path.dirname(path), 'full-submission.txt'))
+
+        records = [InsiderTrading.parse_form4_file(path) for path in paths]
+        tickers = {record['issuer_ticker'] for record in records}
+        assert 'LEN, LEN.B' in tickers
+        assert 'NCLH]' in tickers
+        assert all(record['transaction_date'] for record in records)
+
+    def test_generate_corpus_is_reproducible(self, tmp_path):
+        """Test that the same seed produces byte-identical filings, dated up to the fixed end date."""
+        first = corpus.generate_corpus(os.path.join(tmp_path, 'a'), 5, 3, seed=7)
+        second = corpus.generate_corpus(os.path.join(tmp_path, 'b'), 5, 3, seed=7)
+
+        for path_a, path_b in zip(first, second):
+            with open(path_a) as fa, open(path_b) as fb:
+                assert fa.read() == fb.read()
+            # Not today's date: a run on another day gets the same corpus
+            assert InsiderTrading.parse_form4_file(path_a)['transaction_date'] <= corpus.CORPUS_END_DATE.isoformat()
+
+    def test_run_benchmarks_writes_results(self, tmp_path):
+        """Test that a small benchmark run times every stage and writes JSON results."""
+        output = os.path.join(tmp_path, 'results.json')
+        assert run_benchmarks.main(['--scales', '20', '--issuers', '4', '--output', output]) == 0
+
+        with open(output) as f:
+            results = json.load(f)
+
+        scale = results['scales'][0]
+        assert scale['filings'] == 20
+        assert scale['json_bytes'] > 0
+        for stage in ('discovery', 'parse', 'insert', 'ingest', 'export_company_transactions', 'export_holdings',
+                      'rollover'):
+            assert stage in scale['stages']
+        assert scale['stages']['parse']['items'] == 20
+        assert scale['stages']['parse_etree']['items_per_sec'] > 0
+        assert scale['stages']['export_company_transactions']['bytes_written'] > 0
+        assert scale['stages']['server_filtered_queries']['p99_ms'] > 0
+
+    def test_scale_universe_projects_the_daily_run(self, tmp_path):
+        """Test that the universe benchmark counts requests and only fetches new members after churn."""
+        output = os.path.join(tmp_path, 'universe.json')
+        assert scale_universe.main(['--issuers', '40', '--filings-per-issuer', '2', '--churn', '0.1',
+                                    '--output', output]) == 0
+
+        with open(output) as f:
+            result = json.load(f)['universe']
+        stages = result['stages']
+        # One submissions request per member plus one per document
+        assert stages['download']['requests'] == 40 + 80
+        assert stages['ingest']['items'] == 80
+        # After 4 members were replaced, only the newcomers' documents are fetched
+        assert stages['universe_resync']['removed'] == 4
+        assert (stages['download_after_churn']['filings'], stages['download_after_churn']['requests']) == (8, 40 + 8)
+        assert result['projection']['within_job_limit']
+
+    def test_serializer_benchmark_compares_backends(self, tmp_path):
+        """Test that the serializer benchmark times every backend on a ticker's largest file."""
+        json_dir = os.path.join(tmp_path, 'json')
+        os.makedirs(os.path.join(json_dir, 'AAPL', 'quarterly'))
+        transactions = [{'id': i, 'reporting_owner': 'Müller, Jörg', 'reporting_owner_position': None,
+                         'transaction_date': '2025-01-15', 'transaction_shares': str(i * 100)} for i in range(50)]
+        for name, count in (('transactions.json', 10), (os.path.join('quarterly', '2025-Q1.json'), 50)):
+            with open(os.path.join(json_dir, 'AAPL', name), 'w') as f:
+                json.dump({'ticker': 'AAPL', 'count': count, 'transactions': transactions[:count]}, f, indent=2)
+        output = os.path.join(tmp_path, 'serializers.json')
+        assert serializers.main(['--json-dir', json_dir, '--tickers', 'AAPL,NOPE', '--repeat', '2',
+                                 '--output', output]) == 0
+
+        with open(output) as f:
+            [result] = json.load(f)['files']
+        assert result['file'].endswith('2025-Q1.json') and result['rows'] == 50
+        assert set(result['seconds']) == {'pandas_stdlib', *serializers.serializer.available_backends()}
+        assert all(result['identical'].values())
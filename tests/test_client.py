@@ -0,0 +1,93 @@
+"""
+Tests for the client.py API client, run against server.py on a local port.
+"""
+import os
+import asyncio
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import sys
+
+# Add the parent directory to the path so we can import from the main script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import client
+import server
+
+@pytest.fixture
+def api_url(test_db_path, tmp_path):
+    """Serve the test database with server.py on an ephemeral port and return its base URL."""
+    api = server.ApiServer(db_path=test_db_path, data_dir=str(tmp_path))
+    executor = ThreadPoolExecutor(max_workers=1)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    address = {}
+
+    async def start():
+        srv = await asyncio.start_server(
+            lambda reader, writer: api.handle_connection(reader, writer, executor), '127.0.0.1', 0)
+        address['port'] = srv.sockets[0].getsockname()[1]
+        address['server'] = srv
+        started.set()
+
+    thread = threading.Thread(target=lambda: (loop.run_until_complete(start()), loop.run_forever()), daemon=True)
+    thread.start()
+    started.wait(5)
+    yield f"http://127.0.0.1:{address['port']}/data/json"
+
+    loop.call_soon_threadsafe(address['server'].close)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+    executor.shutdown()
+    api.close()
+
+class TestClient:
+
+    def test_conditional_fetch_uses_cache(self, api_url, tmp_path):
+        """Test that a second fetch revalidates with the cached ETag and gets a 304."""
+        form4 = client.Form4Client(base_url=api_url, cache_dir=os.path.join(tmp_path, 'cache'))
+        first = form4.companies()
+        second = form4.companies()
+
+        assert first == second
+        assert first['count'] == 3
+        assert form4.stats == {'downloaded': 1, 'not_modified': 1, 'missing': 0}
+        assert os.path.exists(os.path.join(tmp_path, 'cache', 'companies.json.meta'))
+
+    def test_sync_rejects_paths_outside_the_cache(self, tmp_path):
+        """Test that a manifest entry like '../../x.json' fails the sync before anything is fetched."""
+        form4 = client.Form4Client(cache_dir=os.path.join(tmp_path, 'cache'))
+        manifest = {'files': {'AAPL/transactions.json': {'content_hash': 'a'}, '../../x.json': {'content_hash': 'b'}}}
+        with patch.object(form4, 'fetch', return_value=manifest) as mock_fetch, \
+             patch.object(form4, 'fetch_many') as mock_fetch_many:
+            with pytest.raises(ValueError):
+                form4.sync()
+        mock_fetch.assert_called_once_with('manifest.json')
+        mock_fetch_many.assert_not_called()
+        assert form4._cache_paths('AAPL/transactions.json')[0] == os.path.join(
+            os.path.realpath(tmp_path), 'cache', 'AAPL', 'transactions.json')
+
+    def test_missing_document(self, api_url, tmp_path):
+        """Test that a 404 returns None."""
+        form4 = client.Form4Client(base_url=api_url, cache_dir=os.path.join(tmp_path, 'cache'))
+        assert form4.transactions('NOPE') is None
+        assert form4.stats['missing'] == 1
+
+    def test_load_transactions_frame(self, api_url, tmp_path):
+        """Test that many tickers load concurrently into one typed DataFrame."""
+        form4 = client.Form4Client(base_url=api_url, cache_dir=os.path.join(tmp_path, 'cache'), max_workers=4)
+        df = form4.load_transactions(['AAPL', 'MSFT', 'GOOGL', 'NOPE'], quarters=['2024-Q4', '2025-Q1'])
+
+        assert len(df) == 10
+        assert set(df['ticker']) == {'AAPL', 'MSFT', 'GOOGL'}
+        assert str(df['transaction_date'].dtype).startswith('datetime64')
+        assert df['transaction_price'].dtype == float
+        assert df['transaction_type'].dtype == 'category'
+        assert df['transaction_date'].is_monotonic_decreasing
+
+        # A warm reload downloads nothing
+        warm = client.Form4Client(base_url=api_url, cache_dir=os.path.join(tmp_path, 'cache'), max_workers=4)
+        assert len(warm.load_transactions(['AAPL', 'MSFT', 'GOOGL', 'NOPE'], quarters=['2024-Q4', '2025-Q1'])) == 10
+        assert warm.stats['downloaded'] == 0
+        assert warm.stats['not_modified'] == 6
@@ -1,12 +1,14 @@
 """
 Tests for the export_json.py script.
 """
+import argparse
 import os
 import json
+import re
 import pytest
 import sqlite3
 import pandas as pd
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 from datetime import datetime
 import sys
 
@@ -14,6 +16,16 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import export_json
 
+def export_args(tmp_path, **overrides):
+    """Return parsed export_json arguments with the defaults and run metrics written under tmp_path."""
+    args = dict(detailed_years=3, quarterly_years=10, snapshots=False, sqlite=False, include_cold=False,
+                tickers=None, latest_count=export_json.LATEST_COUNT, rebuild_latest=False,
+                views=export_json.views.VIEWS_CONFIG, rebuild_views=False, gzip_months=False,
+                rebuild_months=False, rebuild_holdings=False, json_backend='auto', debug=True,
+                metrics=os.path.join(tmp_path, 'run_metrics.json'), profile=None, profile_mode='cprofile')
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
 class TestExportJson:
     
     def test_initialize_json_directory(self, test_db_path, test_json_dir):
@@ -120,6 +132,38 @@ class TestExportJson:
         assert isinstance(quarterly_data['quarter'], int)
         assert len(quarterly_data['transactions']) > 0
     
+    def test_export_backends_write_identical_files(self, test_db_path, test_json_dir):
+        """Test that every JSON backend writes the same transaction files and rows without a date are skipped."""
+        conn = sqlite3.connect(test_db_path)
+        conn.execute("""
+        INSERT INTO insider_trading (issuer_name, issuer_ticker, reporting_owner, transaction_date, transaction_type)
+        VALUES ('Apple Inc.', 'AAPL', 'Müller, Jörg', NULL, 'S')
+        """)
+        conn.commit()
+        conn.close()
+        
+        outputs = {}
+        for backend in export_json.serializer.available_backends():
+            json_dir = os.path.join(test_json_dir, backend)
+            with patch('export_json.DB_PATH', test_db_path), \
+                 patch('export_json.JSON_DIR', json_dir), \
+                 patch('export_json.serializer._backend', backend):
+                export_json.export_company_transactions()
+            outputs[backend] = {}
+            for root, _, names in os.walk(json_dir):
+                for name in names:
+                    path = os.path.join(root, name)
+                    with open(path, 'rb') as f:
+                        # Only last_updated differs between runs
+                        outputs[backend][os.path.relpath(path, json_dir)] = \
+                            re.sub(rb'"last_updated": "[^"]*"', b'', f.read())
+        
+        assert all(files == outputs['stdlib'] for files in outputs.values())
+        assert sorted(os.listdir(os.path.join(test_json_dir, 'stdlib', 'AAPL', 'quarterly'))) == [
+            '2024-Q4.json', '2025-Q1.json']
+        with open(os.path.join(test_json_dir, 'stdlib', 'AAPL', 'transactions.json')) as f:
+            assert json.load(f)['count'] == 5
+    
     def test_export_summary_data(self, test_db_path, test_json_dir):
         """Test exporting summary data."""
         # Patch dependencies
@@ -158,7 +202,7 @@ class TestExportJson:
         # Check recent transactions
         assert len(data['recent_transactions']) > 0
     
-    def test_main_function(self, test_db_path, test_json_dir):
+    def test_main_function(self, test_db_path, test_json_dir, tmp_path):
         """Test the main function."""
         # Patch dependencies and function calls
         with patch('export_json.DB_PATH', test_db_path), \
@@ -168,7 +212,7 @@ class TestExportJson:
              patch('export_json.export_company_transactions') as mock_transactions, \
              patch('export_json.export_summary_data') as mock_summary, \
              patch('os.path.exists', return_value=True), \
-             patch('argparse.ArgumentParser.parse_args', return_value=MagicMock()):  # Avoid argparse error
+             patch('argparse.ArgumentParser.parse_args', return_value=export_args(tmp_path)):  # Avoid argparse error
             
             # Run the main function
             export_json.main()
@@ -179,7 +223,7 @@ class TestExportJson:
         mock_transactions.assert_called_once()
         mock_summary.assert_called_once()
     
-    def test_missing_database_error(self, test_db_path, test_json_dir):
+    def test_missing_database_error(self, test_db_path, test_json_dir, tmp_path):
         """Test handling of missing database."""
         # Patch dependencies - ensure debug is False to avoid creating an empty DB
         with patch('export_json.DB_PATH', '/nonexistent/path.db'), \
@@ -187,7 +231,7 @@ class TestExportJson:
              patch('export_json.initialize_json_directory') as mock_init, \
              patch('export_json.export_companies_index') as mock_companies, \
              patch('argparse.ArgumentParser.parse_args', 
-                   return_value=MagicMock(debug=False)), \
+                   return_value=export_args(tmp_path, debug=False)), \
              patch.dict('os.environ', {}, clear=True):  # Ensure GITHUB_ACTIONS is not set
             
             # Run the main function
@@ -251,4 +295,98 @@ class TestExportJson:
             data = json.load(f)
         
         assert data['count'] == 0
-        assert len(data['companies']) == 0
\ No newline at end of file
+        assert len(data['companies']) == 0
+
+    def test_export_latest_is_incremental(self, test_db_path, test_json_dir):
+        """Test that latest.json holds the newest rows and is only rewritten for tickers with new rows."""
+        # A stale file in the legacy layout is replaced on the first export
+        os.makedirs(os.path.join(test_json_dir, 'MSFT'))
+        with open(os.path.join(test_json_dir, 'MSFT', 'latest.json'), 'w') as f:
+            json.dump({'ticker': 'MSFT', 'last_updated': '2025-04-15T13:58:22', 'count': 1, 'trades': []}, f)
+        
+        with patch('export_json.DB_PATH', test_db_path), \
+             patch('export_json.JSON_DIR', test_json_dir):
+            assert export_json.export_latest(count=2) == 3
+            
+            with open(os.path.join(test_json_dir, 'AAPL', 'latest.json')) as f:
+                data = json.load(f)
+            assert (data['ticker'], data['count']) == ('AAPL', 2)
+            assert [tx['transaction_date'] for tx in data['transactions']] == ['2025-03-10', '2025-02-20']
+            assert list(data['transactions'][0]) == list(export_json.TRANSACTION_EXPORT_COLUMNS)
+            with open(os.path.join(test_json_dir, 'MSFT', 'latest.json')) as f:
+                assert 'trades' not in json.load(f)
+            
+            # Nothing new: nothing rewritten
+            assert export_json.export_latest(count=2) == 0
+            
+            conn = sqlite3.connect(test_db_path)
+            conn.execute('''
+            INSERT INTO insider_trading (issuer_name, issuer_ticker, reporting_owner, transaction_date,
+                                         transaction_shares, transaction_price, transaction_type)
+            VALUES ('Microsoft Corp', 'MSFT', 'Smith, Brad', '2025-04-01', '1000', '400', 'S')
+            ''')
+            conn.commit()
+            conn.close()
+            # Only MSFT got a row; a deleted file is written again
+            os.remove(os.path.join(test_json_dir, 'GOOGL', 'latest.json'))
+            assert export_json.export_latest(count=2) == 2
+        
+        with open(os.path.join(test_json_dir, 'MSFT', 'latest.json')) as f:
+            data = json.load(f)
+        assert [tx['reporting_owner'] for tx in data['transactions']] == ['Smith, Brad', 'Hood, Amy']
+        
+        # GOOGL's rows move to GOOG: the stale GOOGL file goes away
+        conn = sqlite3.connect(test_db_path)
+        conn.execute("UPDATE insider_trading SET issuer_ticker = 'GOOG' WHERE issuer_ticker = 'GOOGL'")
+        conn.commit()
+        conn.close()
+        with patch('export_json.DB_PATH', test_db_path), \
+             patch('export_json.JSON_DIR', test_json_dir):
+            assert export_json.export_latest(count=2, rebuild=True) == 3
+        assert os.path.exists(os.path.join(test_json_dir, 'GOOG', 'latest.json'))
+        assert not os.path.exists(os.path.join(test_json_dir, 'GOOGL', 'latest.json'))
+
+    def test_export_views_are_incremental(self, test_db_path, test_json_dir, tmp_path):
+        """Test that declared views hold the matching rows of every company and merge new rows."""
+        config_path = os.path.join(tmp_path, 'views.json')
+        with open(config_path, 'w') as f:
+            json.dump({'views': [
+                {'name': 'large-sales', 'description': 'Sales over $1M', 'transaction_types': ['S'],
+                 'min_value': 1000000},
+                {'name': 'cfo', 'positions': ['cfo', 'Chief Financial'], 'limit': 2},
+            ]}, f)
+        views_dir = os.path.join(test_json_dir, 'views')
+        
+        with patch('export_json.DB_PATH', test_db_path), \
+             patch('export_json.JSON_DIR', test_json_dir):
+            assert export_json.export_views(config_path) == 2
+            
+            with open(os.path.join(views_dir, 'large-sales.json')) as f:
+                data = json.load(f)
+            assert [(tx['ticker'], tx['transaction_date']) for tx in data['transactions']] == \
+                [('AAPL', '2025-03-10'), ('AAPL', '2025-02-20'), ('MSFT', '2025-02-10'),
+                 ('MSFT', '2025-01-20'), ('AAPL', '2025-01-15'), ('GOOGL', '2025-01-05')]
+            assert data['transactions'][3]['value'] == 15000 * 380.50
+            with open(os.path.join(views_dir, 'cfo.json')) as f:
+                assert [tx['reporting_owner'] for tx in json.load(f)['transactions']] == ['Maestri, Luca', 'Hood, Amy']
+            
+            # Nothing new: nothing rewritten
+            assert export_json.export_views(config_path) == 0
+            
+            conn = sqlite3.connect(test_db_path)
+            conn.execute('''
+            INSERT INTO insider_trading (issuer_name, issuer_ticker, reporting_owner, reporting_owner_position,
+                                         transaction_date, transaction_shares, transaction_price, transaction_type)
+            VALUES ('Microsoft Corp', 'MSFT', 'Hood, Amy', 'EVP, Chief Financial Officer', '2025-04-01', '100',
+                    '400', 'S')
+            ''')
+            conn.commit()
+            conn.close()
+            # Only the CFO view matches the new row
+            assert export_json.export_views(config_path) == 1
+        
+        with open(os.path.join(views_dir, 'cfo.json')) as f:
+            data = json.load(f)
+        assert [tx['transaction_date'] for tx in data['transactions']] == ['2025-04-01', '2025-02-20']
+        with open(os.path.join(views_dir, 'index.json')) as f:
+            assert [(view['name'], view['count']) for view in json.load(f)['views']] == [('large-sales', 6), ('cfo', 2)]
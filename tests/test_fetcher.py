@@ -0,0 +1,139 @@
+"""
+Tests for the fetcher.py primary-document fetcher, against a fake EDGAR.
+"""
+import os
+import json
+import random
+import sqlite3
+import pytest
+from datetime import date
+from unittest.mock import patch
+import sys
+
+# Add the parent directory to the path so we can import from the main script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fetcher
+import issuers
+import InsiderTrading
+from benchmarks import corpus
+
+ARCHIVE = "https://www.sec.gov/Archives/edgar/data/1000000"
+
+class FakeResponse:
+    def __init__(self, content, status_code=200):
+        self.content = content if isinstance(content, bytes) else json.dumps(content).encode()
+        self.status_code = status_code
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+class FakeEdgar:
+    """Serves canned documents by URL and records the requested URLs."""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.requested = []
+
+    def get(self, url, timeout=None):
+        self.requested.append(url)
+        return FakeResponse(self.documents[url]) if url in self.documents else FakeResponse(b'', 404)
+
+def filing_xml(accession_number):
+    rng = random.Random(accession_number)
+    return corpus.form4_xml(rng, '0001000000', 'BRK.B', '0002000001', 'Doe Jane', 'CFO',
+                            date(2025, 1, 10), 2, 1).encode()
+
+def fake_edgar():
+    recent = {
+        'accessionNumber': ['0001-25-000003', '0001-25-000002', '0001-25-000001', '0001-24-000009'],
+        'filingDate': ['2025-01-20', '2025-01-12', '2025-01-10', '2024-12-30'],
+        'form': ['4', '4', '8-K', '4'],
+        'primaryDocument': ['xslF345X05/wk-form4_3.xml', '', 'doc.htm', 'xslF345X05/wk-form4_9.xml'],
+    }
+    older = {'accessionNumber': ['0001-19-000001'], 'filingDate': ['2019-03-01'], 'form': ['4'],
+             'primaryDocument': ['xslF345X03/old.xml']}
+    return FakeEdgar({
+        'https://data.sec.gov/submissions/CIK0001000000.json': {
+            'filings': {'recent': recent, 'files': [
+                {'name': 'CIK0001000000-submissions-001.json', 'filingFrom': '2018-01-01', 'filingTo': '2019-12-31'}]}},
+        'https://data.sec.gov/submissions/CIK0001000000-submissions-001.json': older,
+        f'{ARCHIVE}/000125000003/wk-form4_3.xml': filing_xml(3),
+        f'{ARCHIVE}/000125000002/index.json': {'directory': {'item': [
+            {'name': '0001-25-000002.txt'}, {'name': 'FilingSummary.xml'}, {'name': 'form4.xml'}]}},
+        f'{ARCHIVE}/000125000002/form4.xml': filing_xml(2),
+        f'{ARCHIVE}/000124000009/wk-form4_9.xml': filing_xml(9),
+        f'{ARCHIVE}/0001-25-000003.txt': b'<SEC-DOCUMENT>full submission</SEC-DOCUMENT>',
+    })
+
+class TestFetcher:
+
+    def _fetcher(self, tmp_path, edgar):
+        db_path = os.path.join(tmp_path, 'test.db')
+        conn = sqlite3.connect(db_path)
+        issuers.initialize_issuers(conn)
+        conn.execute("INSERT INTO issuers (cik, ticker, source) VALUES ('0001000000', 'BRK.B', 'sec')")
+        conn.commit()
+        conn.close()
+        dl = fetcher.PrimaryDocumentFetcher('test agent', str(tmp_path), db_path,
+                                            limiter=InsiderTrading.RateLimiter(0))
+        dl._session = lambda: edgar
+        return dl
+
+    def test_get_downloads_only_primary_xml(self, tmp_path):
+        """Test that only the ownership XML of Form 4s in the date range is downloaded."""
+        edgar = fake_edgar()
+        dl = self._fetcher(tmp_path, edgar)
+
+        downloaded = dl.get("4", "BRK-B", after='2025-01-01', before='2025-01-31', download_details=True,
+                            accession_numbers_to_skip=set())
+        assert downloaded == 2
+        # One listing request, the raw XML named by the submissions API, and the index for the unnamed one
+        assert edgar.requested == [
+            'https://data.sec.gov/submissions/CIK0001000000.json',
+            f'{ARCHIVE}/000125000003/wk-form4_3.xml',
+            f'{ARCHIVE}/000125000002/index.json',
+            f'{ARCHIVE}/000125000002/form4.xml',
+        ]
+
+        filing_dir = os.path.join(tmp_path, 'sec-edgar-filings', 'BRK-B', '4', '0001-25-000003')
+        assert os.listdir(filing_dir) == ['primary-document.xml']
+        record = InsiderTrading.parse_form4_file(os.path.join(filing_dir, 'primary-document.xml'))
+        assert record['issuer_cik'] == '0001000000'
+
+        # Already downloaded accessions are skipped; the older page is read only when the range reaches it
+        edgar.requested.clear()
+        with patch('InsiderTrading.DATA_DIR', str(tmp_path)):
+            assert InsiderTrading.download_form4_filings(dl, 'BRK-B', '2019-01-01', '2025-01-31') == 1
+        assert edgar.requested == [
+            'https://data.sec.gov/submissions/CIK0001000000.json',
+            'https://data.sec.gov/submissions/CIK0001000000-submissions-001.json',
+            f'{ARCHIVE}/000124000009/wk-form4_9.xml',
+            f'{ARCHIVE}/000119000001/old.xml',  # gone from EDGAR: nothing is written
+        ]
+        assert sorted(os.listdir(os.path.join(tmp_path, 'sec-edgar-filings', 'BRK-B', '4'))) == [
+            '0001-24-000009', '0001-25-000002', '0001-25-000003']
+
+    def test_full_submission_is_fetched_on_demand(self, tmp_path):
+        """Test that the full submission is only downloaded when asked for, and only once."""
+        edgar = fake_edgar()
+        dl = self._fetcher(tmp_path, edgar)
+        dl.get("4", "BRK-B", after='2025-01-15', before='2025-01-31')
+
+        filing_dir = os.path.join(tmp_path, 'sec-edgar-filings', 'BRK-B', '4', '0001-25-000003')
+        path = dl.fetch_full_submission(filing_dir)
+        assert open(path, 'rb').read() == b'<SEC-DOCUMENT>full submission</SEC-DOCUMENT>'
+        requests_made = len(edgar.requested)
+        dl.fetch_full_submission(filing_dir)
+        assert len(edgar.requested) == requests_made
+
+    def test_unknown_ticker(self, tmp_path):
+        """Test that a ticker missing from the issuer map is reported without any request."""
+        edgar = fake_edgar()
+        dl = self._fetcher(tmp_path, edgar)
+        with pytest.raises(ValueError, match='NOPE'):
+            dl.get("4", "NOPE", after='2025-01-01', before='2025-01-31')
+        assert edgar.requested == []
@@ -0,0 +1,125 @@
+"""
+Differential tests for the form4_parser.py backends.
+"""
+import os
+import pytest
+import xml.etree.ElementTree as ET
+import sys
+
+# Add the parent directory to the path so we can import from the main script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import form4_parser
+import InsiderTrading
+from benchmarks import corpus
+
+FAST_BACKENDS = [name for name in form4_parser.BACKENDS if name != 'legacy']
+
+# Documents that exercise the legacy parser's first-match and descendant-search behaviour
+EDGE_CASES = {
+    'empty': "<ownershipDocument></ownershipDocument>",
+    'two_owners_two_transactions': """<?xml version="1.0"?>
+<ownershipDocument>
+    <issuer><issuerCik>0000000042</issuerCik><issuerName>Smith &amp; Sons</issuerName>
+        <issuerTradingSymbol>SMS</issuerTradingSymbol></issuer>
+    <reportingOwner>
+        <reportingOwnerId><rptOwnerCik>0000000001</rptOwnerCik><rptOwnerName>Fund LP</rptOwnerName></reportingOwnerId>
+        <reportingOwnerRelationship><isTenPercentOwner>1</isTenPercentOwner></reportingOwnerRelationship>
+    </reportingOwner>
+    <reportingOwner>
+        <reportingOwnerId><rptOwnerCik>0000000002</rptOwnerCik><rptOwnerName>Doe Jane</rptOwnerName></reportingOwnerId>
+        <reportingOwnerRelationship><isOfficer>1</isOfficer><officerTitle>Chief Executive Officer</officerTitle></reportingOwnerRelationship>
+    </reportingOwner>
+    <nonDerivativeTable>
+        <nonDerivativeHolding><postTransactionAmounts><sharesOwnedFollowingTransaction><value>7</value></sharesOwnedFollowingTransaction></postTransactionAmounts></nonDerivativeHolding>
+        <nonDerivativeTransaction>
+            <transactionDate><value>2025-01-02</value></transactionDate>
+            <transactionCoding><transactionFormType>4</transactionFormType><transactionCode>S</transactionCode></transactionCoding>
+            <transactionAmounts><transactionShares><value>100</value></transactionShares>
+                <transactionPricePerShare><footnoteId id="F1"/></transactionPricePerShare></transactionAmounts>
+            <postTransactionAmounts><sharesOwnedFollowingTransaction><value> 900 </value></sharesOwnedFollowingTransaction></postTransactionAmounts>
+        </nonDerivativeTransaction>
+        <nonDerivativeTransaction>
+            <transactionDate><value>2025-01-03</value></transactionDate>
+            <transactionAmounts><transactionPricePerShare><value>12.5</value></transactionPricePerShare></transactionAmounts>
+        </nonDerivativeTransaction>
+    </nonDerivativeTable>
+</ownershipDocument>""",
+    'derivative_only': """<ownershipDocument>
+    <issuer><issuerTradingSymbol>ABC</issuerTradingSymbol></issuer>
+    <derivativeTable><derivativeTransaction><transactionDate><value>2025-02-01</value></transactionDate>
+        <transactionCoding><transactionCode>M</transactionCode></transactionCoding></derivativeTransaction></derivativeTable>
+</ownershipDocument>""",
+    'no_amount_wrappers': """<ownershipDocument><issuer><issuerName>Apple Inc.</issuerName></issuer>
+    <nonDerivativeTable><nonDerivativeTransaction><transactionDate><value>2025-03-15</value></transactionDate>
+    <transactionCode>S</transactionCode><transactionShares><value>5000</value></transactionShares>
+    <sharesOwnedFollowingTransaction><value>95000</value></sharesOwnedFollowingTransaction>
+    </nonDerivativeTransaction></nonDerivativeTable></ownershipDocument>""",
+    'empty_values': """<ownershipDocument><issuer><issuerName/><issuerTradingSymbol></issuerTradingSymbol></issuer>
+    <nonDerivativeTable><nonDerivativeTransaction><transactionDate><value/></transactionDate>
+    <transactionAmounts><transactionShares><value><![CDATA[1,000]]></value></transactionShares></transactionAmounts>
+    </nonDerivativeTransaction></nonDerivativeTable></ownershipDocument>""",
+}
+
+def _backend(name):
+    if not form4_parser.backend_available(name):
+        pytest.skip(f"{name} is not installed")
+    return form4_parser.get_parser(name)
+
+@pytest.fixture(scope='module')
+def fixture_corpus(tmp_path_factory):
+    """A seeded synthetic corpus plus the hand-written edge cases."""
+    data_dir = tmp_path_factory.mktemp('corpus')
+    paths = corpus.generate_corpus(str(data_dir), n_filings=300, n_issuers=20, seed=11)
+    for name, xml in EDGE_CASES.items():
+        path = os.path.join(data_dir, f'{name}.xml')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(xml)
+        paths.append(path)
+    return paths
+
+class TestForm4Parser:
+
+    @pytest.mark.parametrize('backend', FAST_BACKENDS)
+    def test_backends_match_legacy_parser(self, backend, fixture_corpus):
+        """Test that every backend returns the legacy parser's fields, field for field."""
+        parse = _backend(backend)
+        for path in fixture_corpus:
+            assert parse(path) == form4_parser.parse_legacy(path), path
+
+    def test_edge_case_values(self, tmp_path):
+        """Test the fields of the multi-owner, multi-transaction edge case."""
+        path = os.path.join(tmp_path, 'filing.xml')
+        with open(path, 'w') as f:
+            f.write(EDGE_CASES['two_owners_two_transactions'])
+        record = form4_parser.parse_etree(path)
+
+        assert record['issuer_name'] == 'Smith & Sons'
+        assert record['reporting_owner'] == 'Fund LP'
+        assert record['reporting_owner_position'] == 'Chief Executive Officer'
+        assert record['transaction_date'] == '2025-01-02'
+        assert record['transaction_price'] is None
+        assert record['shares_after_transaction'] == ' 900 '
+
+    @pytest.mark.parametrize('backend', list(form4_parser.BACKENDS))
+    def test_malformed_documents_raise_parse_error(self, backend, tmp_path):
+        """Test that every backend reports broken XML the same way."""
+        parse = _backend(backend)
+        path = os.path.join(tmp_path, 'broken.xml')
+        with open(path, 'w') as f:
+            f.write("<ownershipDocument><issuer>")
+        with pytest.raises(ET.ParseError):
+            parse(path)
+
+    def test_backend_selection(self, tmp_path):
+        """Test auto selection and the errors for unknown backends."""
+        assert form4_parser.get_parser('auto') in [form4_parser.get_parser(name)
+                                                   for name in form4_parser.available_backends()]
+        with pytest.raises(ValueError):
+            form4_parser.get_parser('sax')
+
+        path = os.path.join(tmp_path, 'filing.xml')
+        with open(path, 'w') as f:
+            f.write(EDGE_CASES['two_owners_two_transactions'])
+        record = InsiderTrading.parse_form4_file(path, backend='etree')
+        assert record['issuer_cik'] == '0000000042'
+        assert record['reported_ticker'] == 'SMS'
@@ -0,0 +1,92 @@
+"""
+Tests for the holdings.py per-insider holdings timelines.
+"""
+import os
+import json
+import sqlite3
+from unittest.mock import patch, MagicMock
+import sys
+
+# Add the parent directory to the path so we can import from the main script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import holdings
+import issuers
+import partitions
+
+def read_holdings(json_dir, ticker):
+    with open(os.path.join(json_dir, ticker, holdings.HOLDINGS_FILE)) as f:
+        return json.load(f)
+
+def add_row(conn, ticker, owner, cik, date, shares, shares_after, transaction_type='S'):
+    conn.execute('''
+    INSERT INTO insider_trading (issuer_name, issuer_ticker, reporting_owner, reporting_owner_cik,
+    reporting_owner_position, transaction_date, transaction_shares, transaction_price, transaction_type,
+    shares_after_transaction, source_file)
+    VALUES ('Test Co', ?, ?, ?, 'CEO', ?, ?, '10', ?, ?, 'test_file.xml')
+    ''', (ticker, owner, cik, date, shares, transaction_type, shares_after))
+    conn.commit()
+
+class TestHoldings:
+
+    def test_export_writes_timelines(self, test_db_path, test_json_dir):
+        """Test the holdings.json layout built from the fixture rows."""
+        conn = sqlite3.connect(test_db_path)
+        assert holdings.export_holdings(conn, os.path.dirname(test_db_path), test_json_dir) == 3
+
+        document = read_holdings(test_json_dir, 'AAPL')
+        assert document['fields'] == ['date', 'shares_after', 'type', 'shares']
+        assert [insider['owner'] for insider in document['insiders']] == [
+            'Cook, Tim', 'Maestri, Luca', 'Williams, Jeff']
+        cook = document['insiders'][0]
+        assert cook['owner_cik'] == '0001111111'
+        assert cook['points'] == [['2024-11-10', 490000, 'P', 5000], ['2025-01-15', 500000, 'S', 10000]]
+        assert (cook['first_date'], cook['last_date'], cook['latest_shares']) == ('2024-11-10', '2025-01-15', 500000)
+        conn.close()
+
+    def test_only_touched_series_are_updated(self, test_db_path, test_json_dir):
+        """Test that a new row only rewrites its own ticker and merges into the stored series."""
+        data_dir = os.path.dirname(test_db_path)
+        conn = sqlite3.connect(test_db_path)
+        holdings.export_holdings(conn, data_dir, test_json_dir)
+        msft_before = read_holdings(test_json_dir, 'MSFT')
+
+        add_row(conn, 'AAPL', 'Cook, Tim', '0001111111', '2024-12-01', '2000', '492000.0')
+        add_row(conn, 'AAPL', 'Cook, Tim', '0001111111', '2025-04-01', '1000', None)  # no holding reported
+        with patch('holdings.partitions.query_partitions') as mock_query:
+            assert holdings.export_holdings(conn, data_dir, test_json_dir) == 1
+        mock_query.assert_not_called()
+
+        cook = read_holdings(test_json_dir, 'AAPL')['insiders'][0]
+        assert [point[0] for point in cook['points']] == ['2024-11-10', '2024-12-01', '2025-01-15']
+        assert cook['points'][1][1] == 492000
+        assert read_holdings(test_json_dir, 'MSFT') == msft_before
+
+        # Nothing new: nothing is written
+        assert holdings.export_holdings(conn, data_dir, test_json_dir) == 0
+        conn.close()
+
+    def test_rebuild_after_reroute_and_rollover(self, test_db_path, test_json_dir):
+        """Test that moved tickers rebuild every series, including rows rolled into cold partitions."""
+        data_dir = os.path.dirname(test_db_path)
+        conn = sqlite3.connect(test_db_path)
+        conn.execute("ALTER TABLE insider_trading ADD COLUMN issuer_cik TEXT")
+        conn.execute("UPDATE insider_trading SET issuer_cik = '0001652044' WHERE issuer_ticker = 'GOOGL'")
+        conn.commit()
+        holdings.export_holdings(conn, data_dir, test_json_dir)
+        conn.close()
+        partitions.rollover(test_db_path, data_dir, hot_years=0)
+
+        # The rows now live in cold partitions only; the SEC map moves the CIK to GOOG
+        conn = sqlite3.connect(test_db_path)
+        assert conn.execute("SELECT COUNT(*) FROM insider_trading").fetchone()[0] == 0
+        response = MagicMock(status_code=200, headers={})
+        response.json.return_value = {'0': {'cik_str': 1652044, 'ticker': 'GOOG', 'title': 'Alphabet Inc.'}}
+        with patch('requests.get', return_value=response):
+            assert issuers.refresh_issuer_map(conn, 'test agent') == 1
+
+        holdings.export_holdings(conn, data_dir, test_json_dir)
+        assert read_holdings(test_json_dir, 'GOOGL')['insiders'] == []
+        assert [insider['owner'] for insider in read_holdings(test_json_dir, 'GOOG')['insiders']] == [
+            'Pichai, Sundar', 'Porat, Ruth']
+        assert len(read_holdings(test_json_dir, 'AAPL')['insiders']) == 3
+        conn.close()
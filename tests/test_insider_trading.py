@@ -58,7 +58,12 @@ class TestInsiderTrading:
         # Check tables
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
         tables = cursor.fetchall()
-        assert ('insider_trading',) in tables
+        for table in ('transactions', 'companies', 'owners', 'positions'):
+            assert (table,) in tables
+        
+        # insider_trading is the compatibility view over them
+        cursor.execute("SELECT type FROM sqlite_master WHERE name='insider_trading'")
+        assert cursor.fetchone() == ('view',)
         
         # Check indexes
         cursor.execute("SELECT name FROM sqlite_master WHERE type='index'")
@@ -191,4 +196,63 @@ class TestInsiderTrading:
         assert df.iloc[0]['transaction_price'] == "200.00"
         assert df.iloc[0]['transaction_type'] == "S"
         assert df.iloc[0]['shares_after_transaction'] == "95000"
-        assert df.iloc[0]['source_file'] == xml_file_path
\ No newline at end of file
+        assert df.iloc[0]['source_file'] == xml_file_path
+
+    def test_bulk_load_processing(self, tmp_path):
+        """Test that bulk-load mode inserts every file and restores indexes and journal mode."""
+        test_data_dir = os.path.join(tmp_path, "data")
+        os.makedirs(test_data_dir, exist_ok=True)
+        xml_files = []
+        for i in range(5):
+            xml_file_path = os.path.join(test_data_dir, f"form4_{i}.xml")
+            with open(xml_file_path, "w") as f:
+                f.write(f"""
+                <ownershipDocument>
+                    <issuer><issuerName>Apple Inc.</issuerName><issuerTradingSymbol>AAPL</issuerTradingSymbol></issuer>
+                    <reportingOwner><reportingOwnerId><rptOwnerCik>000000000{i}</rptOwnerCik><rptOwnerName>Owner {i}</rptOwnerName></reportingOwnerId></reportingOwner>
+                </ownershipDocument>
+                """)
+            xml_files.append(xml_file_path)
+        
+        test_db_path = os.path.join(tmp_path, "test_insider_trading.db")
+        with patch('InsiderTrading.DB_PATH', test_db_path), \
+             patch('InsiderTrading.DATA_DIR', test_data_dir), \
+             patch('glob.glob', return_value=xml_files):
+            InsiderTrading.initialize_database()
+            InsiderTrading.process_form4_filings(bulk_load=True, batch_size=2, vacuum=True)
+            
+            # A second run must not insert the same files again
+            InsiderTrading.process_form4_filings(bulk_load=True, batch_size=2)
+        
+        conn = sqlite3.connect(test_db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM insider_trading")
+        assert cursor.fetchone()[0] == 5
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='index'")
+        indexes = {row[0] for row in cursor.fetchall()}
+        assert set(InsiderTrading.SECONDARY_INDEXES) <= indexes
+        cursor.execute("PRAGMA journal_mode")
+        assert cursor.fetchone()[0] == 'delete'
+        conn.close()
+    
+    def test_bulk_load_restores_on_error(self, tmp_path):
+        """Test that a failed bulk load rolls back its partial batch and rebuilds the indexes."""
+        test_db_path = os.path.join(tmp_path, "test_insider_trading.db")
+        with patch('InsiderTrading.DB_PATH', test_db_path):
+            InsiderTrading.initialize_database()
+        
+        conn = sqlite3.connect(test_db_path)
+        state = InsiderTrading.enable_bulk_load(conn)
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='index'")
+        assert not set(InsiderTrading.SECONDARY_INDEXES) & {row[0] for row in cursor.fetchall()}
+        conn.execute("INSERT INTO insider_trading (issuer_ticker) VALUES ('AAPL')")
+        conn.rollback()
+        InsiderTrading.disable_bulk_load(conn, state, success=False)
+        
+        assert conn.execute("SELECT COUNT(*) FROM insider_trading").fetchone()[0] == 0
+        cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='index'")
+        assert set(InsiderTrading.SECONDARY_INDEXES) <= {row[0] for row in cursor.fetchall()}
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == state['synchronous']
+        conn.close()
@@ -0,0 +1,68 @@
+"""
+Tests for the inventory.py filing inventory.
+"""
+import os
+import argparse
+import random
+import sqlite3
+from datetime import date
+from unittest.mock import patch
+import sys
+
+# Add the parent directory to the path so we can import from the main script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import inventory
+import InsiderTrading
+from benchmarks import corpus
+
+def write_filing(data_dir, ticker, accession, xml, filed=None):
+    filing_dir = os.path.join(data_dir, 'sec-edgar-filings', ticker, '4', accession)
+    os.makedirs(filing_dir)
+    path = os.path.join(filing_dir, 'primary-document.xml')
+    with open(path, 'w') as f:
+        f.write(xml)
+    if filed:
+        with open(os.path.join(filing_dir, inventory.FULL_SUBMISSION), 'w') as f:
+            f.write(f"<SEC-HEADER>\nACCESSION NUMBER:\t\t{accession}\nFILED AS OF DATE:\t\t{filed}\n")
+    return path
+
+class TestInventory:
+
+    def test_ingest_maintains_inventory(self, tmp_path, capsys):
+        """Test that ingestion records each file's status and a debug run reports without walking the data."""
+        data_dir = str(tmp_path)
+        db_path = os.path.join(data_dir, 'insider_trading.db')
+        good = write_filing(data_dir, 'AAPL', '0000320193-25-000001',
+                            corpus.form4_xml(random.Random(1), '0000320193', 'AAPL', '0002000001', 'Doe Jane',
+                                             'CFO', date(2025, 4, 10), 1, 0), filed='20250414')
+        broken = write_filing(data_dir, 'AAPL', '0000320193-25-000002', '<ownershipDocument><issuer>')
+        args = argparse.Namespace(no_download=True, limit=0, bulk_load=False, batch_size=100, vacuum=False,
+                                  parser='auto')
+
+        with patch('InsiderTrading.DATA_DIR', data_dir), patch('InsiderTrading.DB_PATH', db_path), \
+             patch('os.walk', side_effect=AssertionError('the data directory was walked')):
+            assert InsiderTrading.run(args, debug=True) == 0
+
+        conn = sqlite3.connect(db_path)
+        rows = {row[0]: row[1:] for row in conn.execute(
+            "SELECT path, ticker, accession, filing_date, status, size FROM filing_inventory")}
+        assert rows[good][:4] == ('AAPL', '0000320193-25-000001', '2025-04-14', 'ingested')
+        assert rows[good][4] == os.path.getsize(good)
+        assert rows[broken][3] == 'error'
+        assert conn.execute("SELECT error FROM filing_inventory WHERE path = ?", (broken,)).fetchone()[0]
+        output = capsys.readouterr().out
+        assert 'DEBUG: Inventory: 2 files' in output and 'DEBUG:   Status: error 1, ingested 1' in output
+
+        # Downloads record their filing date; a scan drops rows of deleted files
+        new = write_filing(data_dir, 'MSFT', '0000789019-25-000001', '<ownershipDocument/>')
+        inventory.record_downloads(conn, data_dir, [(new, '2025-04-15')])
+        os.remove(broken)
+        assert inventory.scan(conn, data_dir) == (0, 1)
+        report = inventory.summary(conn)
+        assert report['statuses'] == {'ingested': 1, 'pending': 1}
+        assert (report['tickers'], report['last_filing_date']) == (2, '2025-04-15')
+        conn.close()
+
+        with patch('InsiderTrading.DB_PATH', db_path):
+            assert inventory.main(['report', '--ticker', 'MSFT']) == 0
+        assert 'Inventory of MSFT: 1 files' in capsys.readouterr().out
@@ -0,0 +1,148 @@
+"""
+Tests for the issuers.py CIK routing.
+"""
+import os
+import sqlite3
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch, MagicMock
+import sys
+
+# Add the parent directory to the path so we can import from the main script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import issuers
+import InsiderTrading
+import export_json
+from benchmarks import corpus
+
+COMPANY_TICKERS = {
+    '0': {'cik_str': 1000000, 'ticker': 'BRK-B', 'title': 'Berkshire Hathaway Inc'},
+    '1': {'cik_str': 1000000, 'ticker': 'BRK-A', 'title': 'Berkshire Hathaway Inc'},
+    '2': {'cik_str': 1000002, 'ticker': 'LEN', 'title': 'Lennar Corp'},
+    '3': {'cik_str': 1000002, 'ticker': 'LEN-B', 'title': 'Lennar Corp'},
+}
+
+def sec_response(status_code=200, document=None, etag='"v1"'):
+    """A fake requests response for company_tickers.json."""
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = document
+    response.headers = {'ETag': etag, 'Last-Modified': 'Mon, 06 Jan 2025 00:00:00 GMT'}
+    return response
+
+class TestIssuers:
+
+    @pytest.mark.parametrize('symbol, expected', [
+        ('AAPL', 'AAPL'),
+        ('LEN, LEN.B', 'LEN'),
+        ('BFA, BFB', 'BFA'),
+        ('NCLH]', 'NCLH'),
+        ('brk-a', 'BRK.A'),
+        ('fo9jod#z', None),
+        ('-', None),
+        (None, None),
+    ])
+    def test_sanitize_symbol(self, symbol, expected):
+        """Test that filer-typed symbols are cleaned up or rejected."""
+        assert issuers.sanitize_symbol(symbol) == expected
+
+    def test_route_registers_unknown_ciks(self):
+        """Test that an unknown CIK keeps the first usable symbol for all later filings."""
+        conn = sqlite3.connect(':memory:')
+        issuers.initialize_issuers(conn)
+        issuer_map = {}
+
+        assert issuers.route_issuer(conn, issuer_map, '0000000042', 'LEN, LEN.B') == 'LEN'
+        assert issuers.route_issuer(conn, issuer_map, '42', 'LEN.B') == 'LEN'
+        assert issuers.route_issuer(conn, issuer_map, '0000000043', 'LEN') == 'CIK43'
+        assert issuers.route_issuer(conn, issuer_map, '0000000044', '-') == 'CIK44'
+        assert issuers.route_issuer(conn, issuer_map, None, 'msft') == 'MSFT'
+        assert issuers.load_issuer_map(conn)['0000000042'] == 'LEN'
+
+    def test_refresh_is_conditional_and_incremental(self, tmp_path):
+        """Test the SEC map refresh: interval skip, 304 handling and rerouting changed CIKs."""
+        conn = sqlite3.connect(os.path.join(tmp_path, 'test.db'))
+        conn.execute("CREATE TABLE insider_trading (issuer_ticker TEXT, issuer_cik TEXT)")
+        conn.execute("INSERT INTO insider_trading VALUES ('BRK.B', '0001000000')")
+        now = datetime(2025, 1, 6, 12)
+
+        with patch('requests.get', return_value=sec_response(document=COMPANY_TICKERS)) as mock_get:
+            assert issuers.refresh_issuer_map(conn, 'test agent', now=now) == 2
+            # Within the refresh interval nothing is requested
+            assert issuers.refresh_issuer_map(conn, 'test agent', now=now + timedelta(hours=1)) == 0
+        assert mock_get.call_count == 1
+        assert issuers.lookup(conn, '1000002')['tickers'] == 'LEN,LEN.B'
+        assert issuers.lookup(conn, 'brk-b')['cik'] == '0001000000'
+
+        with patch('requests.get', return_value=sec_response(status_code=304)) as mock_get:
+            assert issuers.refresh_issuer_map(conn, 'test agent', now=now + timedelta(days=2)) == 0
+        assert mock_get.call_args.kwargs['headers']['If-None-Match'] == '"v1"'
+
+        # Berkshire's canonical ticker changes: only that CIK is rewritten, with its rows
+        renamed = dict(COMPANY_TICKERS, **{'0': {'cik_str': 1000000, 'ticker': 'BRK-A', 'title': 'Berkshire Hathaway Inc'}})
+        with patch('requests.get', return_value=sec_response(document=renamed, etag='"v2"')):
+            assert issuers.refresh_issuer_map(conn, 'test agent', now=now + timedelta(days=4)) == 1
+        assert conn.execute("SELECT issuer_ticker FROM insider_trading").fetchone()[0] == 'BRK.A'
+        conn.close()
+
+    def test_lookup_matches_secondary_share_classes(self):
+        """Test that a ticker the SEC lists after the canonical one still finds its issuer."""
+        conn = sqlite3.connect(':memory:')
+        issuers.initialize_issuers(conn)
+        conn.executemany("INSERT INTO issuers (cik, ticker, tickers, name, source) VALUES (?, ?, ?, ?, 'sec')", [
+            ('0001652044', 'GOOGL', 'GOOGL,GOOG', 'Alphabet Inc.'),
+            ('0000000099', 'XGOOG', 'XGOOG', 'Not Alphabet'),
+        ])
+
+        assert issuers.lookup(conn, 'GOOG')['cik'] == '0001652044'
+        assert issuers.lookup(conn, 'googl')['ticker'] == 'GOOGL'
+        assert issuers.lookup(conn, 'XGOOG')['cik'] == '0000000099'
+        assert issuers.lookup(conn, 'GOO') is None
+        conn.close()
+
+    def test_ingest_routes_by_cik_and_export_drops_aliases(self, tmp_path):
+        """Test that messy symbols end up in one directory per issuer."""
+        data_dir = os.path.join(tmp_path, 'data')
+        json_dir = os.path.join(data_dir, 'json')
+        db_path = os.path.join(data_dir, 'insider_trading.db')
+        corpus.generate_corpus(data_dir, n_filings=30, n_issuers=6, seed=3)
+
+        # A directory left by an export that keyed rows by the raw symbol
+        os.makedirs(os.path.join(json_dir, 'NCLH]'))
+
+        with patch('InsiderTrading.DATA_DIR', data_dir), \
+             patch('InsiderTrading.DB_PATH', db_path), \
+             patch('export_json.DB_PATH', db_path), \
+             patch('export_json.JSON_DIR', json_dir):
+            InsiderTrading.initialize_database()
+            InsiderTrading.process_form4_filings()
+            export_json.initialize_json_directory()
+
+        conn = sqlite3.connect(db_path)
+        tickers = {row[0] for row in conn.execute("SELECT DISTINCT issuer_ticker FROM insider_trading")}
+        reported = {row[0] for row in conn.execute("SELECT DISTINCT reported_ticker FROM insider_trading")}
+        conn.close()
+
+        assert tickers == {'BRK.B', 'BF.B', 'LEN', 'NCLH', 'BRK.A', 'GOOG'}
+        assert 'LEN, LEN.B' in reported
+        assert sorted(os.listdir(json_dir)) == sorted(tickers)
+
+    def test_migration_reroutes_legacy_rows(self, test_db_path, tmp_path):
+        """Test that rows from before CIK routing get the new columns and a routed ticker."""
+        xml_file = os.path.join(tmp_path, 'legacy.xml')
+        with open(xml_file, 'w') as f:
+            f.write("<ownershipDocument><issuer><issuerCik>0000320193</issuerCik>"
+                    "<issuerTradingSymbol>aapl]</issuerTradingSymbol></issuer></ownershipDocument>")
+        conn = sqlite3.connect(test_db_path)
+        conn.execute("UPDATE insider_trading SET issuer_ticker = 'aapl]', source_file = ? WHERE id = 1", (xml_file,))
+        conn.execute("INSERT INTO insider_trading (issuer_ticker) VALUES ('-')")
+        conn.commit()
+
+        InsiderTrading.migrate_schema(conn)
+        rows = conn.execute("SELECT id, issuer_ticker, issuer_cik, reported_ticker FROM insider_trading").fetchall()
+        conn.close()
+
+        by_id = {row[0]: row[1:] for row in rows}
+        assert by_id[1] == ('AAPL', '0000320193', 'aapl]')
+        assert by_id[2] == ('AAPL', None, 'AAPL')
+        assert by_id[max(by_id)] == (None, None, '-')
@@ -0,0 +1,114 @@
+"""
+Tests for the manifest.py export manifest and the client's manifest sync.
+"""
+import os
+import json
+import sqlite3
+import functools
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from unittest.mock import patch
+import sys
+
+# Add the parent directory to the path so we can import from the main script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import manifest
+import export_json
+import client
+
+def run_export(db_path, json_dir, tmp_path, *extra):
+    """Run the full JSON export into json_dir."""
+    with patch('export_json.DB_PATH', db_path), \
+         patch('export_json.DATA_DIR', str(tmp_path)), \
+         patch('export_json.JSON_DIR', json_dir):
+        assert export_json.main(list(extra)) == 0
+    return manifest.load_manifest(json_dir)
+
+class TestManifest:
+
+    def test_export_writes_manifest_last(self, test_db_path, test_json_dir, tmp_path):
+        """Test that the export publishes hashes, sizes, row counts and date spans of every file."""
+        document = run_export(test_db_path, test_json_dir, tmp_path, '--snapshots')
+        files = document['files']
+
+        assert document['file_count'] == len(files)
+        assert sorted(files) == manifest.list_files(test_json_dir)
+        assert 'manifest.json' not in files
+
+        aapl = files['AAPL/transactions.json']
+        with open(os.path.join(test_json_dir, 'AAPL', 'transactions.json'), 'rb') as f:
+            assert aapl['sha256'] == hashlib.sha256(f.read()).hexdigest()
+        assert aapl['content_hash'] != aapl['sha256']
+        assert files['GOOGL/snapshot.bin']['content_hash'] == files['GOOGL/snapshot.bin']['sha256']
+        assert aapl['rows'] == 5
+        assert (aapl['first_date'], aapl['last_date']) == ('2024-11-10', '2025-03-10')
+        assert aapl['bytes'] == os.path.getsize(os.path.join(test_json_dir, 'AAPL', 'transactions.json'))
+        assert files['MSFT/quarterly/2024-Q4.json']['rows'] == 1
+        assert files['companies.json']['rows'] == 3
+        assert files['GOOGL/snapshot.bin']['rows'] == 2
+        assert files['GOOGL/snapshot.bin']['first_date'] == '2024-11-25'
+
+    def test_hash_ignores_last_updated(self, test_db_path, test_json_dir, tmp_path):
+        """Test that re-exporting unchanged data keeps every hash, so clients fetch nothing."""
+        first = run_export(test_db_path, test_json_dir, tmp_path)
+        second = run_export(test_db_path, test_json_dir, tmp_path)
+        assert manifest.changed_files(first, second) == []
+
+        # One new MSFT transaction changes only the MSFT files it lands in
+        conn = sqlite3.connect(test_db_path)
+        conn.execute("""INSERT INTO insider_trading (issuer_name, issuer_ticker, reporting_owner, transaction_date,
+                        transaction_shares, transaction_price, transaction_type)
+                        VALUES ('Microsoft Corp', 'MSFT', 'Hood, Amy', '2025-02-11', '100', '390', 'S')""")
+        conn.commit()
+        conn.close()
+        third = run_export(test_db_path, test_json_dir, tmp_path)
+        assert manifest.changed_files(second, third) == [
+            'MSFT/latest.json', 'MSFT/quarterly/2025-Q1.json', 'MSFT/transactions.json', 'companies.json',
+            'summary.json']
+
+    def test_unchanged_files_reuse_entries(self, test_db_path, test_json_dir, tmp_path):
+        """Test that files with the same size and mtime are not read again, and mtimes stay local."""
+        run_export(test_db_path, test_json_dir, tmp_path)
+        previous = manifest.load_manifest(test_json_dir)
+        assert all('mtime_ns' not in entry for entry in previous['files'].values())
+
+        cache = manifest.load_cache(test_json_dir)
+        with patch('manifest.describe_file', wraps=manifest.describe_file) as describe:
+            rebuilt = manifest.build_manifest(test_json_dir, cache)
+        describe.assert_not_called()
+        assert rebuilt['files'] == previous['files']
+
+        # A touched file (as after a fresh checkout) is read again but keeps its published entry
+        os.utime(os.path.join(test_json_dir, 'summary.json'))
+        with patch('manifest.describe_file', wraps=manifest.describe_file) as describe:
+            rebuilt = manifest.build_manifest(test_json_dir, cache)
+        assert [call.args[1] for call in describe.call_args_list] == ['summary.json']
+        assert rebuilt['files'] == previous['files']
+
+    def test_client_sync_fetches_changed_files(self, test_db_path, tmp_path):
+        """Test that the client only downloads files whose manifest hash changed."""
+        site_dir = os.path.join(tmp_path, 'site')
+        json_dir = os.path.join(site_dir, 'data', 'json')
+        os.makedirs(json_dir)
+        run_export(test_db_path, json_dir, tmp_path)
+
+        handler = functools.partial(SimpleHTTPRequestHandler, directory=site_dir)
+        httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        try:
+            base_url = f"http://127.0.0.1:{httpd.server_address[1]}/data/json"
+            form4 = client.Form4Client(base_url=base_url, cache_dir=os.path.join(tmp_path, 'cache'))
+            first = form4.sync()
+            assert 'AAPL/transactions.json' in first and 'companies.json' in first
+
+            # Rewritten with the same data: the hashes match and nothing is fetched
+            run_export(test_db_path, json_dir, tmp_path)
+            assert form4.sync() == []
+            with open(os.path.join(tmp_path, 'cache', 'AAPL', 'transactions.json')) as f:
+                assert json.load(f)['count'] == 5
+            form4.close()
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
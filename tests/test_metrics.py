@@ -0,0 +1,100 @@
+"""
+Tests for the metrics.py run instrumentation.
+"""
+import os
+import json
+import pytest
+from unittest.mock import patch
+import sys
+
+# Add the parent directory to the path so we can import from the main script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+import export_json
+
+class TestMetrics:
+
+    def test_stage_counters_and_rates(self, tmp_path):
+        """Test that stages record times, counters and derived rates."""
+        metrics_path = os.path.join(tmp_path, 'run_metrics.json')
+        metrics.start_run('test', metrics_path)
+        with metrics.stage('ingest'):
+            metrics.incr('files', 10)
+            metrics.incr('rows', 8)
+            metrics.incr('errors')
+            with metrics.timer('parse'):
+                pass
+        metrics.finish_run()
+
+        with open(metrics_path) as f:
+            data = json.load(f)
+
+        stage = data['runs']['test']['stages']['ingest']
+        assert data['runs']['test']['status'] == 'ok'
+        assert stage['counters']['files'] == 10
+        assert stage['counters']['rows'] == 8
+        assert stage['counters']['errors'] == 1
+        assert 'parse_seconds' in stage['counters']
+        assert stage['wall_seconds'] >= 0
+        assert 'cpu_seconds' in stage
+        assert 'files_per_sec' in stage
+
+    def test_calls_are_noops_without_a_run(self):
+        """Test that instrumented code works when no run is active."""
+        assert metrics.current_run() is None
+        with metrics.stage('ingest') as entry:
+            metrics.incr('files')
+            metrics.record_file(__file__)
+        assert entry is None
+
+    def test_nested_runs_share_one_metrics_file(self, tmp_path):
+        """Test that a nested script (backfill -> export) records into the outer run."""
+        metrics_path = os.path.join(tmp_path, 'run_metrics.json')
+        outer = metrics.start_run('backfill', metrics_path)
+        inner = metrics.start_run('export_json', os.path.join(tmp_path, 'other.json'))
+        assert inner is outer
+        with metrics.stage('export_summary_data'):
+            metrics.incr('files')
+        metrics.finish_run()
+        assert not os.path.exists(os.path.join(tmp_path, 'other.json'))
+        metrics.finish_run()
+
+        with open(metrics_path) as f:
+            data = json.load(f)
+        assert 'export_summary_data' in data['runs']['backfill']['stages']
+
+    @pytest.mark.parametrize('mode', ['cprofile', 'tracemalloc'])
+    def test_profile_single_stage(self, tmp_path, mode):
+        """Test that only the requested stage is profiled."""
+        metrics_path = os.path.join(tmp_path, 'run_metrics.json')
+        metrics.start_run('test', metrics_path, profile_stage='parse', profile_mode=mode)
+        with metrics.stage('download'):
+            pass
+        with metrics.stage('parse'):
+            sorted(str(i) for i in range(1000))
+        metrics.finish_run()
+
+        with open(metrics_path) as f:
+            stages = json.load(f)['runs']['test']['stages']
+        assert 'profile' not in stages['download'] and 'tracemalloc' not in stages['download']
+        if mode == 'cprofile':
+            assert os.path.exists(stages['parse']['profile'])
+        else:
+            assert stages['parse']['tracemalloc']['peak_bytes'] > 0
+
+    def test_export_main_writes_run_metrics(self, test_db_path, test_json_dir, tmp_path):
+        """Test that export_json.main() records every export stage and the bytes written."""
+        metrics_path = os.path.join(tmp_path, 'run_metrics.json')
+        with patch('export_json.DB_PATH', test_db_path), \
+             patch('export_json.JSON_DIR', test_json_dir), \
+             patch.dict('os.environ', {}, clear=True):
+            assert export_json.main(['--metrics', metrics_path]) == 0
+
+        with open(metrics_path) as f:
+            run = json.load(f)['runs']['export_json']
+
+        assert run['status'] == 'ok'
+        stage = run['stages']['export_company_transactions']
+        assert stage['counters']['bytes_written'] > 0
+        assert stage['counters']['rows'] > 0
+        assert 'export_summary_data' in run['stages']
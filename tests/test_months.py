@@ -0,0 +1,103 @@
+"""
+Tests for the months.py market-wide month files.
+"""
+import os
+import gzip
+import json
+import sqlite3
+from datetime import datetime
+import sys
+
+# Add the parent directory to the path so we can import from the main script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import months
+
+def read_month(json_dir, month):
+    with open(months.month_path(json_dir, month)) as f:
+        return json.load(f)
+
+def add_row(conn, ticker, date):
+    conn.execute('''
+    INSERT INTO insider_trading (issuer_name, issuer_ticker, reporting_owner, transaction_date,
+                                 transaction_shares, transaction_price, transaction_type)
+    VALUES ('Test Co', ?, 'Doe, Jane', ?, '100', '10', 'S')
+    ''', (ticker, date))
+    conn.commit()
+
+class TestMonths:
+
+    def test_settled_months_are_frozen(self, test_db_path, test_json_dir):
+        """Test that every issuer's rows of a month share a file and settled months are never rewritten."""
+        data_dir = os.path.dirname(test_db_path)
+        conn = sqlite3.connect(test_db_path)
+        # 2024-11 to 2025-01 are settled on 2025-03-20, February and March are still open
+        today = datetime(2025, 3, 20)
+        assert months.update_month_files(conn, data_dir, test_json_dir, today=today) == 5
+
+        january = read_month(test_json_dir, '2025-01')
+        assert january['frozen'] is True
+        assert [(tx['ticker'], tx['transaction_date']) for tx in january['transactions']] == [
+            ('GOOGL', '2025-01-05'), ('AAPL', '2025-01-15'), ('MSFT', '2025-01-20')]
+        assert read_month(test_json_dir, '2025-03')['frozen'] is False
+        mtime = os.stat(months.month_path(test_json_dir, '2025-01')).st_mtime_ns
+
+        # A late row for the frozen January is only counted; March is rewritten
+        add_row(conn, 'AAPL', '2025-01-31')
+        add_row(conn, 'MSFT', '2025-03-18')
+        assert months.update_month_files(conn, data_dir, test_json_dir, today=today) == 1
+        assert os.stat(months.month_path(test_json_dir, '2025-01')).st_mtime_ns == mtime
+        assert read_month(test_json_dir, '2025-03')['count'] == 2
+        assert conn.execute("SELECT late_rows FROM month_files WHERE month = '2025-01'").fetchone()[0] == 1
+
+        # February settles: written a last time and frozen
+        assert months.update_month_files(conn, data_dir, test_json_dir, today=datetime(2025, 4, 15)) == 1
+        assert read_month(test_json_dir, '2025-02')['frozen'] is True
+        assert months.update_month_files(conn, data_dir, test_json_dir, today=datetime(2025, 4, 15)) == 0
+
+        # A deleted frozen file is written again, here compressed
+        os.remove(months.month_path(test_json_dir, '2025-01'))
+        assert months.update_month_files(conn, data_dir, test_json_dir, compress=True,
+                                         today=datetime(2025, 4, 15)) == 1
+        with gzip.open(months.month_path(test_json_dir, '2025-01', compress=True)) as f:
+            assert json.load(f)['count'] == 4
+
+        with open(os.path.join(test_json_dir, months.MONTHS_DIR, months.INDEX_FILE)) as f:
+            index = json.load(f)
+        assert [(entry['month'], entry['frozen']) for entry in index['months']] == [
+            ('2024-11', True), ('2024-12', True), ('2025-01', True), ('2025-02', True), ('2025-03', False)]
+        assert index['months'][2]['file'] == '2025-01.json.gz'
+        conn.close()
+
+    def test_frozen_files_on_disk_survive_a_fresh_database(self, test_db_path, test_json_dir, tmp_path):
+        """Test that a database without month_files keeps frozen files on disk and counts late rows."""
+        data_dir = os.path.dirname(test_db_path)
+        conn = sqlite3.connect(test_db_path)
+        today = datetime(2025, 3, 20)
+        months.update_month_files(conn, data_dir, test_json_dir, today=today)
+        conn.close()
+        path = months.month_path(test_json_dir, '2025-01')
+        with open(path, 'rb') as f:
+            before = f.read()
+
+        # The next run starts from a database holding only one late January row
+        fresh_path = os.path.join(tmp_path, 'fresh.db')
+        fresh = sqlite3.connect(fresh_path)
+        fresh.execute('''
+        CREATE TABLE insider_trading (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, issuer_name TEXT, issuer_ticker TEXT, reporting_owner TEXT,
+            reporting_owner_cik TEXT, reporting_owner_position TEXT, transaction_date TEXT,
+            transaction_shares TEXT, transaction_price TEXT, transaction_type TEXT,
+            shares_after_transaction TEXT, source_file TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        add_row(fresh, 'AAPL', '2025-01-31')
+        assert months.update_month_files(fresh, str(tmp_path), test_json_dir, today=today) == 0
+
+        with open(path, 'rb') as f:
+            assert f.read() == before
+        assert fresh.execute("SELECT row_count, late_rows FROM month_files WHERE month = '2025-01'").fetchone() == (3, 1)
+        with open(os.path.join(test_json_dir, months.MONTHS_DIR, months.INDEX_FILE)) as f:
+            index = json.load(f)
+        assert [(entry['month'], entry['frozen']) for entry in index['months']] == [
+            ('2024-11', True), ('2024-12', True), ('2025-01', True)]
+        fresh.close()
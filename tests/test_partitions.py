@@ -0,0 +1,168 @@
+"""
+Tests for the partitions.py hot/cold rollover and query routing.
+"""
+import os
+import json
+import sqlite3
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+import sys
+
+# Add the parent directory to the path so we can import from the main script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import partitions
+import InsiderTrading
+import export_json
+
+# With one hot year the cutoff is 2025-01-15: 2024 and early 2025 rows go cold
+TODAY = datetime(2026, 1, 15)
+
+class TestPartitions:
+
+    def test_rollover_moves_old_rows(self, test_db_path, tmp_path):
+        """Test that rows older than the hot window move into yearly cold databases."""
+        moved = partitions.rollover(test_db_path, str(tmp_path), hot_years=1, today=TODAY)
+
+        assert moved == {2024: 4, 2025: 1}
+        conn = sqlite3.connect(test_db_path)
+        hot_dates = [row[0] for row in conn.execute("SELECT transaction_date FROM insider_trading")]
+        catalog = partitions.list_partitions(conn)
+        conn.close()
+
+        assert len(hot_dates) == 5
+        assert min(hot_dates) >= '2025-01-15'
+        assert [partition['year'] for partition in catalog] == [2024, 2025]
+        assert catalog[0]['min_date'] == '2024-11-10' and catalog[0]['max_date'] == '2024-12-15'
+        assert os.path.exists(partitions.cold_db_path(str(tmp_path), 2024))
+
+    def test_rollover_is_repeatable(self, test_db_path, tmp_path):
+        """Test that running rollover again doesn't move or duplicate anything."""
+        partitions.rollover(test_db_path, str(tmp_path), hot_years=1, today=TODAY)
+        assert partitions.rollover(test_db_path, str(tmp_path), hot_years=1, today=TODAY) == {}
+
+        conn = sqlite3.connect(partitions.cold_db_path(str(tmp_path), 2024))
+        assert conn.execute("SELECT COUNT(*) FROM insider_trading").fetchone()[0] == 4
+        conn.close()
+
+    def test_query_routing(self, test_db_path, tmp_path):
+        """Test that recent queries stay hot and older ranges attach only the partitions they need."""
+        partitions.rollover(test_db_path, str(tmp_path), hot_years=1, today=TODAY)
+        conn = sqlite3.connect(test_db_path)
+        assert partitions.partitions_for_range(conn, date_from='2025-02-01') == []
+        assert [p['year'] for p in partitions.partitions_for_range(conn, date_to='2024-12-31')] == [2024]
+        conn.close()
+
+        with patch('InsiderTrading.DB_PATH', test_db_path), \
+             patch('InsiderTrading.DATA_DIR', str(tmp_path)):
+            recent = InsiderTrading.query_insider_trading(date_from='2025-02-01', as_dataframe=False)
+            everything = InsiderTrading.query_insider_trading(limit=100, as_dataframe=False)
+            aapl = InsiderTrading.query_insider_trading(ticker='AAPL')
+
+        assert len(recent) == 3
+        assert len(everything) == 10
+        assert [row['transaction_date'] for row in everything] == sorted(
+            (row['transaction_date'] for row in everything), reverse=True)
+        assert len(aapl) == 5
+        assert aapl.iloc[-1]['transaction_date'] == '2024-11-10'
+
+    def test_ingest_skips_rolled_over_filings(self, tmp_path):
+        """Test that filings whose rows were rolled into cold partitions are not ingested again."""
+        from benchmarks import corpus
+
+        data_dir = str(tmp_path)
+        db_path = os.path.join(data_dir, 'insider_trading.db')
+        corpus.generate_corpus(data_dir, n_filings=60, n_issuers=4, seed=2, years=6)
+        with patch('InsiderTrading.DB_PATH', db_path), \
+             patch('InsiderTrading.DATA_DIR', data_dir):
+            InsiderTrading.initialize_database()
+            InsiderTrading.process_form4_filings()
+            moved = partitions.rollover(db_path, data_dir, hot_years=3, today=datetime(2025, 6, 30))
+            assert sum(moved.values()) > 0
+            InsiderTrading.process_form4_filings()
+
+        conn = sqlite3.connect(db_path)
+        hot = conn.execute("SELECT COUNT(*) FROM insider_trading").fetchone()[0]
+        _, rows = partitions.query_partitions(conn, data_dir, "1", [], 'source_file', -1, columns=['source_file'])
+        conn.close()
+        assert hot + sum(moved.values()) == 60
+        assert len(rows) == len({row[0] for row in rows}) == 60
+
+    def test_query_spans_attach_groups(self, test_db_path, tmp_path):
+        """Test that results are merged correctly when partitions exceed one attach group."""
+        partitions.rollover(test_db_path, str(tmp_path), hot_years=1, today=TODAY)
+        conn = sqlite3.connect(test_db_path)
+        with patch('partitions.MAX_ATTACHED', 1):
+            columns, rows = partitions.query_partitions(conn, str(tmp_path), '1=1', [],
+                                                        'transaction_date DESC', 3)
+        conn.close()
+
+        date_index = columns.index('transaction_date')
+        assert [row[date_index] for row in rows] == ['2025-03-10', '2025-02-20', '2025-02-10']
+
+    def test_attach_groups_merge_by_order_by(self, test_db_path, tmp_path):
+        """Test that merged attach groups follow order_by and work without a transaction_date column."""
+        conn = sqlite3.connect(test_db_path)
+        conn.execute("UPDATE insider_trading SET source_file = 'filing_' || (100 - id) || '.xml'")
+        conn.commit()
+        conn.close()
+        partitions.rollover(test_db_path, str(tmp_path), hot_years=1, today=TODAY)
+
+        conn = sqlite3.connect(test_db_path)
+        with patch('partitions.MAX_ATTACHED', 1):
+            columns, rows = partitions.query_partitions(conn, str(tmp_path), 'source_file IS NOT NULL', [],
+                                                        'source_file', -1, columns=['source_file'])
+            _, first = partitions.query_partitions(conn, str(tmp_path), '1=1', [], 'source_file', 2,
+                                                   columns=['source_file'])
+        conn.close()
+
+        assert columns == ['source_file']
+        assert [row[0] for row in rows] == [f'filing_{100 - id}.xml' for id in range(10, 0, -1)]
+        assert [row[0] for row in first] == ['filing_90.xml', 'filing_91.xml']
+
+    def test_export_keeps_cold_quarters(self, test_db_path, test_json_dir, tmp_path):
+        """Test that exporting after a rollover doesn't truncate quarters that moved to cold storage."""
+        with patch('export_json.DB_PATH', test_db_path), \
+             patch('export_json.DATA_DIR', str(tmp_path)), \
+             patch('export_json.JSON_DIR', test_json_dir):
+            quarter_path = os.path.join(test_json_dir, 'AAPL', 'quarterly', '2024-Q4.json')
+            export_json.export_company_transactions()
+            partitions.rollover(test_db_path, str(tmp_path), hot_years=1, today=TODAY)
+
+            os.remove(quarter_path)
+            export_json.export_company_transactions(include_cold=True)
+            with open(quarter_path) as f:
+                assert json.load(f)['count'] == 2
+
+            # Frozen quarters are left alone by a hot-only export
+            with open(quarter_path, 'w') as f:
+                f.write('{"count": 2}')
+            export_json.export_company_transactions()
+            with open(quarter_path) as f:
+                assert json.load(f) == {'count': 2}
+
+    def test_companies_and_summary_include_cold_rows(self, test_db_path, test_json_dir, tmp_path):
+        """Test that companies.json and summary.json keep the history that rolled over."""
+        partitions.rollover(test_db_path, str(tmp_path), hot_years=1, today=TODAY)
+        with patch('export_json.DB_PATH', test_db_path), \
+             patch('export_json.DATA_DIR', str(tmp_path)), \
+             patch('export_json.JSON_DIR', test_json_dir):
+            export_json.initialize_json_directory()
+            export_json.export_companies_index()
+            export_json.export_summary_data()
+
+        # Every GOOGL row is cold
+        assert os.path.isdir(os.path.join(test_json_dir, 'GOOGL'))
+        with open(os.path.join(test_json_dir, 'companies.json')) as f:
+            companies = {company['ticker']: company for company in json.load(f)['companies']}
+        assert [(ticker, company['transaction_count'], company['earliest_transaction'],
+                 company['latest_transaction']) for ticker, company in companies.items()] == [
+            ('AAPL', 5, '2024-11-10', '2025-03-10'),
+            ('MSFT', 3, '2024-12-15', '2025-02-10'),
+            ('GOOGL', 2, '2024-11-25', '2025-01-05')]
+
+        with open(os.path.join(test_json_dir, 'summary.json')) as f:
+            summary = json.load(f)
+        assert len(summary['recent_transactions']) == 10
+        assert summary['recent_transactions'][-1]['date'] == '2024-11-10'
+        assert summary['large_transactions'][0]['insider'] == 'Nadella, Satya'
@@ -0,0 +1,97 @@
+"""
+Tests for the prune.py retention enforcement.
+"""
+import os
+import gzip
+import json
+import sqlite3
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+import sys
+
+# Add the parent directory to the path so we can import from the main script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import prune
+import partitions
+
+# With one retention year the cutoff is the start of 2025-Q1: all 2024 rows are pruned
+TODAY = datetime(2026, 1, 15)
+
+def add_filing(conn, data_dir, row_id):
+    """Point a row at a raw filing in the download tree and return its accession directory."""
+    accession_dir = os.path.join(data_dir, 'sec-edgar-filings', 'AAPL', '4', f'0000000000-24-00000{row_id}')
+    os.makedirs(accession_dir)
+    xml_file = os.path.join(accession_dir, 'primary-document.xml')
+    with open(xml_file, 'w') as f:
+        f.write('<ownershipDocument></ownershipDocument>')
+    conn.execute("UPDATE insider_trading SET source_file = ? WHERE id = ?", (xml_file, row_id))
+    conn.commit()
+    return accession_dir
+
+class TestPrune:
+
+    def test_retention_cutoff_is_quarter_aligned(self):
+        """Test that the cutoff never splits an exported quarter."""
+        assert prune.retention_cutoff(1, TODAY) == '2025-01-01'
+        assert prune.retention_cutoff(10, datetime(2025, 8, 20)) == '2015-07-01'
+
+    def test_prune_archives_deletes_and_vacuums(self, test_db_path, tmp_path):
+        """Test that old rows are archived, deleted and their raw filings removed."""
+        data_dir = str(tmp_path)
+        conn = sqlite3.connect(test_db_path)
+        old_filing = add_filing(conn, data_dir, 2)    # AAPL 2024-11-10
+        recent_filing = add_filing(conn, data_dir, 1)  # AAPL 2025-01-15
+        conn.close()
+
+        dry_run = prune.prune(test_db_path, data_dir, retention_years=1, today=TODAY, dry_run=True)
+        assert dry_run['rows_archived'] == 4 and dry_run['rows_deleted'] == 0
+        assert not os.path.exists(prune.archive_dir(data_dir))
+
+        report = prune.prune(test_db_path, data_dir, retention_years=1, today=TODAY)
+        assert report['rows_archived'] == 4
+        assert report['rows_deleted'] == 4
+        assert report['archived_by_year'] == {'2024': 4}
+        assert report['filings_removed'] == 1
+        assert report['archive_bytes_written'] > 0
+        assert report['vacuum']['mode'] == 'full'
+        assert not os.path.exists(old_filing)
+        assert os.path.exists(recent_filing)
+
+        conn = sqlite3.connect(test_db_path)
+        assert conn.execute("SELECT MIN(transaction_date), COUNT(*) FROM insider_trading").fetchone() == ('2025-01-05', 6)
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        conn.close()
+
+        with gzip.open(prune.archive_path(data_dir, 2024), 'rt') as f:
+            archived = [json.loads(line) for line in f]
+        assert sorted(row['transaction_date'] for row in archived) == ['2024-11-10', '2024-11-25', '2024-12-05', '2024-12-15']
+
+        # Nothing left to prune; the database is now in incremental mode
+        again = prune.prune(test_db_path, data_dir, retention_years=1, today=TODAY)
+        assert again['rows_deleted'] == 0
+        assert again['vacuum']['mode'] == 'incremental'
+
+    def test_prune_cold_partitions(self, test_db_path, tmp_path):
+        """Test that cold partitions past the horizon are pruned and emptied files removed."""
+        data_dir = str(tmp_path)
+        partitions.rollover(test_db_path, data_dir, hot_years=1, today=TODAY)
+
+        report = prune.prune(test_db_path, data_dir, retention_years=1, today=TODAY)
+        assert report['rows_deleted'] == 4
+        assert report['cold_partitions_removed'] == 1
+        assert not os.path.exists(partitions.cold_db_path(data_dir, 2024))
+
+        conn = sqlite3.connect(test_db_path)
+        catalog = partitions.list_partitions(conn)
+        conn.close()
+        assert [(p['year'], p['row_count']) for p in catalog] == [(2025, 1)]
+
+    def test_main_reports_counts(self, test_db_path, tmp_path, capsys):
+        """Test the prune command end to end."""
+        with patch('InsiderTrading.DB_PATH', test_db_path), \
+             patch('InsiderTrading.DATA_DIR', str(tmp_path)):
+            assert prune.main(['--retention-years', '1', '--metrics', os.path.join(tmp_path, 'm.json')]) == 0
+        output = capsys.readouterr().out
+        assert 'Rows deleted:' in output
+        assert 'Database size:' in output
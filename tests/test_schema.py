@@ -0,0 +1,84 @@
+"""
+Tests for the normalized database schema in schema.py.
+"""
+import os
+import sqlite3
+import sys
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import from the main script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import InsiderTrading
+import schema
+
+COLUMNS = ('id', 'issuer_name', 'issuer_ticker', 'reporting_owner', 'reporting_owner_cik',
+           'reporting_owner_position', 'transaction_date', 'transaction_shares', 'transaction_price',
+           'transaction_type', 'shares_after_transaction', 'source_file', 'created_at')
+
+def read_rows(db_path):
+    """Return the insider_trading rows of a database ordered by id."""
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT {', '.join(COLUMNS)} FROM insider_trading ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+class TestSchema:
+
+    def test_initialize_database_normalizes_flat_table(self, test_db_path):
+        """Test that a single-table database is converted with the same rows through the view."""
+        # The last id is deleted first: it must not be handed out again
+        conn = sqlite3.connect(test_db_path)
+        conn.execute("DELETE FROM insider_trading WHERE id = 10")
+        conn.commit()
+        conn.close()
+        before = read_rows(test_db_path)
+
+        with patch('InsiderTrading.DB_PATH', test_db_path):
+            InsiderTrading.initialize_database()
+
+        assert read_rows(test_db_path) == before
+        conn = sqlite3.connect(test_db_path)
+        try:
+            report = schema.status(conn)
+            assert report['layout'] == 'normalized'
+            assert report['rows'] == 9
+            assert (report['companies'], report['owners'], report['positions']) == (3, 6, 3)
+            assert schema.normalize(conn) == 0
+
+            issuer_cik, reported_ticker = conn.execute(
+                "SELECT issuer_cik, reported_ticker FROM insider_trading WHERE id = 9").fetchone()
+            conn.execute(InsiderTrading.INSERT_TRANSACTION_SQL,
+                         ('Alphabet Inc.', 'GOOGL', 'Porat, Ruth', '0007777777', 'CFO', '2025-03-01',
+                          '1000', '160.00', 'S', '119000', issuer_cik, reported_ticker, 'new_file.xml'))
+            conn.commit()
+            assert conn.execute("SELECT MAX(id) FROM insider_trading").fetchone()[0] == 11
+            # Existing dimension rows are reused, new ones added
+            assert conn.execute("SELECT COUNT(*) FROM companies").fetchone()[0] == 3
+            assert conn.execute("SELECT COUNT(*) FROM owners").fetchone()[0] == 7
+        finally:
+            conn.close()
+
+    def test_view_update_and_delete(self, tmp_path):
+        """Test that updates and deletes through the view reach the transactions table."""
+        db_path = os.path.join(tmp_path, 'insider_trading.db')
+        with patch('InsiderTrading.DB_PATH', db_path):
+            InsiderTrading.initialize_database()
+
+        conn = sqlite3.connect(db_path)
+        try:
+            for owner in ('Cook, Tim', 'Maestri, Luca'):
+                conn.execute(InsiderTrading.INSERT_TRANSACTION_SQL,
+                             ('Apple Inc.', 'AAPL', owner, None, 'CEO', '2025-01-15', '10000', '180.25',
+                              'S', '500000', '0000320193', 'AAPL', 'test_file.xml'))
+            conn.execute("UPDATE insider_trading SET issuer_ticker = 'AAPL2', transaction_price = '181' WHERE id = 1")
+            conn.execute("DELETE FROM insider_trading WHERE id = 2")
+            conn.commit()
+
+            rows = conn.execute("SELECT id, issuer_ticker, reporting_owner, transaction_price FROM insider_trading").fetchall()
+            assert rows == [(1, 'AAPL2', 'Cook, Tim', '181')]
+            assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 1
+            # Dimension rows stay when their last transaction goes
+            assert conn.execute("SELECT COUNT(*) FROM companies").fetchone()[0] == 2
+        finally:
+            conn.close()
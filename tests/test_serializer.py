@@ -0,0 +1,50 @@
+"""
+Tests for the serializer.py JSON backends.
+"""
+import os
+import json
+import pytest
+import sys
+
+# Add the parent directory to the path so we can import from the main script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import serializer
+
+COLUMNS = ('id', 'reporting_owner', 'transaction_price', 'value')
+
+ROWS = [
+    (1, 'Doe, Jane', '180.25', 1802500.0),
+    (2, 'Müller, Jörg ☃ \U0001f600', None, 1e16),
+    (3, 'Tab\tQuote"Back\\slash\x7fDEL', '0', 1e-05),
+    (2 ** 70, '', '12.5', float('nan')),
+]
+
+class TestSerializer:
+
+    @pytest.mark.parametrize('backend', serializer.available_backends())
+    @pytest.mark.parametrize('compact', [False, True])
+    def test_backends_write_the_json_module_bytes(self, backend, compact):
+        """Test that every backend writes what json.dumps writes, with non-finite floats as null."""
+        document = {'ticker': 'AAPL', 'count': len(ROWS), 'ratio': 3e-05, 'big': 1.5e300,
+                    'transactions': serializer.Rows(COLUMNS, ROWS)}
+        records = [dict(zip(COLUMNS, row)) for row in ROWS]
+        records[3]['value'] = None
+        options = {'separators': (',', ':')} if compact else {'indent': 2}
+        expected = json.dumps({**document, 'transactions': records}, **options).encode('ascii')
+
+        assert serializer.get_backend(backend)(document, compact) == expected
+        assert json.loads(expected)['transactions'][1]['reporting_owner'] == ROWS[1][1]
+
+    def test_set_backend(self, tmp_path):
+        """Test that dump() uses the selected backend and an unknown one fails when used."""
+        path = os.path.join(tmp_path, 'rows.json')
+        previous = serializer.set_backend('stdlib')
+        try:
+            assert serializer.dump({'rows': serializer.Rows(['a'], [(1,)])}, path, compact=True) == 18
+            with open(path, 'rb') as f:
+                assert f.read() == b'{"rows":[{"a":1}]}'
+            serializer.set_backend('simdjson')
+            with pytest.raises(ValueError):
+                serializer.dumps({})
+        finally:
+            serializer.set_backend(previous)
@@ -0,0 +1,195 @@
+"""
+Tests for the server.py read API.
+"""
+import os
+import gzip
+import json
+import sqlite3
+import asyncio
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from unittest.mock import patch
+import sys
+
+# Add the parent directory to the path so we can import from the main script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import partitions
+import server
+
+@pytest.fixture
+def api(test_db_path, tmp_path):
+    """An ApiServer over the test database."""
+    api = server.ApiServer(db_path=test_db_path, data_dir=str(tmp_path))
+    yield api
+    api.close()
+
+class TestServer:
+
+    def test_transactions_with_filters(self, api):
+        """Test date range, type, owner and limit parameters."""
+        status, headers, body = api.handle('GET', '/data/json/AAPL/transactions.json?from=2024-12-01&type=S')
+        data = json.loads(body)
+        assert status == 200
+        assert headers['Content-Type'] == 'application/json'
+        assert [tx['transaction_date'] for tx in data['transactions']] == ['2025-03-10', '2025-02-20', '2025-01-15']
+        assert data['count'] == 3
+
+        _, _, body = api.handle('GET', '/data/json/AAPL/transactions.json?from=2024-01-01&owner=maestri&limit=1')
+        data = json.loads(body)
+        assert data['count'] == 1
+        assert data['transactions'][0]['reporting_owner'] == 'Maestri, Luca'
+
+        _, _, body = api.handle('GET', '/data/json/MSFT/transactions.json?from=2024-01-01&owner=0004444444')
+        assert json.loads(body)['count'] == 2
+
+        # LIKE wildcards in the owner are matched literally
+        for owner in ('%25', '_', 'Cook_'):
+            _, _, body = api.handle('GET', f'/data/json/AAPL/transactions.json?from=2024-01-01&owner={owner}')
+            assert json.loads(body)['count'] == 0
+
+    def test_unexpected_errors_return_500(self, api):
+        """Test that an error outside the database still gets a JSON 500 response."""
+        with patch('views.load_views', side_effect=ValueError('views.json: expected a list')):
+            status, headers, body = api.handle('GET', '/data/json/views/index.json')
+        assert status == 500
+        assert headers['Content-Type'] == 'application/json'
+        assert json.loads(body) == {'error': 'Internal server error'}
+
+    def test_static_layout(self, api):
+        """Test that the static API paths are served with the same document shapes."""
+        status, _, body = api.handle('GET', '/data/json/companies.json')
+        assert status == 200
+        assert json.loads(body)['count'] == 3
+
+        status, _, body = api.handle('GET', '/data/json/summary.json')
+        assert status == 200
+        assert 'large_transactions' in json.loads(body)
+
+        status, _, body = api.handle('GET', '/data/json/AAPL/quarterly/2024-Q4.json')
+        data = json.loads(body)
+        assert status == 200
+        assert (data['year'], data['quarter'], data['count']) == (2024, 4, 2)
+
+        status, _, body = api.handle('GET', '/data/json/MSFT/latest.json')
+        data = json.loads(body)
+        assert status == 200
+        assert [tx['transaction_date'] for tx in data['transactions']] == ['2025-02-10', '2025-01-20', '2024-12-15']
+
+        status, _, body = api.handle('GET', '/data/json/views/officer-purchases.json')
+        data = json.loads(body)
+        assert status == 200
+        assert [(tx['ticker'], tx['reporting_owner']) for tx in data['transactions']] == [('AAPL', 'Cook, Tim')]
+        
+        status, _, body = api.handle('GET', '/data/json/by-month/2025-01.json')
+        data = json.loads(body)
+        assert status == 200
+        assert [tx['ticker'] for tx in data['transactions']] == ['GOOGL', 'AAPL', 'MSFT']
+        
+        assert api.handle('GET', '/data/json/NOPE/latest.json')[0] == 404
+        assert api.handle('GET', '/data/json/by-month/2019-01.json')[0] == 404
+        assert api.handle('GET', '/data/json/views/nope.json')[0] == 404
+        assert api.handle('GET', '/data/json/AAPL/quarterly/2019-Q1.json')[0] == 404
+        assert api.handle('GET', '/data/json/NOPE/transactions.json')[0] == 404
+        assert api.handle('GET', '/data/json/unknown.json')[0] == 404
+        assert api.handle('POST', '/data/json/summary.json')[0] == 405
+        assert api.handle('GET', '/data/json/AAPL/transactions.json?from=yesterday')[0] == 400
+        assert api.handle('GET', '/data/json/AAPL/transactions.json?limit=-1')[0] == 400
+
+    def test_etag_and_conditional_requests(self, api):
+        """Test strong ETags, If-None-Match and If-Modified-Since handling."""
+        path = '/data/json/AAPL/transactions.json?from=2024-01-01'
+        status, headers, body = api.handle('GET', path)
+        etag = headers['ETag']
+        assert status == 200 and etag.startswith('"') and not etag.startswith('W/')
+
+        status, _, body = api.handle('GET', path, {'If-None-Match': etag})
+        assert status == 304 and body == b''
+
+        status, _, _ = api.handle('GET', path, {'If-Modified-Since': headers['Last-Modified']})
+        assert status == 304
+
+        status, _, _ = api.handle('GET', path, {'If-None-Match': '"stale"'})
+        assert status == 200
+
+    def test_gzip(self, api):
+        """Test that large responses are gzipped for clients that accept it."""
+        path = '/data/json/AAPL/transactions.json?from=2024-01-01'
+        _, plain_headers, plain = api.handle('GET', path)
+        status, headers, body = api.handle('GET', path, {'Accept-Encoding': 'gzip, deflate'})
+
+        assert status == 200
+        assert headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(body) == plain
+        assert headers['ETag'] != plain_headers['ETag']
+        assert int(headers['Content-Length']) == len(body)
+
+    def test_cache_is_bounded_and_invalidated(self, api, test_db_path):
+        """Test the LRU bounds and that a database change clears the cache."""
+        api.cache = server.ResponseCache(max_entries=2)
+        for ticker in ('AAPL', 'MSFT', 'GOOGL'):
+            api.handle('GET', f'/data/json/{ticker}/transactions.json?from=2024-01-01')
+        assert len(api.cache.entries) == 2
+
+        _, _, body = api.handle('GET', '/data/json/GOOGL/transactions.json?from=2024-01-01')
+        assert json.loads(body)['count'] == 2
+
+        conn = sqlite3.connect(test_db_path)
+        conn.execute("""
+        INSERT INTO insider_trading (issuer_name, issuer_ticker, reporting_owner, transaction_date, transaction_type)
+        VALUES ('Alphabet Inc.', 'GOOGL', 'Page, Larry', '2025-03-20', 'S')
+        """)
+        conn.commit()
+        conn.close()
+
+        _, _, body = api.handle('GET', '/data/json/GOOGL/transactions.json?from=2024-01-01')
+        assert json.loads(body)['count'] == 3
+
+    def test_http_round_trip(self, api):
+        """Test one keep-alive connection through the asyncio server."""
+        # The transport is exercised against a real socket on an ephemeral port
+        async def exercise():
+            executor = ThreadPoolExecutor(max_workers=1)
+            srv = await asyncio.start_server(
+                lambda r, w: api.handle_connection(r, w, executor), '127.0.0.1', 0)
+            port = srv.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            responses = []
+            # Header names are case-insensitive: the second request ends the connection
+            for path, extra in (('/data/json/companies.json', ''),
+                                ('/data/json/AAPL/transactions.json?from=2024-01-01', 'CONNECTION: Close\r\n')):
+                writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n{extra}\r\n'.encode())
+                await writer.drain()
+                head = await reader.readuntil(b'\r\n\r\n')
+                lines = head.decode().split('\r\n')
+                headers = dict(line.split(': ', 1) for line in lines[1:] if line)
+                body = await reader.readexactly(int(headers['Content-Length']))
+                responses.append((lines[0], json.loads(body), headers['Connection']))
+            writer.close()
+            srv.close()
+            await srv.wait_closed()
+            executor.shutdown()
+            return responses
+
+        responses = asyncio.run(exercise())
+        assert responses[0][0] == 'HTTP/1.1 200 OK'
+        assert responses[0][1]['count'] == 3
+        assert responses[1][1]['count'] == 5
+        assert [response[2] for response in responses] == ['keep-alive', 'close']
+
+    def test_unknown_ticker_with_cold_partitions(self, api, test_db_path, tmp_path):
+        """Test that an unknown ticker is a 404 once partitions exist, and a cold-only ticker is found."""
+        # With one hot year all of GOOGL's rows go cold
+        partitions.rollover(test_db_path, str(tmp_path), hot_years=1, today=datetime(2026, 1, 15))
+
+        status, _, body = api.handle('GET', '/data/json/GOOGL/transactions.json?from=2024-01-01')
+        assert status == 200 and json.loads(body)['count'] == 2
+        assert api.handle('GET', '/data/json/ZZZZ/transactions.json?from=2024-01-01')[0] == 404
+
+        # Partitions catalogued before the ticker list existed are searched
+        conn = sqlite3.connect(test_db_path)
+        conn.execute("DELETE FROM cold_partition_tickers")
+        conn.commit()
+        conn.close()
+        assert api.handle('GET', '/data/json/GOOGL/transactions.json?from=2024-01-02')[0] == 200
+        assert api.handle('GET', '/data/json/ZZZZ/transactions.json?from=2024-01-02')[0] == 404
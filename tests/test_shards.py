@@ -0,0 +1,144 @@
+"""
+Tests for the shards.py sharded ingestion and merge.
+"""
+import os
+import shutil
+import sqlite3
+import subprocess
+import pytest
+from unittest.mock import patch
+import sys
+
+# Add the parent directory to the path so we can import from the main script
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_DIR)
+import shards
+import InsiderTrading
+from benchmarks import corpus
+
+NUM_SHARDS = 3
+
+def build_shard_corpus(data_dir):
+    """Write a synthetic corpus into each shard's directory, by the shard of its ticker."""
+    source_dir = os.path.join(data_dir, 'corpus')
+    corpus.generate_corpus(source_dir, n_filings=120, n_issuers=12, seed=5)
+    filings_dir = os.path.join(source_dir, 'sec-edgar-filings')
+    for ticker in os.listdir(filings_dir):
+        target = os.path.join(shards.shard_dir(data_dir, shards.shard_of(ticker, NUM_SHARDS), NUM_SHARDS),
+                              'sec-edgar-filings', ticker)
+        shutil.copytree(os.path.join(filings_dir, ticker), target)
+    shutil.rmtree(source_dir)
+
+def merged_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(f'''
+    SELECT id, {', '.join(InsiderTrading.TRANSACTION_COLUMNS)}, source_file
+    FROM insider_trading ORDER BY id
+    ''').fetchall()
+    conn.close()
+    return rows
+
+class TestShards:
+
+    def test_assignment_is_deterministic(self):
+        """Test that every ticker lands in exactly one shard, independently of hash seeds and spelling."""
+        tickers = [ticker for ticker in corpus.issuer_tickers(200) if ticker.isalpha()] + ['BRK-B']
+        assigned = [shards.select_shard(tickers, shard, 8) for shard in range(8)]
+        assert sorted(sum(assigned, [])) == sorted(tickers)
+        assert all(assigned)
+        assert shards.shard_of('BRK-B', 8) == shards.shard_of('brk.b', 8)
+
+        # Same answer in a process with another PYTHONHASHSEED
+        output = subprocess.run(
+            [sys.executable, os.path.join(REPO_DIR, 'shards.py'), 'assign', '--shard', '3/8',
+             '--tickers', ','.join(tickers)],
+            env={**os.environ, 'PYTHONHASHSEED': '123'}, capture_output=True, text=True, check=True).stdout
+        assert output.strip().splitlines()[-1] == ','.join(assigned[3])
+
+        with pytest.raises(ValueError):
+            shards.parse_shard('4/4')
+
+    def test_parallel_shards_merge_like_a_single_run(self, tmp_path):
+        """Test that shards ingested by separate processes merge into the rows of a one-process ingest."""
+        data_dir = str(tmp_path)
+        build_shard_corpus(data_dir)
+
+        # Each shard is parsed by its own process, concurrently
+        processes = [subprocess.Popen([sys.executable, os.path.join(REPO_DIR, 'shards.py'), 'ingest',
+                                       '--shard', f'{shard}/{NUM_SHARDS}', '--data-dir', data_dir],
+                                      stdout=subprocess.DEVNULL)
+                     for shard in range(NUM_SHARDS)]
+        assert [process.wait() for process in processes] == [0] * NUM_SHARDS
+
+        assert shards.main(['merge', '--num-shards', str(NUM_SHARDS), '--data-dir', data_dir]) == 0
+        db_path = os.path.join(data_dir, 'insider_trading.db')
+        rows = merged_rows(db_path)
+        assert len(rows) == 120
+        assert len({shards.accession_number(row[-1]) for row in rows}) == 120
+        # Ids follow (transaction_date, accession)
+        dates = [row[InsiderTrading.TRANSACTION_COLUMNS.index('transaction_date') + 1] for row in rows]
+        assert dates == sorted(dates)
+
+        # Merging again adds nothing, and a fresh merge of the same shards gives the same table
+        assert shards.main(['merge', '--data-dir', data_dir]) == 0
+        assert merged_rows(db_path) == rows
+        second_db = os.path.join(data_dir, 'second.db')
+        with patch('InsiderTrading.DB_PATH', second_db), patch('InsiderTrading.DATA_DIR', data_dir):
+            InsiderTrading.initialize_database()
+        databases = list(shards.find_shard_databases(data_dir, NUM_SHARDS).values())
+        shards.merge_shards(second_db, data_dir, reversed(databases))
+        assert [row[1:] for row in merged_rows(second_db)] == [row[1:] for row in rows]
+
+    def test_duplicates_and_conflicts(self, tmp_path):
+        """Test that a filing in two shards is kept once and rows already in the target win."""
+        data_dir = str(tmp_path)
+        paths = []
+        for shard, (shares, created_at) in enumerate([('100', '2025-01-01 00:00:00'),
+                                                      ('150', '2025-02-01 00:00:00')]):
+            db_path = os.path.join(shards.shard_dir(data_dir, shard, 2), 'insider_trading.db')
+            os.makedirs(os.path.dirname(db_path))
+            with patch('InsiderTrading.DB_PATH', db_path), \
+                 patch('InsiderTrading.DATA_DIR', os.path.dirname(db_path)):
+                InsiderTrading.initialize_database()
+            conn = sqlite3.connect(db_path)
+            rows = [
+                # The same filing, reparsed with a different share count by the second shard
+                ('AAPL', '2025-01-10', shares, f'/s{shard}/sec-edgar-filings/AAPL/4/0001-25-000001/primary-document.xml'),
+                # Already in the target database
+                ('MSFT', '2025-01-11', '5', f'/s{shard}/sec-edgar-filings/MSFT/4/0001-25-000002/primary-document.xml'),
+                (f'NEW{shard}', '2025-01-12', '7', f'/s{shard}/sec-edgar-filings/NEW{shard}/4/0001-25-00001{shard}/primary-document.xml'),
+            ]
+            conn.executemany('''
+            INSERT INTO insider_trading (issuer_ticker, transaction_date, transaction_shares, source_file, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            ''', [row + (created_at,) for row in rows])
+            conn.commit()
+            conn.close()
+            paths.append(db_path)
+
+        target = os.path.join(data_dir, 'insider_trading.db')
+        with patch('InsiderTrading.DB_PATH', target), patch('InsiderTrading.DATA_DIR', data_dir):
+            InsiderTrading.initialize_database()
+        conn = sqlite3.connect(target)
+        conn.execute('''
+        INSERT INTO insider_trading (issuer_ticker, transaction_date, transaction_shares, source_file)
+        VALUES ('MSFT', '2025-01-11', '9', '/main/sec-edgar-filings/MSFT/4/0001-25-000002/primary-document.xml')
+        ''')
+        conn.commit()
+        conn.close()
+
+        stats = shards.merge_shards(target, data_dir, paths)
+        assert stats == {'shards': 2, 'rows': 6, 'inserted': 3, 'duplicates': 2, 'conflicts': 1, 'existing': 1}
+
+        conn = sqlite3.connect(target)
+        rows = dict(conn.execute("SELECT issuer_ticker, transaction_shares FROM insider_trading").fetchall())
+        conn.close()
+        # The most recent parse wins between shards; the target keeps its own row
+        assert rows == {'MSFT': '9', 'AAPL': '150', 'NEW0': '7', 'NEW1': '7'}
+
+    def test_missing_shard_is_an_error(self, tmp_path):
+        """Test that merging an incomplete shard set fails without touching the database."""
+        data_dir = str(tmp_path)
+        shards.ingest_shard(data_dir, 0, 2)
+        assert shards.main(['merge', '--num-shards', '2', '--data-dir', data_dir]) == 1
+        assert not os.path.exists(os.path.join(data_dir, 'insider_trading.db'))
@@ -0,0 +1,83 @@
+"""
+Tests for the snapshots.py binary per-ticker snapshots.
+"""
+import os
+import math
+import numpy as np
+import pytest
+from datetime import date
+from unittest.mock import patch
+import sys
+
+# Add the parent directory to the path so we can import from the main script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import snapshots
+import export_json
+
+class TestSnapshots:
+
+    def test_export_and_memmap_load(self, test_db_path, test_json_dir, tmp_path):
+        """Test that snapshots round-trip through numpy.memmap with typed columns."""
+        assert snapshots.export_snapshots(test_db_path, str(tmp_path), test_json_dir) == 3
+
+        snapshot = snapshots.load_snapshot(os.path.join(test_json_dir, 'AAPL', snapshots.SNAPSHOT_FILE))
+        assert snapshot['ticker'] == 'AAPL'
+        assert not snapshot['date'].flags.writeable  # a view of the read-only map
+        assert snapshot['date'].dtype == np.dtype('<i4')
+        assert snapshot['price'].dtype == np.dtype('<f8')
+
+        # Oldest first, dates as days since the epoch
+        first_day = date(1970, 1, 1).toordinal()
+        dates = [date.fromordinal(first_day + int(day)).isoformat() for day in snapshot['date']]
+        assert dates == ['2024-11-10', '2024-12-05', '2025-01-15', '2025-02-20', '2025-03-10']
+
+        assert snapshot['shares'][0] == 5000
+        assert snapshot['value'][0] == pytest.approx(5000 * 175.50)
+        owners = snapshot['dictionary']['owners']
+        types = snapshot['dictionary']['types']
+        assert [owners[i] for i in snapshot['owner']][:2] == ['Cook, Tim', 'Maestri, Luca']
+        assert [types[i] for i in snapshot['type']] == ['P', 'A', 'S', 'S', 'S']
+
+    def test_missing_values_and_frombuffer(self, tmp_path):
+        """Test NaN/sentinel encoding of missing values and the in-memory reader."""
+        path = os.path.join(tmp_path, snapshots.SNAPSHOT_FILE)
+        record = {'transaction_date': None, 'transaction_shares': 'n/a', 'transaction_price': None,
+                  'shares_after_transaction': '12', 'reporting_owner': 'Doe, Jane',
+                  'reporting_owner_cik': '0000000001', 'transaction_type': None}
+        snapshots.write_snapshot(path, snapshots.encode_snapshot('XYZ', [record]))
+
+        snapshot = snapshots.load_snapshot(path, use_mmap=False)
+        assert snapshot['date'][0] == snapshots.MISSING_DATE
+        assert math.isnan(snapshot['shares'][0]) and math.isnan(snapshot['value'][0])
+        assert snapshot['shares_after'][0] == 12
+        assert snapshot['dictionary']['types'] == [None]
+
+    def test_unchanged_snapshots_are_not_rewritten(self, test_db_path, test_json_dir, tmp_path):
+        """Test that a second export leaves identical snapshots alone."""
+        snapshots.export_snapshots(test_db_path, str(tmp_path), test_json_dir)
+        path = os.path.join(test_json_dir, 'MSFT', snapshots.SNAPSHOT_FILE)
+        mtime = os.stat(path).st_mtime_ns
+        assert snapshots.export_snapshots(test_db_path, str(tmp_path), test_json_dir) == 0
+        assert os.stat(path).st_mtime_ns == mtime
+
+        universe = snapshots.load_universe(test_json_dir)
+        assert sorted(universe) == ['AAPL', 'GOOGL', 'MSFT']
+
+    def test_rejects_other_files(self, tmp_path):
+        """Test that a file without the snapshot header is refused."""
+        path = os.path.join(tmp_path, 'not_a_snapshot.bin')
+        with open(path, 'wb') as f:
+            f.write(b'{"transactions": []}'.ljust(128))
+        with pytest.raises(ValueError):
+            snapshots.load_snapshot(path)
+
+    def test_export_main_option(self, test_db_path, test_json_dir, tmp_path):
+        """Test that export_json writes snapshots only when asked to."""
+        with patch('export_json.DB_PATH', test_db_path), \
+             patch('export_json.DATA_DIR', str(tmp_path)), \
+             patch('export_json.JSON_DIR', test_json_dir), \
+             patch.dict('os.environ', {}, clear=True):
+            assert export_json.main(['--metrics', os.path.join(tmp_path, 'm.json')]) == 0
+            assert not os.path.exists(os.path.join(test_json_dir, 'AAPL', snapshots.SNAPSHOT_FILE))
+            assert export_json.main(['--snapshots', '--metrics', os.path.join(tmp_path, 'm.json')]) == 0
+            assert os.path.exists(os.path.join(test_json_dir, 'AAPL', snapshots.SNAPSHOT_FILE))
@@ -0,0 +1,85 @@
+"""
+Tests for the sqlite_snapshot.py read-only SQLite snapshot.
+"""
+import os
+import sqlite3
+import pytest
+from datetime import datetime
+import sys
+
+# Add the parent directory to the path so we can import from the main script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sqlite_snapshot
+import manifest
+import partitions
+
+def query_plan(conn, query, params=()):
+    return ' '.join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params))
+
+class TestSqliteSnapshot:
+
+    def test_snapshot_layout(self, test_db_path, test_json_dir):
+        """Test the page size, journal mode, row order, metadata and covering indexes of the snapshot."""
+        data_dir = os.path.dirname(test_db_path)
+        # Some rows live in a cold partition; the snapshot has them all
+        partitions.rollover(test_db_path, data_dir, hot_years=0, today=datetime(2025, 1, 1))
+        path = os.path.join(test_json_dir, sqlite_snapshot.SNAPSHOT_FILE)
+        assert sqlite_snapshot.build_snapshot(test_db_path, data_dir, path)
+        assert sorted(os.listdir(test_json_dir)) == [sqlite_snapshot.SNAPSHOT_FILE]
+
+        conn = sqlite_snapshot.connect(path)
+        assert conn.execute("PRAGMA page_size").fetchone()[0] == sqlite_snapshot.PAGE_SIZE
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+        assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+        # Rows are stored by company and date
+        rows = conn.execute("SELECT issuer_ticker, transaction_date FROM insider_trading ORDER BY rowid").fetchall()
+        assert len(rows) == 10
+        assert rows == sorted(rows)
+
+        value = conn.execute('''
+        SELECT transaction_value FROM insider_trading WHERE reporting_owner_cik = '0001111111'
+        AND transaction_date = '2025-01-15'
+        ''').fetchone()[0]
+        assert value == 10000 * 180.25
+
+        metadata = sqlite_snapshot.read_metadata(path)
+        assert metadata['row_count'] == '10'
+        assert metadata['cold_partitions'] == '1'
+        assert (metadata['first_date'], metadata['last_date']) == ('2024-11-10', '2025-03-10')
+
+        assert 'COVERING INDEX idx_ticker_date' in query_plan(conn, '''
+        SELECT COUNT(*), SUM(transaction_value) FROM insider_trading
+        WHERE issuer_ticker = ? AND transaction_date BETWEEN ? AND ?''', ('AAPL', '2024-01-01', '2024-12-31'))
+        assert 'COVERING INDEX idx_owner_date' in query_plan(conn, '''
+        SELECT transaction_date, issuer_ticker, transaction_type FROM insider_trading
+        WHERE reporting_owner_cik = ? ORDER BY transaction_date''', ('0001111111',))
+        assert 'idx_value' in query_plan(conn, '''
+        SELECT issuer_ticker, transaction_date FROM insider_trading ORDER BY transaction_value DESC LIMIT 5''')
+
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM insider_trading")
+        conn.close()
+
+        entry = manifest.describe_file(test_json_dir, sqlite_snapshot.SNAPSHOT_FILE)
+        assert (entry['rows'], entry['first_date'], entry['last_date']) == (10, '2024-11-10', '2025-03-10')
+
+    def test_unchanged_data_keeps_the_file(self, test_db_path, test_json_dir):
+        """Test that the snapshot is only replaced when its data changed."""
+        data_dir = os.path.dirname(test_db_path)
+        path = os.path.join(test_json_dir, sqlite_snapshot.SNAPSHOT_FILE)
+        assert sqlite_snapshot.build_snapshot(test_db_path, data_dir, path)
+        generated_at = sqlite_snapshot.read_metadata(path)['generated_at']
+
+        assert not sqlite_snapshot.build_snapshot(test_db_path, data_dir, path)
+        assert sqlite_snapshot.read_metadata(path)['generated_at'] == generated_at
+
+        conn = sqlite3.connect(test_db_path)
+        conn.execute("UPDATE insider_trading SET transaction_price = '1,000.5' WHERE reporting_owner = 'Hood, Amy'")
+        conn.commit()
+        conn.close()
+        assert sqlite_snapshot.build_snapshot(test_db_path, data_dir, path)
+        snapshot = sqlite_snapshot.connect(path)
+        assert snapshot.execute("SELECT transaction_price FROM insider_trading WHERE reporting_owner = 'Hood, Amy'"
+                                ).fetchone()[0] == 1000.5
+        snapshot.close()
+        assert sorted(os.listdir(test_json_dir)) == [sqlite_snapshot.SNAPSHOT_FILE]
@@ -0,0 +1,52 @@
+"""
+Import-time regression tests for the command line scripts.
+"""
+import os
+import json
+import subprocess
+import pytest
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy dependencies that must only be imported by the code paths that use them
+HEAVY_MODULES = ['pandas', 'numpy', 'requests', 'sec_edgar_downloader']
+
+# The command line scripts and the modules they import at startup
+SCRIPTS = ['InsiderTrading', 'export_json', 'backfill', 'server', 'watch', 'issuers', 'partitions', 'prune',
+           'shards', 'universe', 'client']
+
+def _import_in_subprocess(modules):
+    """Import modules in a fresh interpreter and report the heavy modules loaded."""
+    code = (
+        "import json, sys\n"
+        f"import {', '.join(modules)}\n"
+        f"print(json.dumps({{'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=REPO_DIR,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+class TestStartup:
+
+    @pytest.mark.parametrize('module', ['InsiderTrading', 'export_json', 'backfill'])
+    def test_import_does_not_load_heavy_dependencies(self, module):
+        """Test that importing a script doesn't pull in pandas, requests or sec_edgar_downloader."""
+        report = _import_in_subprocess([module])
+        assert report['loaded'] == []
+
+    def test_importing_every_script_stays_light(self):
+        """Test that importing every script together still loads none of the heavy dependencies."""
+        report = _import_in_subprocess(SCRIPTS)
+        assert report['loaded'] == []
+
+    def test_query_without_pandas(self, test_db_path):
+        """Test that the pandas-free query path returns plain dictionaries."""
+        code = (
+            "import sys, InsiderTrading\n"
+            f"InsiderTrading.DB_PATH = {test_db_path!r}\n"
+            "rows = InsiderTrading.query_insider_trading(ticker='AAPL', as_dataframe=False)\n"
+            "assert len(rows) == 5 and rows[0]['issuer_ticker'] == 'AAPL'\n"
+            "assert 'pandas' not in sys.modules\n"
+        )
+        subprocess.run([sys.executable, '-c', code], cwd=REPO_DIR, check=True)
@@ -0,0 +1,90 @@
+"""
+Tests for the universe.py issuer universe registry.
+"""
+import os
+import json
+import sqlite3
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+import sys
+
+# Add the parent directory to the path so we can import from the main script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import universe
+import issuers
+
+def write_sources(tmp_path, index_tickers):
+    (tmp_path / 'index.csv').write_text('Symbol,Security\n' + ''.join(f"{t},{t} Inc.\n" for t in index_tickers))
+    (tmp_path / 'watchlist.json').write_text(json.dumps([{'ticker': 'brk-b'}, '0000320193']))
+    (tmp_path / 'ciks.txt').write_text('# Extra issuers\n0000789019\n0000000001\n')
+    sources = [
+        {'type': 'csv', 'path': 'index.csv'},
+        {'type': 'json', 'path': 'watchlist.json'},
+        {'type': 'ciks', 'path': 'ciks.txt'},
+        {'type': 'tickers', 'tickers': ['BF.B', 'AAPL']},
+    ]
+    (tmp_path / 'universe.json').write_text(json.dumps({'sources': sources}))
+    return sources
+
+class TestUniverse:
+
+    def test_sources_are_merged_and_resolved(self, tmp_path):
+        """Test that every source type contributes members, CIKs are mapped and duplicates are merged."""
+        sources = write_sources(tmp_path, ['GOOGL', 'AAPL'])
+        conn = sqlite3.connect(os.path.join(tmp_path, 'test.db'))
+        issuers.initialize_issuers(conn)
+        conn.executemany("INSERT INTO issuers (cik, ticker, source) VALUES (?, ?, 'sec')",
+                         [('0000320193', 'AAPL'), ('0000789019', 'MSFT')])
+
+        summary = universe.sync_universe(conn, sources, base_dir=str(tmp_path))
+        # The unknown CIK 0000000001 is left out
+        assert summary == {'members': 5, 'added': ['AAPL', 'BF.B', 'BRK.B', 'GOOGL', 'MSFT'], 'removed': [],
+                           'failed': []}
+        # Download spellings, as the daily run's directories use them
+        assert universe.members(conn) == ['AAPL', 'BF-B', 'BRK-B', 'GOOGL', 'MSFT']
+        assert conn.execute("SELECT sources FROM universe_members WHERE ticker = 'AAPL'").fetchone()[0] == \
+            'csv:index.csv,json:watchlist.json,tickers'
+
+        with pytest.raises(ValueError):
+            universe.sync_universe(conn, [{'type': 'tickers', 'tickers': ['-']}], str(tmp_path))
+        (tmp_path / 'bad.json').write_text(json.dumps({'sources': [{'type': 'sector'}]}))
+        with pytest.raises(ValueError):
+            universe.load_config(str(tmp_path / 'bad.json'))
+        assert universe.load_config(str(tmp_path / 'missing.json')) == universe.DEFAULT_SOURCES
+        conn.close()
+
+    def test_membership_changes_are_incremental(self, tmp_path):
+        """Test that joins and departures are recorded, and an unreadable source keeps its members."""
+        sources = [{'type': 'csv', 'path': 'index.csv'}]
+        conn = sqlite3.connect(os.path.join(tmp_path, 'test.db'))
+        write_sources(tmp_path, ['AAPL', 'MSFT', 'GOOGL'])
+        universe.sync_universe(conn, sources, str(tmp_path), now=datetime(2025, 1, 1))
+
+        write_sources(tmp_path, ['AAPL', 'GOOGL', 'NVDA'])
+        summary = universe.sync_universe(conn, sources, str(tmp_path), now=datetime(2025, 2, 1))
+        assert (summary['added'], summary['removed']) == (['NVDA'], ['MSFT'])
+        assert universe.members(conn, removed=True) == ['MSFT']
+        added_at = dict(conn.execute("SELECT ticker, added_at FROM universe_members"))
+        assert added_at['AAPL'] == '2025-01-01T00:00:00' and added_at['NVDA'] == '2025-02-01T00:00:00'
+
+        # A source that can't be read keeps its previous members
+        os.remove(tmp_path / 'index.csv')
+        summary = universe.sync_universe(conn, sources, str(tmp_path), now=datetime(2025, 3, 1))
+        assert (summary['added'], summary['removed'], summary['failed']) == ([], [], ['csv:index.csv'])
+        assert universe.members(conn) == ['AAPL', 'GOOGL', 'NVDA']
+
+        # Members that come back are active again, from the day they rejoined
+        write_sources(tmp_path, ['AAPL', 'GOOGL', 'NVDA', 'MSFT'])
+        summary = universe.sync_universe(conn, sources, str(tmp_path), now=datetime(2025, 4, 1))
+        assert summary['added'] == ['MSFT']
+        assert universe.members(conn, removed=True) == []
+        assert conn.execute("SELECT added_at FROM universe_members WHERE ticker = 'MSFT'").fetchone()[0] == \
+            '2025-04-01T00:00:00'
+        conn.close()
+
+        # The scripts read it through load_universe()
+        (tmp_path / 'universe.json').write_text(json.dumps({'sources': sources}))
+        with patch('InsiderTrading.DB_PATH', os.path.join(tmp_path, 'test.db')), \
+             patch('InsiderTrading.DATA_DIR', str(tmp_path)):
+            assert universe.load_universe(str(tmp_path / 'universe.json'), limit=2) == ['AAPL', 'GOOGL']
@@ -0,0 +1,146 @@
+"""
+Tests for the watch.py near-real-time ingestion, against a local feed stand-in.
+"""
+import os
+import json
+import random
+import sqlite3
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+import pytest
+import sys
+
+# Add the parent directory to the path so we can import from the main script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import watch
+import InsiderTrading
+from benchmarks import corpus
+
+ISSUERS = {'0000320193': 'AAPL', '0001067983': 'BRK.B', '0009999999': 'XYZ'}
+
+def feed_entry(accession, name, cik, role, updated):
+    return f"""<entry>
+<title>4 - {name} ({cik}) ({role})</title>
+<link rel="alternate" type="text/html" href="https://www.sec.gov/Archives/edgar/data/{int(cik)}/{accession.replace('-', '')}/{accession}-index.htm"/>
+<updated>{updated}</updated>
+<category scheme="https://www.sec.gov/" label="form type" term="4"/>
+<id>urn:tag:sec.gov,2008:accession-number={accession}</id>
+</entry>
+"""
+
+def feed(entries):
+    return ('<?xml version="1.0" encoding="ISO-8859-1" ?>\n<feed xmlns="http://www.w3.org/2005/Atom">\n'
+            '<title>Latest Filings</title>\n' + ''.join(entries) + '</feed>\n').encode('iso-8859-1')
+
+class FakeEdgar(BaseHTTPRequestHandler):
+    """Serves the documents of the server's `documents` dictionary by path."""
+
+    def do_GET(self):
+        body = self.server.documents.get(self.path)
+        self.server.requested.append(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def edgar():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeEdgar)
+    server.documents = {}
+    server.requested = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    with patch('fetcher.ARCHIVES_URL', server.url + '/Archives/edgar/data/{cik}/{accession}'):
+        yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def watch_env(tmp_path):
+    data_dir = str(tmp_path)
+    db_path = os.path.join(data_dir, 'insider_trading.db')
+    with patch('InsiderTrading.DATA_DIR', data_dir), patch('InsiderTrading.DB_PATH', db_path):
+        InsiderTrading.initialize_database()
+        conn = sqlite3.connect(db_path)
+        conn.executemany("INSERT INTO issuers (cik, ticker, tickers, source) VALUES (?, ?, ?, 'sec')",
+                         [(cik, ticker, ticker) for cik, ticker in ISSUERS.items()])
+        conn.commit()
+        conn.close()
+        yield data_dir, db_path
+
+def publish(edgar, accession, issuer_cik, ticker):
+    """Put a filing's index and ownership XML into the archive stand-in."""
+    prefix = f"/Archives/edgar/data/{int(issuer_cik)}/{accession.replace('-', '')}"
+    edgar.documents[f"{prefix}/index.json"] = json.dumps(
+        {'directory': {'item': [{'name': f'{accession}.txt'}, {'name': 'form4.xml'}]}}).encode()
+    edgar.documents[f"{prefix}/form4.xml"] = corpus.form4_xml(
+        random.Random(accession), issuer_cik, ticker, '0002000001', 'Doe Jane', 'CFO', date(2025, 4, 10), 1, 0
+    ).encode()
+
+class TestWatch:
+
+    def test_parse_feed(self):
+        """Test that issuer and reporting-owner entries of a feed are grouped by accession."""
+        filings = watch.parse_feed(feed([
+            feed_entry('0000320193-25-000002', 'Doe Jane', '0002000001', 'Reporting', '2025-04-14T16:05:12-04:00'),
+            feed_entry('0000320193-25-000002', 'Apple Inc.', '0000320193', 'Issuer', '2025-04-14T16:05:12-04:00'),
+            feed_entry('0000320193-25-000001', 'Doe Jane', '0002000001', 'Reporting', '2025-04-14T16:01:00-04:00'),
+        ]))
+        assert list(filings) == ['0000320193-25-000002', '0000320193-25-000001']
+        assert filings['0000320193-25-000002']['issuer_cik'] == '0000320193'
+        assert filings['0000320193-25-000002']['issuer_name'] == 'Apple Inc.'
+        # Its issuer entry isn't on this page yet
+        assert filings['0000320193-25-000001']['issuer_cik'] is None
+
+    def test_poll_ingests_new_filings_once(self, edgar, watch_env):
+        """Test that each new accession is downloaded, ingested and exported once, and lags are recorded."""
+        data_dir, db_path = watch_env
+        universe = ['AAPL', 'BRK-B']
+        entries = []
+        for accession, name, cik in [('0000320193-25-000001', 'Apple Inc.', '0000320193'),
+                                     ('0001067983-25-000001', 'Berkshire Hathaway Inc', '0001067983'),
+                                     ('0009999999-25-000001', 'Xyz Corp', '0009999999')]:
+            publish(edgar, accession, cik, ISSUERS[cik])
+            entries += [feed_entry(accession, 'Doe Jane', '0002000001', 'Reporting', '2025-04-14T16:00:00-04:00'),
+                        feed_entry(accession, name, cik, 'Issuer', '2025-04-14T16:00:00-04:00')]
+        # A filing whose documents aren't in the archive yet
+        entries.append(feed_entry('0000320193-25-000002', 'Apple Inc.', '0000320193', 'Issuer',
+                                  '2025-04-14T16:02:00-04:00'))
+        edgar.documents['/feed'] = feed(entries)
+
+        exported = []
+        with patch('export_json.main', side_effect=lambda argv: exported.append(argv) or 0), \
+             patch('InsiderTrading.refresh_issuers'):
+            assert watch.run_watch(interval=0, feed_url=edgar.url + '/feed', universe=universe, max_polls=2) == 2
+
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("SELECT issuer_ticker, source_file FROM insider_trading ORDER BY issuer_ticker").fetchall()
+        states = dict(conn.execute("SELECT accession, status FROM watch_filings"))
+        attempts = conn.execute("SELECT attempts FROM watch_filings WHERE accession = '0000320193-25-000002'"
+                                ).fetchone()[0]
+        exported_at = conn.execute("SELECT COUNT(exported_at) FROM watch_filings").fetchone()[0]
+        report = watch.lag_report(conn)
+        conn.close()
+
+        # One row per filing of the universe, under the daily run's directory names
+        assert [row[0] for row in rows] == ['AAPL', 'BRK.B']
+        assert os.path.join(data_dir, 'sec-edgar-filings', 'BRK-B', '4', '0001067983-25-000001') in rows[1][1]
+        assert states == {'0000320193-25-000001': 'ingested', '0001067983-25-000001': 'ingested',
+                          '0009999999-25-000001': 'skipped', '0000320193-25-000002': 'missing'}
+        # The second poll only retried the missing filing: nothing more was exported
+        assert exported == [['--tickers', 'AAPL,BRK.B']]
+        assert attempts == 2
+        assert exported_at == 2
+        assert report['filings'] == 2 and report['ingest']['max_seconds'] > 0
+
+        with patch('InsiderTrading.DB_PATH', db_path):
+            assert watch.main(['status']) == 0
@@ -0,0 +1,278 @@
+"""
+Configurable universe of issuers to download.
+
+The tickers covered by the daily run, the backfill and watch mode come from
+the sources listed in universe.json (the S&P 500 list when it's missing):
+
+    {"sources": [
+        {"type": "index", "name": "sp500"},
+        {"type": "csv", "path": "russell1000.csv", "column": "Ticker"},
+        {"type": "json", "path": "https://example.com/watchlist.json"},
+        {"type": "ciks", "ciks": ["0001067983"]},
+        {"type": "tickers", "tickers": ["BRK-B"]}
+    ]}
+
+    index    a published index membership list: a name from INDEXES, or any
+             CSV `url` with its ticker `column`
+    csv      a CSV file or URL with a ticker `column` (default 'Symbol') and/or
+             a `cik_column`
+    json     a JSON file or URL: a list of tickers, {"tickers": [...]}, or
+             [{"ticker": ..., "cik": ...}, ...]
+    ciks     issuer CIKs (`ciks`, or a `path` with one per line), mapped to
+             tickers with the issuer map
+    tickers  an inline list
+
+Relative paths are read from the directory of the config file.
+
+Membership is kept in the `universe_members` table and every sync reports
+the tickers that joined and left. Members that leave are only marked as
+removed (their rows, filings and JSON stay), and a source that can't be read
+keeps its previous members instead of shrinking the universe. Downloads skip
+accessions already on disk and backfill tasks are checkpointed per ticker,
+so a membership change only costs the new members' filings.
+
+Usage:
+    python universe.py sync [--config universe.json]
+    python universe.py list [--removed]
+"""
+from datetime import datetime
+import argparse
+import csv
+import io
+import json
+import os
+import sqlite3
+
+import InsiderTrading
+import issuers
+
+UNIVERSE_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'universe.json')
+
+# Index membership lists known by name
+INDEXES = {
+    'sp500': {'url': InsiderTrading.SP500_URL, 'column': 'Symbol'},
+}
+
+DEFAULT_SOURCES = [{'type': 'index', 'name': 'sp500'}]
+SOURCE_TYPES = ('index', 'csv', 'json', 'ciks', 'tickers')
+
+REQUEST_TIMEOUT = 30
+
+def initialize_universe(conn):
+    """Create the universe_members table if it doesn't exist."""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS universe_members (
+        ticker TEXT PRIMARY KEY,
+        symbol TEXT NOT NULL,
+        cik TEXT,
+        sources TEXT NOT NULL,
+        added_at TEXT NOT NULL,
+        removed_at TEXT
+    )
+    ''')
+    conn.commit()
+
+def load_config(path=UNIVERSE_CONFIG):
+    """Return the list of sources of a universe config file (the default sources when it doesn't exist)."""
+    if not os.path.exists(path):
+        return [dict(source) for source in DEFAULT_SOURCES]
+    with open(path) as f:
+        config = json.load(f)
+    sources = config.get('sources') if isinstance(config, dict) else config
+    if not sources:
+        raise ValueError(f"{path} lists no sources")
+    for source in sources:
+        if source.get('type') not in SOURCE_TYPES:
+            raise ValueError(f"Unknown universe source type {source.get('type')!r} in {path} "
+                             f"(expected one of {', '.join(SOURCE_TYPES)})")
+    return sources
+
+def source_name(source):
+    """Return the name a source's members are recorded under, e.g. 'index:sp500' or 'csv:russell1000.csv'."""
+    kind = source['type']
+    label = source.get('name') or source.get('path') or source.get('url')
+    return f"{kind}:{label}" if label else kind
+
+def _read_text(location, base_dir):
+    """Return the text of a local file (relative to base_dir) or an http(s) URL."""
+    if location.startswith(('http://', 'https://')):
+        import requests
+
+        response = requests.get(location, headers={'User-Agent': InsiderTrading.sec_user_agent()},
+                                timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response.text
+    with open(os.path.join(base_dir, location), encoding='utf-8-sig') as f:
+        return f.read()
+
+def _csv_members(text, column='Symbol', cik_column=None):
+    reader = csv.DictReader(io.StringIO(text))
+    fields = reader.fieldnames or []
+    if column not in fields and cik_column not in fields:
+        raise ValueError(f"Column {column!r} not found (available: {', '.join(fields)})")
+    return [(row.get(column), row.get(cik_column) if cik_column else None) for row in reader]
+
+def _json_members(text):
+    document = json.loads(text)
+    if isinstance(document, dict):
+        document = document.get('tickers') or document.get('members') or []
+    members = []
+    for entry in document:
+        if isinstance(entry, dict):
+            members.append((entry.get('ticker'), entry.get('cik')))
+        elif issuers.normalize_cik(entry):
+            members.append((None, entry))
+        else:
+            members.append((entry, None))
+    return members
+
+def read_source(source, base_dir='.'):
+    """Return the raw (symbol, cik) members of a source; either may be None. Raises when it can't be read."""
+    kind = source['type']
+    if kind == 'index':
+        index = INDEXES.get(source.get('name'), {})
+        url = source.get('url') or index.get('url')
+        if not url:
+            raise ValueError(f"Unknown index {source.get('name')!r} (known: {', '.join(INDEXES)})")
+        return _csv_members(_read_text(url, base_dir), source.get('column') or index.get('column', 'Symbol'))
+    if kind == 'csv':
+        return _csv_members(_read_text(source.get('path') or source['url'], base_dir),
+                            source.get('column', 'Symbol'), source.get('cik_column'))
+    if kind == 'json':
+        return _json_members(_read_text(source.get('path') or source['url'], base_dir))
+    if kind == 'ciks':
+        ciks = list(source.get('ciks', []))
+        if source.get('path'):
+            ciks += [line.strip() for line in _read_text(source['path'], base_dir).splitlines()
+                     if line.strip() and not line.startswith('#')]
+        return [(None, cik) for cik in ciks]
+    return [(symbol, None) for symbol in source.get('tickers', [])]
+
+def resolve_members(conn, members):
+    """Return {ticker: (symbol, cik)} for raw members, mapping CIKs to tickers with the issuer map.
+
+    `ticker` is the sanitized symbol ('BRK.B') and `symbol` the spelling used
+    for directories and downloads ('BRK-B'). Members that resolve to nothing
+    are reported and left out.
+    """
+    resolved = {}
+    for symbol, cik in members:
+        cik = issuers.normalize_cik(cik)
+        ticker = issuers.sanitize_symbol(symbol)
+        if cik and ticker is None:
+            entry = issuers.lookup(conn, cik)
+            ticker = entry['ticker'] if entry else None
+        if ticker is None:
+            print(f"Warning: universe member {symbol or cik!r} has no usable ticker, skipped")
+            continue
+        if ticker not in resolved:
+            resolved[ticker] = (ticker.replace('.', '-'), cik)
+    return resolved
+
+def sync_universe(conn, sources, base_dir='.', now=None):
+    """Read every source and update universe_members; returns a summary of the changes.
+
+    Members of a source that can't be read are carried over from the table.
+    The summary has 'added' and 'removed' ticker lists, 'members' and the
+    names of 'failed' sources. Raises ValueError when the universe ends up empty.
+    """
+    initialize_universe(conn)
+    now = (now or datetime.now()).isoformat(timespec='seconds')
+    current = {ticker: (symbol, cik, set(names.split(',')))
+               for ticker, symbol, cik, names in conn.execute(
+                   "SELECT ticker, symbol, cik, sources FROM universe_members WHERE removed_at IS NULL")}
+
+    members = {}
+    failed = []
+    for source in sources:
+        name = source_name(source)
+        try:
+            resolved = resolve_members(conn, read_source(source, base_dir))
+        except Exception as e:
+            print(f"Warning: could not read universe source {name}, keeping its previous members: {e}")
+            failed.append(name)
+            resolved = {ticker: (symbol, cik) for ticker, (symbol, cik, names) in current.items() if name in names}
+        for ticker, (symbol, cik) in resolved.items():
+            entry = members.setdefault(ticker, [symbol, cik, []])
+            entry[1] = entry[1] or cik
+            entry[2].append(name)
+
+    if not members:
+        raise ValueError("The universe is empty: no source could be read")
+
+    added = sorted(set(members) - set(current))
+    removed = sorted(set(current) - set(members))
+    conn.executemany('''
+    INSERT INTO universe_members (ticker, symbol, cik, sources, added_at) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (ticker) DO UPDATE SET
+        symbol = excluded.symbol, cik = COALESCE(excluded.cik, universe_members.cik), sources = excluded.sources,
+        added_at = CASE WHEN universe_members.removed_at IS NULL THEN universe_members.added_at
+                        ELSE excluded.added_at END,
+        removed_at = NULL
+    ''', [(ticker, symbol, cik, ','.join(names), now) for ticker, (symbol, cik, names) in members.items()])
+    conn.executemany("UPDATE universe_members SET removed_at = ? WHERE ticker = ?",
+                     [(now, ticker) for ticker in removed])
+    conn.commit()
+    return {'members': len(members), 'added': added, 'removed': removed, 'failed': failed}
+
+def members(conn, removed=False):
+    """Return the download symbols of the current members (or of the removed ones), in ticker order."""
+    initialize_universe(conn)
+    condition = 'removed_at IS NOT NULL' if removed else 'removed_at IS NULL'
+    return [row[0] for row in conn.execute(f"SELECT symbol FROM universe_members WHERE {condition} ORDER BY ticker")]
+
+def load_universe(config_path=None, limit=0):
+    """Sync the universe from its config and return the symbols to download (the first `limit` when > 0)."""
+    config_path = config_path or UNIVERSE_CONFIG
+    sources = load_config(config_path)
+    os.makedirs(InsiderTrading.DATA_DIR, exist_ok=True)
+    if any(source['type'] in ('ciks', 'json') or source.get('cik_column') for source in sources):
+        # CIKs are mapped to tickers with the issuer map
+        InsiderTrading.refresh_issuers()
+    conn = sqlite3.connect(InsiderTrading.DB_PATH)
+    try:
+        summary = sync_universe(conn, sources, base_dir=os.path.dirname(os.path.abspath(config_path)))
+        symbols = members(conn)
+    finally:
+        conn.close()
+
+    print(f"Universe: {summary['members']} issuers from {len(sources)} sources"
+          f" ({len(summary['added'])} added, {len(summary['removed'])} removed)")
+    if summary['added']:
+        print(f"  Added: {', '.join(summary['added'][:20])}{' ...' if len(summary['added']) > 20 else ''}")
+    if summary['removed']:
+        print(f"  Removed: {', '.join(summary['removed'][:20])}{' ...' if len(summary['removed']) > 20 else ''}")
+    return symbols[:limit] if limit > 0 else symbols
+
+def main(argv=None):
+    """Main function for the universe commands."""
+    parser = argparse.ArgumentParser(description='Maintain the universe of issuers to download.')
+    parser.add_argument('command', choices=['sync', 'list'],
+                        help='sync: read the sources and record joins and departures; list: print the members')
+    parser.add_argument('--config', type=str, default=UNIVERSE_CONFIG,
+                        help='Universe config file (default: universe.json)')
+    parser.add_argument('--removed', action='store_true',
+                        help='With list: print the members that left instead')
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'sync':
+            load_universe(args.config)
+            return 0
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 1
+
+    if not os.path.exists(InsiderTrading.DB_PATH):
+        print(f"Error: SQLite database not found at {InsiderTrading.DB_PATH}")
+        return 1
+    conn = sqlite3.connect(InsiderTrading.DB_PATH)
+    try:
+        print(','.join(members(conn, removed=args.removed)))
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""
+Precomputed cross-company filtered views, declared in views.json.
+
+Each view is a filter over every company's transactions, exported as its
+own small file, `data/json/views/{name}.json`, so clients don't have to
+download and filter every ticker's transactions.json:
+
+    {"views": [
+        {"name": "officer-purchases", "description": "Open-market purchases by officers",
+         "transaction_types": ["P"], "officers": true},
+        {"name": "large-sales", "description": "Sales over $1M",
+         "transaction_types": ["S"], "min_value": 1000000, "days": 365}
+    ]}
+
+    transaction_types  transaction codes to keep ('P', 'S', 'A', ...)
+    positions          officer title substrings, case-insensitive ('CEO', 'Chief Financial')
+    officers           true to keep only reporting owners with an officer title
+    tickers            issuer tickers to keep
+    min_value          smallest shares * price
+    max_value          largest shares * price
+    min_shares         smallest number of shares
+    days               only transactions of the last `days` days
+    limit              newest rows kept (default: VIEW_LIMIT)
+
+Every file lists the newest matching rows first:
+
+    {"name": "large-sales", "description": ..., "last_updated": ...,
+     "filter": {...}, "count": 1, "transactions": [{"ticker": "MSFT", ..., "value": 5707500.0}]}
+
+`views/index.json` lists the views with their counts. An export only reads
+the rows added since the last one (tracked by row id in `export_watermarks`)
+and merges the matches into the existing files. A view is rebuilt from the
+hot table when its file is missing, its filter changed, with rebuild=True
+and after issuers.py moved rows to new tickers (it clears the export
+watermarks).
+"""
+from datetime import datetime, timedelta
+import json
+import os
+import re
+
+import holdings
+import metrics
+import serializer
+
+VIEWS_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'views.json')
+VIEWS_DIR = 'views'
+INDEX_FILE = 'index.json'
+WATERMARK = 'views'
+
+VIEW_LIMIT = 500
+FILTER_KEYS = ('transaction_types', 'positions', 'officers', 'tickers', 'min_value', 'max_value', 'min_shares',
+               'days', 'limit')
+VIEW_NAME = re.compile(r'^[a-z0-9][a-z0-9_-]*$')
+
+VIEW_COLUMNS = ('id', 'issuer_ticker AS ticker', 'issuer_name', 'reporting_owner', 'reporting_owner_cik',
+                'reporting_owner_position', 'transaction_date', 'transaction_shares', 'transaction_price',
+                'transaction_type', 'shares_after_transaction')
+VALUE = 'CAST(transaction_shares AS REAL) * CAST(transaction_price AS REAL)'
+
+def load_views(path=VIEWS_CONFIG):
+    """Return the views declared in a config file (none when it doesn't exist). Raises ValueError when invalid."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        config = json.load(f)
+    views = config.get('views', []) if isinstance(config, dict) else config
+    names = set()
+    for view in views:
+        name = view.get('name')
+        if not isinstance(name, str) or not VIEW_NAME.match(name) or name == 'index':
+            raise ValueError(f"Invalid view name {name!r} in {path} (lowercase letters, digits, '-' and '_')")
+        if name in names:
+            raise ValueError(f"View {name!r} is declared twice in {path}")
+        names.add(name)
+        unknown = set(view) - set(FILTER_KEYS) - {'name', 'description'}
+        if unknown:
+            raise ValueError(f"Unknown key(s) {', '.join(sorted(unknown))} in view {name!r} of {path} "
+                             f"(expected {', '.join(FILTER_KEYS)})")
+    return views
+
+def view_filter(view):
+    """Return the filter part of a view definition (what the exported rows depend on)."""
+    return {key: view[key] for key in FILTER_KEYS if key in view}
+
+def cutoff_date(view, today=None):
+    """Return the oldest transaction_date a view keeps, or None without a `days` window."""
+    if not view.get('days'):
+        return None
+    return ((today or datetime.now()) - timedelta(days=view['days'])).strftime('%Y-%m-%d')
+
+def view_records(conn, view, since_id=None, today=None):
+    """Return the hot-table rows matching a view (newest first), only those with id > since_id when given."""
+    conditions, params = [], []
+    if view.get('transaction_types'):
+        conditions.append(f"transaction_type IN ({', '.join('?' * len(view['transaction_types']))})")
+        params += view['transaction_types']
+    if view.get('positions'):
+        conditions.append('(' + ' OR '.join(['reporting_owner_position LIKE ?'] * len(view['positions'])) + ')')
+        params += [f"%{position}%" for position in view['positions']]
+    if view.get('officers'):
+        conditions.append("TRIM(COALESCE(reporting_owner_position, '')) != ''")
+    if view.get('tickers'):
+        conditions.append(f"issuer_ticker IN ({', '.join('?' * len(view['tickers']))})")
+        params += view['tickers']
+    if view.get('min_value') is not None:
+        conditions.append(f"{VALUE} >= ?")
+        params.append(view['min_value'])
+    if view.get('max_value') is not None:
+        conditions.append(f"{VALUE} <= ?")
+        params.append(view['max_value'])
+    if view.get('min_shares') is not None:
+        conditions.append("CAST(transaction_shares AS REAL) >= ?")
+        params.append(view['min_shares'])
+    cutoff = cutoff_date(view, today)
+    if cutoff:
+        conditions.append("transaction_date >= ?")
+        params.append(cutoff)
+    if since_id is not None:
+        conditions.append("id > ?")
+        params.append(since_id)
+
+    cursor = conn.execute(f"""
+        SELECT {', '.join(VIEW_COLUMNS)}, {VALUE} AS value
+        FROM insider_trading
+        WHERE issuer_ticker IS NOT NULL {''.join(f' AND {condition}' for condition in conditions)}
+        ORDER BY transaction_date DESC, id DESC
+        LIMIT ?
+    """, params + [view.get('limit', VIEW_LIMIT)])
+    columns = [description[0] for description in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def _load_view_file(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def merge_rows(existing, new, view, today=None):
+    """Merge new matching rows into a view's rows: newest first, within its window and limit."""
+    rows = {row['id']: row for row in existing}
+    rows.update((row['id'], row) for row in new)
+    cutoff = cutoff_date(view, today)
+    merged = sorted((row for row in rows.values() if not cutoff or (row['transaction_date'] or '') >= cutoff),
+                    key=lambda row: (row['transaction_date'] or '', row['id']), reverse=True)
+    return merged[:view.get('limit', VIEW_LIMIT)]
+
+def update_views(conn, json_dir, views, rebuild=False, today=None):
+    """Merge the rows added since the last update into the view files and rewrite views/index.json.
+
+    Returns the number of view files written.
+    """
+    holdings.initialize_holdings(conn)
+    since_id = holdings.get_watermark(conn, WATERMARK)
+    max_id = conn.execute("SELECT MAX(id) FROM insider_trading").fetchone()[0] or 0
+    views_dir = os.path.join(json_dir, VIEWS_DIR)
+    if not views and not os.path.isdir(views_dir):
+        return 0
+    os.makedirs(views_dir, exist_ok=True)
+
+    written = 0
+    now = datetime.now().isoformat()
+    index = []
+    for view in views:
+        path = os.path.join(views_dir, f"{view['name']}.json")
+        existing = None if rebuild or since_id is None else _load_view_file(path)
+        if existing is None or existing.get('filter') != view_filter(view):
+            transactions = view_records(conn, view, today=today)
+        else:
+            transactions = merge_rows(existing['transactions'], view_records(conn, view, since_id, today),
+                                      view, today)
+            if transactions == existing['transactions']:
+                metrics.incr('cache_hits')
+                index.append({'name': view['name'], 'description': view.get('description', ''),
+                              'count': len(transactions), 'last_updated': existing.get('last_updated')})
+                continue
+        serializer.dump({
+            'name': view['name'],
+            'description': view.get('description', ''),
+            'last_updated': now,
+            'filter': view_filter(view),
+            'count': len(transactions),
+            'transactions': transactions
+        }, path, compact=True)
+        metrics.record_file(path, rows=len(transactions))
+        index.append({'name': view['name'], 'description': view.get('description', ''),
+                      'count': len(transactions), 'last_updated': now})
+        written += 1
+
+    # Files of views no longer declared are removed
+    declared = {f"{view['name']}.json" for view in views} | {INDEX_FILE}
+    for name in sorted(os.listdir(views_dir)):
+        if name.endswith('.json') and name not in declared:
+            os.remove(os.path.join(views_dir, name))
+
+    index_path = os.path.join(views_dir, INDEX_FILE)
+    serializer.dump({'last_updated': now, 'count': len(index), 'views': index}, index_path)
+    metrics.record_file(index_path, rows=len(index))
+
+    holdings.set_watermark(conn, WATERMARK, max_id)
+    conn.commit()
+    return written
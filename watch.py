@@ -0,0 +1,316 @@
+"""
+Near-real-time ingestion from EDGAR's latest-filings feed.
+
+The daily run leaves filings up to a day old. Watch mode polls the Atom feed
+of the latest Form 4 filings every `interval` seconds and, for each
+accession it hasn't seen yet:
+
+    1. downloads the filing's ownership XML (fetcher.py, same layout as the
+       daily download, so the daily run skips it afterwards)
+    2. parses it and inserts its row
+    3. re-exports the JSON files of the tickers that got new rows
+
+Accessions are tracked in the `watch_filings` table with their acceptance
+time (the feed's `updated`), when they were ingested and when they were
+exported, so the lag from acceptance to ingest and to publication can be
+reported (`python watch.py status`). Every poll is recorded in
+run_metrics.json under 'watch'.
+
+The feed lists every filing twice: once for the issuer and once for the
+reporting owner. Only the issuer entry names the issuer's CIK, so a filing
+is handled once its issuer entry has been seen.
+
+Usage:
+    python InsiderTrading.py --watch [--interval 60]
+    python watch.py status
+"""
+from datetime import datetime, timezone
+import argparse
+import os
+import re
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+
+import InsiderTrading
+import inventory
+import issuers
+import metrics
+
+FEED_URL = ("https://www.sec.gov/cgi-bin/browse-edgar?action=getcurrent&type=4&company=&dateb="
+            "&owner=include&start=0&count=100&output=atom")
+DEFAULT_INTERVAL = 60
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+ACCESSION_PATTERN = re.compile(r'accession-number=(\d{10}-\d{2}-\d{6})')
+# '4 - Apple Inc. (0000320193) (Issuer)'
+TITLE_PATTERN = re.compile(r'^(?P<form>\S+) - (?P<name>.*) \((?P<cik>\d+)\) \((?P<role>[^()]+)\)\s*$')
+
+STATUS_INGESTED = 'ingested'
+STATUS_SKIPPED = 'skipped'
+STATUS_MISSING = 'missing'
+STATUS_ERROR = 'error'
+
+# Failed accessions, and those whose documents weren't in the archive yet, are
+# retried on later polls until they have been tried this often
+RETRY_STATUSES = (STATUS_MISSING, STATUS_ERROR)
+MAX_ATTEMPTS = 3
+
+def initialize_watch(conn):
+    """Create the watch_filings table if it doesn't exist."""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS watch_filings (
+        accession TEXT PRIMARY KEY,
+        issuer_cik TEXT,
+        ticker TEXT,
+        accepted_at TEXT,
+        seen_at TEXT,
+        ingested_at TEXT,
+        exported_at TEXT,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error TEXT
+    )
+    ''')
+    conn.commit()
+
+def parse_feed(data, form='4'):
+    """Return the filings of a latest-filings Atom feed as {accession: entry}, newest first.
+
+    Each entry has accession, form, issuer_cik, issuer_name and accepted_at;
+    issuer_cik is None for filings whose issuer entry isn't in this page.
+    """
+    root = ET.fromstring(data)
+    filings = {}
+    for entry in root.iter(f'{ATOM}entry'):
+        match = ACCESSION_PATTERN.search(entry.findtext(f'{ATOM}id') or '')
+        title = TITLE_PATTERN.match(entry.findtext(f'{ATOM}title') or '')
+        if not match or not title or title.group('form') != form:
+            continue
+        filing = filings.setdefault(match.group(1), {
+            'accession': match.group(1),
+            'form': title.group('form'),
+            'issuer_cik': None,
+            'issuer_name': None,
+            'accepted_at': entry.findtext(f'{ATOM}updated'),
+        })
+        if title.group('role').strip().lower() == 'issuer':
+            filing['issuer_cik'] = issuers.normalize_cik(title.group('cik'))
+            filing['issuer_name'] = title.group('name')
+    return filings
+
+def seen_accessions(conn, accessions):
+    """Return the accessions that need no further work (done, or out of attempts)."""
+    seen = set()
+    accessions = list(accessions)
+    for start in range(0, len(accessions), 500):
+        batch = accessions[start:start + 500]
+        cursor = conn.execute(f'''
+        SELECT accession FROM watch_filings
+        WHERE accession IN ({', '.join('?' * len(batch))}) AND (status NOT IN (?, ?) OR attempts >= ?)
+        ''', batch + list(RETRY_STATUSES) + [MAX_ATTEMPTS])
+        seen.update(row[0] for row in cursor)
+    return seen
+
+def _record(conn, filing, status, ticker=None, error=None, ingested_at=None):
+    conn.execute('''
+    INSERT INTO watch_filings (accession, issuer_cik, ticker, accepted_at, seen_at, ingested_at, status, attempts, error)
+    VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?)
+    ON CONFLICT (accession) DO UPDATE SET
+        ticker = excluded.ticker, ingested_at = excluded.ingested_at, status = excluded.status,
+        attempts = watch_filings.attempts + 1, error = excluded.error
+    ''', (filing['accession'], filing['issuer_cik'], ticker, filing['accepted_at'], _now(), ingested_at, status, error))
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+def lag_seconds(accepted_at, done_at):
+    """Return the seconds between a filing's acceptance and a later ISO timestamp, or None."""
+    try:
+        accepted = datetime.fromisoformat(accepted_at)
+        done = datetime.fromisoformat(done_at)
+    except (TypeError, ValueError):
+        return None
+    if accepted.tzinfo is None:
+        accepted = accepted.replace(tzinfo=timezone.utc)
+    return max((done - accepted).total_seconds(), 0.0)
+
+def _directory_ticker(ticker, universe):
+    """Return the directory spelling of a ticker: the universe's own ('BRK-B'), as the daily download uses."""
+    for candidate in universe or ():
+        if issuers.sanitize_symbol(candidate) == ticker:
+            return candidate
+    return ticker.replace('.', '-')
+
+def poll_once(dl, feed_url=FEED_URL, universe=None, parser_backend='auto', export=True):
+    """Fetch the feed once, ingest the new filings and export the tickers they touched.
+
+    `dl` is a fetcher.PrimaryDocumentFetcher. With a `universe` of tickers,
+    filings of other issuers are recorded as skipped. Returns a summary
+    dictionary (new filings, ingested, skipped, tickers, lags).
+    """
+    summary = {'new': 0, 'ingested': 0, 'skipped': 0, 'errors': 0, 'tickers': [], 'lags': []}
+    with metrics.stage('watch_poll'):
+        data = dl.fetch(feed_url)
+        filings = parse_feed(data) if data else {}
+
+        conn = sqlite3.connect(InsiderTrading.DB_PATH)
+        try:
+            initialize_watch(conn)
+            inventory.initialize_inventory(conn)
+            issuer_map = issuers.load_issuer_map(conn)
+            wanted = {issuers.sanitize_symbol(ticker) for ticker in universe} if universe else None
+            done = seen_accessions(conn, filings)
+            # Oldest first, so rows are inserted in acceptance order
+            new = [filing for accession, filing in reversed(list(filings.items()))
+                   if accession not in done and filing['issuer_cik']]
+            summary['new'] = len(new)
+            metrics.incr('files', len(new))
+
+            tickers = set()
+            for filing in new:
+                ticker = issuer_map.get(filing['issuer_cik'])
+                if wanted is not None and ticker not in wanted:
+                    _record(conn, filing, STATUS_SKIPPED, ticker=ticker)
+                    summary['skipped'] += 1
+                    continue
+                try:
+                    directory = _directory_ticker(ticker or f"CIK{int(filing['issuer_cik'])}", universe)
+                    path = dl.fetch_primary_document(directory, filing['issuer_cik'], filing['accession'])
+                    if path is None:
+                        _record(conn, filing, STATUS_MISSING, ticker=ticker)
+                        continue
+                    if conn.execute("SELECT 1 FROM insider_trading WHERE source_file = ?", (path,)).fetchone():
+                        record = {'issuer_ticker': ticker}
+                    else:
+                        record = InsiderTrading.ingest_form4_file(conn, issuer_map, path, parser_backend)
+                    ingested_at = _now()
+                    _record(conn, filing, STATUS_INGESTED, ticker=record['issuer_ticker'], ingested_at=ingested_at)
+                    inventory.record(conn, InsiderTrading.DATA_DIR, path, inventory.STATUS_INGESTED,
+                                     filing_date=(filing['accepted_at'] or '')[:10] or None)
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    _record(conn, filing, STATUS_ERROR, ticker=ticker, error=str(e))
+                    conn.commit()
+                    metrics.incr('errors')
+                    summary['errors'] += 1
+                    print(f"Error ingesting {filing['accession']}: {e}")
+                    continue
+                summary['ingested'] += 1
+                if record['issuer_ticker']:
+                    tickers.add(record['issuer_ticker'])
+                lag = lag_seconds(filing['accepted_at'], ingested_at)
+                if lag is not None:
+                    summary['lags'].append(lag)
+                    metrics.incr('ingest_lag_seconds', lag)
+            conn.commit()
+        finally:
+            conn.close()
+    summary['tickers'] = sorted(tickers)
+
+    if export and tickers:
+        import export_json
+
+        with metrics.stage('watch_export'):
+            export_json.main(['--tickers', ','.join(summary['tickers'])])
+        mark_exported(summary['tickers'])
+    return summary
+
+def mark_exported(tickers):
+    """Record the export time of the ingested filings of some tickers that weren't exported yet."""
+    conn = sqlite3.connect(InsiderTrading.DB_PATH)
+    try:
+        conn.execute(f'''
+        UPDATE watch_filings SET exported_at = ?
+        WHERE status = ? AND exported_at IS NULL AND ticker IN ({', '.join('?' * len(tickers))})
+        ''', [_now(), STATUS_INGESTED] + list(tickers))
+        conn.commit()
+    finally:
+        conn.close()
+
+def lag_report(conn, limit=1000):
+    """Return acceptance-to-ingest and acceptance-to-export lag statistics of the latest ingested filings."""
+    rows = conn.execute('''
+    SELECT accepted_at, ingested_at, exported_at FROM watch_filings
+    WHERE status = ? ORDER BY ingested_at DESC LIMIT ?
+    ''', (STATUS_INGESTED, limit)).fetchall()
+    report = {'filings': len(rows)}
+    for name, index in (('ingest', 1), ('export', 2)):
+        lags = sorted(lag for lag in (lag_seconds(row[0], row[index]) for row in rows) if lag is not None)
+        if lags:
+            report[name] = {
+                'p50_seconds': round(lags[len(lags) // 2], 1),
+                'p95_seconds': round(lags[min(len(lags) - 1, int(len(lags) * 0.95))], 1),
+                'max_seconds': round(lags[-1], 1),
+            }
+    return report
+
+def run_watch(interval=DEFAULT_INTERVAL, feed_url=FEED_URL, universe=None, parser_backend='auto', max_polls=0,
+              export=True):
+    """Poll the feed every `interval` seconds until interrupted (or for `max_polls` polls)."""
+    os.makedirs(InsiderTrading.DATA_DIR, exist_ok=True)
+    InsiderTrading.initialize_database()
+    InsiderTrading.refresh_issuers()
+    # Only single ownership documents are fetched, whatever the daily run's fetch mode
+    dl = InsiderTrading.create_downloader(fetch_mode='primary')
+    print(f"Watching {feed_url} every {interval}s"
+          + (f" for {len(universe)} tickers" if universe else " for every issuer"))
+
+    polls = 0
+    try:
+        while not max_polls or polls < max_polls:
+            started = time.monotonic()
+            metrics.start_run('watch', os.path.join(InsiderTrading.DATA_DIR, 'run_metrics.json'))
+            status = 'error'
+            try:
+                summary = poll_once(dl, feed_url, universe=universe, parser_backend=parser_backend, export=export)
+                status = 'ok'
+            except Exception as e:
+                print(f"ERROR: poll failed: {e}")
+                summary = None
+            finally:
+                metrics.finish_run(status)
+            polls += 1
+
+            if summary and summary['new']:
+                lags = summary['lags']
+                print(f"[{_now()}] {summary['ingested']} filings ingested, {summary['skipped']} skipped"
+                      + (f", max lag {max(lags):.0f}s" if lags else '')
+                      + (f"; exported {', '.join(summary['tickers'])}" if summary['tickers'] else ''))
+            if max_polls and polls >= max_polls:
+                break
+            time.sleep(max(interval - (time.monotonic() - started), 0))
+    except KeyboardInterrupt:
+        print("Stopped watching")
+    return polls
+
+def main(argv=None):
+    """Main function for watch mode status."""
+    parser = argparse.ArgumentParser(description='Report on near-real-time watch mode.')
+    parser.add_argument('command', choices=['status'],
+                        help='status: acceptance-to-ingest and acceptance-to-export lag of recent filings')
+    parser.add_argument('--limit', type=int, default=1000,
+                        help='Number of latest ingested filings to report on (default: 1000)')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(InsiderTrading.DB_PATH):
+        print(f"Error: SQLite database not found at {InsiderTrading.DB_PATH}")
+        return 1
+    conn = sqlite3.connect(InsiderTrading.DB_PATH)
+    initialize_watch(conn)
+    counts = dict(conn.execute("SELECT status, COUNT(*) FROM watch_filings GROUP BY status"))
+    report = lag_report(conn, args.limit)
+    conn.close()
+
+    print(f"Filings seen: {counts}")
+    for name in ('ingest', 'export'):
+        if name in report:
+            stats = report[name]
+            print(f"Acceptance to {name}: p50 {stats['p50_seconds']}s, p95 {stats['p95_seconds']}s, "
+                  f"max {stats['max_seconds']}s (last {report['filings']} filings)")
+    return 0
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())